@@ -0,0 +1,84 @@
+"""
+Cảnh báo tồn kho thấp / hết hàng.
+Thay vì tính lại CASE trên toàn bộ tbl_inventory mỗi lần mở báo cáo, ngưỡng được đánh giá
+ngay khi một dòng tồn kho thay đổi (import/export/kiểm kê...) và kết quả được lưu trong
+bảng nhỏ tbl_stock_alert chỉ chứa các mặt hàng dưới ngưỡng.
+"""
+import datetime
+
+from .config import LOW_STOCK_RATIO
+from .db import get_connection, safe_close_connection, fetchall_sql
+from .event_bus import bus, TOPIC_ALERTS
+from . import queries
+
+OUT_OF_STOCK = "Out of Stock"
+LOW_STOCK = "Low Stock"
+
+
+def classify(stock_quantity, max_stock_level):
+    """Cùng quy tắc với queries.STOCK_ALERT_LEVEL (cột status của báo cáo tồn kho); None nghĩa là đủ hàng"""
+    stock_quantity = stock_quantity or 0
+    if stock_quantity <= 0:
+        return OUT_OF_STOCK
+    if max_stock_level and max_stock_level > 0 and stock_quantity < max_stock_level * LOW_STOCK_RATIO:
+        return LOW_STOCK
+    return None
+
+
+def evaluate_inventory(cursor, inventory_id: int):
+    """
+    Đánh giá lại ngưỡng của một inventory trong transaction hiện tại.
+    Trả về sự kiện thay đổi (để publish sau khi commit) hoặc None nếu cảnh báo không đổi.
+    """
+    cursor.execute(queries.SELECT_INVENTORY_FOR_ALERT, (inventory_id,))
+    inventory = cursor.fetchone()
+    cursor.execute(queries.SELECT_STOCK_ALERT_BY_ID, (inventory_id,))
+    previous = cursor.fetchone()
+
+    level = classify(inventory["stockQuantity"], inventory["maxStockLevel"]) if inventory else None
+    if level is None:
+        if not previous:
+            return None
+        cursor.execute(queries.DELETE_STOCK_ALERT, (inventory_id,))
+        return {"inventoryID": inventory_id, "alertLevel": None, "previousLevel": previous["alertLevel"]}
+
+    if previous and previous["alertLevel"] == level and previous["stockQuantity"] == inventory["stockQuantity"]:
+        return None
+    cursor.execute(queries.UPSERT_STOCK_ALERT, (
+        inventory_id, level, inventory["stockQuantity"], inventory["maxStockLevel"]
+    ))
+    return {
+        "inventoryID": inventory_id,
+        "alertLevel": level,
+        "previousLevel": previous["alertLevel"] if previous else None,
+        "stockQuantity": inventory["stockQuantity"],
+        "maxStockLevel": inventory["maxStockLevel"],
+        "updatedAt": datetime.datetime.now(),
+    }
+
+
+def rebuild_alerts():
+    """Tính lại toàn bộ bảng cảnh báo (khi khởi động hoặc sau khi sửa dữ liệu ngoài API)"""
+    conn = None
+    try:
+        conn = get_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(queries.CLEAR_STOCK_ALERTS)
+            cursor.execute(queries.REBUILD_STOCK_ALERTS, (LOW_STOCK_RATIO,))
+        conn.commit()
+    finally:
+        safe_close_connection(conn)
+
+
+def get_alerts(level: str = None):
+    if level:
+        return fetchall_sql(queries.SELECT_STOCK_ALERTS_BY_LEVEL, (level,))
+    return fetchall_sql(queries.SELECT_STOCK_ALERTS)
+
+
+# ===== PUSH =====
+def publish(events):
+    """Phát các thay đổi cảnh báo (đã commit) lên bus với topic alerts"""
+    for event in events:
+        if event:
+            bus.publish(TOPIC_ALERTS, "stock_alert", event)
@@ -0,0 +1,179 @@
+"""
+Xuất kết quả truy vấn ra Arrow IPC stream hoặc Parquet cho phân tích dữ liệu (pandas, polars, DuckDB...).
+
+Kết quả được đọc theo lô bằng cursor tuple không buffer (db.iter_sql_batches) và đưa thẳng vào
+Arrow record batch theo cột, không tạo dict cho mỗi dòng và không qua JSON. Schema được dựng từ
+kiểu cột MySQL trong cursor.description nên mọi lô có cùng schema (kể cả lô toàn NULL). Backend SQLite
+không có kiểu cột trong description: kiểu được suy ra từ giá trị của lô đầu tiên (_infer_type).
+
+- Arrow: stream IPC, mỗi record batch được gửi ngay khi đọc xong (bộ nhớ không phụ thuộc số dòng)
+- Parquet: cần footer ở cuối file nên được ghi theo lô vào file tạm rồi mới gửi
+
+Chọn định dạng bằng `?format=arrow|parquet` hoặc header Accept (MEDIA_ARROW / MEDIA_PARQUET).
+pyarrow là phụ thuộc tùy chọn (pip install pyarrow), chỉ cần khi dùng hai định dạng này.
+"""
+import datetime
+import decimal
+import io
+import itertools
+import os
+import tempfile
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from pymysql.constants import FIELD_TYPE
+
+from .db import iter_sql_batches
+
+MEDIA_ARROW = "application/vnd.apache.arrow.stream"
+MEDIA_PARQUET = "application/vnd.apache.parquet"
+FORMATS = {"arrow": MEDIA_ARROW, "parquet": MEDIA_PARQUET}
+EXTENSIONS = {"arrow": "arrows", "parquet": "parquet"}
+BATCH_ROWS = 10000
+PARQUET_CHUNK_BYTES = 1024 * 1024
+
+_INT_TYPES = {FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.LONG, FIELD_TYPE.INT24, FIELD_TYPE.LONGLONG, FIELD_TYPE.YEAR}
+_FLOAT_TYPES = {FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE}
+_DECIMAL_TYPES = {FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL}
+_DATE_TYPES = {FIELD_TYPE.DATE, FIELD_TYPE.NEWDATE}
+_DATETIME_TYPES = {FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP}
+
+
+def negotiate(format: str = None, accept: str = None):
+    """"arrow"/"parquet" nếu client yêu cầu (format= ưu tiên hơn Accept), ngược lại None (JSON như cũ)"""
+    if format:
+        return format if format in FORMATS else None
+    for kind, media_type in FORMATS.items():
+        if accept and media_type in accept:
+            return kind
+    return None
+
+
+def require_pyarrow():
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        raise HTTPException(status_code=406, detail="Arrow/Parquet export requires pyarrow (pip install pyarrow)")
+
+
+def _arrow_type(pa, column):
+    """Kiểu Arrow theo mã kiểu MySQL của cột; None nếu cursor không có mã kiểu (SQLite)"""
+    type_code, scale = column[1], column[5]
+    if type_code is None:
+        return None
+    if type_code in _INT_TYPES:
+        return pa.int64()
+    if type_code in _FLOAT_TYPES:
+        return pa.float64()
+    if type_code in _DECIMAL_TYPES:
+        return pa.decimal128(38, scale or 0)
+    if type_code in _DATE_TYPES:
+        return pa.date32()
+    if type_code in _DATETIME_TYPES:
+        return pa.timestamp("us")
+    if type_code == FIELD_TYPE.TIME:
+        return pa.duration("us")
+    return pa.string()
+
+
+def _infer_type(pa, values):
+    """
+    Kiểu Arrow theo kiểu Python của các giá trị (SQLite). DECIMAL trong SQLite được lưu dạng REAL
+    nên ra float64; cột không có giá trị nào hoặc trộn nhiều kiểu thì là string.
+    """
+    kinds = {type(value) for value in values if value is not None}
+    if not kinds:
+        return pa.string()
+    if kinds <= {int, bool}:
+        return pa.bool_() if kinds == {bool} else pa.int64()
+    if kinds <= {int, float, decimal.Decimal}:
+        return pa.float64()
+    if kinds == {datetime.datetime}:
+        return pa.timestamp("us")
+    if kinds == {datetime.date}:
+        return pa.date32()
+    if kinds == {bytes}:
+        return pa.binary()
+    return pa.string()
+
+
+def _as_strings(values) -> list:
+    return [value if value is None or isinstance(value, str) else str(value) for value in values]
+
+
+def _as_floats(values) -> list:
+    return [value if value is None else float(value) for value in values]
+
+
+def _batches(pa, query: str, params: tuple):
+    """(schema, iterator record batch); truy vấn được chạy ngay để lỗi SQL xảy ra trước khi gửi response"""
+    results = iter_sql_batches(query, params, BATCH_ROWS)
+    description = next(results)
+    first = next(results, None)
+    samples = list(zip(*first)) if first else [()] * len(description)
+    fields = []
+    converters = {}
+    for index, (column, values) in enumerate(zip(description, samples)):
+        arrow_type = _arrow_type(pa, column)
+        if arrow_type is None:
+            arrow_type = _infer_type(pa, values)
+            # SQLite không ép kiểu theo cột: số nguyên/Decimal trong cột số thực, cột toàn NULL ở lô đầu
+            if arrow_type == pa.float64():
+                converters[index] = _as_floats
+            elif arrow_type == pa.string():
+                converters[index] = _as_strings
+        fields.append((column[0], arrow_type))
+    schema = pa.schema(fields)
+
+    def record_batches():
+        for rows in itertools.chain([first] if first else [], results):
+            columns = list(zip(*rows))
+            yield pa.RecordBatch.from_arrays([
+                pa.array(converters[index](values) if index in converters else values, type=field.type)
+                for index, (values, field) in enumerate(zip(columns, schema))
+            ], schema=schema)
+    return schema, record_batches()
+
+
+def _arrow_stream(pa, schema, batches):
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+
+def _parquet_file(pa, schema, batches) -> str:
+    import pyarrow.parquet as pq
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    os.close(fd)
+    try:
+        with pq.ParquetWriter(path, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def _send_file(path: str):
+    try:
+        with open(path, "rb") as file:
+            while chunk := file.read(PARQUET_CHUNK_BYTES):
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def export(kind: str, query: str, params: tuple = (), filename: str = "export") -> StreamingResponse:
+    pa = require_pyarrow()
+    schema, batches = _batches(pa, query, params)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{EXTENSIONS[kind]}"'}
+    if kind == "parquet":
+        return StreamingResponse(_send_file(_parquet_file(pa, schema, batches)), media_type=MEDIA_PARQUET, headers=headers)
+    return StreamingResponse(_arrow_stream(pa, schema, batches), media_type=MEDIA_ARROW, headers=headers)
@@ -0,0 +1,108 @@
+"""
+So sánh commit theo từng request (execute_sql) với group commit (db.GroupCommitWriter) cho các INSERT nhỏ
+từ nhiều request đồng thời, như thanh toán ở quầy POS giờ cao điểm.
+
+Chạy trên database trong config.py (cần quyền tạo/xóa bảng):
+    python -m src.api.benchmarks.group_commit --threads 64 --ops 100 --window-ms 5
+
+Hoặc trên SQLite nhúng (không cần MySQL): --sqlite :memory: hoặc --sqlite data/bench.sqlite3
+
+Ghi vào bảng tạm tbl_bench_group_commit (xóa khi xong), không đụng dữ liệu thật.
+"""
+import argparse
+import threading
+import time
+
+from src.api import db
+from src.api.db import GroupCommitWriter, execute_sql
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS tbl_bench_group_commit (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        orderID INT NOT NULL,
+        amount DECIMAL(10, 2) NOT NULL,
+        createdAt DATETIME NOT NULL
+    )
+"""
+INSERT_ROW = "INSERT INTO tbl_bench_group_commit (orderID, amount, createdAt) VALUES (%s, %s, NOW())"
+DROP_TABLE = "DROP TABLE IF EXISTS tbl_bench_group_commit"
+
+
+def run(mode: str, threads: int, ops: int, window_ms: float, max_batch: int) -> dict:
+    writer = None
+    write = execute_sql
+    if mode == "grouped":
+        writer = GroupCommitWriter(enabled=True, window_ms=window_ms, max_batch=max_batch)
+        writer.start()
+        write = writer.execute
+    latencies = []
+    rowids = []
+    errors = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(threads)
+
+    def worker(n):
+        local, ids = [], []
+        try:
+            start_barrier.wait()
+            for i in range(ops):
+                began = time.perf_counter()
+                ids.append(write(INSERT_ROW, (n, i)))
+                local.append(time.perf_counter() - began)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+        with lock:
+            latencies.extend(local)
+            rowids.extend(ids)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    began = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    stats = writer.stats() if writer else None
+    if writer:
+        writer.stop()
+
+    latencies.sort()
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2) if latencies else None
+    result = {
+        "mode": mode,
+        "ops": len(latencies),
+        "seconds": round(elapsed, 3),
+        "opsPerSecond": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50Ms": percentile(0.5),
+        "p99Ms": percentile(0.99),
+        "uniqueRowIDs": len(set(rowids)) == len(rowids),  # Mỗi request nhận đúng lastrowid của mình
+        "errors": len(errors),
+    }
+    if stats:
+        result["batches"] = stats["batches"]
+        result["avgBatch"] = round(stats["statements"] / stats["batches"], 1) if stats["batches"] else 0
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--ops", type=int, default=100, help="Số INSERT của mỗi thread")
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--max-batch", type=int, default=200)
+    parser.add_argument("--sqlite", help="Chạy trên SQLite (đường dẫn file hoặc :memory:) thay cho MySQL")
+    args = parser.parse_args()
+    if args.sqlite:
+        db.use_sqlite(args.sqlite)
+    execute_sql(CREATE_TABLE)
+    try:
+        for mode in ("per-request", "grouped"):
+            print(run(mode, args.threads, args.ops, args.window_ms, args.max_batch))
+    finally:
+        execute_sql(DROP_TABLE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Đo tranh chấp khi nhiều transaction cùng xuất kho một inventory qua stock_movements.apply_export
+(lịch sử stores, định giá, tồn kho, cảnh báo): một dòng tbl_inventory so với bộ đếm chia shard
+(hot_stock.py), trong đó định giá và cảnh báo được ghi theo lô sau đó (settleMs).
+
+Chạy trên database trong config.py (cần quyền tạo/xóa dòng):
+    python -m src.api.benchmarks.hot_stock_contention --threads 32 --ops 200 --shards 8
+
+Hoặc trên SQLite nhúng (không cần MySQL): --sqlite :memory: hoặc --sqlite data/bench.sqlite3
+
+Dùng một inventoryID riêng (mặc định 999999) và xóa dữ liệu của nó khi xong.
+"""
+import argparse
+import threading
+import time
+
+from src.api import db
+from src.api.db import get_connection, safe_close_connection
+from src.api import queries, hot_stock, stock_movements, valuation
+
+
+def _setup(inventory_id: int, stock: int, shards: int):
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(queries.DELETE_INVENTORY_SHARDS, (inventory_id,))
+            cursor.execute("DELETE FROM tbl_inventory WHERE inventoryID = %s", (inventory_id,))
+            cursor.execute(queries.INSERT_INVENTORY_FOR_IMPORT, (inventory_id, stock, 1))
+            valuation.ensure_valuation(cursor, inventory_id)
+            if shards:
+                hot_stock.enable(cursor, inventory_id, shards)
+        conn.commit()
+    finally:
+        safe_close_connection(conn)
+
+
+def _teardown(inventory_id: int):
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(queries.DELETE_INVENTORY_SHARDS, (inventory_id,))
+            cursor.execute(queries.DELETE_INVENTORY_VALUATION, (inventory_id,))
+            cursor.execute(queries.DELETE_COST_LAYERS, (inventory_id,))
+            cursor.execute(queries.DELETE_STOCK_ALERT, (inventory_id,))
+            cursor.execute("DELETE FROM tbl_stores WHERE inventoryID = %s", (inventory_id,))
+            cursor.execute("DELETE FROM tbl_inventory WHERE inventoryID = %s", (inventory_id,))
+        conn.commit()
+    finally:
+        safe_close_connection(conn)
+
+
+def _remaining(inventory_id: int) -> tuple:
+    """(tồn kho, số lượng trong dòng định giá) sau khi đã ghi hết phần còn chờ"""
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(queries.SELECT_STOCK_QUANTITY_FOR_EXPORT, (inventory_id,))
+            stock = cursor.fetchone()["stockQuantity"]
+            cursor.execute(queries.SELECT_INVENTORY_VALUATION_FOR_UPDATE, (inventory_id,))
+            valued = cursor.fetchone()["quantity"]
+        conn.commit()
+        return stock, valued
+    finally:
+        safe_close_connection(conn)
+
+
+def run(mode: str, inventory_id: int, threads: int, ops: int, shards: int) -> dict:
+    _setup(inventory_id, threads * ops, shards if mode == "sharded" else 0)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(threads)
+
+    def worker():
+        conn = get_connection()
+        local = []
+        try:
+            start_barrier.wait()
+            for _ in range(ops):
+                began = time.perf_counter()
+                with conn.cursor() as cursor:
+                    stock_movements.apply_export(cursor, None, inventory_id, 1)
+                conn.commit()
+                local.append(time.perf_counter() - began)
+        except Exception as e:
+            conn.rollback()
+            with lock:
+                errors.append(str(e))
+        finally:
+            safe_close_connection(conn)
+            with lock:
+                latencies.extend(local)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    began = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    # Phần định giá/cảnh báo còn chờ của inventory chia shard (thread nền làm việc này khi chạy server)
+    settle_began = time.perf_counter()
+    stock_movements.settle_all()
+    settle_elapsed = time.perf_counter() - settle_began
+    remaining, valued = _remaining(inventory_id)
+    _teardown(inventory_id)
+
+    latencies.sort()
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2) if latencies else None
+    return {
+        "mode": mode,
+        "ops": len(latencies),
+        "seconds": round(elapsed, 3),
+        "opsPerSecond": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50Ms": percentile(0.5),
+        "p99Ms": percentile(0.99),
+        "settleMs": round(settle_elapsed * 1000, 2),
+        "remaining": remaining,  # Phải bằng 0 nếu không có lỗi: không mất hoặc trừ thừa
+        "valuationQuantity": valued,  # Phải bằng remaining: mọi lần xuất đã được ghi vào định giá
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--ops", type=int, default=200, help="Số lần xuất kho (mỗi lần 1 đơn vị) của mỗi thread")
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--inventory-id", type=int, default=999999)
+    parser.add_argument("--sqlite", help="Chạy trên SQLite (đường dẫn file hoặc :memory:) thay cho MySQL")
+    args = parser.parse_args()
+    if args.sqlite:
+        db.use_sqlite(args.sqlite)
+        db.init_schema(queries.BASE_TABLES + queries.SCHEMA_STATEMENTS)
+    for mode in ("single", "sharded"):
+        print(run(mode, args.inventory_id, args.threads, args.ops, args.shards))
+
+
+if __name__ == "__main__":
+    main()
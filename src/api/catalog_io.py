@@ -0,0 +1,264 @@
+"""
+Nhập/xuất danh mục sản phẩm số lượng lớn (CSV, XLSX) theo kiểu streaming.
+
+Nhập: file được đọc từng dòng (csv) hoặc từng hàng (openpyxl read-only), mỗi dòng được kiểm tra
+bằng model Product, các dòng hợp lệ được ghi theo lô bằng một câu INSERT nhiều dòng
+... ON DUPLICATE KEY UPDATE (mỗi lô một transaction). Dòng có productID cập nhật sản phẩm đó;
+dòng không có productID được ghép với sản phẩm cùng (productName, productBrand) nếu đã tồn tại.
+Tiến độ và lỗi từng dòng được trả về dạng NDJSON trong lúc nhập.
+
+Xuất: đọc bằng db.iter_sql (cursor không buffer) và ghi ra CSV/NDJSON theo từng khối; export_response
+chọn định dạng cho các endpoint xuất (arrow/parquet qua arrow_export.py).
+"""
+import csv
+import io
+import logging
+import os
+import shutil
+import uuid
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+
+from .config import CATALOG_IMPORT_BATCH_SIZE, JOBS_DB_PATH
+from .db import get_connection, safe_close_connection, iter_sql
+from .models.product import Product
+from .report_precompute import report_store
+from . import queries, arrow_export
+
+PRODUCT_FIELDS = list(Product.__annotations__)
+IMPORT_COLUMNS = ["productID"] + PRODUCT_FIELDS
+STR_FIELDS = {name for name, kind in Product.__annotations__.items() if kind is str}
+EXPORT_CHUNK_ROWS = 1000
+MAX_JOB_ERRORS = 1000  # Số lỗi từng dòng giữ lại trong kết quả job nhập nền
+UPLOAD_DIR = os.path.join(os.path.dirname(JOBS_DB_PATH), "uploads")  # File upload lưu tạm cho job nhập nền
+
+
+# ===== READ =====
+def _iter_csv(file):
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _iter_xlsx(openpyxl, file):
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else "" for cell in next(rows, ())]
+        for line, values in enumerate(rows, start=2):
+            yield line, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def check_format(filename: str) -> str:
+    """Định dạng file theo phần mở rộng ("csv" hoặc "xlsx"), 415 nếu không hỗ trợ"""
+    name = (filename or "").lower()
+    if name.endswith(".xlsx"):
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=415, detail="XLSX import requires openpyxl (pip install openpyxl)")
+        return "xlsx"
+    if name.endswith(".csv") or not name:
+        return "csv"
+    raise HTTPException(status_code=415, detail="Only .csv and .xlsx files are supported")
+
+
+def read_rows(filename: str, file):
+    """Chọn bộ đọc theo phần mở rộng file; trả về iterator (số dòng, dict)"""
+    if check_format(filename) == "xlsx":
+        import openpyxl
+        return _iter_xlsx(openpyxl, file)
+    return _iter_csv(file)
+
+
+def validate_row(raw: dict):
+    """Trả về (tuple giá trị theo IMPORT_COLUMNS, None) hoặc (None, thông báo lỗi)"""
+    data = {}
+    for key, value in raw.items():
+        key = (key or "").strip()
+        if key not in IMPORT_COLUMNS or value is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+            if value == "":
+                continue
+        elif key in STR_FIELDS:
+            value = str(value)
+        data[key] = value
+
+    product_id = data.pop("productID", None)
+    try:
+        product_id = int(product_id) if product_id is not None else None
+        product = Product(**data)
+    except ValidationError as e:
+        return None, "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+    except ValueError:
+        return None, f"productID: invalid value {product_id!r}"
+    values = dict(product)
+    return (product_id,) + tuple(values[field] for field in PRODUCT_FIELDS), None
+
+
+# ===== IMPORT =====
+def _match_existing(cursor, batch: list) -> list:
+    """Điền productID cho các dòng chưa có ID nhưng trùng (productName, productBrand) với sản phẩm đã có"""
+    name_index = PRODUCT_FIELDS.index("productName") + 1
+    brand_index = PRODUCT_FIELDS.index("productBrand") + 1
+    missing = {(row[name_index], row[brand_index]) for row in batch if row[0] is None}
+    if not missing:
+        return batch
+    params = [value for pair in missing for value in pair]
+    cursor.execute(
+        queries.SELECT_PRODUCT_IDS_BY_NAME_BRAND.format(placeholders=", ".join(["(%s, %s)"] * len(missing))),
+        params,
+    )
+    existing = {(row["productName"], row["productBrand"]): row["productID"] for row in cursor.fetchall()}
+    return [
+        (existing.get((row[name_index], row[brand_index])),) + row[1:] if row[0] is None else row
+        for row in batch
+    ]
+
+
+def _write_batch(conn, batch: list, stats: dict, dry_run: bool):
+    with conn.cursor() as cursor:
+        batch = _match_existing(cursor, batch)
+        updated = sum(1 for row in batch if row[0] is not None)
+        if not dry_run:
+            row_placeholders = "(" + ", ".join(["%s"] * len(IMPORT_COLUMNS)) + ")"
+            cursor.execute(
+                queries.UPSERT_PRODUCTS_BATCH.format(values=", ".join([row_placeholders] * len(batch))),
+                [value for row in batch for value in row],
+            )
+    if not dry_run:
+        conn.commit()
+    stats["updated"] += updated
+    stats["inserted"] += len(batch) - updated
+
+
+def import_products(rows, batch_size: int = CATALOG_IMPORT_BATCH_SIZE, dry_run: bool = False):
+    """
+    Generator sự kiện tiến độ: {"type": "error", "row", "error"} cho dòng lỗi,
+    {"type": "progress", ...} sau mỗi lô và {"type": "done", ...} ở cuối.
+    """
+    stats = {"processed": 0, "inserted": 0, "updated": 0, "failed": 0}
+    batch = []
+    batch_lines = []
+    conn = None
+
+    def flush():
+        try:
+            _write_batch(conn, batch, stats, dry_run)
+            return {"type": "progress", **stats}
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Error in import_products batch: {e}")
+            stats["failed"] += len(batch)
+            return {"type": "error", "rows": [batch_lines[0], batch_lines[-1]], "error": str(e)}
+
+    try:
+        conn = get_connection()
+        for line, raw in rows:
+            stats["processed"] += 1
+            values, error = validate_row(raw)
+            if error:
+                stats["failed"] += 1
+                yield {"type": "error", "row": line, "error": error}
+                continue
+            batch.append(values)
+            batch_lines.append(line)
+            if len(batch) >= batch_size:
+                yield flush()
+                batch, batch_lines = [], []
+        if batch:
+            yield flush()
+        if not dry_run and stats["inserted"] + stats["updated"]:
+            report_store.request_refresh()
+        yield {"type": "done", "dryRun": dry_run, **stats}
+    finally:
+        safe_close_connection(conn)
+
+
+def save_upload(file) -> str:
+    """Lưu file upload (chỉ tồn tại trong request) vào UPLOAD_DIR cho job nền, trả về đường dẫn"""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}_{os.path.basename(file.filename or 'catalog.csv')}")
+    with open(path, "wb") as target:
+        shutil.copyfileobj(file.file, target)
+    return path
+
+
+def discard_upload(params: dict):
+    """Xóa file đã lưu tạm của job nhập không chạy tới cuối (bị hủy khi đang chờ, bị ngắt do restart)"""
+    try:
+        os.remove(params["path"])
+    except FileNotFoundError:
+        pass
+
+
+def run_import_job(params: dict, context):
+    """Nhập danh mục trong job nền (jobs.py) từ file đã lưu tạm; file bị xóa khi xong"""
+    path = params["path"]
+    try:
+        with open(path, "rb") as file:
+            rows = read_rows(params["filename"], file)
+            errors = []
+            summary = {}
+            for event in import_products(rows, params["batch_size"], params["dry_run"]):
+                context.check_cancelled()
+                if event["type"] == "error":
+                    if len(errors) < MAX_JOB_ERRORS:
+                        errors.append(event)
+                else:
+                    summary = {k: v for k, v in event.items() if k != "type"}
+                    context.progress(**summary)
+        return {**summary, "errors": errors}
+    finally:
+        discard_upload(params)
+
+
+def ndjson(events):
+    for event in events:
+        yield orjson.dumps(event, default=str) + b"\n"
+
+
+# ===== EXPORT =====
+def export_csv(query: str, params: tuple = ()):
+    """Ghi kết quả truy vấn ra CSV theo từng khối EXPORT_CHUNK_ROWS dòng"""
+    buffer = io.StringIO()
+    writer = None
+    count = 0
+    for row in iter_sql(query, params):
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row))
+            writer.writeheader()
+        writer.writerow(row)
+        count += 1
+        if count % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_ndjson(query: str, params: tuple = ()):
+    return ndjson(iter_sql(query, params))
+
+
+def export_response(query: str, format: str, filename: str):
+    """Response streaming cho endpoint xuất dữ liệu (csv, ndjson, arrow hoặc parquet)"""
+    if format == "csv":
+        return StreamingResponse(
+            export_csv(query), media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'},
+        )
+    if format == "ndjson":
+        return StreamingResponse(export_ndjson(query), media_type="application/x-ndjson")
+    if format in arrow_export.FORMATS:
+        return arrow_export.export(format, query, filename=filename)
+    raise HTTPException(status_code=400, detail="format must be csv, ndjson, arrow or parquet")
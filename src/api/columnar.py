@@ -0,0 +1,48 @@
+"""
+Định dạng cột cho các list endpoint lớn (`?format=columnar`).
+
+Thay vì mỗi dòng là một dict lặp lại tên cột, kết quả được đọc bằng cursor tuple
+(db.fetchall_sql(..., columnar=True)) và trả về một danh sách cột dùng chung:
+    {"columns": ["storeID", "productID", ...], "rows": [[1, 5, ...], [2, 7, ...]]}
+Response được serialize thẳng bằng orjson, không qua jsonable_encoder của FastAPI (vốn duyệt
+từng giá trị), nên vừa nhỏ hơn vừa nhanh hơn với vài chục nghìn dòng.
+"""
+import decimal
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from .db import fetchall_sql
+
+FORMATS = ("json", "columnar")
+
+
+def is_columnar(format: str) -> bool:
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(FORMATS)}")
+    return format == "columnar"
+
+
+def to_columnar(rows: list) -> dict:
+    """Chuyển danh sách dict (đã đọc theo DictCursor) sang dạng cột"""
+    columns = list(rows[0]) if rows else []
+    return {"columns": columns, "rows": [tuple(row[c] for c in columns) for row in rows]}
+
+
+def _default(value):
+    # Decimal -> số như jsonable_encoder, các kiểu khác (timedelta, bytes...) -> chuỗi
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return str(value)
+
+
+def response(result: dict) -> Response:
+    return Response(orjson.dumps(result, default=_default), media_type="application/json")
+
+
+def fetch_response(query: str, params: tuple = (), columnar: bool = False):
+    """Kết quả của list endpoint: danh sách dict như trước, hoặc response dạng cột"""
+    if columnar:
+        return response(fetchall_sql(query, params, columnar=True))
+    return fetchall_sql(query, params)
@@ -16,6 +16,93 @@ DB_CONFIG = {
     "db": "storemanagesystem",  # Tên database
     # cursorclass sẽ được xử lý tự động trong api.py
 }
+# Read replica: mỗi phần tử ghi đè các khóa của DB_CONFIG, vd. [{"host": "10.0.0.12"}, {"port": 3307}]
+DB_REPLICAS = []
+DB_REPLICA_MAX_LAG_SECONDS = 5  # Replica trễ hơn ngưỡng này không nhận truy vấn đọc
+DB_REPLICA_CHECK_SECONDS = 10  # Chu kỳ kiểm tra kết nối/độ trễ replica
+DB_READ_YOUR_WRITES_SECONDS = 10  # Sau khi ghi, session (cookie) đọc từ primary trong N giây
+# Group commit: gom các INSERT nhỏ (thanh toán, dòng đơn hàng) từ nhiều request vào một transaction (xem db.GroupCommitWriter)
+GROUP_COMMIT_ENABLED = False
+GROUP_COMMIT_WINDOW_MS = 5  # Thời gian chờ gom thêm câu sau câu đầu tiên của lô
+GROUP_COMMIT_MAX_BATCH = 200  # Số câu tối đa trong một transaction
+GROUP_COMMIT_TIMEOUT_SECONDS = 10  # Thời gian request chờ kết quả tối đa
+# Backend lưu trữ: "mysql" (DB_CONFIG) hoặc "sqlite" - database nhúng cho chi nhánh nhỏ/test (xem sqlite_backend.py)
+DB_BACKEND = "mysql"
+SQLITE_DB_PATH = "data/store.sqlite3"  # File database khi DB_BACKEND = "sqlite"; ":memory:" để dùng database trong bộ nhớ
+SQLITE_CACHE_MB = 64  # Page cache của mỗi kết nối SQLite (mmap gấp 4 lần)
+SQLITE_BUSY_TIMEOUT_SECONDS = 5  # Thời gian chờ khóa ghi tối đa trước khi báo "database is locked"
+
+# ===== TENANT (MULTI-STORE) CONFIG =====
+# Mỗi cửa hàng một shard (database riêng, cùng schema): mỗi phần tử ghi đè các khóa của DB_CONFIG,
+# vd. {"hn01": {"db": "store_hn01"}, "hcm01": {"host": "10.0.0.21", "db": "store_hcm01"}}
+# Với DB_BACKEND = "sqlite": {"hn01": {"path": "data/store_hn01.sqlite3"}}. Để {} nếu chỉ có một database.
+TENANT_SHARDS = {}
+TENANT_HEADER = "X-Store-ID"  # Header chọn cửa hàng; không gửi thì dùng database mặc định (DB_CONFIG)
+# Ranh giới tin cậy: TENANT_HEADER do client gửi, app không gắn cửa hàng với nhân viên đăng nhập.
+# Cửa hàng không có trong TENANT_TOKENS nhận mọi request ghi X-Store-ID của nó (chỉ dùng khi API nằm sau
+# gateway/mạng nội bộ đã xác thực cửa hàng); có token thì request phải gửi kèm TENANT_TOKEN_HEADER khớp, sai trả 403.
+TENANT_TOKENS = {}  # vd. {"hn01": "<token bí mật của hn01>"}
+TENANT_TOKEN_HEADER = "X-Store-Token"
+TENANT_FANOUT_WORKERS = 8  # Số shard được truy vấn song song cho báo cáo toàn chuỗi (?stores=all)
+
+# ===== QUERY FAN-OUT CONFIG =====
+QUERY_FANOUT_WORKERS = 32  # Số thread (kết nối) dùng chung cho các câu đọc chạy song song trong một request
+QUERY_FANOUT_MAX_PER_REQUEST = 4  # Số câu tối đa một request chạy cùng lúc
+QUERY_FANOUT_TIMEOUT_SECONDS = 10  # Thời gian chờ tối đa cho cả nhóm câu của một request
+
+# ===== INVENTORY CONFIG =====
+LOW_STOCK_RATIO = 0.2  # Cảnh báo "Low Stock" khi tồn kho < maxStockLevel * tỉ lệ này
+INVENTORY_VALUATION_METHOD = "FIFO"  # Định giá tồn kho: "FIFO" hoặc "AVERAGE" (xem valuation.py)
+HOT_STOCK_DEFAULT_SHARDS = 8  # Số shard mặc định khi bật bộ đếm chia shard cho inventory bán chạy (xem hot_stock.py)
+HOT_STOCK_SETTLE_SECONDS = 1  # Chu kỳ ghi định giá/cảnh báo của xuất kho inventory chia shard theo lô (0 để ghi ngay trong mỗi lần xuất)
+RESERVATION_HOLD_SECONDS = 600  # Thời gian giữ hàng cho giỏ hàng trước khi tự hủy (xem reservations.py)
+RESERVATION_STOCK_REFRESH_SECONDS = 60  # Chu kỳ nạp lại tồn kho theo sản phẩm cho số lượng có thể bán (0 để tắt)
+
+# Journal ghi trễ cho import/export/kiểm kê (xem journal.py) - chỉ dùng khi chạy một worker
+INVENTORY_JOURNAL_ENABLED = False
+INVENTORY_JOURNAL_PATH = "data/inventory_journal.log"
+INVENTORY_JOURNAL_FSYNC_MS = 5  # Thời gian gom các request vào cùng một lần fsync
+INVENTORY_JOURNAL_FLUSH_MS = 200  # Chu kỳ ghi các biến động vào MySQL
+INVENTORY_JOURNAL_BATCH_SIZE = 500  # Số biến động tối đa trong một transaction MySQL
+
+# Lưu trữ lịch sử kho (tbl_stores -> tbl_stores_archive), xem store_archive.py
+STORES_HOT_RETENTION_DAYS = 90  # Giữ biến động trong N ngày gần nhất ở bảng chính
+STORES_ARCHIVE_INTERVAL_HOURS = 24  # Chu kỳ chạy job lưu trữ (0 để tắt)
+STORES_ARCHIVE_WINDOW_DAYS = 7  # Số ngày dữ liệu chuyển trong mỗi transaction
+
+# Ảnh chụp tồn kho theo ngày cho truy vấn tồn kho tại một thời điểm (xem stock_snapshots.py)
+STOCK_SNAPSHOT_INTERVAL_HOURS = 24  # Chu kỳ chụp các ngày còn thiếu (0 để tắt)
+
+# ===== CATALOG IMPORT CONFIG =====
+CATALOG_IMPORT_BATCH_SIZE = 500  # Số sản phẩm mỗi câu INSERT nhiều dòng / transaction khi nhập CSV/XLSX
+
+# ===== BACKGROUND JOBS CONFIG =====
+JOBS_DB_PATH = "data/jobs.sqlite3"  # File SQLite lưu trạng thái/kết quả job (xem jobs.py)
+JOBS_WORKERS = 2  # Số job chạy đồng thời
+JOBS_RESULT_TTL_HOURS = 24  # Giữ kết quả job trong N giờ sau khi kết thúc
+
+# ===== REPORTS CONFIG =====
+REPORTS_PRECOMPUTE_INTERVAL_MINUTES = 15  # Chu kỳ tính trước các báo cáo chuẩn (0 để tắt), xem report_precompute.py
+
+# ===== IDEMPOTENCY CONFIG =====
+IDEMPOTENCY_KEY_TTL_HOURS = 24  # Thời gian giữ Idempotency-Key và response đã lưu (xem idempotency.py)
+
+# ===== TRACING / METRICS CONFIG =====
+METRICS_ENABLED = True  # Histogram độ trễ/DB/serialize theo route, xuất Prometheus tại GET /metrics (xem tracing.py)
+# "" để tắt span; đường dẫn file (JSON lines, vd. "data/spans.jsonl") hoặc URL OTLP/HTTP của collector cục bộ
+# (vd. "http://localhost:4318/v1/traces")
+TRACING_SPANS_EXPORT = ""
+TRACING_SPANS_SAMPLE_RATIO = 1.0  # Tỉ lệ request được ghi span (request có traceparent sampled luôn được ghi)
+TRACING_SERVICE_NAME = "store-management-api"
+TRACING_MAX_QUERY_SPANS = 100  # Số span SQL tối đa mỗi request
+
+# ===== ADMIN / PROFILING CONFIG =====
+ADMIN_TOKEN = ""  # Token cho các endpoint /admin và ?profile=1 (header X-Admin-Token); "" để tắt
+PROFILE_DIR = "data/profiles"  # Thư mục lưu file cProfile (pstats) của các request ?profile=1
+PROFILE_KEEP = 50  # Số file profile mới nhất được giữ lại
+PROFILE_ROUTES = []  # Mẫu route cho phép ?profile=1, vd. ["/stores", "/reports/summary"]; [] = mọi route
+PROFILE_SAMPLE_INTERVAL_MS = 5  # Chu kỳ lấy mẫu stack mặc định của POST /admin/profile/sample
+PROFILE_MAX_SECONDS = 60  # Thời gian lấy mẫu tối đa mỗi lần
 
 # ===== CORS CONFIG =====
 # Danh sách các origin được phép truy cập API
@@ -25,6 +112,8 @@ CORS_ALLOW_ORIGINS = ["*"]
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_METHODS = ["*"]
 CORS_ALLOW_HEADERS = ["*"]
+# Các header trả về mà frontend được phép đọc (vd. cursor phân trang)
+CORS_EXPOSE_HEADERS = ["X-Next-Cursor", "Idempotent-Replayed", "X-Profile-ID", "X-DB-Primary-Until"]
 
 # ===== LOGGING CONFIG =====
 LOG_LEVEL = "INFO"  # DEBUG, INFO, WARNING, ERROR, CRITICAL
@@ -1,15 +1,239 @@
+import contextlib
+import contextvars
+import hmac
+import itertools
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
 import pymysql
-from pymysql.cursors import DictCursor
+from pymysql.cursors import Cursor, DictCursor, SSCursor, SSDictCursor
 import logging
 from .config import DB_CONFIG as CONFIG_DB_CONFIG
+from .config import DB_REPLICAS, DB_REPLICA_MAX_LAG_SECONDS, DB_REPLICA_CHECK_SECONDS, DB_READ_YOUR_WRITES_SECONDS
+from .config import GROUP_COMMIT_ENABLED, GROUP_COMMIT_WINDOW_MS, GROUP_COMMIT_MAX_BATCH, GROUP_COMMIT_TIMEOUT_SECONDS
+from .config import DB_BACKEND, SQLITE_DB_PATH, SQLITE_CACHE_MB, SQLITE_BUSY_TIMEOUT_SECONDS
+from .config import TENANT_SHARDS, TENANT_TOKENS, TENANT_FANOUT_WORKERS
+from .config import QUERY_FANOUT_WORKERS, QUERY_FANOUT_MAX_PER_REQUEST, QUERY_FANOUT_TIMEOUT_SECONDS
+from . import sqlite_backend, tracing
 
 # ===== DATABASE CONFIG =====
 # Thêm cursorclass vào config
 DB_CONFIG = CONFIG_DB_CONFIG.copy()
 DB_CONFIG["cursorclass"] = DictCursor
 
+# ===== SQLITE BACKEND =====
+# Database nhúng thay cho MySQL (DB_BACKEND = "sqlite"): mọi kết nối đọc/ghi đi vào cùng một file
+_sqlite = None
+
+def use_sqlite(path: str = SQLITE_DB_PATH):
+    """Chuyển sang backend SQLite; ":memory:" cho database trong bộ nhớ (benchmark/test)"""
+    global _sqlite
+    _sqlite = sqlite_backend.Database(path, SQLITE_CACHE_MB, SQLITE_BUSY_TIMEOUT_SECONDS)
+    return _sqlite
+
+def using_sqlite() -> bool:
+    return _sqlite is not None
+
+if DB_BACKEND == "sqlite":
+    use_sqlite()
+
+
+# ===== READ-YOUR-WRITES =====
+# Trạng thái định tuyến của request hiện tại (middleware trong main.py tạo qua begin_request).
+# Là object dùng chung nên route chạy trong threadpool ghi vào vẫn thấy được ở middleware.
+_routing = contextvars.ContextVar("db_routing", default=None)
+
+class RoutingState:
+    __slots__ = ("primary_until", "wrote")
+
+    def __init__(self, primary_until: float = 0.0):
+        self.primary_until = primary_until
+        self.wrote = False
+
+    def use_primary(self) -> bool:
+        return self.wrote or time.time() < self.primary_until
+
+def begin_request(primary_until: float = 0.0) -> RoutingState:
+    """Bắt đầu request; primary_until là mốc (epoch) mà session còn phải đọc từ primary"""
+    # Mốc do client gửi lên: không cho ghim vào primary lâu hơn DB_READ_YOUR_WRITES_SECONDS
+    state = RoutingState(min(primary_until, primary_pin_until()))
+    _routing.set(state)
+    return state
+
+def mark_write():
+    state = _routing.get()
+    if state is not None:
+        state.wrote = True
+
+def primary_pin_until() -> float:
+    """Mốc đọc từ primary cho session sau khi request hiện tại ghi dữ liệu"""
+    return time.time() + DB_READ_YOUR_WRITES_SECONDS
+
+class TracedConnection(pymysql.connections.Connection):
+    """Cộng thời gian và số câu SQL vào trace của request đang chạy (xem tracing.py)"""
+
+    def query(self, sql, unbuffered=False):
+        began = time.perf_counter()
+        try:
+            return super().query(sql, unbuffered)
+        finally:
+            tracing.record_query(sql, time.perf_counter() - began)
+
+class PrimaryConnection(TracedConnection):
+    """Kết nối tới primary; commit đánh dấu request đã ghi để các lần đọc sau không đi qua replica"""
+
+    def commit(self):
+        super().commit()
+        mark_write()
+
 def get_connection():
-    return pymysql.connect(**DB_CONFIG)
+    tenant = _tenant.get()
+    if tenant is not None:
+        return _tenant_connection(tenant)
+    if _sqlite is not None:
+        return _sqlite.connect(on_commit=mark_write)
+    return PrimaryConnection(**DB_CONFIG)
+
+
+# ===== READ REPLICAS =====
+class Replica:
+    def __init__(self, config: dict):
+        self.config = {**DB_CONFIG, "connect_timeout": 2, **config}
+        self.name = f"{self.config.get('host')}:{self.config.get('port', 3306)}"
+        self.healthy = True
+        self.lag = None
+        self.last_error = None
+        self.checked_at = None
+        self.reads = 0
+        self.failures = 0
+
+    def mark_down(self, error):
+        self.healthy = False
+        self.failures += 1
+        self.last_error = str(error)
+
+    def check(self, max_lag: float):
+        """Kết nối thử và đọc độ trễ replication; trễ quá max_lag thì không nhận truy vấn đọc"""
+        conn = None
+        try:
+            conn = pymysql.connect(**{**self.config, "connect_timeout": 2})
+            with conn.cursor() as cursor:
+                status = None
+                for statement in ("SHOW REPLICA STATUS", "SHOW SLAVE STATUS"):
+                    try:
+                        cursor.execute(statement)
+                        status = cursor.fetchone()
+                        break
+                    except pymysql.err.MySQLError:
+                        continue
+            if status:
+                lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+            else:
+                # Không phải replica (vd. instance MySQL thứ hai khi phát triển) hoặc không có quyền xem
+                lag = 0
+            self.lag = lag
+            if lag is None:
+                self.mark_down("Replication is not running")
+            elif lag > max_lag:
+                self.mark_down(f"Replication lag {lag}s exceeds {max_lag}s")
+            else:
+                self.healthy = True
+                self.last_error = None
+        except pymysql.err.MySQLError as e:
+            self.mark_down(e)
+        finally:
+            self.checked_at = time.time()
+            safe_close_connection(conn)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name, "healthy": self.healthy, "lagSeconds": self.lag, "reads": self.reads,
+            "failures": self.failures, "lastError": self.last_error, "checkedAt": self.checked_at,
+        }
+
+class ReplicaRouter:
+    def __init__(self, configs: list, max_lag: float = DB_REPLICA_MAX_LAG_SECONDS,
+                 check_seconds: float = DB_REPLICA_CHECK_SECONDS):
+        self.replicas = [Replica(config) for config in configs]
+        self.max_lag = max_lag
+        self.check_seconds = check_seconds
+        self.counters = {"replica": 0, "primary": 0, "pinned": 0, "fallback": 0}
+        self._counters_lock = threading.Lock()  # nhiều thread của threadpool cùng đếm
+        self._next = itertools.count()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def pick(self):
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    def count(self, key: str, replica=None):
+        with self._counters_lock:
+            self.counters[key] += 1
+            if replica is not None:
+                replica.reads += 1
+
+    def check_all(self):
+        for replica in self.replicas:
+            replica.check(self.max_lag)
+
+    def _loop(self):
+        while not self._stop.wait(self.check_seconds):
+            self.check_all()
+
+    def start(self):
+        if self.replicas and self._thread is None:
+            self._stop.clear()
+            self.check_all()
+            self._thread = threading.Thread(target=self._loop, name="replica-health", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def stats(self) -> dict:
+        with self._counters_lock:
+            reads = dict(self.counters)
+        return {
+            "reads": reads,
+            "maxLagSeconds": self.max_lag,
+            "replicas": [r.stats() for r in self.replicas],
+        }
+
+replica_router = ReplicaRouter(DB_REPLICAS)
+
+def get_read_connection():
+    """
+    Kết nối cho truy vấn chỉ đọc: replica khỏe (round-robin) nếu request/session chưa ghi gần đây,
+    ngược lại hoặc khi không có replica khả dụng thì dùng primary.
+    """
+    if _tenant.get() is not None:
+        # Shard của cửa hàng không có replica
+        return get_connection()
+    if _sqlite is not None:
+        return _sqlite.connect()
+    state = _routing.get()
+    if state is not None and state.use_primary():
+        replica_router.count("pinned")
+        return get_connection()
+    replica = replica_router.pick()
+    if replica is not None:
+        try:
+            conn = TracedConnection(**replica.config)
+            replica_router.count("replica", replica)
+            return conn
+        except pymysql.err.MySQLError as e:
+            logging.error(f"Replica {replica.name} unavailable, falling back to primary: {e}")
+            replica.mark_down(e)
+            replica_router.count("fallback")
+    replica_router.count("primary")
+    return get_connection()
 
 def safe_close_connection(conn):
     if conn is not None:
@@ -19,11 +243,89 @@ def safe_close_connection(conn):
         except Exception as e:
             logging.error(f"Error closing connection: {e}")
 
+# ===== TENANTS =====
+# Cửa hàng (tenant) của request hiện tại, middleware trong main.py đặt theo TENANT_HEADER.
+# None là database mặc định; các cửa hàng trong TENANT_SHARDS có database (shard) riêng với cùng schema.
+_tenant = contextvars.ContextVar("db_tenant", default=None)
+_tenant_sqlite = {}
+_tenant_sqlite_lock = threading.Lock()
+_fanout_executor = ThreadPoolExecutor(max_workers=TENANT_FANOUT_WORKERS, thread_name_prefix="tenant-fanout")
+
+class UnknownTenant(Exception):
+    pass
+
+class TenantForbidden(Exception):
+    pass
+
+def all_tenants() -> list:
+    """Database mặc định và mọi shard"""
+    return [None, *TENANT_SHARDS]
+
+def current_tenant():
+    return _tenant.get()
+
+def set_tenant(tenant, token: str = None):
+    """
+    Chọn shard cho request hiện tại (None hoặc "" = database mặc định).
+    Cửa hàng có token trong TENANT_TOKENS chỉ được chọn khi token khớp (xem config.py - ranh giới tin cậy).
+    """
+    tenant = tenant or None
+    if tenant is not None and tenant not in TENANT_SHARDS:
+        raise UnknownTenant(tenant)
+    expected = TENANT_TOKENS.get(tenant) if tenant is not None else None
+    if expected and not (token and hmac.compare_digest(token, expected)):
+        raise TenantForbidden(tenant)
+    _tenant.set(tenant)
+
+@contextlib.contextmanager
+def use_tenant(tenant):
+    """Chạy một đoạn code trên shard của tenant (thread nền, job, fan-out)"""
+    token = _tenant.set(tenant)
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+def _tenant_sqlite_database(tenant):
+    with _tenant_sqlite_lock:
+        if tenant not in _tenant_sqlite:
+            _tenant_sqlite[tenant] = sqlite_backend.Database(
+                TENANT_SHARDS[tenant]["path"], SQLITE_CACHE_MB, SQLITE_BUSY_TIMEOUT_SECONDS
+            )
+        return _tenant_sqlite[tenant]
+
+def _tenant_connection(tenant):
+    if _sqlite is not None:
+        return _tenant_sqlite_database(tenant).connect(on_commit=mark_write)
+    return PrimaryConnection(**{**DB_CONFIG, **TENANT_SHARDS[tenant]})
+
+def fan_out_tenants(fn, tenants: list = None) -> dict:
+    """
+    Chạy fn() trên từng shard song song (mỗi shard một thread của pool TENANT_FANOUT_WORKERS),
+    trả về {tenant: kết quả}. Lỗi của một shard được ném lại sau khi các shard khác chạy xong.
+    """
+    tenants = all_tenants() if tenants is None else tenants
+
+    def run(tenant):
+        with use_tenant(tenant):
+            return fn()
+    futures = {tenant: _fanout_executor.submit(contextvars.copy_context().run, run, tenant) for tenant in tenants}
+    wait(futures.values())
+    return {tenant: future.result() for tenant, future in futures.items()}
+
 # ===== HELPERS =====
-def fetchall_sql(query: str, params: tuple = ()):
+def fetchall_sql(query: str, params: tuple = (), columnar: bool = False):
+    """
+    columnar=True đọc bằng cursor tuple và trả về {"columns": [...], "rows": [tuple, ...]}
+    thay vì một dict cho mỗi dòng (xem columnar.py)
+    """
     conn = None
     try:
-        conn = get_connection()
+        conn = get_read_connection()
+        if columnar:
+            with conn.cursor(Cursor) as cursor:
+                cursor.execute(query, params)
+                return {"columns": [column[0] for column in cursor.description or ()], "rows": cursor.fetchall()}
         with conn.cursor() as cursor:
             
             cursor.execute(query, params)
@@ -42,3 +344,260 @@ def execute_sql(query: str, params: tuple = ()):
             return cursor.lastrowid
     finally:
         safe_close_connection(conn)
+
+# ===== QUERY FAN-OUT =====
+# Các câu đọc độc lập của một endpoint chạy song song, mỗi câu trên một kết nối riêng,
+# nên độ trễ là câu chậm nhất thay vì tổng các câu
+_query_executor = ThreadPoolExecutor(max_workers=QUERY_FANOUT_WORKERS, thread_name_prefix="query-fanout")
+
+def _fetch(query: str, params: tuple, primary: bool):
+    conn = None
+    try:
+        conn = get_connection() if primary else get_read_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+    finally:
+        safe_close_connection(conn)
+
+def fetch_parallel(statements: dict, primary: bool = False, max_concurrency: int = QUERY_FANOUT_MAX_PER_REQUEST,
+                   timeout: float = QUERY_FANOUT_TIMEOUT_SECONDS) -> dict:
+    """
+    statements: {tên: query hoặc (query, params)}, trả về {tên: danh sách dòng}.
+    Mỗi request chạy tối đa max_concurrency câu cùng lúc; quá timeout giây thì ném TimeoutError
+    (câu chưa chạy bị hủy, câu đang chạy chạy nốt trên pool). Các câu dùng context của request
+    (tenant, đọc primary sau khi ghi); primary=True luôn đọc từ primary, vd. kiểm tra trước khi xóa.
+    """
+    pending = [(name, *((statement, ()) if isinstance(statement, str) else statement))
+               for name, statement in statements.items()]
+    if len(pending) == 1:
+        name, query, params = pending[0]
+        return {name: _fetch(query, params, primary)}
+
+    deadline = time.monotonic() + timeout
+    running = {}
+    results = {}
+    try:
+        while pending or running:
+            while pending and len(running) < max_concurrency:
+                name, query, params = pending.pop(0)
+                context = contextvars.copy_context()
+                running[_query_executor.submit(context.run, _fetch, query, params, primary)] = name
+            done, _ = wait(running, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"Queries {', '.join(running.values())} did not finish within {timeout} seconds")
+            for future in done:
+                results[running.pop(future)] = future.result()
+    finally:
+        for future in running:
+            future.cancel()
+    return {name: results[name] for name in statements}
+
+# ===== GROUP COMMIT =====
+class GroupCommitWriter:
+    """
+    Gom các câu INSERT/UPDATE nhỏ từ nhiều request vào một transaction: thread ghi lấy câu đầu tiên
+    trong hàng đợi, chờ thêm tối đa GROUP_COMMIT_WINDOW_MS (hoặc tới GROUP_COMMIT_MAX_BATCH câu),
+    chạy tất cả rồi commit một lần. Mỗi request nhận lastrowid của câu của mình sau khi commit xong.
+    Nếu một câu lỗi, cả lô rollback và từng câu được chạy lại riêng để lỗi chỉ trả về cho request đó.
+    Request chờ quá GROUP_COMMIT_TIMEOUT_SECONDS chỉ bỏ được câu còn nằm trong hàng đợi; câu đã vào lô
+    đang ghi thì request chờ thêm tối đa GROUP_COMMIT_TIMEOUT_SECONDS cho lô commit xong (quá nữa thì lỗi
+    TimeoutError, câu vẫn có thể được ghi sau đó).
+    """
+
+    def __init__(self, enabled: bool = GROUP_COMMIT_ENABLED, window_ms: float = GROUP_COMMIT_WINDOW_MS,
+                 max_batch: int = GROUP_COMMIT_MAX_BATCH, timeout: float = GROUP_COMMIT_TIMEOUT_SECONDS):
+        self.enabled = enabled
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.counters = {"statements": 0, "batches": 0, "largestBatch": 0, "retried": 0, "failed": 0, "cancelled": 0}
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def submit(self, query: str, params: tuple = ()) -> Future:
+        future = Future()
+        self._queue.put((query, params, future))
+        return future
+
+    def execute(self, query: str, params: tuple = ()):
+        """Như execute_sql nhưng commit chung với các request khác; trả về lastrowid"""
+        future = self.submit(query, params)
+        try:
+            result = future.result(self.timeout)
+        except FutureTimeout:
+            if future.cancel():
+                # Câu chưa được lấy khỏi hàng đợi: _loop sẽ bỏ qua, không ghi
+                raise
+            try:
+                result = future.result(self.timeout)
+            except FutureTimeout:
+                raise TimeoutError(
+                    f"Group commit did not finish within {2 * self.timeout} seconds; the statement may still be committed"
+                ) from None
+        mark_write()
+        return result
+
+    def _collect(self) -> list:
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, conn, batch: list) -> bool:
+        rowids = []
+        try:
+            with conn.cursor() as cursor:
+                for query, params, _ in batch:
+                    cursor.execute(query, params)
+                    rowids.append(cursor.lastrowid)
+            conn.commit()
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            if len(batch) == 1:
+                self.counters["failed"] += 1
+                batch[0][2].set_exception(e)
+            return False
+        for (_, _, future), rowid in zip(batch, rowids):
+            future.set_result(rowid)
+        return True
+
+    def _loop(self):
+        conn = None
+        while not (self._stop.is_set() and self._queue.empty()):
+            collected = self._collect()
+            # Bỏ các câu request đã hủy vì chờ quá lâu; các câu còn lại không hủy được nữa
+            batch = [item for item in collected if item[2].set_running_or_notify_cancel()]
+            self.counters["cancelled"] += len(collected) - len(batch)
+            if not batch:
+                continue
+            self.counters["statements"] += len(batch)
+            self.counters["batches"] += 1
+            self.counters["largestBatch"] = max(self.counters["largestBatch"], len(batch))
+            try:
+                if conn is None or not conn.open:
+                    conn = get_connection()
+                if self._write(conn, batch):
+                    continue
+                self.counters["retried"] += len(batch)
+                for item in batch:
+                    self._write(conn, [item])
+            except Exception as e:
+                # Mất kết nối: báo lỗi cho các request chưa có kết quả, lô sau mở kết nối mới
+                logging.error(f"Error in group commit writer: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        self.counters["failed"] += 1
+                        future.set_exception(e)
+                safe_close_connection(conn)
+                conn = None
+        safe_close_connection(conn)
+
+    def start(self):
+        if self.enabled and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="group-commit", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Ghi nốt các câu còn trong hàng đợi rồi dừng"""
+        thread = self._thread
+        self._stop.set()
+        self._thread = None
+        if thread is not None:
+            thread.join(self.timeout)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.running, "windowMs": self.window * 1000, "maxBatch": self.max_batch,
+            "queued": self._queue.qsize(), **self.counters,
+        }
+
+group_writer = GroupCommitWriter()
+
+def execute_sql_grouped(query: str, params: tuple = ()):
+    """INSERT/UPDATE nhỏ không cần transaction riêng: đi qua group_writer nếu bật, ngược lại như execute_sql"""
+    # group_writer chỉ ghi vào database mặc định
+    if group_writer.running and _tenant.get() is None:
+        return group_writer.execute(query, params)
+    return execute_sql(query, params)
+
+def iter_sql(query: str, params: tuple = (), batch_size: int = 1000):
+    """
+    Đọc kết quả theo từng lô bằng cursor không buffer (SSDictCursor): MySQL trả dòng dần dần
+    nên bộ nhớ không phụ thuộc kích thước bảng. Kết nối được giữ tới khi generator kết thúc.
+    """
+    conn = None
+    try:
+        conn = get_read_connection()
+        with conn.cursor(SSDictCursor) as cursor:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+    finally:
+        safe_close_connection(conn)
+
+def iter_sql_batches(query: str, params: tuple = (), batch_size: int = 10000):
+    """
+    Như iter_sql nhưng trả về từng lô dòng dạng tuple (SSCursor), không tạo dict cho mỗi dòng.
+    Lô đầu tiên là cursor.description để nơi gọi dựng schema (vd. arrow_export.py).
+    """
+    conn = None
+    try:
+        conn = get_read_connection()
+        with conn.cursor(SSCursor) as cursor:
+            cursor.execute(query, params)
+            yield cursor.description or ()
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+    finally:
+        safe_close_connection(conn)
+
+
+# ===== SCHEMA =====
+# Mã lỗi MySQL cho "đã tồn tại": bảng (1050), index (1061), cột (1060)
+_ALREADY_EXISTS_ERRORS = (1050, 1060, 1061)
+
+def _already_exists(error: Exception) -> bool:
+    if isinstance(error, sqlite3.Error):
+        return sqlite_backend.is_already_exists(error)
+    return bool(error.args) and error.args[0] in _ALREADY_EXISTS_ERRORS
+
+def init_schema(statements: list):
+    """Chạy các câu DDL phụ trợ (index, bảng mới), bỏ qua những thứ đã tồn tại"""
+    conn = None
+    try:
+        conn = get_connection()
+        with conn.cursor() as cursor:
+            for statement in statements:
+                try:
+                    cursor.execute(statement)
+                except (pymysql.err.MySQLError, sqlite3.Error) as e:
+                    if _already_exists(e):
+                        continue
+                    logging.error(f"Error applying schema statement: {e}")
+        conn.commit()
+    finally:
+        safe_close_connection(conn)
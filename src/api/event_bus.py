@@ -0,0 +1,163 @@
+"""
+Bus sự kiện trong tiến trình cho các thay đổi dữ liệu (tồn kho, đơn hàng, thanh toán, kho...).
+Các luồng ghi gọi publish() sau khi commit; dashboard đăng ký theo topic qua SSE
+(xem routers/events.py) để nhận delta thay vì polling lại toàn bộ bảng. Module trong tiến trình
+đăng ký listen() để phản ứng với thay đổi (vd. report_precompute.py tính lại báo cáo).
+
+Mỗi sự kiện được gắn cửa hàng (tenant, xem db.py - TENANTS) của luồng đã phát nó; subscriber chỉ
+nhận sự kiện của cửa hàng mà request đăng ký đã chọn.
+
+Mỗi subscriber có hàng đợi giới hạn: nếu client đọc không kịp, hàng đợi bị xóa và thay
+bằng một sự kiện "resync" để client tự tải lại dữ liệu, luồng ghi không bao giờ bị chặn.
+"""
+import asyncio
+import collections
+import datetime
+import itertools
+import logging
+import threading
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from .db import current_tenant
+
+SUBSCRIBER_QUEUE_SIZE = 256
+HISTORY_SIZE = 1000  # Số sự kiện giữ lại để client kết nối lại (Last-Event-ID) nhận bù
+
+TOPIC_INVENTORY = "inventory"
+TOPIC_ORDERS = "orders"
+TOPIC_PAYMENTS = "payments"
+TOPIC_STORES = "stores"
+TOPIC_ALERTS = "alerts"
+TOPIC_SYSTEM = "system"
+
+
+class Subscription:
+    def __init__(self, loop, topics, maxsize, tenant=None):
+        self.loop = loop
+        self.topics = set(topics) if topics else None
+        self.tenant = tenant
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def wants(self, event: dict) -> bool:
+        if event.get("tenant") != self.tenant:
+            return False
+        topic = event["topic"]
+        return self.topics is None or topic in self.topics or topic == TOPIC_SYSTEM
+
+    def deliver(self, event: dict):
+        """Chạy trong event loop của subscriber"""
+        if self.queue.full():
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(make_event(
+                TOPIC_SYSTEM, "resync", {"reason": "subscriber queue overflow"}, seq=event["id"], tenant=self.tenant
+            ))
+            return
+        self.queue.put_nowait(event)
+
+
+class EventBus:
+    def __init__(self, history_size: int = HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._listeners = []
+        self._history = collections.deque(maxlen=history_size)
+        self._seq = itertools.count(1)
+
+    def subscribe(self, topics=None, maxsize: int = SUBSCRIBER_QUEUE_SIZE, last_event_id: int = None) -> Subscription:
+        """Đăng ký nhận sự kiện của cửa hàng hiện tại (gọi trong event loop). topics=None nghĩa là mọi topic"""
+        subscription = Subscription(asyncio.get_running_loop(), topics, maxsize, current_tenant())
+        with self._lock:
+            self._subscribers.add(subscription)
+            if last_event_id is not None:
+                missed = [e for e in self._history if e["id"] > last_event_id and subscription.wants(e)]
+                if self._history and self._history[0]["id"] > last_event_id + 1:
+                    # Sự kiện cần bù đã bị đẩy khỏi history
+                    missed = [make_event(
+                        TOPIC_SYSTEM, "resync", {"reason": "history expired"}, seq=last_event_id, tenant=subscription.tenant
+                    )]
+                for event in missed:
+                    subscription.deliver(event)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def listen(self, topics, fn):
+        """fn(event) chạy ngay trong luồng publish cho các topic này (phải nhanh, không chặn luồng ghi)"""
+        self._listeners.append((set(topics), fn))
+
+    def publish(self, topic: str, event_type: str, data: dict = None):
+        """Phát một sự kiện của cửa hàng hiện tại; an toàn khi gọi từ thread của route sync"""
+        with self._lock:
+            event = make_event(topic, event_type, data, seq=next(self._seq), tenant=current_tenant())
+            self._history.append(event)
+            subscribers = [s for s in self._subscribers if s.wants(event)]
+        for topics, fn in self._listeners:
+            if topic in topics:
+                try:
+                    fn(event)
+                except Exception as e:
+                    logging.error(f"Error in event listener for {topic}: {e}")
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # Event loop của subscriber đã đóng
+                self.unsubscribe(subscription)
+                logging.debug("Dropped event subscriber with closed event loop")
+        return event
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "lastEventID": self._history[-1]["id"] if self._history else 0,
+                "dropped": sum(s.dropped for s in self._subscribers),
+            }
+
+
+def make_event(topic: str, event_type: str, data: dict = None, seq: int = 0, tenant=None) -> dict:
+    return {
+        "id": seq,
+        "topic": topic,
+        "type": event_type,
+        "data": data or {},
+        "tenant": tenant,
+        "ts": datetime.datetime.now(),
+    }
+
+
+def format_sse(event: dict, name: str = None) -> str:
+    """Định dạng một sự kiện theo chuẩn text/event-stream"""
+    payload = orjson.dumps(jsonable_encoder(event)).decode()
+    return f"id: {event.get('id', 0)}\nevent: {name or event.get('topic', 'message')}\ndata: {payload}\n\n"
+
+
+async def iter_sse(request, topics=None, last_event_id: int = None, snapshot=None, keepalive_seconds: int = 15):
+    """
+    Sinh luồng SSE cho tới khi client ngắt kết nối. Đăng ký với bus khi response bắt đầu gửi (không phải
+    lúc tạo generator) nên response không bao giờ chạy thì không để lại subscriber. snapshot: hàm async trả
+    về chunk gửi đầu tiên, gọi sau khi đã đăng ký để không lỡ sự kiện phát trong lúc tạo snapshot.
+    """
+    subscription = bus.subscribe(topics, last_event_id=last_event_id)
+    try:
+        if snapshot is not None:
+            yield await snapshot()
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse(event, event["type"] if event["topic"] == TOPIC_SYSTEM else None)
+    finally:
+        bus.unsubscribe(subscription)
+
+
+bus = EventBus()
@@ -0,0 +1,149 @@
+"""
+Bộ đếm tồn kho chia shard cho các inventory bán chạy (hot SKU).
+
+Mỗi lần xuất kho bình thường cập nhật cùng một dòng tbl_inventory, nên khi khuyến mãi các
+transaction phải chờ khóa dòng đó. Với inventory được bật chế độ shard, số lượng được chia vào
+N dòng tbl_inventory_shard: xuất kho trừ vào một shard ngẫu nhiên, shard không đủ thì mượn
+từ các shard khác (và dòng chính); nhập kho cộng vào một shard ngẫu nhiên.
+
+Tồn kho thực = tbl_inventory.stockQuantity + tổng các shard (các query đọc tồn kho đều cộng shard).
+Nhờ vậy worker chưa biết inventory vừa bật/tắt shard vẫn ghi đúng tổng; dòng chính có thể âm tạm thời.
+Xuất kho có thể cộng số lượng vào pendingIssue của shard thay vì khóa dòng định giá; phần này được
+ghi vào định giá theo lô (stock_movements.settle_pending).
+
+Thứ tự khóa luôn là: dòng định giá (valuation.py) -> các shard (theo shardNo) -> dòng tbl_inventory.
+Các hàm chạy trên cursor của transaction hiện tại và không commit.
+"""
+import random
+
+from . import queries
+
+
+class InsufficientStock(Exception):
+    pass
+
+
+def shard_count(cursor, inventory_id: int) -> int:
+    """Số shard của inventory (0 nếu không bật), đọc không khóa"""
+    cursor.execute(queries.COUNT_INVENTORY_SHARDS, (inventory_id,))
+    row = cursor.fetchone()
+    return row["count"] if row else 0
+
+
+def _spread(total: int, shards: int) -> list:
+    base, remainder = divmod(total, shards)
+    return [base + (1 if i < remainder else 0) for i in range(shards)]
+
+
+def increment(cursor, inventory_id: int, quantity: int) -> bool:
+    """Cộng vào một shard ngẫu nhiên; False nếu inventory không bật shard"""
+    shards = shard_count(cursor, inventory_id)
+    if not shards:
+        return False
+    cursor.execute(queries.INCREMENT_INVENTORY_SHARD, (quantity, inventory_id, random.randrange(shards)))
+    return cursor.rowcount == 1
+
+
+def lock(cursor, inventory_id: int) -> list:
+    """Khóa các shard của inventory theo shardNo (trước dòng chính); [] nếu không bật shard"""
+    cursor.execute(queries.SELECT_INVENTORY_SHARDS_FOR_UPDATE, (inventory_id,))
+    return cursor.fetchall()
+
+
+def decrement(cursor, inventory_id: int, quantity: int, defer_issue: bool = False) -> bool:
+    """
+    Trừ `quantity` khỏi các shard; False nếu inventory không bật shard (nơi gọi trừ vào dòng chính).
+    defer_issue=True ghi `quantity` vào pendingIssue để định giá sau. Raise InsufficientStock nếu
+    tổng tồn kho không đủ.
+    """
+    shards = shard_count(cursor, inventory_id)
+    if not shards:
+        return False
+    pending = quantity if defer_issue else 0
+
+    # Đường nhanh: chỉ khóa một shard
+    cursor.execute(queries.DECREMENT_INVENTORY_SHARD, (quantity, pending, inventory_id, random.randrange(shards), quantity))
+    if cursor.rowcount == 1:
+        return True
+
+    # Mượn: khóa tất cả shard (theo thứ tự shardNo để tránh deadlock) rồi tới dòng chính
+    rows = lock(cursor, inventory_id)
+    if not rows:
+        # Shard vừa bị tắt bởi request khác
+        return False
+    cursor.execute(queries.SELECT_INVENTORY_MAIN_FOR_UPDATE, (inventory_id,))
+    main = cursor.fetchone()
+    main_quantity = main["stockQuantity"] if main else 0
+    if sum(max(r["quantity"], 0) for r in rows) + max(main_quantity, 0) < quantity:
+        raise InsufficientStock()
+
+    remaining = quantity
+    for row in sorted(rows, key=lambda r: r["quantity"], reverse=True):
+        taken = min(remaining, max(row["quantity"], 0))
+        if taken:
+            cursor.execute(queries.SET_INVENTORY_SHARD, (row["quantity"] - taken, inventory_id, row["shardNo"]))
+            remaining -= taken
+        if not remaining:
+            break
+    if remaining:
+        cursor.execute(queries.UPDATE_INVENTORY_FOR_EXPORT, (remaining, inventory_id))
+    if pending:
+        cursor.execute(queries.ADD_INVENTORY_SHARD_PENDING_ISSUE, (pending, inventory_id, rows[0]["shardNo"]))
+    return True
+
+
+def take_pending(cursor, inventory_id: int) -> int:
+    """Khóa các shard, trả về và xóa tổng pendingIssue (gọi sau khi đã khóa dòng định giá)"""
+    pending = sum(row["pendingIssue"] for row in lock(cursor, inventory_id))
+    if pending:
+        cursor.execute(queries.CLEAR_INVENTORY_SHARD_PENDING_ISSUE, (inventory_id,))
+    return pending
+
+
+def absorb(cursor, inventory_id: int):
+    """
+    Sau khi dòng chính được đặt giá trị tuyệt đối (kiểm kê, PUT /inventories): đưa các shard về 0
+    và chia lại số lượng của dòng chính vào shard. Không làm gì nếu inventory không bật shard.
+    Nơi gọi đã khóa các shard (lock) trước khi cập nhật dòng chính; pendingIssue được bỏ vì định giá
+    đã được ghi lại hoặc đặt lại theo giá trị mới.
+    """
+    rows = lock(cursor, inventory_id)
+    if not rows:
+        return
+    cursor.execute(queries.CLEAR_INVENTORY_SHARD_PENDING_ISSUE, (inventory_id,))
+    cursor.execute(queries.SELECT_INVENTORY_MAIN_FOR_UPDATE, (inventory_id,))
+    main = cursor.fetchone()
+    total = max(main["stockQuantity"], 0) if main else 0
+    for row, value in zip(rows, _spread(total, len(rows))):
+        cursor.execute(queries.SET_INVENTORY_SHARD, (value, inventory_id, row["shardNo"]))
+    cursor.execute(queries.SET_INVENTORY_MAIN_QUANTITY, (0, inventory_id))
+
+
+def enable(cursor, inventory_id: int, shards: int):
+    """
+    Bật (hoặc đổi số) shard: gom toàn bộ tồn kho rồi chia đều vào `shards` dòng.
+    Nơi gọi ghi pendingIssue vào định giá trước (stock_movements.settle_pending).
+    """
+    rows = lock(cursor, inventory_id)
+    cursor.execute(queries.SELECT_INVENTORY_MAIN_FOR_UPDATE, (inventory_id,))
+    main = cursor.fetchone()
+    if main is None:
+        return False
+    total = main["stockQuantity"] + sum(r["quantity"] for r in rows)
+    cursor.execute(queries.DELETE_INVENTORY_SHARDS, (inventory_id,))
+    cursor.executemany(
+        queries.INSERT_INVENTORY_SHARD,
+        [(inventory_id, shard, value) for shard, value in enumerate(_spread(max(total, 0), shards))],
+    )
+    cursor.execute(queries.SET_INVENTORY_MAIN_QUANTITY, (min(total, 0), inventory_id))
+    return True
+
+
+def disable(cursor, inventory_id: int):
+    """Tắt shard: cộng các shard về dòng chính (nơi gọi ghi pendingIssue vào định giá trước)"""
+    shard_total = sum(r["quantity"] for r in lock(cursor, inventory_id))
+    cursor.execute(queries.SELECT_INVENTORY_MAIN_FOR_UPDATE, (inventory_id,))
+    main = cursor.fetchone()
+    if main is not None:
+        cursor.execute(queries.SET_INVENTORY_MAIN_QUANTITY, (main["stockQuantity"] + shard_total, inventory_id))
+    cursor.execute(queries.DELETE_INVENTORY_SHARDS, (inventory_id,))
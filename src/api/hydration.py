@@ -0,0 +1,51 @@
+"""
+Nạp đầy đủ đơn hàng (dòng sản phẩm, sản phẩm, thanh toán) cho nhiều orderID cùng lúc.
+Mỗi bảng chỉ tốn một câu truy vấn IN (...) thay vì gọi /requests/{id} cho từng đơn.
+"""
+from .db import get_connection, safe_close_connection
+from . import queries
+
+MAX_BATCH_SIZE = 200
+
+
+def _fetch_in(cursor, query: str, ids: list) -> list:
+    if not ids:
+        return []
+    placeholders = ", ".join(["%s"] * len(ids))
+    cursor.execute(query.format(placeholders=placeholders), tuple(ids))
+    return cursor.fetchall()
+
+
+def hydrate_orders(order_ids: list, cursor=None) -> list:
+    """
+    Trả về danh sách đơn hàng theo đúng thứ tự order_ids (bỏ qua mã không tồn tại),
+    mỗi đơn có thêm "items" (kèm "product") và "payments".
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    if not order_ids:
+        return []
+    if cursor is None:
+        conn = None
+        try:
+            conn = get_connection()
+            with conn.cursor() as cursor:
+                return hydrate_orders(order_ids, cursor)
+        finally:
+            safe_close_connection(conn)
+
+    orders = {row["orderID"]: row for row in _fetch_in(cursor, queries.SELECT_ORDERS_BY_IDS, order_ids)}
+    for order in orders.values():
+        order["items"] = []
+        order["payments"] = []
+
+    lines = _fetch_in(cursor, queries.SELECT_REQUESTS_BY_ORDER_IDS, list(orders))
+    product_ids = list({line["productID"] for line in lines if line.get("productID") is not None})
+    products = {row["productID"]: row for row in _fetch_in(cursor, queries.SELECT_PRODUCTS_BY_IDS, product_ids)}
+    for line in lines:
+        line["product"] = products.get(line["productID"])
+        orders[line["orderID"]]["items"].append(line)
+
+    for payment in _fetch_in(cursor, queries.SELECT_PAYMENTS_BY_ORDER_IDS, list(orders)):
+        orders[payment["orderID"]]["payments"].append(payment)
+
+    return [orders[order_id] for order_id in order_ids if order_id in orders]
@@ -0,0 +1,138 @@
+"""
+Idempotency-Key cho các thao tác ghi mà client có thể gửi lại (checkout, thanh toán, nhập/xuất/kiểm kê kho).
+
+Client gửi header `Idempotency-Key` (chuỗi ngẫu nhiên, vd. UUID, tối đa IDEMPOTENCY_KEY_MAX_LENGTH ký tự).
+Lần đầu, khóa được giữ chỗ trong tbl_idempotency_key (INSERT theo khóa chính nên chỉ một request thắng)
+rồi thao tác chạy bình thường; response được lưu lại. Các lần gửi lại cùng khóa nhận đúng response đó
+(header Idempotent-Replayed: true) mà không chạy lại thao tác ghi.
+
+- Cùng khóa nhưng nội dung request khác: 422.
+- Request đầu còn đang chạy: 409 (client thử lại sau).
+- Thao tác lỗi (mọi exception): khóa được giải phóng để client thử lại.
+Khóa hết hạn sau IDEMPOTENCY_KEY_TTL_HOURS; bảng được dọn định kỳ trong lúc giữ chỗ.
+Bảng chỉ lưu SHA-256 của (scope, khóa) và của request, cùng response đã serialize.
+"""
+import datetime
+import hashlib
+import logging
+import threading
+import time
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+
+from .config import IDEMPOTENCY_KEY_TTL_HOURS
+from .db import get_connection, safe_close_connection
+from . import queries
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+REPLAYED_HEADER = "Idempotent-Replayed"
+PURGE_INTERVAL_SECONDS = 600  # Dọn khóa hết hạn tối đa mỗi 10 phút (mỗi worker)
+
+_last_purge = 0.0
+_purge_lock = threading.Lock()
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha256(orjson.dumps(parts, default=str, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def fingerprint(payload) -> str:
+    """Băm nội dung request để phát hiện khóa bị dùng lại cho request khác"""
+    return _digest(dict(payload))
+
+
+def _purge_expired(cursor):
+    global _last_purge
+    with _purge_lock:
+        if time.time() - _last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        _last_purge = time.time()
+    cursor.execute(queries.DELETE_EXPIRED_IDEMPOTENCY_KEYS)
+
+
+def claim(key: str, scope: str, request_hash: str):
+    """Giữ chỗ khóa; None nếu request này được chạy, ngược lại response đã lưu để trả lại"""
+    if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail=f"{IDEMPOTENCY_HEADER} must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters")
+    key_hash = _digest(scope, key)
+    expires_at = datetime.datetime.now() + datetime.timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+    conn = None
+    try:
+        conn = get_connection()
+        with conn.cursor() as cursor:
+            _purge_expired(cursor)
+            # 1: khóa mới, 2: khóa cũ đã hết hạn được giữ chỗ lại, 0: khóa còn hiệu lực
+            cursor.execute(queries.CLAIM_IDEMPOTENCY_KEY, (key_hash, scope, request_hash, expires_at))
+            claimed = cursor.rowcount in (1, 2)
+            if not claimed:
+                cursor.execute(queries.SELECT_IDEMPOTENCY_KEY, (key_hash,))
+                row = cursor.fetchone()
+            conn.commit()
+    finally:
+        safe_close_connection(conn)
+
+    if claimed:
+        return None
+    if row is None:
+        # Vừa bị giải phóng/hết hạn giữa hai câu lệnh: coi như đang chạy, client thử lại
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+    if row["requestHash"] != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    if row["statusCode"] is None:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+    return ORJSONResponse(
+        status_code=row["statusCode"],
+        content=orjson.loads(row["responseBody"]),
+        headers={REPLAYED_HEADER: "true"},
+    )
+
+
+def complete(key: str, scope: str, status_code: int, body):
+    conn = None
+    try:
+        conn = get_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(queries.COMPLETE_IDEMPOTENCY_KEY, (status_code, orjson.dumps(body, default=str), _digest(scope, key)))
+        conn.commit()
+    finally:
+        safe_close_connection(conn)
+
+
+def release(key: str, scope: str):
+    conn = None
+    try:
+        conn = get_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(queries.DELETE_IDEMPOTENCY_KEY, (_digest(scope, key),))
+        conn.commit()
+    except Exception as e:
+        # Khóa còn lại sẽ trả 409 tới khi hết hạn
+        logging.error(f"Error releasing idempotency key: {e}")
+    finally:
+        safe_close_connection(conn)
+
+
+def run(key, scope: str, payload, handler, status_code: int = 200):
+    """
+    Chạy handler() đúng một lần cho mỗi (scope, key). Không có key thì chạy như bình thường.
+    status_code là mã mà route trả về khi thành công (dùng khi phát lại).
+    """
+    if not key:
+        return handler()
+    replay = claim(key, scope, fingerprint(payload))
+    if replay is not None:
+        return replay
+    try:
+        result = handler()
+    except BaseException:
+        release(key, scope)
+        raise
+    try:
+        complete(key, scope, status_code, result)
+    except Exception as e:
+        # Thao tác đã commit; lần gửi lại sẽ nhận 409 thay vì ghi trùng
+        logging.error(f"Error storing idempotent response for {scope}: {e}")
+    return result
@@ -0,0 +1,297 @@
+"""
+Chạy các tác vụ dài (báo cáo nhiều năm, nhập danh mục lớn) ở nền thay vì trong request.
+
+Job được lưu trong file SQLite cục bộ (JOBS_DB_PATH) nên trạng thái/kết quả vẫn đọc được sau khi
+request kết thúc và sau khi server khởi động lại. Worker là một ThreadPoolExecutor trong tiến trình.
+
+Mỗi loại job đăng ký một hàm `fn(params: dict, context: JobContext)` qua `register`; hàm trả về
+kết quả (serialize bằng orjson). Hủy job là hợp tác: hàm gọi `context.check_cancelled()` giữa các bước.
+Job đang chờ khi server dừng sẽ được chạy lại; job đang chạy dở được đánh dấu failed.
+Hàm `discard(params)` tùy chọn khi đăng ký dọn tài nguyên của job bị hủy lúc đang chờ hoặc bị ngắt do restart
+(vd. file upload đã lưu tạm), vì khi đó hàm của job không chạy tới khối finally của nó.
+Job thuộc về cửa hàng (tenant) của request đã tạo nó: chạy trên shard đó và chỉ request cùng cửa hàng
+mới xem, lấy kết quả hay hủy được.
+"""
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+
+from .config import JOBS_DB_PATH, JOBS_WORKERS, JOBS_RESULT_TTL_HOURS
+from .db import current_tenant, use_tenant
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED, STATUS_CANCELLED)
+# Job tạo trước khi có cột tenant lưu cửa hàng trong params dưới khóa này
+LEGACY_TENANT_PARAM = "_tenant"
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        jobID TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        params TEXT NOT NULL,
+        status TEXT NOT NULL,
+        progress TEXT,
+        result TEXT,
+        error TEXT,
+        createdAt TEXT NOT NULL,
+        startedAt TEXT,
+        finishedAt TEXT,
+        expiresAt TEXT,
+        tenant TEXT
+    )
+"""
+_SUMMARY_COLUMNS = "jobID, kind, status, progress, error, createdAt, startedAt, finishedAt, expiresAt"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class UnknownJobKind(Exception):
+    pass
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+def _dumps(value) -> str:
+    return orjson.dumps(value, default=str).decode()
+
+
+class JobContext:
+    """Được truyền cho hàm của job để báo tiến độ và kiểm tra yêu cầu hủy"""
+
+    def __init__(self, runner, job_id: str, cancel_event: threading.Event):
+        self.job_id = job_id
+        self._runner = runner
+        self._cancel_event = cancel_event
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def progress(self, **info):
+        self._runner._execute("UPDATE jobs SET progress = ? WHERE jobID = ?", (_dumps(info), self.job_id))
+
+
+class JobRunner:
+    def __init__(self, path: str = JOBS_DB_PATH, workers: int = JOBS_WORKERS, ttl_hours: float = JOBS_RESULT_TTL_HOURS):
+        self.path = path
+        self.workers = workers
+        self.ttl = datetime.timedelta(hours=ttl_hours)
+        self._handlers = {}
+        self._discards = {}
+        self._cancel_events = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    # ===== STORE =====
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            conn = self._connect()
+            try:
+                cursor = conn.execute(sql, params)
+                conn.commit()
+                return cursor.rowcount
+            finally:
+                conn.close()
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            conn = self._connect()
+            try:
+                return [dict(row) for row in conn.execute(sql, params).fetchall()]
+            finally:
+                conn.close()
+
+    # ===== LIFECYCLE =====
+    def register(self, kind: str, fn, discard=None):
+        """discard(params): dọn tài nguyên của job không bao giờ chạy tới cuối (hủy khi đang chờ, bị ngắt do restart)"""
+        self._handlers[kind] = fn
+        if discard is not None:
+            self._discards[kind] = discard
+
+    def _discard(self, job: dict):
+        discard = self._discards.get(job["kind"])
+        if discard is None:
+            return
+        try:
+            params = orjson.loads(job["params"])
+            params.pop(LEGACY_TENANT_PARAM, None)
+            discard(params)
+        except Exception as e:
+            logging.error(f"Error discarding job {job['jobID']} ({job['kind']}): {e}")
+
+    def start(self):
+        if self._executor is not None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(_SCHEMA)
+                if "tenant" not in {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN tenant TEXT")
+                    conn.execute(
+                        "UPDATE jobs SET tenant = json_extract(params, ?) WHERE json_extract(params, ?) IS NOT NULL",
+                        (f"$.{LEGACY_TENANT_PARAM}", f"$.{LEGACY_TENANT_PARAM}"),
+                    )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, createdAt)")
+                conn.commit()
+            finally:
+                conn.close()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        interrupted = self._query("SELECT jobID, kind, params FROM jobs WHERE status = ?", (STATUS_RUNNING,))
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, finishedAt = ?, expiresAt = ? WHERE status = ?",
+            (STATUS_FAILED, "Interrupted by server restart", _now(), self._expires_at(), STATUS_RUNNING),
+        )
+        for job in interrupted:
+            self._discard(job)
+        for row in self._query("SELECT jobID FROM jobs WHERE status = ? ORDER BY createdAt", (STATUS_QUEUED,)):
+            self._schedule(row["jobID"])
+        self.purge_expired()
+
+    def stop(self):
+        for event in list(self._cancel_events.values()):
+            event.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # ===== JOBS =====
+    def _expires_at(self) -> str:
+        return (datetime.datetime.now() + self.ttl).isoformat(timespec="seconds")
+
+    def _schedule(self, job_id: str):
+        self._cancel_events[job_id] = threading.Event()
+        self._executor.submit(self._run, job_id)
+
+    def submit(self, kind: str, params: dict = None) -> str:
+        if kind not in self._handlers:
+            raise UnknownJobKind(kind)
+        if self._executor is None:
+            raise RuntimeError("Job runner is not started")
+        job_id = uuid.uuid4().hex
+        # Cửa hàng (shard) của request đã tạo job để job chạy trên đúng database
+        self._execute(
+            "INSERT INTO jobs (jobID, kind, params, status, createdAt, tenant) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, _dumps(params or {}), STATUS_QUEUED, _now(), current_tenant()),
+        )
+        self._schedule(job_id)
+        self.purge_expired()
+        return job_id
+
+    def _finish(self, job_id: str, status: str, result=None, error: str = None):
+        self._execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finishedAt = ?, expiresAt = ? WHERE jobID = ?",
+            (status, _dumps(result) if result is not None else None, error, _now(), self._expires_at(), job_id),
+        )
+
+    def _run(self, job_id: str):
+        cancel_event = self._cancel_events.get(job_id) or threading.Event()
+        try:
+            # Chỉ chạy nếu job vẫn đang chờ (chưa bị hủy trước khi tới lượt)
+            started = self._execute(
+                "UPDATE jobs SET status = ?, startedAt = ? WHERE jobID = ? AND status = ?",
+                (STATUS_RUNNING, _now(), job_id, STATUS_QUEUED),
+            )
+            if not started:
+                return
+            job = self._query("SELECT kind, params, tenant FROM jobs WHERE jobID = ?", (job_id,))[0]
+            handler = self._handlers.get(job["kind"])
+            if handler is None:
+                self._finish(job_id, STATUS_FAILED, error=f"Unknown job kind: {job['kind']}")
+                return
+            try:
+                params = orjson.loads(job["params"])
+                params.pop(LEGACY_TENANT_PARAM, None)
+                with use_tenant(job["tenant"]):
+                    result = handler(params, JobContext(self, job_id, cancel_event))
+                if cancel_event.is_set():
+                    raise JobCancelled()
+                self._finish(job_id, STATUS_SUCCEEDED, result=result)
+            except JobCancelled:
+                self._finish(job_id, STATUS_CANCELLED)
+            except Exception as e:
+                logging.error(f"Error in job {job_id} ({job['kind']}): {e}")
+                self._finish(job_id, STATUS_FAILED, error=str(e))
+        except Exception as e:
+            logging.error(f"Error running job {job_id}: {e}")
+        finally:
+            self._cancel_events.pop(job_id, None)
+
+    def cancel(self, job_id: str) -> bool:
+        """Hủy job đang chờ ngay lập tức; job đang chạy dừng ở lần check_cancelled tiếp theo"""
+        if self.get(job_id) is None:
+            return False
+        if self._execute(
+            "UPDATE jobs SET status = ?, finishedAt = ?, expiresAt = ? WHERE jobID = ? AND status = ?",
+            (STATUS_CANCELLED, _now(), self._expires_at(), job_id, STATUS_QUEUED),
+        ):
+            # Hàm của job sẽ không chạy (_run bỏ qua job không còn queued) nên phải dọn ở đây
+            self._discard(self._query("SELECT jobID, kind, params FROM jobs WHERE jobID = ?", (job_id,))[0])
+            return True
+        event = self._cancel_events.get(job_id)
+        if event is None:
+            return False
+        event.set()
+        return True
+
+    def get(self, job_id: str, include_result: bool = False):
+        """Job của cửa hàng hiện tại, None nếu không có hoặc thuộc cửa hàng khác"""
+        columns = _SUMMARY_COLUMNS + (", result" if include_result else "")
+        rows = self._query(f"SELECT {columns} FROM jobs WHERE jobID = ? AND tenant IS ?", (job_id, current_tenant()))
+        if not rows:
+            return None
+        job = rows[0]
+        job["progress"] = orjson.loads(job["progress"]) if job["progress"] else None
+        if include_result:
+            job["result"] = orjson.loads(job["result"]) if job["result"] else None
+        return job
+
+    def list(self, status: str = None, limit: int = 50) -> list:
+        """Các job của cửa hàng hiện tại, mới nhất trước"""
+        tenant = current_tenant()
+        if status:
+            rows = self._query(
+                f"SELECT {_SUMMARY_COLUMNS} FROM jobs WHERE tenant IS ? AND status = ? ORDER BY createdAt DESC LIMIT ?",
+                (tenant, status, limit)
+            )
+        else:
+            rows = self._query(
+                f"SELECT {_SUMMARY_COLUMNS} FROM jobs WHERE tenant IS ? ORDER BY createdAt DESC LIMIT ?", (tenant, limit)
+            )
+        for row in rows:
+            row["progress"] = orjson.loads(row["progress"]) if row["progress"] else None
+        return rows
+
+    def purge_expired(self) -> int:
+        """Xóa kết quả đã hết hạn (JOBS_RESULT_TTL_HOURS sau khi job kết thúc)"""
+        return self._execute("DELETE FROM jobs WHERE expiresAt IS NOT NULL AND expiresAt < ?", (_now(),))
+
+
+runner = JobRunner()
@@ -0,0 +1,451 @@
+"""
+Journal ghi trễ (write-behind) cho biến động tồn kho tần suất cao, vd. quét mã vạch khi nhận hàng.
+
+Khi bật INVENTORY_JOURNAL_ENABLED, import/export/kiểm kê không ghi MySQL trong request nữa:
+- biến động được nối vào file log cục bộ; nhiều request dùng chung một lần fsync
+  (gom trong INVENTORY_JOURNAL_FSYNC_MS) rồi mới được trả lời
+- một thread nền gom tối đa INVENTORY_JOURNAL_BATCH_SIZE biến động vào một transaction MySQL,
+  dùng đúng các bước ghi của stock_movements, và lưu seq cuối đã ghi vào tbl_journal_state
+  trong cùng transaction nên mỗi biến động được áp dụng đúng một lần
+- khi khởi động lại sau sự cố, các dòng trong log có seq lớn hơn seq đã ghi được phát lại
+- luồng đọc (kiểm tra tồn khi xuất, GET /inventories) cộng thêm phần chênh lệch còn chờ ghi
+
+Journal nằm trong bộ nhớ của một tiến trình nên chỉ dùng với một worker uvicorn.
+"""
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+import pymysql
+
+from .config import (
+    INVENTORY_JOURNAL_ENABLED, INVENTORY_JOURNAL_PATH, INVENTORY_JOURNAL_FSYNC_MS,
+    INVENTORY_JOURNAL_FLUSH_MS, INVENTORY_JOURNAL_BATCH_SIZE
+)
+from .db import get_connection, safe_close_connection, current_tenant
+from . import queries, alerts, stock_movements, hot_stock
+
+JOURNAL_NAME = "inventory"
+OP_IMPORT = "import"
+OP_EXPORT = "export"
+OP_STOCKTAKING = "stocktaking"
+COMPACT_SIZE_BYTES = 64 * 1024 * 1024
+# Lỗi kết nối: giữ nguyên batch và thử lại ở lần flush sau
+TRANSIENT_ERRORS = (pymysql.err.OperationalError, pymysql.err.InterfaceError, sqlite3.OperationalError)
+# Lỗi dữ liệu của riêng một biến động: bỏ qua và ghi vào file .failed
+DATA_ERRORS = (
+    pymysql.err.IntegrityError, pymysql.err.DataError, sqlite3.IntegrityError, sqlite3.DataError,
+    hot_stock.InsufficientStock,
+)
+
+
+class InsufficientStock(Exception):
+    pass
+
+
+class InventoryNotFound(Exception):
+    pass
+
+
+class MovementJournal:
+    def __init__(self, path: str, fsync_ms: int, flush_ms: int, batch_size: int):
+        self.path = path
+        self.fsync_interval = fsync_ms / 1000
+        self.flush_interval = flush_ms / 1000
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()  # bảo vệ file, _pending và các seq
+        self._synced = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()  # mỗi lúc chỉ một lần flush
+        self._fsync_lock = threading.Lock()  # luôn lấy trước _lock; giữ file không bị thay khi đang fsync
+        self._pending = []  # các biến động chưa ghi vào MySQL, theo thứ tự seq
+        self._seq = 0
+        self._synced_seq = 0
+        self._flushed_seq = 0
+        self._generation = 0  # tăng khi bắt đầu và khi xong mỗi lần ghi batch vào MySQL
+        self._applying = False  # đang ghi một batch: tồn kho trong database có thể đã gồm batch đó
+        self._applied = threading.Condition(self._lock)
+        self._file = None
+        self._stop = threading.Event()
+        self._wake_syncer = threading.Event()
+        self._wake_flusher = threading.Event()
+        self._threads = []
+
+    # ===== LIFECYCLE =====
+    def start(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._flushed_seq = self._load_flushed_seq()
+        last_seq = self._flushed_seq
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Dòng ghi dở khi tiến trình bị dừng đột ngột (chưa fsync nên chưa được xác nhận)
+                        logging.warning("Skipping torn line in inventory journal")
+                        continue
+                    last_seq = max(last_seq, entry["seq"])
+                    if entry["seq"] > self._flushed_seq:
+                        self._pending.append(entry)
+        self._seq = self._synced_seq = last_seq
+        if self._pending:
+            logging.info(f"Replaying {len(self._pending)} unflushed inventory journal entries")
+
+        self._file = open(self.path, "a", encoding="utf-8")
+        with self._fsync_lock, self._lock:
+            self._rewrite_locked()
+        for target in (self._sync_loop, self._flush_loop):
+            thread = threading.Thread(target=target, name=f"journal-{target.__name__}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._wake_flusher.set()
+
+    def stop(self, timeout: float = 10):
+        self.drain(timeout)
+        self._stop.set()
+        self._wake_syncer.set()
+        self._wake_flusher.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    # ===== APPEND =====
+    def record_import(self, product_id, inventory_id, quantity, unit_cost, import_date=None) -> dict:
+        with self._lock:
+            entry = self._append_locked(OP_IMPORT, product_id, inventory_id, import_date, quantity=quantity, unitCost=unit_cost)
+        return self._wait_durable(entry)
+
+    def record_export(self, product_id, inventory_id, quantity, export_date=None) -> dict:
+        while True:
+            generation = self._stable_generation()
+            db_stock = self._read_db_stock(inventory_id)
+            with self._lock:
+                if generation != self._generation:
+                    # Một batch được ghi trong lúc đọc database, đọc lại cho nhất quán
+                    continue
+                stock = self._effective_stock_locked(inventory_id, db_stock)
+                if stock is None or stock < quantity:
+                    raise InsufficientStock()
+                entry = self._append_locked(OP_EXPORT, product_id, inventory_id, export_date, quantity=quantity)
+                break
+        return self._wait_durable(entry)
+
+    def record_stocktaking(self, product_id, inventory_id, actual_quantity, stocktaking_date=None) -> dict:
+        while True:
+            generation = self._stable_generation()
+            db_stock = self._read_db_stock(inventory_id)
+            with self._lock:
+                if generation != self._generation:
+                    continue
+                stock = self._effective_stock_locked(inventory_id, db_stock)
+                if stock is None:
+                    raise InventoryNotFound()
+                entry = self._append_locked(
+                    OP_STOCKTAKING, product_id, inventory_id, stocktaking_date,
+                    actualQuantity=actual_quantity, difference=actual_quantity - stock
+                )
+                break
+        return self._wait_durable(entry)
+
+    def _stable_generation(self) -> int:
+        """Thế hệ hiện tại khi không có batch nào đang được ghi (chờ batch đang ghi xong)"""
+        with self._lock:
+            while self._applying:
+                self._applied.wait(timeout=1)
+            return self._generation
+
+    def _append_locked(self, op, product_id, inventory_id, date, **fields) -> dict:
+        self._seq += 1
+        entry = {
+            "seq": self._seq,
+            "op": op,
+            "productID": product_id,
+            "inventoryID": inventory_id,
+            "date": (date or datetime.datetime.now()).isoformat(),
+            **fields,
+        }
+        self._file.write(json.dumps(entry) + "\n")
+        self._pending.append(entry)
+        self._wake_syncer.set()
+        return entry
+
+    def _wait_durable(self, entry: dict) -> dict:
+        with self._lock:
+            while self._synced_seq < entry["seq"]:
+                if self._stop.is_set():
+                    raise RuntimeError("Inventory journal stopped before entry was synced")
+                self._synced.wait(timeout=1)
+            if len(self._pending) >= self.batch_size:
+                self._wake_flusher.set()
+        return entry
+
+    # ===== READ PATH =====
+    def pending_view(self) -> dict:
+        """{inventoryID: (giá trị kiểm kê cuối hoặc None, chênh lệch cộng dồn sau đó)}"""
+        with self._lock:
+            return self._pending_view_locked()
+
+    def _pending_view_locked(self, inventory_id=None) -> dict:
+        view = {}
+        for entry in self._pending:
+            if inventory_id is not None and entry["inventoryID"] != inventory_id:
+                continue
+            override, delta = view.get(entry["inventoryID"], (None, 0))
+            if entry["op"] == OP_STOCKTAKING:
+                override, delta = entry["actualQuantity"], 0
+            elif entry["op"] == OP_IMPORT:
+                delta += entry["quantity"]
+            else:
+                delta -= entry["quantity"]
+            view[entry["inventoryID"]] = (override, delta)
+        return view
+
+    def _effective_stock_locked(self, inventory_id, db_stock):
+        view = self._pending_view_locked(inventory_id)
+        if inventory_id not in view:
+            return db_stock
+        override, delta = view[inventory_id]
+        if override is not None:
+            return override + delta
+        if db_stock is None:
+            # Inventory sẽ được tạo bởi một lần import còn chờ ghi
+            has_import = any(e["op"] == OP_IMPORT and e["inventoryID"] == inventory_id for e in self._pending)
+            return delta if has_import else None
+        return db_stock + delta
+
+    def merge_stock(self, rows: list) -> list:
+        """Cộng phần chênh lệch còn chờ ghi vào stockQuantity của các dòng tbl_inventory"""
+        view = self.pending_view()
+        if not view:
+            return rows
+        for row in rows:
+            if row.get("inventoryID") in view:
+                override, delta = view[row["inventoryID"]]
+                base = override if override is not None else (row.get("stockQuantity") or 0)
+                row["stockQuantity"] = base + delta
+        return rows
+
+    def _read_db_stock(self, inventory_id):
+        conn = None
+        try:
+            conn = get_connection()
+            with conn.cursor() as cursor:
+                return stock_movements.get_stock(cursor, inventory_id)
+        finally:
+            safe_close_connection(conn)
+
+    # ===== SYNC (fsync theo nhóm) =====
+    def _sync_loop(self):
+        while not self._stop.is_set():
+            self._wake_syncer.wait(timeout=0.5)
+            self._wake_syncer.clear()
+            # Chờ thêm một chút để gom nhiều request vào cùng một lần fsync
+            self._stop.wait(self.fsync_interval)
+            try:
+                self._sync()
+            except Exception as e:
+                logging.error(f"Error syncing inventory journal: {e}")
+
+    def _sync(self):
+        with self._fsync_lock:
+            with self._lock:
+                target = self._seq
+                if target == self._synced_seq or self._file is None:
+                    return
+                self._file.flush()
+                fd = self._file.fileno()
+            # fsync ngoài _lock để các request khác vẫn nối tiếp được vào file
+            os.fsync(fd)
+            with self._lock:
+                self._synced_seq = max(self._synced_seq, target)
+                self._synced.notify_all()
+
+    # ===== FLUSH (ghi vào MySQL) =====
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wake_flusher.wait(timeout=self.flush_interval)
+            self._wake_flusher.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Error flushing inventory journal: {e}")
+
+    def flush(self) -> int:
+        """Ghi các biến động đã fsync vào MySQL theo từng batch, trả về số biến động đã ghi"""
+        flushed = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [e for e in self._pending[:self.batch_size] if e["seq"] <= self._synced_seq]
+                    if not batch:
+                        break
+                    # Đánh dấu trước khi commit để luồng đọc không cộng batch này hai lần (database + _pending)
+                    self._applying = True
+                    self._generation += 1
+                applied = 0
+                try:
+                    applied, alert_events = self._apply_batch(batch)
+                finally:
+                    with self._fsync_lock, self._lock:
+                        if applied:
+                            del self._pending[:applied]
+                            self._flushed_seq = batch[applied - 1]["seq"]
+                            if not self._pending or self._file.tell() > COMPACT_SIZE_BYTES:
+                                self._rewrite_locked()
+                        self._applying = False
+                        self._generation += 1
+                        self._applied.notify_all()
+                alerts.publish(alert_events)
+                flushed += applied
+                if applied < len(batch):
+                    # Mất kết nối giữa chừng, phần còn lại được ghi ở lần flush sau
+                    break
+        return flushed
+
+    def drain(self, timeout: float = 10):
+        """Chờ tới khi mọi biến động đã được ghi vào MySQL (dùng khi tắt server)"""
+        deadline = datetime.datetime.now() + datetime.timedelta(seconds=timeout)
+        while self._pending and datetime.datetime.now() < deadline:
+            self._sync()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Error flushing inventory journal: {e}")
+            if self._pending:
+                self._stop.wait(0.05)
+
+    def _apply_batch(self, batch: list) -> tuple:
+        """
+        (số biến động đầu batch đã được ghi, alert_events). Lỗi kết nối khi ghi cả batch được raise để
+        flush sau thử lại nguyên batch; lỗi khác thì ghi từng biến động, biến động lỗi dữ liệu được bỏ qua
+        (dead-letter) sau khi seq của nó đã được lưu.
+        """
+        try:
+            return len(batch), self._apply_entries(batch)
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception as e:
+            # Tách từng biến động để một dòng lỗi không chặn cả journal
+            logging.error(f"Error applying inventory journal batch, retrying one by one: {e}")
+        alert_events = []
+        for applied, entry in enumerate(batch):
+            try:
+                alert_events += self._apply_entries([entry])
+            except DATA_ERRORS as e:
+                try:
+                    self._apply_entries([], last_seq=entry["seq"])
+                except Exception as state_error:
+                    logging.error(f"Error skipping inventory journal entry {entry['seq']}: {state_error}")
+                    return applied, alert_events
+                logging.error(f"Dropping inventory journal entry {entry['seq']}: {e}")
+                self._dead_letter(entry, e)
+            except Exception as e:
+                logging.error(f"Error applying inventory journal entry {entry['seq']}, will retry: {e}")
+                return applied, alert_events
+        return len(batch), alert_events
+
+    def _apply_entries(self, entries: list, last_seq: int = None) -> list:
+        conn = None
+        try:
+            conn = get_connection()
+            alert_events = []
+            with conn.cursor() as cursor:
+                for entry in entries:
+                    date = datetime.datetime.fromisoformat(entry["date"])
+                    if entry["op"] == OP_IMPORT:
+                        alert = stock_movements.apply_import(
+                            cursor, entry["productID"], entry["inventoryID"], entry["quantity"], entry["unitCost"], date
+                        )
+                    elif entry["op"] == OP_EXPORT:
+                        alert = stock_movements.apply_export(
+                            cursor, entry["productID"], entry["inventoryID"], entry["quantity"], date
+                        )
+                    else:
+                        _, alert = stock_movements.apply_stocktaking(
+                            cursor, entry["productID"], entry["inventoryID"], entry["actualQuantity"], date
+                        )
+                    alert_events.append(alert)
+                seq = last_seq if last_seq is not None else entries[-1]["seq"]
+                cursor.execute(queries.UPSERT_JOURNAL_STATE, (JOURNAL_NAME, seq))
+            conn.commit()
+            return alert_events
+        except Exception:
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            safe_close_connection(conn)
+
+    def _dead_letter(self, entry: dict, error: Exception):
+        with open(self.path + ".failed", "a", encoding="utf-8") as f:
+            f.write(json.dumps({**entry, "error": str(error)}) + "\n")
+
+    def _load_flushed_seq(self) -> int:
+        conn = None
+        try:
+            conn = get_connection()
+            with conn.cursor() as cursor:
+                cursor.execute(queries.SELECT_JOURNAL_STATE, (JOURNAL_NAME,))
+                row = cursor.fetchone()
+                return row["lastSeq"] if row else 0
+        finally:
+            safe_close_connection(conn)
+
+    def _rewrite_locked(self):
+        """Viết lại file log chỉ với các biến động còn chờ ghi (gọi khi đang giữ _fsync_lock và _lock)"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in self._pending:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        # Mọi dòng còn lại vừa được fsync cùng file mới
+        self._synced_seq = self._seq
+        self._synced.notify_all()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "lastSeq": self._seq,
+                "syncedSeq": self._synced_seq,
+                "flushedSeq": self._flushed_seq,
+            }
+
+
+journal = None
+
+
+def current():
+    """Journal nếu request hiện tại dùng database mặc định; cửa hàng có shard riêng (TENANT_SHARDS) ghi thẳng vào shard"""
+    return journal if current_tenant() is None else None
+
+
+def start_journal():
+    global journal
+    if INVENTORY_JOURNAL_ENABLED and journal is None:
+        journal = MovementJournal(
+            INVENTORY_JOURNAL_PATH, INVENTORY_JOURNAL_FSYNC_MS, INVENTORY_JOURNAL_FLUSH_MS, INVENTORY_JOURNAL_BATCH_SIZE
+        )
+        journal.start()
+    return journal
+
+
+def stop_journal():
+    global journal
+    if journal is not None:
+        journal.stop()
+        journal = None
@@ -0,0 +1,154 @@
+"""
+Dựng câu truy vấn cho các list endpoint: projection (fields=), sort nhiều cột (sort=)
+và bộ lọc theo kiểu dữ liệu (cột__toán_tử=giá_trị).
+
+Ví dụ: /orders?fields=orderID,orderDate,totalAmount&sort=-orderDate,orderID
+               &orderDate__gte=2024-01-01&orderStatus__in=Pending,Shipped&limit=50
+"""
+import base64
+import datetime
+from fastapi import HTTPException
+
+# Toán tử so sánh được phép trong bộ lọc
+FILTER_OPERATORS = {
+    "eq": "=",
+    "ne": "!=",
+    "gt": ">",
+    "gte": ">=",
+    "lt": "<",
+    "lte": "<=",
+}
+RESERVED_PARAMS = {"fields", "sort", "limit", "offset", "cursor", "format"}
+MAX_LIMIT = 1000
+
+
+def encode_cursor(row_date: datetime.datetime, row_id: int) -> str:
+    """Cursor phân trang keyset (ngày, id) dạng chuỗi mờ cho client"""
+    raw = f"{row_date.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        row_date, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.datetime.fromisoformat(row_date), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_value(kind: str, raw: str):
+    """Chuyển giá trị chuỗi trên query string sang đúng kiểu của cột"""
+    if kind == "int":
+        return int(raw)
+    if kind == "float":
+        return float(raw)
+    if kind == "datetime":
+        return datetime.datetime.fromisoformat(raw)
+    return raw
+
+
+def _is_date_only(raw: str) -> bool:
+    return len(raw) == 10 and raw[4] == "-" and raw[7] == "-"
+
+
+def _parse_fields(raw: str, columns: dict) -> list:
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def _parse_sort(raw: str, columns: dict) -> list:
+    order_by = []
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        direction = "DESC" if item.startswith("-") else "ASC"
+        column = item.lstrip("+-")
+        if column not in columns:
+            raise HTTPException(status_code=400, detail=f"Unknown sort field: {column}")
+        order_by.append(f"{column} {direction}")
+    return order_by
+
+
+def parse_filters(query_params, columns: dict):
+    """Đọc các tham số dạng cột=giá_trị hoặc cột__toán_tử=giá_trị, trả về (conditions, params)"""
+    conditions = []
+    params = []
+    for key, raw in query_params.multi_items():
+        if key in RESERVED_PARAMS:
+            continue
+        column, _, op = key.partition("__")
+        if column not in columns:
+            # Các tham số riêng của endpoint (search, category...) do router tự xử lý
+            continue
+        op = op or "eq"
+        kind = columns[column]
+        try:
+            if op == "in":
+                values = [parse_value(kind, v.strip()) for v in raw.split(",") if v.strip()]
+                if not values:
+                    continue
+                conditions.append(f"{column} IN ({', '.join(['%s'] * len(values))})")
+                params.extend(values)
+            elif op in FILTER_OPERATORS:
+                value = parse_value(kind, raw)
+                if kind == "datetime" and _is_date_only(raw) and op in ("lte", "gt"):
+                    # orderDate__lte=2024-01-31 phải bao gồm cả ngày 31
+                    value += datetime.timedelta(days=1)
+                    conditions.append(f"{column} {'<' if op == 'lte' else '>='} %s")
+                else:
+                    conditions.append(f"{column} {FILTER_OPERATORS[op]} %s")
+                params.append(value)
+            else:
+                raise HTTPException(status_code=400, detail=f"Unknown filter operator: {op}")
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid value for {key}: {raw}")
+    return conditions, params
+
+
+def build_list_query(table: str, columns: dict, query_params, conditions=None, params=None,
+                     default_sort: str = None, required_fields=None):
+    """
+    Dựng câu SELECT cho list endpoint.
+    `columns` là whitelist {tên cột: kiểu} (int, float, datetime, str) - chỉ các cột này
+    được phép xuất hiện trong fields/sort/filter nên không thể chèn SQL qua tên cột.
+    `conditions`/`params` là các điều kiện router đã tự dựng trước (search, category...).
+    `required_fields` luôn được thêm vào projection (vd. các cột dùng làm cursor phân trang).
+    """
+    conditions = list(conditions or [])
+    params = list(params or [])
+
+    fields = _parse_fields(query_params["fields"], columns) if query_params.get("fields") else None
+    if fields and required_fields:
+        fields += [f for f in required_fields if f not in fields]
+    select_list = ", ".join(fields) if fields else "*"
+
+    filter_conditions, filter_params = parse_filters(query_params, columns)
+    conditions.extend(filter_conditions)
+    params.extend(filter_params)
+
+    query = f"SELECT {select_list} FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    sort = query_params.get("sort") or default_sort
+    if sort:
+        order_by = _parse_sort(sort, columns)
+        if order_by:
+            query += " ORDER BY " + ", ".join(order_by)
+
+    if query_params.get("limit"):
+        try:
+            limit = min(int(query_params["limit"]), MAX_LIMIT)
+            offset = int(query_params.get("offset") or 0)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="limit/offset must be integers")
+        if limit < 0 or offset < 0:
+            raise HTTPException(status_code=400, detail="limit/offset must not be negative")
+        query += " LIMIT %s OFFSET %s"
+        params.extend([limit, offset])
+
+    return query, tuple(params)
@@ -1,9 +1,14 @@
 import sys
 import os
 import logging
+import time
+from contextlib import asynccontextmanager
+from http.cookies import SimpleCookie
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import ORJSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
 
 # Add the project root to the Python path
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -14,26 +19,189 @@ sys.path.insert(0, PROJECT_ROOT)
 from src.api.config import (
     SERVER_HOST, SERVER_PORT, SERVER_RELOAD,
     CORS_ALLOW_ORIGINS, CORS_ALLOW_CREDENTIALS, CORS_ALLOW_METHODS, CORS_ALLOW_HEADERS,
+    CORS_EXPOSE_HEADERS, TENANT_HEADER, TENANT_TOKEN_HEADER,
     LOG_LEVEL
 )
 
+from src.api.db import init_schema, using_sqlite, replica_router, group_writer, begin_request, primary_pin_until
+from src.api.db import all_tenants, use_tenant, set_tenant, UnknownTenant, TenantForbidden
+from src.api import queries
+from src.api import alerts as stock_alerts
+from src.api import journal as inventory_journal
+from src.api import store_archive
+from src.api import stock_snapshots
+from src.api import stock_movements
+from src.api.jobs import runner as job_runner
+from src.api.report_precompute import report_store
+from src.api import reservations as stock_reservations
+from src.api import tracing
+from src.api import profiling
+
 # Import routers
 from src.api.routers import (
     customers, products, orders, payments, staff, vendors, inventory,
-    requests, stores, supplies, reports, auth, inventory_operations
+    requests, stores, supplies, reports, auth, inventory_operations, alerts, events, jobs, database,
+    reservations, metrics, admin
 )
 
 # Logging
 logging.basicConfig(level=getattr(logging, LOG_LEVEL.upper(), logging.INFO))
 
+# ===== LIFESPAN =====
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Database mặc định và shard của từng cửa hàng (TENANT_SHARDS) có cùng schema
+    for tenant in all_tenants():
+        try:
+            with use_tenant(tenant):
+                if using_sqlite():
+                    # Database SQLite mới: tạo các bảng gốc trước (MySQL đã có sẵn)
+                    init_schema(queries.BASE_TABLES)
+                init_schema(queries.SCHEMA_STATEMENTS)
+                stock_alerts.rebuild_alerts()
+        except Exception as e:
+            # Không chặn server khởi động nếu database chưa sẵn sàng
+            logging.error(f"Error initializing schema ({tenant or 'default'}): {e}")
+    tracing.start()
+    replica_router.start()
+    group_writer.start()
+    inventory_journal.start_journal()
+    store_archive.start_archiver()
+    stock_snapshots.start_snapshotter()
+    stock_movements.start_settler()
+    job_runner.start()
+    report_store.start()
+    stock_reservations.table.start()
+    yield
+    stock_reservations.stop_all()
+    report_store.stop()
+    job_runner.stop()
+    stock_movements.stop_settler()
+    stock_snapshots.stop_snapshotter()
+    store_archive.stop_archiver()
+    inventory_journal.stop_journal()
+    group_writer.stop()
+    replica_router.stop()
+    tracing.stop()
+
 # FastAPI app
-app = FastAPI(default_response_class=ORJSONResponse)
+app = FastAPI(default_response_class=tracing.ORJSONResponse, lifespan=lifespan)
+
+# ===== REQUEST MIDDLEWARE =====
+# Read-your-writes: request có ghi dữ liệu trả mốc (cookie và header) để các request tiếp theo của session
+# đọc từ primary trong DB_READ_YOUR_WRITES_SECONDS, tránh đọc dữ liệu cũ từ replica (xem db.get_read_connection)
+DB_PRIMARY_COOKIE = "db_primary_until"
+# Frontend khác origin không lưu được cookie: mốc được trả ở header và client gửi lại header này
+DB_PRIMARY_HEADER = "X-DB-Primary-Until"
+
+def _primary_until(value) -> float:
+    try:
+        return float(value or 0)
+    except ValueError:
+        return 0.0
+
+def _content_length(headers):
+    value = headers.get("content-length")
+    return int(value) if value and value.isdigit() else None
+
+def _primary_cookie(until: float) -> str:
+    cookie = SimpleCookie()
+    cookie[DB_PRIMARY_COOKIE] = str(until)
+    cookie[DB_PRIMARY_COOKIE].update({"max-age": int(until - time.time()) + 1, "path": "/", "httponly": True, "samesite": "lax"})
+    return cookie[DB_PRIMARY_COOKIE].OutputString()
+
+class RequestMiddleware:
+    """
+    Middleware ASGI cho mọi request HTTP, theo thứ tự từ ngoài vào:
+    - tracing: đo cả request (kể cả lỗi do middleware trả về); route là mẫu đường dẫn của route đã khớp (xem tracing.py)
+    - ?profile=1 (kèm X-Admin-Token): endpoint chạy dưới cProfile, mã file trả về ở header X-Profile-ID (xem profiling.py)
+    - TENANT_HEADER (kèm TENANT_TOKEN_HEADER nếu cửa hàng có token) chọn shard của cửa hàng cho mọi truy vấn
+      trong request (xem db.py - TENANTS)
+    - read-your-writes (cookie/header DB_PRIMARY_*)
+    Một lớp ASGI thay vì bốn @app.middleware("http"): mỗi lớp BaseHTTPMiddleware thêm một task và
+    một lần chuyển response qua stream cho mỗi request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        connection = HTTPConnection(scope)
+        trace = tracing.begin(connection.headers.get("traceparent"))
+        response = {"status": 500, "bytes": None}
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["bytes"] = _content_length(MutableHeaders(scope=message))
+            await send(message)
+        try:
+            await self._profile(scope, receive, traced_send, connection)
+        finally:
+            route = scope.get("route")
+            tracing.finish(
+                trace, scope["method"], route.path if route is not None else tracing.UNMATCHED_ROUTE, scope["path"],
+                response["status"], _content_length(connection.headers), response["bytes"],
+            )
+
+    async def _profile(self, scope, receive, send, connection):
+        if connection.query_params.get(profiling.PROFILE_PARAM) != "1":
+            await self._select_tenant(scope, receive, send, connection)
+            return
+        if not profiling.is_admin(connection.headers.get(profiling.ADMIN_HEADER)):
+            await ORJSONResponse(status_code=403, content={"detail": "Profiling requires a valid admin token"})(scope, receive, send)
+            return
+        holder = profiling.begin_request()
+
+        async def profiled_send(message):
+            if message["type"] == "http.response.start":
+                route = scope.get("route")
+                profile_id = profiling.save(holder, scope["method"], route.path if route is not None else scope["path"])
+                if profile_id:
+                    MutableHeaders(scope=message)[profiling.PROFILE_ID_HEADER] = profile_id
+            await send(message)
+        await self._select_tenant(scope, receive, profiled_send, connection)
+
+    async def _select_tenant(self, scope, receive, send, connection):
+        try:
+            set_tenant(connection.headers.get(TENANT_HEADER), connection.headers.get(TENANT_TOKEN_HEADER))
+        except UnknownTenant as e:
+            await ORJSONResponse(status_code=400, content={"detail": f"Unknown store: {e}"})(scope, receive, send)
+            return
+        except TenantForbidden as e:
+            await ORJSONResponse(status_code=403, content={"detail": f"Invalid token for store: {e}"})(scope, receive, send)
+            return
+        await self._read_your_writes(scope, receive, send, connection)
+
+    async def _read_your_writes(self, scope, receive, send, connection):
+        state = begin_request(max(
+            _primary_until(connection.cookies.get(DB_PRIMARY_COOKIE)), _primary_until(connection.headers.get(DB_PRIMARY_HEADER))
+        ))
+
+        async def pinned_send(message):
+            if message["type"] == "http.response.start" and state.wrote:
+                until = primary_pin_until()
+                headers = MutableHeaders(scope=message)
+                headers.append("set-cookie", _primary_cookie(until))
+                headers[DB_PRIMARY_HEADER] = str(until)
+            await send(message)
+        await self.app(scope, receive, pinned_send)
+
+app.add_middleware(RequestMiddleware)
+
+# ===== CORS =====
+# Thêm sau cùng nên là lớp ngoài cùng: cả response do middleware khác trả về (400 cửa hàng không hợp lệ,
+# 403 profiling) cũng có header CORS, trình duyệt không báo thành lỗi mạng
 app.add_middleware(
     CORSMiddleware,
     allow_origins=CORS_ALLOW_ORIGINS,
     allow_credentials=CORS_ALLOW_CREDENTIALS,
     allow_methods=CORS_ALLOW_METHODS,
     allow_headers=CORS_ALLOW_HEADERS,
+    expose_headers=CORS_EXPOSE_HEADERS,
 )
 
 # Include routers
@@ -50,6 +218,13 @@ app.include_router(supplies.router, tags=["Supplies"])
 app.include_router(reports.router, tags=["Reports"])
 app.include_router(auth.router, tags=["Authentication"])
 app.include_router(inventory_operations.router, tags=["Inventory Operations"])
+app.include_router(alerts.router, tags=["Alerts"])
+app.include_router(events.router, tags=["Events"])
+app.include_router(jobs.router, tags=["Jobs"])
+app.include_router(database.router, tags=["Database"])
+app.include_router(reservations.router, tags=["Reservations"])
+app.include_router(metrics.router, tags=["Metrics"])
+app.include_router(admin.router, tags=["Admin"])
 
 
 # ===== ERROR HANDLING =====
@@ -24,3 +24,4 @@ class OrderCheckoutModel(BaseModel):
     paymentStatus: str
     shippedStatus: str
     shippedDate: Optional[str] = None
+    reservationID: Optional[str] = None  # Giỏ hàng đã giữ hàng (POST /reservations): trừ tồn kho khi checkout
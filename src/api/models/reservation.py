@@ -0,0 +1,10 @@
+from typing import Optional, List
+from pydantic import BaseModel, Field
+
+class ReservationItem(BaseModel):
+    productID: int
+    quantity: int = Field(gt=0)
+
+class Reservation(BaseModel):
+    customerID: Optional[int] = None
+    items: List[ReservationItem]
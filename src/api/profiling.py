@@ -0,0 +1,281 @@
+"""
+Profiling worker đang chạy, chỉ dành cho admin (header X-Admin-Token khớp ADMIN_TOKEN; để "" thì tắt).
+
+- Lấy mẫu (routers/admin.py - POST /admin/profile/sample): thread của request đọc stack của mọi thread
+  khác (sys._current_frames) mỗi PROFILE_SAMPLE_INTERVAL_MS trong N giây, không cần cài gì thêm và không
+  làm chậm request đang chạy. Kết quả là file speedscope (mỗi thread một profile, mở tại speedscope.app)
+  hoặc collapsed stacks cho flamegraph.pl. Mỗi worker chỉ chạy một lần lấy mẫu cùng lúc.
+- ?profile=1 (middleware trong main.py): endpoint của request được chạy dưới cProfile trong chính thread
+  xử lý nó (router dùng route_class=ProfiledRoute); file pstats được lưu ở PROFILE_DIR (giữ PROFILE_KEEP file mới nhất), mã file trả về ở header
+  X-Profile-ID. Chỉ các route trong PROFILE_ROUTES ([] = mọi route). Với endpoint async, cProfile ghi
+  cả các coroutine khác chạy xen trên event loop trong lúc đó.
+- tracemalloc: bật/tắt và chụp snapshot các dòng cấp phát nhiều nhất, so sánh với snapshot trước để tìm
+  chỗ cấp phát tăng dần (vd. gọi GET /stores giữa hai snapshot).
+"""
+import contextvars
+import cProfile
+import datetime
+import functools
+import hmac
+import inspect
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+
+from fastapi.routing import APIRoute
+
+from .config import ADMIN_TOKEN, PROFILE_DIR, PROFILE_KEEP, PROFILE_ROUTES, PROFILE_MAX_SECONDS
+
+ADMIN_HEADER = "X-Admin-Token"
+PROFILE_PARAM = "profile"
+PROFILE_ID_HEADER = "X-Profile-ID"
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+_sampling = threading.Lock()
+_request_profile = contextvars.ContextVar("request_profile", default=None)
+_last_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return bool(ADMIN_TOKEN)
+
+
+def is_admin(token) -> bool:
+    return enabled() and bool(token) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+# ===== SAMPLING =====
+class SamplingBusy(Exception):
+    pass
+
+
+def sample(seconds: float, interval_ms: float) -> dict:
+    """{tên thread: Counter(stack)}; stack là tuple (hàm, file, dòng đầu hàm) từ gốc tới lá"""
+    if not _sampling.acquire(blocking=False):
+        raise SamplingBusy()
+    try:
+        own = threading.get_ident()
+        interval = interval_ms / 1000
+        deadline = time.monotonic() + min(seconds, PROFILE_MAX_SECONDS)
+        names = {}
+        stacks = {}
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stacks.setdefault(names.get(ident, str(ident)), Counter())[tuple(reversed(stack))] += 1
+            time.sleep(interval)
+        return stacks
+    finally:
+        _sampling.release()
+
+
+def to_speedscope(stacks: dict, interval_ms: float, name: str) -> dict:
+    frames = []
+    index = {}
+    profiles = []
+    for thread, counter in sorted(stacks.items()):
+        samples, weights = [], []
+        for stack, count in counter.most_common():
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                ids.append(index[frame])
+            samples.append(ids)
+            weights.append(count * interval_ms)
+        profiles.append({
+            "type": "sampled", "name": thread, "unit": "milliseconds",
+            "startValue": 0, "endValue": sum(weights), "samples": samples, "weights": weights,
+        })
+    return {"$schema": SPEEDSCOPE_SCHEMA, "name": name, "exporter": "store-management-api",
+            "shared": {"frames": frames}, "profiles": profiles}
+
+
+def to_collapsed(stacks: dict) -> str:
+    """Mỗi dòng "thread;hàm (file:dòng);... số_mẫu" cho flamegraph.pl / speedscope"""
+    lines = []
+    for thread, counter in sorted(stacks.items()):
+        for stack, count in counter.most_common():
+            frames = ";".join(f"{name} ({os.path.basename(file)}:{line})" for name, file, line in stack)
+            lines.append(f"{thread.replace(';', '_')};{frames} {count}")
+    return "\n".join(lines) + "\n"
+
+
+# ===== PER-REQUEST CPROFILE =====
+class RequestProfile:
+    def __init__(self):
+        self.profiler = None
+
+
+def _selected(path: str) -> bool:
+    return not PROFILE_ROUTES or path in PROFILE_ROUTES
+
+
+def _wrap(call):
+    """Chạy endpoint dưới cProfile khi request hiện tại có ?profile=1 (trong thread chạy endpoint)"""
+    if inspect.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def async_wrapper(*args, **kwargs):
+            holder = _request_profile.get()
+            if holder is None:
+                return await call(*args, **kwargs)
+            holder.profiler = cProfile.Profile()
+            holder.profiler.enable()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                holder.profiler.disable()
+        return async_wrapper
+
+    @functools.wraps(call)
+    def wrapper(*args, **kwargs):
+        holder = _request_profile.get()
+        if holder is None:
+            return call(*args, **kwargs)
+        holder.profiler = cProfile.Profile()
+        return holder.profiler.runcall(call, *args, **kwargs)
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """route_class của các router: endpoint của route được chọn được bọc để ?profile=1 chạy nó dưới cProfile"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if _selected(path):
+            endpoint = _wrap(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def begin_request() -> RequestProfile:
+    holder = RequestProfile()
+    _request_profile.set(holder)
+    return holder
+
+
+def save(holder: RequestProfile, method: str, route: str):
+    """Ghi file pstats của request, trả về mã profile (None nếu route không được chọn)"""
+    if holder.profiler is None:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    label = re.sub(r"[^A-Za-z0-9]+", "-", route).strip("-") or "root"
+    # Mã bắt đầu bằng thời điểm tới micro giây: sắp theo tên là theo thứ tự tạo (_prune, list_profiles)
+    profile_id = f"{datetime.datetime.now():%Y%m%dT%H%M%S%f}-{method}-{label}-{uuid.uuid4().hex[:8]}"
+    holder.profiler.dump_stats(os.path.join(PROFILE_DIR, f"{profile_id}.prof"))
+    _prune()
+    return profile_id
+
+
+def _prune():
+    files = sorted(entry.path for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(".prof"))
+    for path in files[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else []:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def list_profiles() -> list:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(PROFILE_DIR):
+        if entry.name.endswith(".prof"):
+            stat = entry.stat()
+            profiles.append({
+                "profileID": entry.name[:-len(".prof")],
+                "sizeBytes": stat.st_size,
+                "createdAt": datetime.datetime.fromtimestamp(stat.st_mtime).isoformat(timespec="seconds"),
+            })
+    return sorted(profiles, key=lambda profile: profile["profileID"], reverse=True)
+
+
+def profile_path(profile_id: str):
+    """Đường dẫn file pstats, None nếu mã không hợp lệ hoặc không còn"""
+    if not re.fullmatch(r"[A-Za-z0-9-]+", profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.prof")
+    return path if os.path.isfile(path) else None
+
+
+def profile_text(path: str, sort: str, limit: int) -> str:
+    output = io.StringIO()
+    stats = pstats.Stats(path, stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+# ===== TRACEMALLOC =====
+def start_tracemalloc(frames: int):
+    global _last_snapshot
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    tracemalloc.start(frames)
+    _last_snapshot = None
+
+
+def stop_tracemalloc():
+    global _last_snapshot
+    tracemalloc.stop()
+    _last_snapshot = None
+
+
+def tracemalloc_status() -> dict:
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracing": tracemalloc.is_tracing(),
+        "frames": tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else None,
+        "currentKB": round(current / 1024, 1),
+        "peakKB": round(peak / 1024, 1),
+    }
+
+
+def _traceback(traceback) -> list:
+    return [f"{frame.filename}:{frame.lineno}" for frame in traceback]
+
+
+def snapshot(group_by: str, limit: int, path_filter: str = None, compare: bool = False) -> dict:
+    """
+    Top cấp phát còn sống theo group_by (lineno, filename, traceback). compare=True so với snapshot trước
+    (sizeDiffKB/countDiff); snapshot này trở thành mốc so sánh cho lần sau.
+    """
+    global _last_snapshot
+    current = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ])
+    with _snapshot_lock:
+        previous, _last_snapshot = _last_snapshot, current
+    if path_filter:
+        # Giữ cấp phát có một frame bất kỳ thuộc file khớp (vd. router gọi pymysql/orjson)
+        filters = [tracemalloc.Filter(True, f"*{path_filter}*", all_frames=True)]
+        current = current.filter_traces(filters)
+        previous = previous.filter_traces(filters) if previous is not None else None
+    if compare and previous is not None:
+        stats = current.compare_to(previous, group_by)
+        top = [{
+            "location": _traceback(stat.traceback),
+            "sizeKB": round(stat.size / 1024, 1), "sizeDiffKB": round(stat.size_diff / 1024, 1),
+            "count": stat.count, "countDiff": stat.count_diff,
+        } for stat in stats[:limit]]
+    else:
+        top = [{
+            "location": _traceback(stat.traceback), "sizeKB": round(stat.size / 1024, 1), "count": stat.count,
+        } for stat in current.statistics(group_by)[:limit]]
+    return {**tracemalloc_status(), "compared": compare and previous is not None, "top": top}
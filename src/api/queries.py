@@ -4,10 +4,18 @@ This file contains all the SQL queries used in the application.
 
 # ===== CHECK USAGE =====
 CHECK_PRODUCT_IN_REQUESTS = "SELECT COUNT(*) as count FROM tbl_requests WHERE productID = %s"
-CHECK_PRODUCT_IN_STORES = "SELECT COUNT(*) as count FROM tbl_stores WHERE productID = %s"
+CHECK_PRODUCT_IN_STORES = """
+    SELECT
+        (SELECT COUNT(*) FROM tbl_stores WHERE productID = %s)
+        + (SELECT COUNT(*) FROM tbl_stores_archive WHERE productID = %s) as count
+"""
 CHECK_PRODUCT_IN_SUPPLIES = "SELECT COUNT(*) as count FROM tbl_supplies WHERE productID = %s"
 CHECK_VENDOR_IN_SUPPLIES = "SELECT COUNT(*) as count FROM tbl_supplies WHERE vendorID = %s"
-CHECK_INVENTORY_IN_STORES = "SELECT COUNT(*) as count FROM tbl_stores WHERE inventoryID = %s"
+CHECK_INVENTORY_IN_STORES = """
+    SELECT
+        (SELECT COUNT(*) FROM tbl_stores WHERE inventoryID = %s)
+        + (SELECT COUNT(*) FROM tbl_stores_archive WHERE inventoryID = %s) as count
+"""
 
 # ===== CUSTOMERS =====
 SELECT_CUSTOMERS = "SELECT customerID, customerName, phone, email, address, postalCode, customerType, loyalPoint, loyalLevel FROM tbl_customer"
@@ -16,6 +24,13 @@ SELECT_CUSTOMERS_SEARCH = """
     FROM tbl_customer 
     WHERE customerName LIKE %s OR phone LIKE %s OR email LIKE %s
 """
+SELECT_CUSTOMER_ORDERS_PAGE = """
+    SELECT orderID, orderDate FROM tbl_order
+    WHERE customerID = %s {cursor_clause}
+    ORDER BY orderDate DESC, orderID DESC
+    LIMIT %s
+"""
+SELECT_CUSTOMER_ORDERS_CURSOR = "AND (orderDate < %s OR (orderDate = %s AND orderID < %s))"
 SELECT_CUSTOMER_BY_ID = "SELECT customerID, customerName, phone, email, address, postalCode, customerType, loyalPoint, loyalLevel FROM tbl_customer WHERE customerID = %s"
 INSERT_CUSTOMER = "INSERT INTO tbl_customer (customerName, phone, email, address, postalCode) VALUES (%s, %s, %s, %s, %s)"
 UPDATE_CUSTOMER = "UPDATE tbl_customer SET customerName=%s, phone=%s, email=%s, address=%s, postalCode=%s WHERE customerID=%s"
@@ -58,14 +73,68 @@ UPDATE_PRODUCT = """
     WHERE productID=%s
 """
 DELETE_PRODUCT = "DELETE FROM tbl_product WHERE productID = %s"
+# Nhập danh mục theo lô (catalog_io.py): {values} là danh sách (%s, ...) cho từng dòng
+UPSERT_PRODUCTS_BATCH = """
+    INSERT INTO tbl_product (
+        productID, productName, priceEach, productLine, productScale,
+        productBrand, productDiscription, warrantyPeriod, MSRP
+    ) VALUES {values}
+    ON DUPLICATE KEY UPDATE
+        productName = VALUES(productName), priceEach = VALUES(priceEach),
+        productLine = VALUES(productLine), productScale = VALUES(productScale),
+        productBrand = VALUES(productBrand), productDiscription = VALUES(productDiscription),
+        warrantyPeriod = VALUES(warrantyPeriod), MSRP = VALUES(MSRP)
+"""
+SELECT_PRODUCT_IDS_BY_NAME_BRAND = """
+    SELECT productID, productName, productBrand
+    FROM tbl_product
+    WHERE (productName, productBrand) IN ({placeholders})
+"""
+EXPORT_PRODUCTS = "SELECT * FROM tbl_product ORDER BY productID"
+EXPORT_INVENTORIES = "SELECT * FROM tbl_inventory ORDER BY inventoryID"
+EXPORT_ORDERS = "SELECT * FROM tbl_order ORDER BY orderID"
+# Các cột được phép dùng trong fields/sort/filter của GET /products
+LIST_COLUMNS_PRODUCTS = {
+    "productID": "int",
+    "productName": "str",
+    "priceEach": "float",
+    "productLine": "str",
+    "productScale": "str",
+    "productBrand": "str",
+    "productDiscription": "str",
+    "warrantyPeriod": "int",
+    "MSRP": "float",
+}
 
 # ===== ORDERS =====
+# Các cột được phép dùng trong fields/sort/filter của GET /orders
+LIST_COLUMNS_ORDERS = {
+    "orderID": "int",
+    "orderDate": "datetime",
+    "totalAmount": "float",
+    "orderStatus": "str",
+    "paymentDate": "datetime",
+    "paymentStatus": "str",
+    "pickupMethod": "str",
+    "shippedDate": "datetime",
+    "shippedStatus": "str",
+    "customerID": "int",
+    "staffID": "int",
+}
 SELECT_ORDER_BY_CUSTOMER_ID = "SELECT * FROM tbl_order WHERE customerID = %s"
+SELECT_ORDER_BY_ID = "SELECT * FROM tbl_order WHERE orderID = %s"
+# Dùng cho hydration.hydrate_orders - {placeholders} là danh sách %s tương ứng số ID
+SELECT_ORDERS_BY_IDS = "SELECT * FROM tbl_order WHERE orderID IN ({placeholders})"
+SELECT_REQUESTS_BY_ORDER_IDS = "SELECT * FROM tbl_requests WHERE orderID IN ({placeholders})"
+SELECT_PRODUCTS_BY_IDS = "SELECT * FROM tbl_product WHERE productID IN ({placeholders})"
+SELECT_PAYMENTS_BY_ORDER_IDS = """
+    SELECT * FROM tbl_payment WHERE orderID IN ({placeholders}) ORDER BY transactionDate
+"""
 INSERT_ORDER = """
     INSERT INTO tbl_order (
         totalAmount, orderStatus,  paymentStatus,
         pickupMethod, shippedDate, shippedStatus, customerID, staffID
-    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
 """
 UPDATE_ORDER = """
     UPDATE tbl_order
@@ -76,7 +145,7 @@ UPDATE_ORDER = """
 DELETE_ORDER = "DELETE FROM tbl_order WHERE orderID = %s"
 CHECKOUT_INSERT_ORDER = """
     INSERT INTO tbl_order (
-        totalAmount, orderStatus, paymentStatus,
+        totalAmount, orderStatus, paymentDate, paymentStatus,
         pickupMethod, shippedDate, shippedStatus, customerID, staffID
     ) VALUES (%s,'Pending',%s,%s,%s,%s,%s,%s,%s)
 """
@@ -90,6 +159,15 @@ CHECKOUT_INSERT_PAYMENT = """
 """
 
 # ===== PAYMENTS =====
+# Các cột được phép dùng trong fields/sort/filter của GET /payments
+LIST_COLUMNS_PAYMENTS = {
+    "paymentID": "int",
+    "orderID": "int",
+    "transactionAmount": "float",
+    "paymentMethod": "str",
+    "transactionDate": "datetime",
+    "transactionStatus": "str",
+}
 SELECT_PAYMENTS = "SELECT * FROM tbl_payment"
 INSERT_PAYMENT = """
     INSERT INTO tbl_payment (orderID, transactionAmount, paymentMethod, transactionDate, transactionStatus)
@@ -129,9 +207,27 @@ UPDATE_VENDOR = "UPDATE tbl_vendor SET vendorName=%s, contactName=%s, phone=%s,
 DELETE_VENDOR = "DELETE FROM tbl_vendor WHERE vendorID = %s"
 
 # ===== INVENTORY =====
+# Tồn kho thực của inventory bật shard (hot_stock.py) = dòng chính + tổng các shard
+SHARD_TOTALS_JOIN = """
+    LEFT JOIN (
+        SELECT inventoryID, SUM(quantity) as shardQuantity
+        FROM tbl_inventory_shard
+        GROUP BY inventoryID
+    ) sh ON i.inventoryID = sh.inventoryID
+"""
+SHARD_STOCK_QUANTITY = "(i.stockQuantity + COALESCE(sh.shardQuantity, 0))"
+# Giá trị theo lớp giá vốn (tbl_inventory_valuation v), inventory chưa có định giá dùng tồn kho thực * unitCost
+INVENTORY_VALUE = "COALESCE(v.totalValue, " + SHARD_STOCK_QUANTITY + " * i.unitCost)"
+# Mức cảnh báo của một inventory, cùng quy tắc với alerts.classify (tham số: LOW_STOCK_RATIO); NULL = đủ hàng
+STOCK_ALERT_LEVEL = """CASE
+            WHEN """ + SHARD_STOCK_QUANTITY + """ <= 0 THEN 'Out of Stock'
+            WHEN i.maxStockLevel > 0 AND """ + SHARD_STOCK_QUANTITY + """ < i.maxStockLevel * %s THEN 'Low Stock'
+        END"""
 SELECT_INVENTORIES = """
     SELECT 
-        i.*,
+        i.inventoryID, i.warehouse, i.maxStockLevel,
+        (i.stockQuantity + COALESCE(sh.shardQuantity, 0)) as stockQuantity,
+        i.unitCost, i.lastedUpdate, i.inventoryNote, i.inventoryStatus,
         s.productID,
         p.productName,
         p.productLine,
@@ -143,6 +239,7 @@ SELECT_INVENTORIES = """
         WHERE productID IS NOT NULL
     ) s ON i.inventoryID = s.inventoryID
     LEFT JOIN tbl_product p ON s.productID = p.productID
+    """ + SHARD_TOTALS_JOIN + """
     ORDER BY i.inventoryID
 """
 INSERT_INVENTORY = """
@@ -210,6 +307,20 @@ SELECT_STORES_BY_INVENTORY = """
     WHERE s.inventoryID = %s
     ORDER BY s.storeDate DESC
 """
+# Lịch sử kho có thể đọc cả bảng archive: {table} là tbl_stores hoặc tbl_stores_archive
+SELECT_STORE_HISTORY = """
+    SELECT 
+        s.*,
+        p.productName,
+        p.productLine,
+        p.productBrand,
+        i.warehouse,
+        i.stockQuantity as inventoryStock
+    FROM {table} s
+    LEFT JOIN tbl_product p ON s.productID = p.productID
+    LEFT JOIN tbl_inventory i ON s.inventoryID = i.inventoryID
+    {where_clause}
+"""
 SELECT_PRODUCT_FOR_STORE = "SELECT productID FROM tbl_product WHERE productID = %s"
 SELECT_INVENTORY_FOR_STORE = "SELECT inventoryID FROM tbl_inventory WHERE inventoryID = %s"
 INSERT_STORE = """
@@ -235,6 +346,88 @@ UPDATE_STORE = """
     WHERE inventoryID =%s
 """
 DELETE_STORE = "DELETE FROM tbl_stores WHERE productID = %s"
+DELETE_STORE_ARCHIVE = "DELETE FROM tbl_stores_archive WHERE productID = %s"
+
+# ===== STORES ARCHIVE =====
+SELECT_OLDEST_STORE_DATE = "SELECT MIN(storeDate) as oldest FROM tbl_stores WHERE storeDate < %s"
+# Dòng mới nhất của mỗi cặp (inventoryID, productID) luôn được giữ lại trong tbl_stores
+ARCHIVE_COPY_STORES = """
+    INSERT INTO tbl_stores_archive
+    SELECT s.*
+    FROM tbl_stores s
+    INNER JOIN (
+        SELECT inventoryID, productID, MAX(storeDate) as latestDate
+        FROM tbl_stores
+        GROUP BY inventoryID, productID
+    ) l ON s.inventoryID <=> l.inventoryID AND s.productID <=> l.productID
+    WHERE s.storeDate >= %s AND s.storeDate < %s AND s.storeDate < l.latestDate
+"""
+ARCHIVE_DELETE_STORES = """
+    DELETE s
+    FROM tbl_stores s
+    INNER JOIN (
+        SELECT inventoryID, productID, MAX(storeDate) as latestDate
+        FROM tbl_stores
+        GROUP BY inventoryID, productID
+    ) l ON s.inventoryID <=> l.inventoryID AND s.productID <=> l.productID
+    WHERE s.storeDate >= %s AND s.storeDate < %s AND s.storeDate < l.latestDate
+"""
+
+# ===== STOCK SNAPSHOTS =====
+# Biến động của cả bảng chính và archive trong khoảng [start, end), productID NULL quy về 0
+SELECT_MOVEMENTS_BETWEEN = """
+    SELECT inventoryID, COALESCE(productID, 0) as productID, storeDate, quantityStore, roleStore
+    FROM tbl_stores WHERE storeDate >= %s AND storeDate < %s
+    UNION ALL
+    SELECT inventoryID, COALESCE(productID, 0) as productID, storeDate, quantityStore, roleStore
+    FROM tbl_stores_archive WHERE storeDate >= %s AND storeDate < %s
+    ORDER BY storeDate
+"""
+SELECT_MOVEMENTS_BETWEEN_FOR_INVENTORY = """
+    SELECT inventoryID, COALESCE(productID, 0) as productID, storeDate, quantityStore, roleStore
+    FROM tbl_stores WHERE storeDate >= %s AND storeDate < %s AND inventoryID = %s
+    UNION ALL
+    SELECT inventoryID, COALESCE(productID, 0) as productID, storeDate, quantityStore, roleStore
+    FROM tbl_stores_archive WHERE storeDate >= %s AND storeDate < %s AND inventoryID = %s
+    ORDER BY storeDate
+"""
+SELECT_FIRST_MOVEMENT_DATE = """
+    SELECT MIN(firstDate) as firstDate FROM (
+        SELECT MIN(storeDate) as firstDate FROM tbl_stores
+        UNION ALL
+        SELECT MIN(storeDate) as firstDate FROM tbl_stores_archive
+    ) t
+"""
+SELECT_LAST_SNAPSHOT_RUN = "SELECT MAX(snapshotDate) as lastDate FROM tbl_stock_snapshot_run"
+DELETE_SNAPSHOTS_FROM = "DELETE FROM tbl_stock_snapshot WHERE snapshotDate >= %s"
+DELETE_SNAPSHOT_RUNS_FROM = "DELETE FROM tbl_stock_snapshot_run WHERE snapshotDate >= %s"
+INSERT_SNAPSHOT_RUN = "INSERT IGNORE INTO tbl_stock_snapshot_run (snapshotDate, createdAt) VALUES (%s, NOW())"
+UPSERT_STOCK_SNAPSHOT = """
+    INSERT INTO tbl_stock_snapshot (inventoryID, productID, snapshotDate, quantity)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE quantity = VALUES(quantity)
+"""
+# Ảnh chụp gần nhất <= ngày cho trước của mỗi cặp (inventoryID, productID)
+SELECT_LATEST_SNAPSHOTS = """
+    SELECT s.inventoryID, s.productID, s.quantity
+    FROM tbl_stock_snapshot s
+    INNER JOIN (
+        SELECT inventoryID, productID, MAX(snapshotDate) as latestDate
+        FROM tbl_stock_snapshot
+        WHERE snapshotDate <= %s
+        GROUP BY inventoryID, productID
+    ) l ON s.inventoryID = l.inventoryID AND s.productID = l.productID AND s.snapshotDate = l.latestDate
+"""
+SELECT_LATEST_SNAPSHOTS_FOR_INVENTORY = """
+    SELECT s.inventoryID, s.productID, s.quantity
+    FROM tbl_stock_snapshot s
+    INNER JOIN (
+        SELECT inventoryID, productID, MAX(snapshotDate) as latestDate
+        FROM tbl_stock_snapshot
+        WHERE snapshotDate <= %s AND inventoryID = %s
+        GROUP BY inventoryID, productID
+    ) l ON s.inventoryID = l.inventoryID AND s.productID = l.productID AND s.snapshotDate = l.latestDate
+"""
 
 # ===== SUPPLIES =====
 SELECT_SUPPLIES = """
@@ -342,7 +535,10 @@ INSERT_INVENTORY_FOR_IMPORT = """
     INSERT INTO tbl_inventory (inventoryID, warehouse, stockQuantity, unitCost, lastedUpdate, inventoryStatus)
     VALUES (%s, 'Main Warehouse', %s, %s, NOW(), 'Active')
 """
-SELECT_STOCK_QUANTITY_FOR_EXPORT = "SELECT stockQuantity FROM tbl_inventory WHERE inventoryID = %s"
+SELECT_STOCK_QUANTITY_FOR_EXPORT = """
+    SELECT i.stockQuantity + COALESCE((SELECT SUM(sh.quantity) FROM tbl_inventory_shard sh WHERE sh.inventoryID = i.inventoryID), 0) as stockQuantity
+    FROM tbl_inventory i WHERE i.inventoryID = %s
+"""
 INSERT_STORE_FOR_EXPORT = """
     INSERT INTO tbl_stores (productID, inventoryID, storeDate, quantityStore, roleStore)
     VALUES (%s, %s, %s, %s, 'Export')
@@ -353,7 +549,7 @@ UPDATE_INVENTORY_FOR_EXPORT = """
         lastedUpdate = NOW()
     WHERE inventoryID = %s
 """
-SELECT_STOCK_QUANTITY_FOR_STOCKTAKING = "SELECT stockQuantity FROM tbl_inventory WHERE inventoryID = %s"
+SELECT_STOCK_QUANTITY_FOR_STOCKTAKING = SELECT_STOCK_QUANTITY_FOR_EXPORT
 UPDATE_INVENTORY_FOR_STOCKTAKING = """
     UPDATE tbl_inventory 
     SET stockQuantity = %s,
@@ -365,6 +561,189 @@ INSERT_STORE_FOR_STOCKTAKING = """
     VALUES (%s, %s, %s, %s, 'Stocktaking')
 """
 
+# ===== IDEMPOTENCY KEYS =====
+# Khóa đã hết hạn được giữ chỗ lại cho request mới (expiresAt phải gán cuối cùng)
+CLAIM_IDEMPOTENCY_KEY = """
+    INSERT INTO tbl_idempotency_key (keyHash, scope, requestHash, createdAt, expiresAt)
+    VALUES (%s, %s, %s, NOW(), %s)
+    ON DUPLICATE KEY UPDATE
+        requestHash = IF(expiresAt < NOW(), VALUES(requestHash), requestHash),
+        statusCode = IF(expiresAt < NOW(), NULL, statusCode),
+        responseBody = IF(expiresAt < NOW(), NULL, responseBody),
+        createdAt = IF(expiresAt < NOW(), NOW(), createdAt),
+        expiresAt = IF(expiresAt < NOW(), VALUES(expiresAt), expiresAt)
+"""
+SELECT_IDEMPOTENCY_KEY = "SELECT requestHash, statusCode, responseBody FROM tbl_idempotency_key WHERE keyHash = %s"
+COMPLETE_IDEMPOTENCY_KEY = "UPDATE tbl_idempotency_key SET statusCode = %s, responseBody = %s WHERE keyHash = %s"
+DELETE_IDEMPOTENCY_KEY = "DELETE FROM tbl_idempotency_key WHERE keyHash = %s AND statusCode IS NULL"
+DELETE_EXPIRED_IDEMPOTENCY_KEYS = "DELETE FROM tbl_idempotency_key WHERE expiresAt < NOW()"
+
+# ===== STOCK RESERVATIONS =====
+UPSERT_STOCK_RESERVATION = """
+    INSERT INTO tbl_stock_reservation (reservationID, customerID, items, expiresAt)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE items = VALUES(items), expiresAt = VALUES(expiresAt)
+"""
+SELECT_STOCK_RESERVATIONS = "SELECT reservationID, customerID, items, expiresAt FROM tbl_stock_reservation"
+DELETE_STOCK_RESERVATION = "DELETE FROM tbl_stock_reservation WHERE reservationID = %s"
+DELETE_STOCK_RESERVATIONS = "DELETE FROM tbl_stock_reservation WHERE reservationID IN ({placeholders})"
+DELETE_EXPIRED_STOCK_RESERVATIONS = "DELETE FROM tbl_stock_reservation WHERE expiresAt <= NOW()"
+# Tồn kho theo sản phẩm = tổng các inventory chứa sản phẩm (theo tbl_stores), kể cả shard
+SELECT_PRODUCT_ON_HAND = """
+    SELECT s.productID, SUM(i.stockQuantity + COALESCE(sh.shardQuantity, 0)) as onHand
+    FROM (
+        SELECT DISTINCT productID, inventoryID
+        FROM tbl_stores
+        WHERE productID IS NOT NULL
+    ) s
+    INNER JOIN tbl_inventory i ON s.inventoryID = i.inventoryID
+    """ + SHARD_TOTALS_JOIN + """
+    GROUP BY s.productID
+"""
+SELECT_PRODUCT_INVENTORY_IDS = "SELECT DISTINCT inventoryID FROM tbl_stores WHERE productID = %s"
+SELECT_INVENTORIES_FOR_CHECKOUT = """
+    SELECT i.inventoryID,
+        i.stockQuantity + COALESCE((SELECT SUM(sh.quantity) FROM tbl_inventory_shard sh WHERE sh.inventoryID = i.inventoryID), 0) as stockQuantity
+    FROM tbl_inventory i
+    WHERE i.inventoryID IN ({placeholders})
+    ORDER BY stockQuantity DESC, i.inventoryID
+    FOR UPDATE
+"""
+
+# ===== HOT STOCK SHARDS =====
+COUNT_INVENTORY_SHARDS = "SELECT COUNT(*) as count FROM tbl_inventory_shard WHERE inventoryID = %s"
+INCREMENT_INVENTORY_SHARD = """
+    UPDATE tbl_inventory_shard SET quantity = quantity + %s
+    WHERE inventoryID = %s AND shardNo = %s
+"""
+# pendingIssue: số lượng đã xuất nhưng chưa ghi vào định giá (stock_movements.settle_pending)
+DECREMENT_INVENTORY_SHARD = """
+    UPDATE tbl_inventory_shard SET quantity = quantity - %s, pendingIssue = pendingIssue + %s
+    WHERE inventoryID = %s AND shardNo = %s AND quantity >= %s
+"""
+SELECT_INVENTORY_SHARDS_FOR_UPDATE = """
+    SELECT shardNo, quantity, pendingIssue FROM tbl_inventory_shard
+    WHERE inventoryID = %s
+    ORDER BY shardNo
+    FOR UPDATE
+"""
+SELECT_INVENTORY_MAIN_FOR_UPDATE = "SELECT stockQuantity FROM tbl_inventory WHERE inventoryID = %s FOR UPDATE"
+SET_INVENTORY_SHARD = "UPDATE tbl_inventory_shard SET quantity = %s WHERE inventoryID = %s AND shardNo = %s"
+ADD_INVENTORY_SHARD_PENDING_ISSUE = """
+    UPDATE tbl_inventory_shard SET pendingIssue = pendingIssue + %s
+    WHERE inventoryID = %s AND shardNo = %s
+"""
+CLEAR_INVENTORY_SHARD_PENDING_ISSUE = "UPDATE tbl_inventory_shard SET pendingIssue = 0 WHERE inventoryID = %s"
+SELECT_INVENTORIES_WITH_PENDING_ISSUE = """
+    SELECT DISTINCT inventoryID FROM tbl_inventory_shard WHERE pendingIssue > 0 ORDER BY inventoryID
+"""
+SET_INVENTORY_MAIN_QUANTITY = "UPDATE tbl_inventory SET stockQuantity = %s, lastedUpdate = NOW() WHERE inventoryID = %s"
+INSERT_INVENTORY_SHARD = "INSERT INTO tbl_inventory_shard (inventoryID, shardNo, quantity) VALUES (%s, %s, %s)"
+DELETE_INVENTORY_SHARDS = "DELETE FROM tbl_inventory_shard WHERE inventoryID = %s"
+SELECT_HOT_INVENTORIES = """
+    SELECT i.inventoryID, i.warehouse, i.stockQuantity as mainQuantity,
+        COUNT(sh.shardNo) as shards, SUM(sh.quantity) as shardQuantity,
+        i.stockQuantity + SUM(sh.quantity) as stockQuantity, SUM(sh.pendingIssue) as pendingIssue
+    FROM tbl_inventory_shard sh
+    INNER JOIN tbl_inventory i ON i.inventoryID = sh.inventoryID
+    GROUP BY i.inventoryID, i.warehouse, i.stockQuantity
+    ORDER BY i.inventoryID
+"""
+
+# ===== INVENTORY VALUATION =====
+SELECT_INVENTORY_VALUATION_FOR_UPDATE = "SELECT quantity, totalValue FROM tbl_inventory_valuation WHERE inventoryID = %s FOR UPDATE"
+SELECT_INVENTORY_FOR_VALUATION = """
+    SELECT i.stockQuantity + COALESCE((SELECT SUM(sh.quantity) FROM tbl_inventory_shard sh WHERE sh.inventoryID = i.inventoryID), 0) as stockQuantity,
+        i.unitCost
+    FROM tbl_inventory i WHERE i.inventoryID = %s
+"""
+UPSERT_INVENTORY_VALUATION = """
+    INSERT INTO tbl_inventory_valuation (inventoryID, quantity, totalValue, updatedAt)
+    VALUES (%s, %s, %s, NOW())
+    ON DUPLICATE KEY UPDATE quantity = VALUES(quantity), totalValue = VALUES(totalValue), updatedAt = NOW()
+"""
+SELECT_INVENTORY_VALUATION = """
+    SELECT inventoryID, quantity, totalValue,
+        CASE WHEN quantity > 0 THEN totalValue / quantity ELSE 0 END as averageCost,
+        updatedAt
+    FROM tbl_inventory_valuation
+    WHERE inventoryID = %s
+"""
+DELETE_INVENTORY_VALUATION = "DELETE FROM tbl_inventory_valuation WHERE inventoryID = %s"
+INSERT_COST_LAYER = """
+    INSERT INTO tbl_cost_layer (inventoryID, receivedAt, quantityRemaining, unitCost)
+    VALUES (%s, NOW(), %s, %s)
+"""
+SELECT_OPEN_COST_LAYERS = """
+    SELECT layerID, quantityRemaining, unitCost
+    FROM tbl_cost_layer
+    WHERE inventoryID = %s
+    ORDER BY layerID
+    FOR UPDATE
+"""
+UPDATE_COST_LAYER = "UPDATE tbl_cost_layer SET quantityRemaining = %s WHERE layerID = %s"
+DELETE_COST_LAYER = "DELETE FROM tbl_cost_layer WHERE layerID = %s"
+DELETE_COST_LAYERS = "DELETE FROM tbl_cost_layer WHERE inventoryID = %s"
+SELECT_COST_LAYERS = """
+    SELECT layerID, receivedAt, quantityRemaining, unitCost
+    FROM tbl_cost_layer
+    WHERE inventoryID = %s
+    ORDER BY layerID
+"""
+
+# ===== STOCK ALERTS =====
+SELECT_INVENTORY_FOR_ALERT = """
+    SELECT i.stockQuantity + COALESCE((SELECT SUM(sh.quantity) FROM tbl_inventory_shard sh WHERE sh.inventoryID = i.inventoryID), 0) as stockQuantity,
+        i.maxStockLevel
+    FROM tbl_inventory i WHERE i.inventoryID = %s
+"""
+SELECT_STOCK_ALERT_BY_ID = "SELECT alertLevel, stockQuantity FROM tbl_stock_alert WHERE inventoryID = %s"
+UPSERT_STOCK_ALERT = """
+    INSERT INTO tbl_stock_alert (inventoryID, alertLevel, stockQuantity, maxStockLevel, updatedAt)
+    VALUES (%s, %s, %s, %s, NOW())
+    ON DUPLICATE KEY UPDATE
+        alertLevel = VALUES(alertLevel),
+        stockQuantity = VALUES(stockQuantity),
+        maxStockLevel = VALUES(maxStockLevel),
+        updatedAt = NOW()
+"""
+DELETE_STOCK_ALERT = "DELETE FROM tbl_stock_alert WHERE inventoryID = %s"
+CLEAR_STOCK_ALERTS = "DELETE FROM tbl_stock_alert"
+REBUILD_STOCK_ALERTS = """
+    INSERT INTO tbl_stock_alert (inventoryID, alertLevel, stockQuantity, maxStockLevel, updatedAt)
+    SELECT inventoryID, alertLevel, stockQuantity, maxStockLevel, NOW()
+    FROM (
+        SELECT
+            i.inventoryID,
+            """ + STOCK_ALERT_LEVEL + """ as alertLevel,
+            """ + SHARD_STOCK_QUANTITY + """ as stockQuantity,
+            i.maxStockLevel
+        FROM tbl_inventory i
+        """ + SHARD_TOTALS_JOIN + """
+    ) t
+    WHERE alertLevel IS NOT NULL
+"""
+SELECT_STOCK_ALERTS = """
+    SELECT a.*, i.warehouse
+    FROM tbl_stock_alert a
+    LEFT JOIN tbl_inventory i ON a.inventoryID = i.inventoryID
+    ORDER BY a.updatedAt DESC
+"""
+SELECT_STOCK_ALERTS_BY_LEVEL = """
+    SELECT a.*, i.warehouse
+    FROM tbl_stock_alert a
+    LEFT JOIN tbl_inventory i ON a.inventoryID = i.inventoryID
+    WHERE a.alertLevel = %s
+    ORDER BY a.updatedAt DESC
+"""
+
+# ===== INVENTORY JOURNAL =====
+SELECT_JOURNAL_STATE = "SELECT lastSeq FROM tbl_journal_state WHERE journalName = %s"
+UPSERT_JOURNAL_STATE = """
+    INSERT INTO tbl_journal_state (journalName, lastSeq) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE lastSeq = VALUES(lastSeq)
+"""
+
 # ===== REPORTS =====
 SELECT_REVENUE_REPORT = """
     SELECT 
@@ -400,15 +779,11 @@ SELECT_INVENTORY_REPORT = """
         i.warehouse,
         s.productID,
         p.productName,
-        i.stockQuantity,
+        (i.stockQuantity + COALESCE(sh.shardQuantity, 0)) as stockQuantity,
         i.maxStockLevel,
         i.unitCost,
-        (i.stockQuantity * i.unitCost) as totalValue,
-        CASE 
-            WHEN i.stockQuantity = 0 THEN 'Out of Stock'
-            WHEN i.maxStockLevel > 0 AND i.stockQuantity < i.maxStockLevel * 0.2 THEN 'Low Stock'
-            ELSE 'In Stock'
-        END as status
+        """ + INVENTORY_VALUE + """ as totalValue,
+        COALESCE(""" + STOCK_ALERT_LEVEL + """, 'In Stock') as status
     FROM tbl_inventory i
     LEFT JOIN (
         SELECT DISTINCT inventoryID, productID 
@@ -416,6 +791,8 @@ SELECT_INVENTORY_REPORT = """
         WHERE productID IS NOT NULL
     ) s ON i.inventoryID = s.inventoryID
     LEFT JOIN tbl_product p ON s.productID = p.productID
+    LEFT JOIN tbl_inventory_valuation v ON i.inventoryID = v.inventoryID
+    """ + SHARD_TOTALS_JOIN + """
     ORDER BY i.warehouse, p.productName
 """
 SUMMARY_TOTAL_CUSTOMERS = "SELECT COUNT(*) as count FROM tbl_customer"
@@ -432,7 +809,12 @@ SUMMARY_TOTAL_DEBTS = """
     ) p ON o.orderID = p.orderID
     WHERE o.paymentStatus != 'Paid'
 """
-SUMMARY_TOTAL_INVENTORY_VALUE = "SELECT SUM(stockQuantity * unitCost) as total FROM tbl_inventory"
+SUMMARY_TOTAL_INVENTORY_VALUE = """
+    SELECT SUM(""" + INVENTORY_VALUE + """) as total
+    FROM tbl_inventory i
+    LEFT JOIN tbl_inventory_valuation v ON i.inventoryID = v.inventoryID
+    """ + SHARD_TOTALS_JOIN + """
+"""
 
 # ===== AUTH =====
 SELECT_CUSTOMER_FOR_AUTH = "SELECT * FROM tbl_customer WHERE phone=%s OR email=%s"
@@ -450,3 +832,265 @@ INSERT_STAFF_FOR_AUTH = """
 """
 LOGIN_CUSTOMER = "SELECT * FROM tbl_customer WHERE email=%s OR phone=%s"
 LOGIN_STAFF = "SELECT * FROM tbl_staff WHERE email=%s OR phone=%s"
+
+# ===== SCHEMA =====
+# Các index/bảng phụ trợ được tạo khi khởi động server (xem db.init_schema).
+# Lỗi "đã tồn tại" được bỏ qua nên có thể chạy lại nhiều lần.
+SCHEMA_STATEMENTS = [
+    # Lọc/sắp xếp danh sách theo ngày và khoảng giá trị
+    "CREATE INDEX idx_order_date ON tbl_order (orderDate, orderID)",
+    # Danh sách đơn hàng lọc theo trạng thái/khách hàng + khoảng ngày, phân trang keyset
+    "CREATE INDEX idx_order_status_date ON tbl_order (orderStatus, orderDate, orderID)",
+    "CREATE INDEX idx_order_customer_date ON tbl_order (customerID, orderDate, orderID)",
+    "CREATE INDEX idx_requests_order ON tbl_requests (orderID, productID)",
+    # Tập nhỏ các mặt hàng dưới ngưỡng tồn kho (xem alerts.py)
+    """
+    CREATE TABLE IF NOT EXISTS tbl_stock_alert (
+        inventoryID INT NOT NULL PRIMARY KEY,
+        alertLevel VARCHAR(20) NOT NULL,
+        stockQuantity INT NOT NULL,
+        maxStockLevel INT NULL,
+        updatedAt DATETIME NOT NULL,
+        KEY idx_stock_alert_level (alertLevel, updatedAt)
+    )
+    """,
+    # Lịch sử kho: index theo ngày và theo cặp kho - sản phẩm, bảng archive cùng cấu trúc
+    "CREATE INDEX idx_stores_date ON tbl_stores (storeDate)",
+    "CREATE INDEX idx_stores_pair_date ON tbl_stores (inventoryID, productID, storeDate)",
+    "CREATE TABLE IF NOT EXISTS tbl_stores_archive LIKE tbl_stores",
+    "CREATE INDEX idx_stores_archive_date ON tbl_stores_archive (storeDate)",
+    "CREATE INDEX idx_stores_archive_pair_date ON tbl_stores_archive (inventoryID, productID, storeDate)",
+    # Seq cuối cùng của journal ghi trễ đã được áp dụng vào database (xem journal.py)
+    """
+    CREATE TABLE IF NOT EXISTS tbl_journal_state (
+        journalName VARCHAR(50) NOT NULL PRIMARY KEY,
+        lastSeq BIGINT NOT NULL
+    )
+    """,
+    # Tồn kho cuối ngày của từng cặp kho - sản phẩm và các ngày đã chụp (xem stock_snapshots.py)
+    """
+    CREATE TABLE IF NOT EXISTS tbl_stock_snapshot (
+        inventoryID INT NOT NULL,
+        productID INT NOT NULL,
+        snapshotDate DATE NOT NULL,
+        quantity INT NOT NULL,
+        PRIMARY KEY (inventoryID, productID, snapshotDate),
+        KEY idx_stock_snapshot_date (snapshotDate)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tbl_stock_snapshot_run (
+        snapshotDate DATE NOT NULL PRIMARY KEY,
+        createdAt DATETIME NOT NULL
+    )
+    """,
+    # Định giá tồn kho: các lớp giá vốn còn hàng và giá trị hiện tại của mỗi inventory (xem valuation.py)
+    """
+    CREATE TABLE IF NOT EXISTS tbl_cost_layer (
+        layerID BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        inventoryID INT NOT NULL,
+        receivedAt DATETIME NOT NULL,
+        quantityRemaining INT NOT NULL,
+        unitCost DECIMAL(15,4) NOT NULL,
+        KEY idx_cost_layer_inventory (inventoryID, layerID)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tbl_inventory_valuation (
+        inventoryID INT NOT NULL PRIMARY KEY,
+        quantity INT NOT NULL,
+        totalValue DECIMAL(18,4) NOT NULL,
+        updatedAt DATETIME NOT NULL
+    )
+    """,
+    # Khóa Idempotency-Key và response đã lưu (xem idempotency.py)
+    """
+    CREATE TABLE IF NOT EXISTS tbl_idempotency_key (
+        keyHash CHAR(64) NOT NULL PRIMARY KEY,
+        scope VARCHAR(50) NOT NULL,
+        requestHash CHAR(64) NOT NULL,
+        statusCode SMALLINT NULL,
+        responseBody MEDIUMBLOB NULL,
+        createdAt DATETIME NOT NULL,
+        expiresAt DATETIME NOT NULL,
+        INDEX idx_idempotency_expires (expiresAt)
+    )
+    """,
+    # Giữ hàng cho giỏ hàng, để khôi phục bảng trong bộ nhớ khi khởi động lại (xem reservations.py)
+    """
+    CREATE TABLE IF NOT EXISTS tbl_stock_reservation (
+        reservationID CHAR(32) NOT NULL PRIMARY KEY,
+        customerID INT NULL,
+        items TEXT NOT NULL,
+        expiresAt DATETIME NOT NULL,
+        INDEX idx_stock_reservation_expires (expiresAt)
+    )
+    """,
+    # Bộ đếm tồn kho chia shard cho inventory bán chạy (xem hot_stock.py)
+    """
+    CREATE TABLE IF NOT EXISTS tbl_inventory_shard (
+        inventoryID INT NOT NULL,
+        shardNo INT NOT NULL,
+        quantity INT NOT NULL,
+        pendingIssue INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (inventoryID, shardNo)
+    )
+    """,
+    "ALTER TABLE tbl_inventory_shard ADD COLUMN pendingIssue INT NOT NULL DEFAULT 0",
+    "CREATE INDEX idx_payment_date ON tbl_payment (transactionDate, paymentID)",
+    "CREATE INDEX idx_payment_order ON tbl_payment (orderID)",
+    "CREATE INDEX idx_product_line_price ON tbl_product (productLine, priceEach)",
+]
+
+# ===== BASE TABLES =====
+# Các bảng gốc: database MySQL đã có sẵn (tạo ngoài ứng dụng), chỉ chạy khi tạo database SQLite mới
+# (DB_BACKEND = "sqlite", xem sqlite_backend.py). Chạy trước SCHEMA_STATEMENTS.
+BASE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS tbl_customer (
+        customerID INT AUTO_INCREMENT PRIMARY KEY,
+        customerName VARCHAR(100) NOT NULL,
+        phone VARCHAR(20) NOT NULL,
+        email VARCHAR(100) NULL,
+        address VARCHAR(255) NULL,
+        postalCode VARCHAR(20) NULL,
+        customerType VARCHAR(50) NULL DEFAULT 'Individual',
+        loyalPoint INT NULL DEFAULT 0,
+        loyalLevel VARCHAR(50) NULL DEFAULT 'New',
+        passwordHash VARCHAR(255) NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tbl_staff (
+        staffID INT AUTO_INCREMENT PRIMARY KEY,
+        staffName VARCHAR(100) NOT NULL,
+        position VARCHAR(50) NULL,
+        phone VARCHAR(20) NOT NULL,
+        email VARCHAR(100) NULL,
+        address VARCHAR(255) NULL,
+        managerID INT NULL,
+        salary DECIMAL(12,2) NULL,
+        passwordHash VARCHAR(255) NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tbl_vendor (
+        vendorID INT AUTO_INCREMENT PRIMARY KEY,
+        vendorName VARCHAR(100) NOT NULL,
+        contactName VARCHAR(100) NULL,
+        phone VARCHAR(20) NOT NULL,
+        email VARCHAR(100) NULL,
+        address VARCHAR(255) NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tbl_product (
+        productID INT AUTO_INCREMENT PRIMARY KEY,
+        productName VARCHAR(255) NOT NULL,
+        priceEach DECIMAL(10,2) NOT NULL,
+        productLine VARCHAR(100) NULL,
+        productScale VARCHAR(50) NULL,
+        productBrand VARCHAR(100) NULL,
+        productDiscription TEXT NULL,
+        warrantyPeriod INT NULL,
+        MSRP DECIMAL(10,2) NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tbl_order (
+        orderID INT AUTO_INCREMENT PRIMARY KEY,
+        orderDate DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        totalAmount DECIMAL(12,2) NULL DEFAULT 0,
+        orderStatus VARCHAR(50) NULL,
+        paymentDate DATETIME NULL,
+        paymentStatus VARCHAR(50) NULL,
+        pickupMethod VARCHAR(50) NULL,
+        shippedDate DATETIME NULL,
+        shippedStatus VARCHAR(50) NULL,
+        customerID INT NULL,
+        staffID INT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tbl_requests (
+        orderID INT NOT NULL,
+        productID INT NOT NULL,
+        quantityOrdered INT NOT NULL,
+        discount DECIMAL(5,2) NULL DEFAULT 0,
+        note VARCHAR(255) NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tbl_payment (
+        paymentID INT AUTO_INCREMENT PRIMARY KEY,
+        orderID INT NOT NULL,
+        transactionAmount DECIMAL(12,2) NOT NULL,
+        paymentMethod VARCHAR(50) NULL,
+        transactionDate DATETIME NULL,
+        transactionStatus VARCHAR(50) NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tbl_inventory (
+        inventoryID INT NOT NULL PRIMARY KEY,
+        warehouse VARCHAR(100) NULL,
+        maxStockLevel INT NULL DEFAULT 0,
+        stockQuantity INT NOT NULL DEFAULT 0,
+        unitCost DECIMAL(15,4) NULL DEFAULT 0,
+        lastedUpdate DATETIME NULL,
+        inventoryNote VARCHAR(255) NULL,
+        inventoryStatus VARCHAR(50) NULL DEFAULT 'Active'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tbl_stores (
+        productID INT NULL,
+        inventoryID INT NULL,
+        storeDate DATETIME NULL,
+        quantityStore INT NULL,
+        roleStore VARCHAR(50) NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tbl_supplies (
+        productID INT NOT NULL,
+        vendorID INT NOT NULL,
+        supplyDate DATETIME NULL,
+        quantitySupplier INT NULL,
+        handledBy VARCHAR(100) NULL
+    )
+    """,
+]
+
+# ===== SQLITE OVERRIDES =====
+# Bản SQLite viết tay cho các câu không dịch máy móc được (sqlite_backend.translate dùng thay cho bản MySQL)
+SQLITE_OVERRIDES = {
+    # Chỉ cập nhật khi khóa cũ đã hết hạn để rowcount = 0 khi khóa còn hiệu lực (MySQL: IF() giữ nguyên giá trị)
+    CLAIM_IDEMPOTENCY_KEY: """
+        INSERT INTO tbl_idempotency_key (keyHash, scope, requestHash, createdAt, expiresAt)
+        VALUES (?, ?, ?, datetime('now', 'localtime'), ?)
+        ON CONFLICT (keyHash) DO UPDATE SET
+            requestHash = excluded.requestHash, statusCode = NULL, responseBody = NULL,
+            createdAt = excluded.createdAt, expiresAt = excluded.expiresAt
+        WHERE tbl_idempotency_key.expiresAt < datetime('now', 'localtime')
+    """,
+    # MIN()/MAX() mất kiểu cột khai báo: tên cột dạng "oldest [DATETIME]" để SQLite chuyển lại đúng kiểu
+    SELECT_OLDEST_STORE_DATE: 'SELECT MIN(storeDate) as "oldest [DATETIME]" FROM tbl_stores WHERE storeDate < ?',
+    SELECT_FIRST_MOVEMENT_DATE: """
+        SELECT MIN(firstDate) as "firstDate [DATETIME]" FROM (
+            SELECT MIN(storeDate) as firstDate FROM tbl_stores
+            UNION ALL
+            SELECT MIN(storeDate) as firstDate FROM tbl_stores_archive
+        ) t
+    """,
+    SELECT_LAST_SNAPSHOT_RUN: 'SELECT MAX(snapshotDate) as "lastDate [DATE]" FROM tbl_stock_snapshot_run',
+    # SQLite không có DELETE nhiều bảng (DELETE s FROM ... JOIN)
+    ARCHIVE_DELETE_STORES: """
+        DELETE FROM tbl_stores
+        WHERE storeDate >= ? AND storeDate < ?
+            AND storeDate < (
+                SELECT MAX(l.storeDate) FROM tbl_stores l
+                WHERE l.inventoryID IS tbl_stores.inventoryID AND l.productID IS tbl_stores.productID
+            )
+    """,
+}
@@ -0,0 +1,131 @@
+"""
+Tính trước các báo cáo chuẩn và lưu kết quả theo tham số.
+
+Trang báo cáo của manager luôn gọi cùng một số biến thể (hôm nay, 7 ngày, 30 ngày, từ đầu tháng/quý/năm,
+toàn bộ). Các biến thể này được tính lại theo chu kỳ REPORTS_PRECOMPUTE_INTERVAL_MINUTES, sau các
+thao tác ghi hàng loạt (request_refresh) và sau mỗi thay đổi đơn hàng, thanh toán, tồn kho của database
+mặc định (sự kiện trên event_bus, gom trong REFRESH_DEBOUNCE_SECONDS). Route /reports/* trả kết quả
+đã tính nếu tham số khớp chính xác một biến thể, ngược lại tính trực tiếp như trước.
+
+Khoảng ngày được tính giống ReportsPage.jsx (start_date/end_date dạng YYYY-MM-DD) để tham số khớp.
+"""
+import datetime
+import logging
+import threading
+
+from .config import REPORTS_PRECOMPUTE_INTERVAL_MINUTES
+from .event_bus import bus, TOPIC_INVENTORY, TOPIC_ORDERS, TOPIC_PAYMENTS, TOPIC_STORES
+
+WINDOWS = ("today", "7d", "30d", "mtd", "qtd", "ytd", "all")
+REFRESH_DEBOUNCE_SECONDS = 5  # Gom nhiều yêu cầu tính lại liên tiếp (vd. nhiều lô nhập) thành một lần
+# Checkout, thanh toán, nhập/xuất/kiểm kê làm thay đổi doanh thu, top sản phẩm và tồn kho
+STALE_TOPICS = (TOPIC_ORDERS, TOPIC_PAYMENTS, TOPIC_INVENTORY, TOPIC_STORES)
+
+
+def window_range(window: str, today: datetime.date = None):
+    """(start_date, end_date) dạng chuỗi của một cửa sổ thời gian, (None, None) cho "all" """
+    today = today or datetime.date.today()
+    if window == "all":
+        return None, None
+    if window == "today":
+        start = today
+    elif window == "7d":
+        start = today - datetime.timedelta(days=7)
+    elif window == "30d":
+        start = today - datetime.timedelta(days=30)
+    elif window == "mtd":
+        start = today.replace(day=1)
+    elif window == "qtd":
+        start = today.replace(month=(today.month - 1) // 3 * 3 + 1, day=1)
+    elif window == "ytd":
+        start = today.replace(month=1, day=1)
+    else:
+        raise ValueError(f"Unknown window: {window}")
+    return start.isoformat(), today.isoformat()
+
+
+def _key(report: str, params: dict):
+    return report, tuple(sorted((k, str(v)) for k, v in params.items() if v is not None))
+
+
+class ReportStore:
+    def __init__(self, interval_minutes: float = REPORTS_PRECOMPUTE_INTERVAL_MINUTES):
+        self.interval = interval_minutes * 60
+        self._reports = {}
+        self._results = {}
+        self._lock = threading.Lock()
+        self._refresh = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_refresh = None
+
+    def register(self, report: str, fn, windowed: bool = False, **fixed_params):
+        """fn(**params); báo cáo windowed nhận start_date/end_date cho từng cửa sổ trong WINDOWS"""
+        self._reports[report] = (fn, windowed, fixed_params)
+
+    def variants(self, today: datetime.date = None):
+        for report, (fn, windowed, fixed_params) in self._reports.items():
+            if not windowed:
+                yield report, fn, dict(fixed_params)
+                continue
+            for window in WINDOWS:
+                start_date, end_date = window_range(window, today)
+                yield report, fn, {**fixed_params, "start_date": start_date, "end_date": end_date}
+
+    def get(self, report: str, params: dict = None):
+        """(kết quả, thời điểm tính) nếu có biến thể khớp tham số, ngược lại None"""
+        with self._lock:
+            return self._results.get(_key(report, params or {}))
+
+    def refresh_all(self) -> int:
+        results = {}
+        for report, fn, params in self.variants():
+            try:
+                results[_key(report, params)] = (fn(**params), datetime.datetime.now())
+            except Exception as e:
+                logging.error(f"Error precomputing report {report} {params}: {e}")
+        with self._lock:
+            # Thay toàn bộ: biến thể của ngày hôm trước không còn được phục vụ
+            self._results = results
+        self.last_refresh = datetime.datetime.now()
+        return len(results)
+
+    def request_refresh(self):
+        """Yêu cầu tính lại sớm (sau thao tác ghi hàng loạt)"""
+        self._refresh.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = len(self._results)
+        return {"variants": count, "lastRefresh": self.last_refresh, "intervalMinutes": self.interval / 60}
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.refresh_all()
+            self._refresh.wait(self.interval)
+            if self._refresh.is_set():
+                self._stop.wait(REFRESH_DEBOUNCE_SECONDS)
+                self._refresh.clear()
+
+    def start(self):
+        if self.interval and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="report-precompute", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._refresh.set()
+        self._thread = None
+
+
+report_store = ReportStore()
+
+
+def _on_change(event: dict):
+    # Chỉ database mặc định được tính trước
+    if event["tenant"] is None:
+        report_store.request_refresh()
+
+
+bus.listen(STALE_TOPICS, _on_change)
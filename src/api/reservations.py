@@ -0,0 +1,419 @@
+"""
+Giữ hàng (reservation) cho giỏ hàng để checkout không bán vượt tồn kho.
+
+- Mỗi giỏ hàng giữ một reservation gồm các dòng (productID, quantity), hết hạn sau
+  RESERVATION_HOLD_SECONDS nếu không được gia hạn (PUT) hay chuyển thành đơn hàng.
+- Bảng giữ hàng nằm trong bộ nhớ; mỗi thay đổi được ghi vào tbl_stock_reservation để khôi phục
+  khi khởi động lại.
+- Hạn giữ được theo dõi bằng timer wheel (TimerWheel): mỗi tick chỉ xét một ô, gia hạn không
+  cần xóa mục cũ (mục hết hạn được kiểm tra lại khi tới lượt).
+- Số lượng có thể bán = tồn kho theo sản phẩm (cache, tổng các inventory của sản phẩm trong
+  tbl_stores) - số đang giữ, đọc hoàn toàn từ bộ nhớ. Cache được cộng/trừ theo các biến động
+  import/export/kiểm kê (apply_delta) và nạp lại từ database mỗi RESERVATION_STOCK_REFRESH_SECONDS.
+- Checkout kèm reservationID trừ tồn kho thật cho mọi dòng trong cùng transaction tạo đơn
+  (commit_reservation), rồi bỏ phần giữ.
+
+Bảng nằm trong bộ nhớ của một tiến trình nên chỉ dùng với một worker uvicorn (giống journal.py).
+"""
+import datetime
+import logging
+import math
+import threading
+import time
+import uuid
+
+import orjson
+
+from .config import RESERVATION_HOLD_SECONDS, RESERVATION_STOCK_REFRESH_SECONDS
+from .db import get_connection, safe_close_connection, current_tenant, use_tenant
+from . import queries, stock_movements
+
+WHEEL_SLOTS = 512
+WHEEL_TICK_SECONDS = 1.0
+
+STATUS_ACTIVE = "active"
+STATUS_CONVERTING = "converting"  # Đang được checkout; không hết hạn, không sửa được
+
+
+class ReservationNotFound(Exception):
+    pass
+
+
+class ReservationConflict(Exception):
+    """Không đủ hàng để giữ, hoặc reservation không khớp đơn hàng"""
+
+
+class TimerWheel:
+    """Timer wheel băm: WHEEL_SLOTS ô, mỗi ô một tick; hạn xa hơn một vòng được đếm theo số vòng"""
+
+    def __init__(self, slots: int = WHEEL_SLOTS, tick: float = WHEEL_TICK_SECONDS):
+        self.slots = [[] for _ in range(slots)]
+        self.tick = tick
+        self.cursor = 0
+        self.last_tick = time.monotonic()
+
+    def schedule(self, key, delay_seconds: float):
+        ticks = max(1, math.ceil(delay_seconds / self.tick))
+        rounds, offset = divmod(ticks, len(self.slots))
+        self.slots[(self.cursor + offset) % len(self.slots)].append([key, rounds])
+
+    def advance(self, now: float = None) -> list:
+        """Quay tới thời điểm hiện tại; trả về các key tới hạn"""
+        now = time.monotonic() if now is None else now
+        due = []
+        while now - self.last_tick >= self.tick:
+            self.last_tick += self.tick
+            self.cursor = (self.cursor + 1) % len(self.slots)
+            slot = self.slots[self.cursor]
+            remaining = []
+            for entry in slot:
+                if entry[1] == 0:
+                    due.append(entry[0])
+                else:
+                    entry[1] -= 1
+                    remaining.append(entry)
+            self.slots[self.cursor] = remaining
+        return due
+
+
+class ReservationTable:
+    def __init__(self, hold_seconds: float = RESERVATION_HOLD_SECONDS, refresh_seconds: float = RESERVATION_STOCK_REFRESH_SECONDS,
+                 tenant=None):
+        self.tenant = tenant  # Shard của cửa hàng (None = database mặc định), xem current()
+        self.hold_seconds = hold_seconds
+        self.refresh_seconds = refresh_seconds
+        self._reservations = {}  # reservationID -> {customerID, items: {productID: qty}, expiresAt, status}
+        self._held = {}  # productID -> tổng số lượng đang giữ
+        self._on_hand = {}  # productID -> tồn kho (cache)
+        self._lock = threading.Lock()
+        self._wheel = TimerWheel()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_stock_refresh = None
+        self.expired_count = 0
+
+    # ===== PERSISTENCE =====
+    def _write(self, query: str, params: tuple):
+        conn = None
+        try:
+            conn = get_connection()
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+            conn.commit()
+        finally:
+            safe_close_connection(conn)
+
+    def _persist(self, reservation_id: str, reservation: dict):
+        self._write(queries.UPSERT_STOCK_RESERVATION, (
+            reservation_id,
+            reservation["customerID"],
+            orjson.dumps({str(k): v for k, v in reservation["items"].items()}),
+            reservation["expiresAt"],
+        ))
+
+    def _load(self):
+        conn = None
+        try:
+            conn = get_connection()
+            with conn.cursor() as cursor:
+                cursor.execute(queries.DELETE_EXPIRED_STOCK_RESERVATIONS)
+                cursor.execute(queries.SELECT_STOCK_RESERVATIONS)
+                rows = cursor.fetchall()
+            conn.commit()
+        finally:
+            safe_close_connection(conn)
+        now = datetime.datetime.now()
+        with self._lock:
+            for row in rows:
+                items = {int(k): v for k, v in orjson.loads(row["items"]).items()}
+                self._add_locked(row["reservationID"], row["customerID"], items, row["expiresAt"])
+                self._wheel.schedule(row["reservationID"], (row["expiresAt"] - now).total_seconds())
+        return len(rows)
+
+    def refresh_stock(self):
+        """Nạp lại tồn kho theo sản phẩm từ database (một truy vấn cho mọi sản phẩm)"""
+        conn = None
+        try:
+            conn = get_connection()
+            with conn.cursor() as cursor:
+                cursor.execute(queries.SELECT_PRODUCT_ON_HAND)
+                rows = cursor.fetchall()
+        finally:
+            safe_close_connection(conn)
+        on_hand = {row["productID"]: int(row["onHand"] or 0) for row in rows}
+        with self._lock:
+            self._on_hand = on_hand
+        self.last_stock_refresh = datetime.datetime.now()
+
+    # ===== HOLDS =====
+    def _add_locked(self, reservation_id, customer_id, items: dict, expires_at):
+        self._reservations[reservation_id] = {
+            "customerID": customer_id, "items": items, "expiresAt": expires_at, "status": STATUS_ACTIVE,
+        }
+        for product_id, quantity in items.items():
+            self._held[product_id] = self._held.get(product_id, 0) + quantity
+
+    def _remove_locked(self, reservation_id):
+        reservation = self._reservations.pop(reservation_id, None)
+        if reservation is None:
+            return None
+        for product_id, quantity in reservation["items"].items():
+            left = self._held.get(product_id, 0) - quantity
+            if left > 0:
+                self._held[product_id] = left
+            else:
+                self._held.pop(product_id, None)
+        return reservation
+
+    def _check_available_locked(self, items: dict, released: dict = None):
+        released = released or {}
+        short = []
+        for product_id, quantity in items.items():
+            available = self._on_hand.get(product_id, 0) - self._held.get(product_id, 0) + released.get(product_id, 0)
+            if quantity > available:
+                short.append({"productID": product_id, "requested": quantity, "available": max(available, 0)})
+        if short:
+            raise ReservationConflict({"message": "Insufficient stock", "items": short})
+
+    @staticmethod
+    def _merge(items) -> dict:
+        merged = {}
+        for item in items:
+            merged[item["productID"]] = merged.get(item["productID"], 0) + item["quantity"]
+        return merged
+
+    def _view(self, reservation_id: str, reservation: dict) -> dict:
+        return {
+            "reservationID": reservation_id,
+            "customerID": reservation["customerID"],
+            "status": reservation["status"],
+            "expiresAt": reservation["expiresAt"],
+            "items": [{"productID": p, "quantity": q} for p, q in reservation["items"].items()],
+        }
+
+    def create(self, items: list, customer_id: int = None) -> dict:
+        """Giữ tất cả các dòng hoặc không dòng nào (ReservationConflict nếu thiếu hàng)"""
+        items = self._merge(items)
+        reservation_id = uuid.uuid4().hex
+        expires_at = datetime.datetime.now() + datetime.timedelta(seconds=self.hold_seconds)
+        with self._lock:
+            self._check_available_locked(items)
+            self._add_locked(reservation_id, customer_id, items, expires_at)
+            self._wheel.schedule(reservation_id, self.hold_seconds)
+            reservation = self._reservations[reservation_id]
+        try:
+            self._persist(reservation_id, reservation)
+        except Exception:
+            with self._lock:
+                self._remove_locked(reservation_id)
+            raise
+        return self._view(reservation_id, reservation)
+
+    def update(self, reservation_id: str, items: list) -> dict:
+        """Thay toàn bộ các dòng của giỏ và gia hạn"""
+        items = self._merge(items)
+        expires_at = datetime.datetime.now() + datetime.timedelta(seconds=self.hold_seconds)
+        with self._lock:
+            current = self._reservations.get(reservation_id)
+            if current is None or current["status"] != STATUS_ACTIVE:
+                raise ReservationNotFound()
+            self._check_available_locked(items, released=current["items"])
+            previous = self._remove_locked(reservation_id)
+            self._add_locked(reservation_id, previous["customerID"], items, expires_at)
+            self._wheel.schedule(reservation_id, self.hold_seconds)
+            reservation = self._reservations[reservation_id]
+        try:
+            self._persist(reservation_id, reservation)
+        except Exception as e:
+            # Bộ nhớ vẫn là nguồn chính; bản ghi cũ chỉ ảnh hưởng khi khôi phục sau sự cố
+            logging.error(f"Error persisting reservation {reservation_id}: {e}")
+        return self._view(reservation_id, reservation)
+
+    def get(self, reservation_id: str):
+        with self._lock:
+            reservation = self._reservations.get(reservation_id)
+            return self._view(reservation_id, reservation) if reservation else None
+
+    def release(self, reservation_id: str) -> bool:
+        with self._lock:
+            current = self._reservations.get(reservation_id)
+            if current is None or current["status"] != STATUS_ACTIVE:
+                return False
+            self._remove_locked(reservation_id)
+        self._write(queries.DELETE_STOCK_RESERVATION, (reservation_id,))
+        return True
+
+    # ===== CHECKOUT =====
+    def begin_checkout(self, reservation_id: str, items: list) -> dict:
+        """
+        Khóa reservation cho checkout; đơn hàng phải nằm trong phần đã giữ.
+        Trả về {productID: quantity} của đơn hàng.
+        """
+        ordered = self._merge(items)
+        with self._lock:
+            reservation = self._reservations.get(reservation_id)
+            if reservation is None or reservation["status"] != STATUS_ACTIVE:
+                raise ReservationNotFound()
+            uncovered = [
+                {"productID": p, "requested": q, "held": reservation["items"].get(p, 0)}
+                for p, q in ordered.items() if q > reservation["items"].get(p, 0)
+            ]
+            if uncovered:
+                raise ReservationConflict({"message": "Reservation does not cover the order", "items": uncovered})
+            reservation["status"] = STATUS_CONVERTING
+        return ordered
+
+    def end_checkout(self, reservation_id: str, ordered: dict, committed: bool):
+        """Sau commit: bỏ phần giữ và trừ cache tồn kho; khi lỗi: trả reservation về trạng thái giữ"""
+        with self._lock:
+            reservation = self._reservations.get(reservation_id)
+            if reservation is None:
+                return
+            if not committed:
+                reservation["status"] = STATUS_ACTIVE
+                return
+            self._remove_locked(reservation_id)
+            for product_id, quantity in ordered.items():
+                self._on_hand[product_id] = self._on_hand.get(product_id, 0) - quantity
+
+    # ===== STOCK =====
+    def apply_delta(self, product_id: int, quantity: int):
+        """Biến động tồn kho đã xảy ra (import +, export -, chênh lệch kiểm kê)"""
+        if product_id is None or not quantity:
+            return
+        with self._lock:
+            self._on_hand[product_id] = self._on_hand.get(product_id, 0) + quantity
+
+    def availability(self, product_ids: list = None) -> list:
+        with self._lock:
+            ids = product_ids if product_ids is not None else sorted(self._on_hand)
+            return [
+                {
+                    "productID": product_id,
+                    "onHand": self._on_hand.get(product_id, 0),
+                    "held": self._held.get(product_id, 0),
+                    "available": max(self._on_hand.get(product_id, 0) - self._held.get(product_id, 0), 0),
+                }
+                for product_id in ids
+            ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "reservations": len(self._reservations),
+                "heldUnits": sum(self._held.values()),
+                "products": len(self._on_hand),
+                "expired": self.expired_count,
+                "holdSeconds": self.hold_seconds,
+                "lastStockRefresh": self.last_stock_refresh,
+            }
+
+    # ===== EXPIRY =====
+    def expire_due(self) -> int:
+        now = datetime.datetime.now()
+        expired = []
+        with self._lock:
+            for reservation_id in self._wheel.advance():
+                reservation = self._reservations.get(reservation_id)
+                # Mục cũ của reservation đã gia hạn/đã xóa/đang checkout thì bỏ qua
+                if reservation is None or reservation["status"] != STATUS_ACTIVE or reservation["expiresAt"] > now:
+                    continue
+                self._remove_locked(reservation_id)
+                expired.append(reservation_id)
+            self.expired_count += len(expired)
+        if expired:
+            self._write(
+                queries.DELETE_STOCK_RESERVATIONS.format(placeholders=", ".join(["%s"] * len(expired))),
+                tuple(expired),
+            )
+        return len(expired)
+
+    def _loop(self):
+        next_refresh = time.monotonic() + self.refresh_seconds
+        while not self._stop.wait(WHEEL_TICK_SECONDS):
+            try:
+                with use_tenant(self.tenant):
+                    self.expire_due()
+                    if self.refresh_seconds and time.monotonic() >= next_refresh:
+                        next_refresh = time.monotonic() + self.refresh_seconds
+                        self.refresh_stock()
+            except Exception as e:
+                logging.error(f"Error in reservation timer: {e}")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        try:
+            with use_tenant(self.tenant):
+                self._load()
+                self.refresh_stock()
+        except Exception as e:
+            logging.error(f"Error loading reservations: {e}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="reservations", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+
+def commit_reservation(cursor, ordered: dict, order_date=None) -> list:
+    """
+    Trừ tồn kho cho các dòng của đơn hàng trong transaction checkout (chưa commit).
+    Mỗi sản phẩm được lấy từ các inventory của nó, nhiều hàng trước. Trả về danh sách
+    (productID, inventoryID, quantity, alert) để publish sau khi commit.
+    """
+    movements = []
+    for product_id, quantity in sorted(ordered.items()):
+        cursor.execute(queries.SELECT_PRODUCT_INVENTORY_IDS, (product_id,))
+        inventory_ids = [row["inventoryID"] for row in cursor.fetchall()]
+        rows = []
+        if inventory_ids:
+            cursor.execute(
+                queries.SELECT_INVENTORIES_FOR_CHECKOUT.format(placeholders=", ".join(["%s"] * len(inventory_ids))),
+                inventory_ids,
+            )
+            rows = cursor.fetchall()
+        remaining = quantity
+        for row in rows:
+            taken = min(remaining, max(row["stockQuantity"], 0))
+            if not taken:
+                continue
+            alert = stock_movements.apply_export(cursor, product_id, row["inventoryID"], taken, order_date)
+            movements.append((product_id, row["inventoryID"], taken, alert))
+            remaining -= taken
+            if not remaining:
+                break
+        if remaining:
+            # Tồn kho bị trừ ngoài hệ thống giữ hàng (vd. xuất kho thủ công) sau khi giữ
+            raise ReservationConflict({
+                "message": "Insufficient stock", "items": [{"productID": product_id, "requested": quantity, "available": quantity - remaining}],
+            })
+    return movements
+
+
+table = ReservationTable()
+_tenant_tables = {}
+_tenant_tables_lock = threading.Lock()
+
+
+def current() -> ReservationTable:
+    """Bảng giữ hàng của cửa hàng trong request hiện tại; shard riêng có bảng riêng, chạy khi dùng lần đầu"""
+    tenant = current_tenant()
+    if tenant is None:
+        return table
+    with _tenant_tables_lock:
+        if tenant not in _tenant_tables:
+            tenant_table = ReservationTable(tenant=tenant)
+            tenant_table.start()
+            _tenant_tables[tenant] = tenant_table
+        return _tenant_tables[tenant]
+
+
+def stop_all():
+    table.stop()
+    with _tenant_tables_lock:
+        for tenant_table in _tenant_tables.values():
+            tenant_table.stop()
+        _tenant_tables.clear()
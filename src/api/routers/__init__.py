@@ -11,3 +11,10 @@ from . import supplies
 from . import reports
 from . import auth
 from . import inventory_operations
+from . import alerts
+from . import events
+from . import jobs
+from . import database
+from . import reservations
+from . import metrics
+from . import admin
@@ -0,0 +1,95 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse, ORJSONResponse, PlainTextResponse
+import logging
+
+from .. import profiling
+from ..config import PROFILE_SAMPLE_INTERVAL_MS, PROFILE_MAX_SECONDS
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not profiling.enabled():
+        # ADMIN_TOKEN chưa đặt: không để lộ các endpoint admin
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiling.is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+SAMPLE_FORMATS = ("speedscope", "collapsed")
+TRACEMALLOC_GROUPS = ("lineno", "filename", "traceback")
+
+# ===== SAMPLING PROFILER =====
+@router.post("/admin/profile/sample")
+def sample_worker(seconds: float = 10, interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS, format: str = "speedscope"):
+    """Lấy mẫu stack mọi thread của worker này trong `seconds` giây (flamegraph của worker đang chạy)"""
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {PROFILE_MAX_SECONDS}")
+    if interval_ms < 1:
+        raise HTTPException(status_code=400, detail="interval_ms must be at least 1")
+    if format not in SAMPLE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(SAMPLE_FORMATS)}")
+    try:
+        stacks = profiling.sample(seconds, interval_ms)
+    except profiling.SamplingBusy:
+        raise HTTPException(status_code=409, detail="Another sampling profile is running in this worker")
+    filename = f"worker-{seconds:g}s"
+    if format == "collapsed":
+        return PlainTextResponse(profiling.to_collapsed(stacks),
+                                 headers={"Content-Disposition": f'attachment; filename="{filename}.folded"'})
+    return ORJSONResponse(profiling.to_speedscope(stacks, interval_ms, filename),
+                          headers={"Content-Disposition": f'attachment; filename="{filename}.speedscope.json"'})
+
+# ===== PER-REQUEST PROFILES =====
+@router.get("/admin/profiles")
+def get_profiles():
+    """Các file cProfile của request ?profile=1 (mới nhất trước)"""
+    return profiling.list_profiles()
+
+@router.get("/admin/profiles/{profile_id}")
+def get_profile(profile_id: str, format: str = "pstats", sort: str = "cumulative", limit: int = 50):
+    """format=pstats tải file (snakeviz, pstats), format=text trả bảng các hàm tốn thời gian nhất"""
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "pstats":
+        return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+    if format != "text":
+        raise HTTPException(status_code=400, detail="format must be pstats or text")
+    try:
+        return PlainTextResponse(profiling.profile_text(path, sort, limit))
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown sort key: {sort}")
+    except Exception as e:
+        logging.error(f"Error in get_profile: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ===== TRACEMALLOC =====
+@router.post("/admin/tracemalloc/start")
+def start_tracemalloc(frames: int = 1):
+    """Bật theo dõi cấp phát (tốn thêm CPU/bộ nhớ tới khi tắt); frames > 1 để group_by=traceback có ý nghĩa"""
+    if not 1 <= frames <= 50:
+        raise HTTPException(status_code=400, detail="frames must be between 1 and 50")
+    profiling.start_tracemalloc(frames)
+    return profiling.tracemalloc_status()
+
+@router.post("/admin/tracemalloc/stop")
+def stop_tracemalloc():
+    profiling.stop_tracemalloc()
+    return profiling.tracemalloc_status()
+
+@router.get("/admin/tracemalloc/snapshot")
+def get_tracemalloc_snapshot(group_by: str = "lineno", limit: int = 20, filter: Optional[str] = None,
+                             compare: bool = False):
+    """
+    Các vị trí cấp phát nhiều nhất; filter giới hạn theo đường dẫn file (vd. routers/stores.py),
+    compare=true so với snapshot trước đó
+    """
+    if group_by not in TRACEMALLOC_GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(TRACEMALLOC_GROUPS)}")
+    if not profiling.tracemalloc_status()["tracing"]:
+        raise HTTPException(status_code=409, detail="tracemalloc is not running; POST /admin/tracemalloc/start first")
+    try:
+        return profiling.snapshot(group_by, min(limit, 200), filter, compare)
+    except Exception as e:
+        logging.error(f"Error in get_tracemalloc_snapshot: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,45 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+import logging
+
+from .. import alerts
+from ..event_bus import iter_sse, format_sse, make_event, TOPIC_ALERTS
+from ..profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+@router.get("/alerts/low-stock")
+def get_low_stock_alerts(level: Optional[str] = None):
+    """Danh sách mặt hàng dưới ngưỡng (level = 'Low Stock' hoặc 'Out of Stock')"""
+    try:
+        return alerts.get_alerts(level)
+    except Exception as e:
+        logging.error(f"Error in get_low_stock_alerts: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/alerts/low-stock/stream")
+async def stream_low_stock_alerts(request: Request):
+    """
+    Server-sent events: gửi "snapshot" (toàn bộ cảnh báo hiện tại) khi kết nối,
+    sau đó là các sự kiện "alerts" mỗi khi một mặt hàng vào/ra khỏi ngưỡng
+    """
+    async def snapshot():
+        current = await run_in_threadpool(alerts.get_alerts)
+        return format_sse(make_event(TOPIC_ALERTS, "snapshot", {"alerts": current}), "snapshot")
+
+    return StreamingResponse(
+        iter_sse(request, {TOPIC_ALERTS}, snapshot=snapshot), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+@router.post("/alerts/low-stock/rebuild", status_code=status.HTTP_202_ACCEPTED)
+def rebuild_low_stock_alerts():
+    """Tính lại toàn bộ cảnh báo từ tbl_inventory"""
+    try:
+        alerts.rebuild_alerts()
+        return {"message": "Stock alerts rebuilt"}
+    except Exception as e:
+        logging.error(f"Error in rebuild_low_stock_alerts: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -5,8 +5,9 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from ..db import get_connection, safe_close_connection
 from ..models.auth import RegisterModel, RegisterStaffModel, LoginModel
 from .. import queries
+from ..profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.post("/register/customer", status_code=status.HTTP_201_CREATED)
 def register_customer(payload: RegisterModel):
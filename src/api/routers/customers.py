@@ -1,22 +1,25 @@
 from typing import Optional
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Response, status
 import logging
 
-from ..db import fetchall_sql, execute_sql
+from ..db import fetchall_sql, execute_sql, get_connection, safe_close_connection
 from ..models.customer import Customer
+from ..listing import encode_cursor, decode_cursor
+from ..columnar import is_columnar, fetch_response
+from ..hydration import hydrate_orders
 from .. import queries
+from ..profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.get("/customers")
-def get_customers(search: Optional[str] = None):
+def get_customers(search: Optional[str] = None, format: str = "json"):
+    columnar = is_columnar(format)
     try:
         if search:
             search_pattern = f"%{search}%"
-            rows = fetchall_sql(queries.SELECT_CUSTOMERS_SEARCH, (search_pattern, search_pattern, search_pattern))
-        else:
-            rows = fetchall_sql(queries.SELECT_CUSTOMERS)
-        return rows
+            return fetch_response(queries.SELECT_CUSTOMERS_SEARCH, (search_pattern, search_pattern, search_pattern), columnar)
+        return fetch_response(queries.SELECT_CUSTOMERS, columnar=columnar)
     except Exception as e:
         logging.error(f"Error in get_customers: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -34,6 +37,41 @@ def get_customer(id: int):
         logging.error(f"Error in get_customer: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/customers/{id}/orders")
+def get_customer_orders(id: int, response: Response, limit: int = 20, cursor: Optional[str] = None):
+    """
+    Lịch sử đơn hàng của một khách hàng, mới nhất trước, nạp bằng hydration.hydrate_orders
+    (dòng sản phẩm kèm "product", thanh toán).
+    Phân trang theo ngày: cursor trang sau nằm ở header X-Next-Cursor.
+    """
+    conn = None
+    try:
+        limit = max(1, min(limit, 100))
+        cursor_clause = ""
+        params = [id]
+        if cursor:
+            last_date, last_id = decode_cursor(cursor)
+            cursor_clause = queries.SELECT_CUSTOMER_ORDERS_CURSOR
+            params.extend([last_date, last_date, last_id])
+        params.append(limit)
+
+        conn = get_connection()
+        with conn.cursor() as cur:
+            cur.execute(queries.SELECT_CUSTOMER_ORDERS_PAGE.format(cursor_clause=cursor_clause), tuple(params))
+            page = cur.fetchall()
+            orders = hydrate_orders([order["orderID"] for order in page], cur)
+
+        if len(page) == limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(page[-1]["orderDate"], page[-1]["orderID"])
+        return orders
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error in get_customer_orders: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        safe_close_connection(conn)
+
 @router.post("/customers", status_code=status.HTTP_201_CREATED)
 def create_customer(payload: Customer):
     try:
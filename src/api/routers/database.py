@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+
+from ..db import replica_router, group_writer
+from ..profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+@router.get("/db/stats")
+def get_db_stats():
+    """
+    Số truy vấn đọc theo đích (replica, primary, pinned = read-your-writes, fallback), trạng thái replica
+    và số câu/lô của group commit
+    """
+    return {**replica_router.stats(), "groupCommit": group_writer.stats()}
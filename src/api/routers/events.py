@@ -0,0 +1,24 @@
+from typing import Optional
+from fastapi import APIRouter, Header, Request
+from fastapi.responses import StreamingResponse
+
+from ..event_bus import bus, iter_sse
+from ..profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+@router.get("/events/stream")
+async def stream_events(request: Request, topics: Optional[str] = None, last_event_id: Optional[int] = Header(None)):
+    """
+    Server-sent events cho các thay đổi dữ liệu.
+    topics: inventory, orders, payments, stores, alerts (phân cách bởi dấu phẩy, mặc định tất cả).
+    Khi nhận sự kiện "resync", client cần tải lại dữ liệu đầy đủ.
+    """
+    topic_set = {t.strip() for t in topics.split(",") if t.strip()} if topics else None
+    return StreamingResponse(
+        iter_sse(request, topic_set, last_event_id), media_type="text/event-stream", headers={"Cache-Control": "no-cache"}
+    )
+
+@router.get("/events/stats")
+def get_event_stats():
+    return bus.stats()
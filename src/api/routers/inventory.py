@@ -1,11 +1,17 @@
+from typing import Optional
 from fastapi import APIRouter, HTTPException, status
+import datetime
 import logging
 
-from ..db import fetchall_sql, execute_sql, get_connection, safe_close_connection
+from ..db import fetchall_sql, fetch_parallel, get_connection, safe_close_connection
 from ..models.inventory import Inventory
-from .. import queries
+from ..config import INVENTORY_VALUATION_METHOD, HOT_STOCK_DEFAULT_SHARDS
+from ..catalog_io import export_response
+from ..columnar import is_columnar, to_columnar, response as columnar_response
+from .. import queries, alerts, journal, stock_snapshots, valuation, hot_stock, stock_movements
+from ..profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 def check_inventory_usage(inventory_id: int) -> dict:
     """Kiểm tra xem inventory có đang được sử dụng trong stores không"""
@@ -13,9 +19,9 @@ def check_inventory_usage(inventory_id: int) -> dict:
     try:
         conn = get_connection()
         with conn.cursor() as cursor:
-            cursor.execute(queries.CHECK_INVENTORY_IN_STORES, (inventory_id,))
+            cursor.execute(queries.CHECK_INVENTORY_IN_STORES, (inventory_id, inventory_id))
             result = cursor.fetchone()
-            stores_count = result[0] if result and len(result) > 0 else 0
+            stores_count = result['count'] if result else 0
             
             return {
                 'has_stores': stores_count > 0,
@@ -26,13 +32,139 @@ def check_inventory_usage(inventory_id: int) -> dict:
         safe_close_connection(conn)
 
 @router.get("/inventories")
-def get_inventory():
+def get_inventory(format: str = "json"):
+    columnar = is_columnar(format)
+    active = journal.current()
     try:
-        return fetchall_sql(queries.SELECT_INVENTORIES)
+        if columnar and active is None:
+            return columnar_response(fetchall_sql(queries.SELECT_INVENTORIES, columnar=True))
+        rows = fetchall_sql(queries.SELECT_INVENTORIES)
+        if active is not None:
+            # Cộng các biến động còn chờ ghi trong journal
+            rows = active.merge_stock(rows)
+        return columnar_response(to_columnar(rows)) if columnar else rows
     except Exception as e:
         logging.error(f"Error in get_inventory: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def parse_snapshot_date(value: str) -> datetime.date:
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
+
+@router.get("/inventories/export")
+def export_inventories(format: str = "csv"):
+    """Xuất toàn bộ tbl_inventory theo kiểu streaming (csv, ndjson, arrow hoặc parquet)"""
+    return export_response(queries.EXPORT_INVENTORIES, format, "inventories")
+
+@router.get("/inventories/{id}/stock-at")
+def get_inventory_stock_at(id: int, date: str):
+    """Tồn kho cuối ngày `date` (YYYY-MM-DD) của một inventory, tính từ ảnh chụp gần nhất"""
+    try:
+        products = stock_snapshots.stock_at(parse_snapshot_date(date), id)
+        return {
+            "inventoryID": id,
+            "date": date,
+            "stockQuantity": sum(p["quantity"] for p in products),
+            "products": products,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error in get_inventory_stock_at: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/inventories/{id}/valuation")
+def get_inventory_valuation(id: int):
+    """Giá trị tồn kho theo INVENTORY_VALUATION_METHOD và các lớp giá vốn còn hàng"""
+    try:
+        results = fetch_parallel({
+            "layers": (queries.SELECT_COST_LAYERS, (id,)),
+            "valuation": (queries.SELECT_INVENTORY_VALUATION, (id,)),
+        })
+        layers, rows = results["layers"], results["valuation"]
+        if not rows:
+            raise HTTPException(status_code=404, detail="Inventory valuation not found")
+        return {**rows[0], "method": INVENTORY_VALUATION_METHOD, "layers": layers}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error in get_inventory_valuation: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/inventories/hot")
+def get_hot_inventories():
+    """Các inventory đang bật bộ đếm chia shard"""
+    try:
+        return fetchall_sql(queries.SELECT_HOT_INVENTORIES)
+    except Exception as e:
+        logging.error(f"Error in get_hot_inventories: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/inventories/{id}/shards")
+def enable_inventory_shards(id: int, count: int = HOT_STOCK_DEFAULT_SHARDS):
+    """Bật (hoặc đổi số shard) bộ đếm chia shard cho inventory bán chạy"""
+    if count < 2 or count > 64:
+        raise HTTPException(status_code=400, detail="count must be between 2 and 64")
+    conn = None
+    try:
+        conn = get_connection()
+        with conn.cursor() as cursor:
+            # Shard cũ bị thay: ghi phần xuất còn chờ định giá trước
+            alert = stock_movements.settle_pending(cursor, id)
+            if not hot_stock.enable(cursor, id, count):
+                raise HTTPException(status_code=404, detail="Inventory not found")
+            conn.commit()
+        alerts.publish([alert])
+        return {"message": "Inventory sharding enabled", "shards": count}
+    except HTTPException:
+        if conn:
+            conn.rollback()
+        raise
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logging.error(f"Error in enable_inventory_shards: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        safe_close_connection(conn)
+
+@router.delete("/inventories/{id}/shards")
+def disable_inventory_shards(id: int):
+    """Tắt bộ đếm chia shard: gộp số lượng về dòng tbl_inventory"""
+    conn = None
+    try:
+        conn = get_connection()
+        with conn.cursor() as cursor:
+            alert = stock_movements.settle_pending(cursor, id)
+            hot_stock.disable(cursor, id)
+            conn.commit()
+        alerts.publish([alert])
+        return {"message": "Inventory sharding disabled"}
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logging.error(f"Error in disable_inventory_shards: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        safe_close_connection(conn)
+
+@router.post("/inventories/snapshots")
+def generate_inventory_snapshots(until: Optional[str] = None, rebuild_from: Optional[str] = None):
+    """Chụp tồn kho ngay cho các ngày còn thiếu; rebuild_from chụp lại từ ngày đó (sau khi sửa lịch sử)"""
+    try:
+        written = stock_snapshots.generate_snapshots(
+            parse_snapshot_date(until) if until else None,
+            parse_snapshot_date(rebuild_from) if rebuild_from else None,
+        )
+        return {"message": "Stock snapshots generated", "rows": written}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error in generate_inventory_snapshots: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/inventories", status_code=status.HTTP_201_CREATED)
 def create_inventory(payload: dict):
     conn = None
@@ -66,7 +198,9 @@ def create_inventory(payload: dict):
                     payload.get("stockQuantity", 0)
                 ))
             
+            alert = alerts.evaluate_inventory(cursor, inventory_id)
             conn.commit()
+        alerts.publish([alert])
         return {"message": "Inventory record created", "inventoryID": inventory_id}
     except HTTPException:
         if conn:
@@ -86,6 +220,10 @@ def update_inventory(id: int, payload: Inventory):
     try:
         conn = get_connection()
         with conn.cursor() as cursor:
+            # Tồn kho/giá được sửa trực tiếp: định giá lại từ đầu
+            valuation.reset(cursor, id, payload.stockQuantity, payload.unitCost)
+            # Khóa các shard trước dòng chính (thứ tự khóa của hot_stock.py)
+            hot_stock.lock(cursor, id)
             # Cập nhật inventory record
             cursor.execute(queries.UPDATE_INVENTORY, (
                 payload.warehouse,
@@ -114,8 +252,11 @@ def update_inventory(id: int, payload: Inventory):
                 else:
                     # Tạo stores relationship mới
                     cursor.execute(queries.INSERT_STORE_FOR_INVENTORY_UPDATE, (payload.productID, id, payload.stockQuantity))
-            
+
+            hot_stock.absorb(cursor, id)
+            alert = alerts.evaluate_inventory(cursor, id)
             conn.commit()
+        alerts.publish([alert])
         return {"message": "Inventory updated successfully"}
     except HTTPException:
         if conn:
@@ -131,6 +272,7 @@ def update_inventory(id: int, payload: Inventory):
 
 @router.delete("/inventories/{id}")
 def delete_inventory(id: int):
+    conn = None
     try:
         # Kiểm tra xem inventory có đang được sử dụng không
         usage = check_inventory_usage(id)
@@ -141,10 +283,26 @@ def delete_inventory(id: int):
                 detail=f"Không thể xóa kho này vì đang được sử dụng trong {usage['stores_count']} bản ghi lưu trữ sản phẩm"
             )
         
-        execute_sql(queries.DELETE_INVENTORY, (id,))
+        conn = get_connection()
+        with conn.cursor() as cursor:
+            # Một transaction, theo thứ tự khóa của hot_stock.py: định giá -> shard -> dòng chính
+            cursor.execute(queries.DELETE_COST_LAYERS, (id,))
+            cursor.execute(queries.DELETE_INVENTORY_VALUATION, (id,))
+            cursor.execute(queries.DELETE_INVENTORY_SHARDS, (id,))
+            cursor.execute(queries.DELETE_INVENTORY, (id,))
+            # Inventory không còn nên cảnh báo (nếu có) bị xóa, kèm sự kiện gỡ cảnh báo
+            alert = alerts.evaluate_inventory(cursor, id)
+            conn.commit()
+        alerts.publish([alert])
         return {"message": "Inventory record deleted successfully"}
     except HTTPException:
+        if conn:
+            conn.rollback()
         raise
     except Exception as e:
+        if conn:
+            conn.rollback()
         logging.error(f"Error in delete_inventory: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        safe_close_connection(conn)
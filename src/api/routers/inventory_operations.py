@@ -1,34 +1,41 @@
-import datetime
-from fastapi import APIRouter, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, status
 import logging
 
-from ..db import fetchall_sql, execute_sql, get_connection, safe_close_connection
+from ..db import get_connection, safe_close_connection
 from ..models.inventory import InventoryImport, InventoryExport, Stocktaking
-from .. import queries
+from .. import alerts, journal, stock_movements, hot_stock, idempotency, reservations
+from ..event_bus import bus, TOPIC_INVENTORY
+from ..profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
+def publish_movement(event_type: str, inventory_id: int, product_id: int, **data):
+    # quantity là chênh lệch có dấu (nhập +, xuất -, chênh lệch kiểm kê)
+    reservations.current().apply_delta(product_id, data.get("quantity"))
+    bus.publish(TOPIC_INVENTORY, event_type, {"inventoryID": inventory_id, "productID": product_id, **data})
+
+# Các thao tác kho nhận header Idempotency-Key để client thử lại an toàn (xem idempotency.py)
 @router.post("/inventory/import", status_code=status.HTTP_201_CREATED)
-def import_inventory(payload: InventoryImport):
+def import_inventory(payload: InventoryImport, idempotency_key: Optional[str] = Header(None)):
+    return idempotency.run(
+        idempotency_key, "inventory.import", payload, lambda: perform_import(payload), status.HTTP_201_CREATED
+    )
+
+def perform_import(payload: InventoryImport):
+    active = journal.current()
+    if active is not None:
+        entry = active.record_import(payload.productID, payload.inventoryID, payload.quantity, payload.unitCost, payload.importDate)
+        publish_movement("import", payload.inventoryID, payload.productID, quantity=payload.quantity, unitCost=payload.unitCost)
+        return {"message": "Inventory imported successfully", "journalSeq": entry["seq"]}
     conn = None
     try:
         conn = get_connection()
         with conn.cursor() as cursor:
-            # Thêm vào stores (lịch sử nhập kho)
-            cursor.execute(queries.INSERT_STORE_FOR_INVENTORY_IMPORT, (payload.productID, payload.inventoryID, payload.importDate or datetime.datetime.now(), payload.quantity))
-            
-            # Kiểm tra xem inventory record đã tồn tại chưa
-            cursor.execute(queries.SELECT_INVENTORY_BY_ID, (payload.inventoryID,))
-            inv_exists = cursor.fetchone()
-            
-            if inv_exists:
-                # Cập nhật stock quantity nếu inventory đã tồn tại
-                cursor.execute(queries.UPDATE_INVENTORY_FOR_IMPORT, (payload.quantity, payload.unitCost, payload.inventoryID))
-            else:
-                # Tạo inventory record mới nếu chưa có
-                cursor.execute(queries.INSERT_INVENTORY_FOR_IMPORT, (payload.inventoryID, payload.quantity, payload.unitCost))
-            
+            alert = stock_movements.apply_import(cursor, payload.productID, payload.inventoryID, payload.quantity, payload.unitCost, payload.importDate)
             conn.commit()
+        alerts.publish([alert])
+        publish_movement("import", payload.inventoryID, payload.productID, quantity=payload.quantity, unitCost=payload.unitCost)
         return {"message": "Inventory imported successfully"}
     except Exception as e:
         if conn:
@@ -39,27 +46,40 @@ def import_inventory(payload: InventoryImport):
         safe_close_connection(conn)
 
 @router.post("/inventory/export", status_code=status.HTTP_201_CREATED)
-def export_inventory(payload: InventoryExport):
+def export_inventory(payload: InventoryExport, idempotency_key: Optional[str] = Header(None)):
+    return idempotency.run(
+        idempotency_key, "inventory.export", payload, lambda: perform_export(payload), status.HTTP_201_CREATED
+    )
+
+def perform_export(payload: InventoryExport):
+    active = journal.current()
+    if active is not None:
+        try:
+            entry = active.record_export(payload.productID, payload.inventoryID, payload.quantity, payload.exportDate)
+        except journal.InsufficientStock:
+            raise HTTPException(status_code=400, detail="Insufficient inventory")
+        publish_movement("export", payload.inventoryID, payload.productID, quantity=-payload.quantity)
+        return {"message": "Inventory exported successfully", "journalSeq": entry["seq"]}
     conn = None
     try:
         conn = get_connection()
         with conn.cursor() as cursor:
             # Kiểm tra số lượng tồn kho
-            cursor.execute(queries.SELECT_STOCK_QUANTITY_FOR_EXPORT, (payload.inventoryID,))
-            result = cursor.fetchone()
-            if not result or result['stockQuantity'] < payload.quantity:
+            stock = stock_movements.get_stock(cursor, payload.inventoryID)
+            if stock is None or stock < payload.quantity:
                 raise HTTPException(status_code=400, detail="Insufficient inventory")
-            
-            # Thêm vào stores với roleStore = 'Export' (số lượng âm)
-            cursor.execute(queries.INSERT_STORE_FOR_EXPORT, (payload.productID, payload.inventoryID, payload.exportDate or datetime.datetime.now(), -payload.quantity))
-            
-            # Cập nhật stock quantity
-            cursor.execute(queries.UPDATE_INVENTORY_FOR_EXPORT, (payload.quantity, payload.inventoryID))
-            
+
+            alert = stock_movements.apply_export(cursor, payload.productID, payload.inventoryID, payload.quantity, payload.exportDate)
             conn.commit()
+        alerts.publish([alert])
+        publish_movement("export", payload.inventoryID, payload.productID, quantity=-payload.quantity)
         return {"message": "Inventory exported successfully"}
     except HTTPException:
         raise
+    except hot_stock.InsufficientStock:
+        # Các shard cùng lúc bị request khác trừ hết sau khi kiểm tra tồn kho
+        conn.rollback()
+        raise HTTPException(status_code=400, detail="Insufficient inventory")
     except Exception as e:
         if conn:
             conn.rollback()
@@ -69,27 +89,30 @@ def export_inventory(payload: InventoryExport):
         safe_close_connection(conn)
 
 @router.post("/inventory/stocktaking", status_code=status.HTTP_201_CREATED)
-def stocktaking(payload: Stocktaking):
+def stocktaking(payload: Stocktaking, idempotency_key: Optional[str] = Header(None)):
+    return idempotency.run(
+        idempotency_key, "inventory.stocktaking", payload, lambda: perform_stocktaking(payload), status.HTTP_201_CREATED
+    )
+
+def perform_stocktaking(payload: Stocktaking):
+    active = journal.current()
+    if active is not None:
+        try:
+            entry = active.record_stocktaking(payload.productID, payload.inventoryID, payload.actualQuantity, payload.stocktakingDate)
+        except journal.InventoryNotFound:
+            raise HTTPException(status_code=404, detail="Inventory not found")
+        publish_movement("stocktaking", payload.inventoryID, payload.productID, stockQuantity=payload.actualQuantity, quantity=entry["difference"])
+        return {"message": "Stocktaking completed successfully", "journalSeq": entry["seq"]}
     conn = None
     try:
         conn = get_connection()
         with conn.cursor() as cursor:
-            # Lấy số lượng hiện tại
-            cursor.execute(queries.SELECT_STOCK_QUANTITY_FOR_STOCKTAKING, (payload.inventoryID,))
-            current = cursor.fetchone()
-            if not current:
+            difference, alert = stock_movements.apply_stocktaking(cursor, payload.productID, payload.inventoryID, payload.actualQuantity, payload.stocktakingDate)
+            if difference is None:
                 raise HTTPException(status_code=404, detail="Inventory not found")
-            
-            difference = payload.actualQuantity - current['stockQuantity']
-            
-            # Cập nhật số lượng thực tế
-            cursor.execute(queries.UPDATE_INVENTORY_FOR_STOCKTAKING, (payload.actualQuantity, payload.inventoryID))
-            
-            # Ghi lại lịch sử kiểm kê vào stores
-            if difference != 0:
-                cursor.execute(queries.INSERT_STORE_FOR_STOCKTAKING, (payload.productID, payload.inventoryID, payload.stocktakingDate or datetime.datetime.now(), difference))
-            
             conn.commit()
+        alerts.publish([alert])
+        publish_movement("stocktaking", payload.inventoryID, payload.productID, stockQuantity=payload.actualQuantity, quantity=difference)
         return {"message": "Stocktaking completed successfully"}
     except HTTPException:
         raise
@@ -100,3 +123,23 @@ def stocktaking(payload: Stocktaking):
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         safe_close_connection(conn)
+
+@router.get("/inventory/journal")
+def get_journal_stats():
+    """Trạng thái journal ghi trễ (số biến động còn chờ ghi vào database)"""
+    active = journal.current()
+    if active is None:
+        return {"enabled": False}
+    return {"enabled": True, **active.stats()}
+
+@router.post("/inventory/journal/flush")
+def flush_journal():
+    """Ghi ngay các biến động còn chờ vào database"""
+    active = journal.current()
+    if active is None:
+        return {"enabled": False, "flushed": 0}
+    try:
+        return {"enabled": True, "flushed": active.flush()}
+    except Exception as e:
+        logging.error(f"Error in flush_journal: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,49 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import ORJSONResponse
+import logging
+
+from ..jobs import runner, STATUS_SUCCEEDED
+from ..profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+def submit_job(kind: str, params: dict = None):
+    """Đưa tác vụ vào hàng đợi nền, trả về 202 kèm jobID để client hỏi trạng thái"""
+    job_id = runner.submit(kind, params)
+    return ORJSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"jobID": job_id, "status": "queued", "statusUrl": f"/jobs/{job_id}"},
+        headers={"Location": f"/jobs/{job_id}"},
+    )
+
+@router.get("/jobs")
+def get_jobs(status: Optional[str] = None, limit: int = 50):
+    try:
+        return runner.list(status, min(limit, 500))
+    except Exception as e:
+        logging.error(f"Error in get_jobs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Trạng thái, tiến độ của job (không kèm kết quả)"""
+    job = runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    job = runner.get(job_id, include_result=True)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    if job["status"] != STATUS_SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return job["result"]
+
+@router.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    if not runner.cancel(job_id):
+        raise HTTPException(status_code=404, detail="Job not found or already finished")
+    return {"message": "Job cancellation requested", "jobID": job_id}
@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from .. import tracing
+from ..profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Histogram độ trễ, thời gian DB/Python/serialize, số truy vấn và kích thước payload theo route (Prometheus)"""
+    return PlainTextResponse(tracing.metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@router.get("/metrics/tracing")
+def get_tracing_stats():
+    """Trạng thái xuất span (số span đã ghi / bị bỏ do hàng đợi đầy hoặc collector lỗi)"""
+    return tracing.stats()
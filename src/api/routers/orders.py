@@ -1,43 +1,153 @@
+import datetime
 from typing import Optional
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Header, HTTPException, Request, Response, status
 import logging
 
 from ..db import get_connection, safe_close_connection, fetchall_sql, execute_sql
 from ..models.order import Order, OrderCheckoutModel
-from .. import queries
+from ..listing import build_list_query, encode_cursor, decode_cursor, MAX_LIMIT
+from ..hydration import hydrate_orders, MAX_BATCH_SIZE
+from .. import queries, idempotency, alerts, reservations
+from ..catalog_io import export_response
+from ..event_bus import bus, TOPIC_ORDERS, TOPIC_INVENTORY
+from ..profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+ORDER_ID_MAX_DIGITS = 10  # INT UNSIGNED tối đa 10 chữ số
+
+def order_id_prefix_ranges(prefix: str) -> list:
+    """
+    Tìm orderID theo tiền tố mà không phải LIKE/CAST trên khóa chính:
+    "12" -> [12, 12], [120, 129], [1200, 1299], ... (các khoảng đều dùng được index PK)
+    """
+    value = int(prefix)
+    ranges = [(value, value)]
+    for extra in range(1, ORDER_ID_MAX_DIGITS - len(prefix) + 1):
+        scale = 10 ** extra
+        ranges.append((value * scale, value * scale + scale - 1))
+    return ranges
 
 @router.get("/orders")
-def get_orders(search: Optional[str] = None, status: Optional[str] = None, customer_id: Optional[int] = None):
+def get_orders(
+    request: Request,
+    response: Response,
+    search: Optional[str] = None,
+    status: Optional[str] = None,
+    customer_id: Optional[int] = None,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+    cursor: Optional[str] = None,
+):
+    """
+    Danh sách đơn hàng, mới nhất trước.
+    - search: mã đơn hàng (khớp chính xác hoặc theo tiền tố), vd. "12" -> #12, #120..#129, ...
+    - status: một hoặc nhiều trạng thái, phân cách bởi dấu phẩy
+    - date_from/date_to: khoảng ngày đặt hàng (bao gồm cả hai đầu)
+    - limit + cursor: phân trang keyset theo (orderDate, orderID); cursor trang sau nằm ở header X-Next-Cursor
+    Ngoài ra hỗ trợ fields=, sort= và bộ lọc theo cột - xem listing.py
+    """
     try:
         conditions = []
         params = []
+        search = (search or "").strip().lstrip("#")
         if search:
-            conditions.append("orderID LIKE %s")
-            params.append(f"%{search}%")
+            if not (search.isascii() and search.isdigit()):
+                # Mã đơn hàng chỉ gồm chữ số: chuỗi khác không khớp đơn nào (ô tìm kiếm gửi theo từng phím gõ)
+                return []
+            ranges = order_id_prefix_ranges(search)
+            conditions.append("(" + " OR ".join(["orderID BETWEEN %s AND %s"] * len(ranges)) + ")")
+            for low, high in ranges:
+                params.extend([low, high])
         if status:
-            conditions.append("orderStatus = %s")
-            params.append(status)
+            statuses = [s.strip() for s in status.split(",") if s.strip()]
+            # "status=," không có giá trị nào: bỏ qua bộ lọc thay vì sinh IN () lỗi cú pháp
+            if statuses:
+                conditions.append(f"orderStatus IN ({', '.join(['%s'] * len(statuses))})")
+                params.extend(statuses)
         if customer_id:
             conditions.append("customerID = %s")
             params.append(customer_id)
-        
-        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
-        query = f"SELECT * FROM tbl_order{where_clause} ORDER BY orderDate DESC"
-        return fetchall_sql(query, tuple(params) if params else ())
+        if date_from:
+            conditions.append("orderDate >= %s")
+            params.append(date_from)
+        if date_to:
+            conditions.append("orderDate < %s")
+            params.append(date_to + datetime.timedelta(days=1))
+
+        keyset = not request.query_params.get("sort")
+        if cursor:
+            if not keyset:
+                raise HTTPException(status_code=400, detail="cursor cannot be combined with sort")
+            last_date, last_id = decode_cursor(cursor)
+            conditions.append("(orderDate < %s OR (orderDate = %s AND orderID < %s))")
+            params.extend([last_date, last_date, last_id])
+
+        query, query_params = build_list_query(
+            "tbl_order", queries.LIST_COLUMNS_ORDERS, request.query_params, conditions, params,
+            default_sort="-orderDate,-orderID", required_fields=["orderID", "orderDate"] if keyset else None
+        )
+        rows = fetchall_sql(query, query_params)
+
+        limit = request.query_params.get("limit")
+        if keyset and limit and rows and len(rows) >= min(int(limit), MAX_LIMIT):
+            response.headers["X-Next-Cursor"] = encode_cursor(rows[-1]["orderDate"], rows[-1]["orderID"])
+        return rows
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in get_orders: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/orders/batch")
+def get_orders_batch(ids: str):
+    """Nạp nhiều đơn hàng kèm dòng sản phẩm, sản phẩm và thanh toán: /orders/batch?ids=1,2,3"""
+    try:
+        try:
+            order_ids = [int(i) for i in ids.split(",") if i.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+        if len(order_ids) > MAX_BATCH_SIZE:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} ids per request")
+        return hydrate_orders(order_ids)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error in get_orders_batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/orders/export")
+def export_orders(format: str = "csv"):
+    """Xuất toàn bộ tbl_order theo kiểu streaming (csv, ndjson, arrow hoặc parquet)"""
+    return export_response(queries.EXPORT_ORDERS, format, "orders")
+
 @router.get("/orders/{id}")
 def get_order(id: int):
     try:
-        return fetchall_sql(queries.SELECT_ORDER_BY_CUSTOMER_ID, (id,))
+        rows = fetchall_sql(queries.SELECT_ORDER_BY_ID, (id,))
+        if not rows:
+            raise HTTPException(status_code=404, detail="Order not found")
+        return rows[0]
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in get_order: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/orders/{id}/detail")
+def get_order_detail(id: int):
+    """Đơn hàng kèm các dòng sản phẩm (tbl_requests) và thanh toán trong một lần gọi"""
+    try:
+        orders = hydrate_orders([id])
+        if not orders:
+            raise HTTPException(status_code=404, detail="Order not found")
+        return orders[0]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error in get_order_detail: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/orders", status_code=status.HTTP_201_CREATED)
 def create_order(payload: Order):
     try:
@@ -51,6 +161,7 @@ def create_order(payload: Order):
             payload.customerID,
             payload.staffID
         ))
+        bus.publish(TOPIC_ORDERS, "created", {"orderID": order_id, **dict(payload)})
         return {"message": "Order created", "orderID": order_id}
     except Exception as e:
         logging.error(f"Error in create_order: {e}")
@@ -68,6 +179,7 @@ def update_order(id: int, payload: Order):
             payload.totalAmount,
             id
         ))
+        bus.publish(TOPIC_ORDERS, "updated", {**dict(payload), "orderID": id})
         return {"message": "Order updated successfully"}
     except Exception as e:
         logging.error(f"Error in update_order: {e}")
@@ -78,6 +190,7 @@ def update_order(id: int, payload: Order):
 def delete_order(id: int):
     try:
         execute_sql(queries.DELETE_ORDER, (id,))
+        bus.publish(TOPIC_ORDERS, "deleted", {"orderID": id})
         return {"message": "Order deleted"}
     except Exception as e:
         logging.error(f"Error in delete_order: {e}")
@@ -85,9 +198,25 @@ def delete_order(id: int):
 
 
 @router.post("/order/checkout")
-def order_checkout(payload: OrderCheckoutModel):
-    conn = get_connection()
+def order_checkout(payload: OrderCheckoutModel, idempotency_key: Optional[str] = Header(None)):
+    """Gửi kèm header Idempotency-Key để client thử lại an toàn (xem idempotency.py)"""
+    return idempotency.run(idempotency_key, "order.checkout", payload, lambda: perform_checkout(payload))
+
+def perform_checkout(payload: OrderCheckoutModel):
+    # Giỏ hàng đã giữ hàng: khóa reservation, tồn kho được trừ trong cùng transaction với đơn hàng
+    ordered = None
+    movements = []
+    if payload.reservationID:
+        try:
+            ordered = reservations.current().begin_checkout(payload.reservationID, payload.products)
+        except reservations.ReservationNotFound:
+            raise HTTPException(status_code=404, detail="Reservation not found or expired")
+        except reservations.ReservationConflict as e:
+            raise HTTPException(status_code=409, detail=e.args[0])
+    conn = None
+    committed = False
     try:
+        conn = get_connection()
         with conn.cursor() as cursor:
 
             # 1. Insert ORDER
@@ -114,11 +243,34 @@ def order_checkout(payload: OrderCheckoutModel):
                     sum([p["quantity"] * p["priceEach"] for p in payload.products]),
                     payload.paymentMethod
                 ))
+            # 4. Trừ tồn kho cho các dòng đã giữ
+            if ordered:
+                movements = reservations.commit_reservation(cursor, ordered)
+                cursor.execute(queries.DELETE_STOCK_RESERVATION, (payload.reservationID,))
             conn.commit()
-            return {"message": "Checkout successful", "orderID": order_id}
+            committed = True
+        if ordered:
+            reservations.current().end_checkout(payload.reservationID, ordered, committed=True)
+            alerts.publish([alert for _, _, _, alert in movements])
+            for product_id, inventory_id, quantity, _ in movements:
+                bus.publish(TOPIC_INVENTORY, "export", {
+                    "inventoryID": inventory_id, "productID": product_id, "quantity": -quantity, "orderID": order_id
+                })
+        bus.publish(TOPIC_ORDERS, "checkout", {
+            "orderID": order_id, "customerID": payload.customerID,
+            "totalAmount": sum([p["quantity"] * p["priceEach"] for p in payload.products]),
+            "paymentStatus": payload.paymentStatus
+        })
+        return {"message": "Checkout successful", "orderID": order_id}
 
-    except Exception as e:
+    except reservations.ReservationConflict as e:
         conn.rollback()
+        raise HTTPException(status_code=409, detail=e.args[0])
+    except Exception as e:
+        if conn:
+            conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
+        if ordered and not committed:
+            reservations.current().end_checkout(payload.reservationID, ordered, committed=False)
         safe_close_connection(conn)
@@ -1,29 +1,52 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Request, status
 import logging
 
-from ..db import fetchall_sql, execute_sql
+from ..db import execute_sql, execute_sql_grouped
 from ..models.payment import Payment
-from .. import queries
+from ..listing import build_list_query
+from ..columnar import is_columnar, fetch_response
+from .. import queries, idempotency
+from ..event_bus import bus, TOPIC_PAYMENTS
+from ..profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.get("/payments")
-def get_payments():
+def get_payments(request: Request, format: str = "json"):
+    """
+    Danh sách thanh toán. Hỗ trợ fields=, sort=, limit/offset và bộ lọc theo cột
+    (vd. transactionDate__gte=2024-01-01&transactionStatus=Pending) - xem listing.py.
+    format=columnar trả về {"columns": [...], "rows": [[...]]} (xem columnar.py)
+    """
+    columnar = is_columnar(format)
     try:
-        return fetchall_sql(queries.SELECT_PAYMENTS)
+        if not (request.query_params.keys() - {"format"}):
+            return fetch_response(queries.SELECT_PAYMENTS, columnar=columnar)
+        query, query_params = build_list_query("tbl_payment", queries.LIST_COLUMNS_PAYMENTS, request.query_params)
+        return fetch_response(query, query_params, columnar)
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in get_payments: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/payments", status_code=status.HTTP_201_CREATED)
-def create_payment(payload: Payment):
+def create_payment(payload: Payment, idempotency_key: Optional[str] = Header(None)):
+    """Gửi kèm header Idempotency-Key để client thử lại an toàn (xem idempotency.py)"""
+    return idempotency.run(
+        idempotency_key, "payments.create", payload, lambda: perform_create_payment(payload), status.HTTP_201_CREATED
+    )
+
+def perform_create_payment(payload: Payment):
     try:
-        execute_sql(queries.INSERT_PAYMENT, (
+        payment_id = execute_sql_grouped(queries.INSERT_PAYMENT, (
             payload.orderID,
             payload.transactionAmount,
             payload.paymentMethod,
             payload.transactionStatus
         ))
+        bus.publish(TOPIC_PAYMENTS, "created", {"paymentID": payment_id, **dict(payload)})
         return {"message": "Payment created"}
     except Exception as e:
         logging.error(f"Error in create_payment: {e}")
@@ -39,6 +62,7 @@ def update_payment(paymentID: int, payload: Payment):
             payload.transactionStatus,
             paymentID
         ))
+        bus.publish(TOPIC_PAYMENTS, "updated", {**dict(payload), "paymentID": paymentID})
         return {"message": "Payment updated successfully"}
     except Exception as e:
         logging.error(f"Error in update_payment: {e}")
@@ -48,6 +72,7 @@ def update_payment(paymentID: int, payload: Payment):
 def delete_payment(id: int):
     try:
         execute_sql(queries.DELETE_PAYMENT, (id,))
+        bus.publish(TOPIC_PAYMENTS, "deleted", {"paymentID": id})
         return {"message": "Payment deleted"}
     except Exception as e:
         logging.error(f"Error in delete_payment: {e}")
@@ -1,65 +1,102 @@
 from typing import Optional
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status, UploadFile, File
+from fastapi.responses import StreamingResponse
 import logging
 
-from ..db import fetchall_sql, execute_sql, get_connection, safe_close_connection
+from ..db import fetchall_sql, fetch_parallel, execute_sql
 from ..models.product import Product
-from .. import queries
+from ..listing import build_list_query
+from ..columnar import is_columnar, fetch_response
+from .. import queries, catalog_io
+from ..config import CATALOG_IMPORT_BATCH_SIZE
+from ..jobs import runner
+from .jobs import submit_job
+from ..profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+runner.register("products.import", catalog_io.run_import_job, catalog_io.discard_upload)
 
 def check_product_usage(product_id: int) -> dict:
     """Kiểm tra xem product có đang được sử dụng trong orders, stores, supplies không"""
-    conn = None
-    try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
-            # Kiểm tra trong orders (tbl_requests)
-            cursor.execute(queries.CHECK_PRODUCT_IN_REQUESTS, (product_id,))
-            orders_count = cursor.fetchone()['count']
-            
-            # Kiểm tra trong stores
-            cursor.execute(queries.CHECK_PRODUCT_IN_STORES, (product_id,))
-            stores_count = cursor.fetchone()['count']
-            
-            # Kiểm tra trong supplies
-            cursor.execute(queries.CHECK_PRODUCT_IN_SUPPLIES, (product_id,))
-            supplies_count = cursor.fetchone()['count']
-            
-            return {
-                'has_orders': orders_count > 0,
-                'orders_count': orders_count,
-                'has_stores': stores_count > 0,
-                'stores_count': stores_count,
-                'has_supplies': supplies_count > 0,
-                'supplies_count': supplies_count,
-                'can_delete': orders_count == 0 and stores_count == 0 and supplies_count == 0
-            }
-    finally:
-        safe_close_connection(conn)
+    # Ba câu đếm độc lập chạy song song, đọc từ primary vì kết quả quyết định có được xóa hay không
+    counts = fetch_parallel({
+        'orders': (queries.CHECK_PRODUCT_IN_REQUESTS, (product_id,)),  # tbl_requests
+        'stores': (queries.CHECK_PRODUCT_IN_STORES, (product_id, product_id)),
+        'supplies': (queries.CHECK_PRODUCT_IN_SUPPLIES, (product_id,)),
+    }, primary=True)
+    orders_count = counts['orders'][0]['count']
+    stores_count = counts['stores'][0]['count']
+    supplies_count = counts['supplies'][0]['count']
+
+    return {
+        'has_orders': orders_count > 0,
+        'orders_count': orders_count,
+        'has_stores': stores_count > 0,
+        'stores_count': stores_count,
+        'has_supplies': supplies_count > 0,
+        'supplies_count': supplies_count,
+        'can_delete': orders_count == 0 and stores_count == 0 and supplies_count == 0
+    }
 
 @router.get("/products")
-def get_products(search: Optional[str] = None, category: Optional[str] = None):
+def get_products(request: Request, search: Optional[str] = None, category: Optional[str] = None, format: str = "json"):
+    """
+    Danh sách sản phẩm. Hỗ trợ fields=, sort=, limit/offset và bộ lọc theo cột
+    (vd. priceEach__gte=100&productLine__in=Laptop,Phone) - xem listing.py.
+    format=columnar trả về {"columns": [...], "rows": [[...]]} (xem columnar.py)
+    """
+    columnar = is_columnar(format)
     try:
-        if search or category:
-            conditions = []
-            params = []
-            if search:
-                conditions.append("(productName LIKE %s OR productBrand LIKE %s OR productLine LIKE %s)")
-                search_pattern = f"%{search}%"
-                params.extend([search_pattern, search_pattern, search_pattern])
-            if category:
-                conditions.append("productLine = %s")
-                params.append(category)
-            where_clause = " WHERE " + " AND ".join(conditions)
-            query = f"SELECT * FROM tbl_product{where_clause}"
-            return fetchall_sql(query, tuple(params))
-        else:
-            return fetchall_sql(queries.SELECT_PRODUCTS)
+        conditions = []
+        params = []
+        if search:
+            conditions.append("(productName LIKE %s OR productBrand LIKE %s OR productLine LIKE %s)")
+            search_pattern = f"%{search}%"
+            params.extend([search_pattern, search_pattern, search_pattern])
+        if category:
+            conditions.append("productLine = %s")
+            params.append(category)
+        if not conditions and not (request.query_params.keys() - {"format"}):
+            return fetch_response(queries.SELECT_PRODUCTS, columnar=columnar)
+        query, query_params = build_list_query(
+            "tbl_product", queries.LIST_COLUMNS_PRODUCTS, request.query_params, conditions, params
+        )
+        return fetch_response(query, query_params, columnar)
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in get_products: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/products/export")
+def export_products(format: str = "csv"):
+    """Xuất toàn bộ tbl_product theo kiểu streaming (csv, ndjson, arrow hoặc parquet)"""
+    return catalog_io.export_response(queries.EXPORT_PRODUCTS, format, "products")
+
+@router.post("/products/import")
+def import_products(file: UploadFile = File(...), batch_size: int = CATALOG_IMPORT_BATCH_SIZE,
+                    dry_run: bool = False, background: bool = False):
+    """
+    Nhập danh mục từ CSV/XLSX (cột theo model Product, thêm productID nếu muốn cập nhật theo ID).
+    Trả về NDJSON: lỗi từng dòng, tiến độ sau mỗi lô và tổng kết ở dòng cuối.
+    background=true: chạy trong job nền, trả về 202 kèm jobID (xem GET /jobs/{id}).
+    """
+    batch_size = max(1, min(batch_size, 5000))
+    catalog_io.check_format(file.filename)
+    if background:
+        params = {
+            "path": catalog_io.save_upload(file), "filename": file.filename, "batch_size": batch_size, "dry_run": dry_run,
+        }
+        try:
+            return submit_job("products.import", params)
+        except Exception:
+            catalog_io.discard_upload(params)
+            raise
+    rows = catalog_io.read_rows(file.filename, file.file)
+    events = catalog_io.import_products(rows, batch_size, dry_run)
+    return StreamingResponse(catalog_io.ndjson(events), media_type="application/x-ndjson")
+
 
 @router.get("/products/{id}")
 def get_product(id: int):
@@ -1,85 +1,284 @@
 from typing import Optional
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Response
 import logging
 
-from ..db import fetchall_sql
-from .. import queries
+from ..db import fetchall_sql, fetch_parallel, all_tenants, current_tenant, fan_out_tenants
+from ..config import TENANT_SHARDS, LOW_STOCK_RATIO
+from .. import arrow_export, queries, stock_snapshots
+from ..jobs import runner
+from ..report_precompute import report_store
+from .inventory import parse_snapshot_date
+from .jobs import submit_job
+from ..profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
+# ===== COMPUTE =====
+# Phần tính toán tách khỏi route để chạy được cả trong request lẫn trong job nền (jobs.py)
+def _date_window(start_date: Optional[str], end_date: Optional[str]):
+    conditions = []
+    params = []
+    if start_date:
+        conditions.append("o.orderDate >= %s")
+        params.append(start_date)
+    if end_date:
+        conditions.append("o.orderDate <= %s")
+        params.append(end_date)
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+    return where_clause, params
+
+def revenue_query(start_date: Optional[str] = None, end_date: Optional[str] = None):
+    where_clause, params = _date_window(start_date, end_date)
+    return queries.SELECT_REVENUE_REPORT.format(where_clause=where_clause), tuple(params)
+
+def top_products_query(limit: int = 10, start_date: Optional[str] = None, end_date: Optional[str] = None):
+    where_clause, params = _date_window(start_date, end_date)
+    return queries.SELECT_TOP_PRODUCTS_REPORT.format(where_clause=where_clause), tuple(params + [limit])
+
+def compute_revenue(start_date: Optional[str] = None, end_date: Optional[str] = None):
+    return fetchall_sql(*revenue_query(start_date, end_date))
+
+def compute_top_products(limit: int = 10, start_date: Optional[str] = None, end_date: Optional[str] = None):
+    return fetchall_sql(*top_products_query(limit, start_date, end_date))
+
+def compute_inventory_report():
+    return fetchall_sql(queries.SELECT_INVENTORY_REPORT, (LOW_STOCK_RATIO,))
+
+def compute_summary():
+    # Tổng hợp các thống kê chính; các câu độc lập chạy song song
+    rows = fetch_parallel({
+        'totalCustomers': queries.SUMMARY_TOTAL_CUSTOMERS,
+        'totalProducts': queries.SUMMARY_TOTAL_PRODUCTS,
+        'totalOrders': queries.SUMMARY_TOTAL_ORDERS,
+        'totalRevenue': queries.SUMMARY_TOTAL_REVENUE,
+        'totalDebts': queries.SUMMARY_TOTAL_DEBTS,
+        'totalInventoryValue': queries.SUMMARY_TOTAL_INVENTORY_VALUE,
+    })
+    summary = {}
+
+    summary['totalCustomers'] = rows['totalCustomers'][0]['count']
+    summary['totalProducts'] = rows['totalProducts'][0]['count']
+    summary['totalOrders'] = rows['totalOrders'][0]['count']
+    summary['totalRevenue'] = rows['totalRevenue'][0]['total'] or 0
+    summary['totalDebts'] = rows['totalDebts'][0]['total'] or 0
+    summary['totalInventoryValue'] = rows['totalInventoryValue'][0]['total'] or 0
+
+    return summary
+
+runner.register("reports.revenue", lambda params, context: compute_revenue(**params))
+runner.register("reports.top-products", lambda params, context: compute_top_products(**params))
+runner.register("reports.inventory", lambda params, context: compute_inventory_report())
+runner.register("reports.summary", lambda params, context: compute_summary())
+
+# Các biến thể ReportsPage.jsx luôn gọi được tính trước (report_precompute.py)
+report_store.register("revenue", compute_revenue, windowed=True)
+report_store.register("top-products", compute_top_products, windowed=True, limit=10)
+report_store.register("inventory", compute_inventory_report)
+report_store.register("summary", compute_summary)
+
+def precomputed(response: Response, report: str, params: dict = None):
+    """Kết quả đã tính trước nếu tham số khớp một biến thể; thời điểm tính nằm ở header X-Report-Computed-At"""
+    if current_tenant() is not None:
+        # Chỉ database mặc định được tính trước
+        return None
+    cached = report_store.get(report, params)
+    if cached is None:
+        return None
+    result, computed_at = cached
+    response.headers["X-Report-Computed-At"] = computed_at.isoformat(timespec="seconds")
+    return result
+
+# ===== CROSS-STORE =====
+# ?stores=all (hoặc danh sách mã cửa hàng) chạy báo cáo trên từng shard song song (db.fan_out_tenants) rồi gộp
+DEFAULT_STORE = "default"  # Tên của database mặc định trong ?stores= và cột storeID
+_ALL_ROWS = 2 ** 31 - 1  # Mỗi shard trả toàn bộ sản phẩm để top-products sau khi gộp là chính xác
+
+def parse_stores(stores: Optional[str]):
+    """Danh sách tenant cần gộp, None nếu chỉ báo cáo cửa hàng của request"""
+    if not stores:
+        return None
+    if stores == "all":
+        return all_tenants()
+    tenants = []
+    for store in (value.strip() for value in stores.split(",") if value.strip()):
+        if store != DEFAULT_STORE and store not in TENANT_SHARDS:
+            raise HTTPException(status_code=400, detail=f"Unknown store: {store}")
+        tenants.append(None if store == DEFAULT_STORE else store)
+    return tenants
+
+def merge_revenue(results: dict, **params):
+    totals = {}
+    for rows in results.values():
+        for row in rows:
+            merged = totals.setdefault(row["date"], {
+                "date": row["date"], "orderCount": 0, "totalRevenue": 0, "paidAmount": 0, "unpaidAmount": 0,
+            })
+            for field in ("orderCount", "totalRevenue", "paidAmount", "unpaidAmount"):
+                merged[field] += row[field] or 0
+    return sorted(totals.values(), key=lambda row: row["date"], reverse=True)
+
+def merge_top_products(results: dict, limit: int = 10, **params):
+    # Mỗi shard có danh mục riêng nên sản phẩm được ghép theo (productName, productBrand) như khi nhập danh mục
+    totals = {}
+    for rows in results.values():
+        for row in rows:
+            key = (row["productName"], row["productBrand"])
+            # productID khác nhau giữa các shard nên không giữ lại
+            merged = totals.setdefault(key, {
+                "productName": row["productName"], "productLine": row["productLine"], "productBrand": row["productBrand"],
+                "totalQuantitySold": 0, "totalRevenue": 0,
+            })
+            merged["totalQuantitySold"] += row["totalQuantitySold"] or 0
+            merged["totalRevenue"] += row["totalRevenue"] or 0
+    return sorted(totals.values(), key=lambda row: row["totalQuantitySold"], reverse=True)[:limit]
+
+def merge_inventory(results: dict, **params):
+    return [{"storeID": tenant or DEFAULT_STORE, **row} for tenant, rows in results.items() for row in rows]
+
+def merge_summary(results: dict, **params):
+    merged = {}
+    for summary in results.values():
+        for field, value in summary.items():
+            merged[field] = merged.get(field, 0) + (value or 0)
+    return merged
+
+CROSS_STORE_REPORTS = {
+    "revenue": (compute_revenue, merge_revenue),
+    "top-products": (lambda limit=10, **params: compute_top_products(_ALL_ROWS, **params), merge_top_products),
+    "inventory": (compute_inventory_report, merge_inventory),
+    "summary": (compute_summary, merge_summary),
+}
+
+def compute_across_stores(report: str, tenants: list, **params):
+    compute, merge = CROSS_STORE_REPORTS[report]
+    return merge(fan_out_tenants(lambda: compute(**params), tenants), **params)
+
+runner.register("reports.cross-store", lambda params, context: compute_across_stores(**params))
+
+def cross_store(report: str, tenants: list, background: bool, params: dict = None):
+    if background:
+        return submit_job("reports.cross-store", {"report": report, "tenants": tenants, **(params or {})})
+    return compute_across_stores(report, tenants, **(params or {}))
+
+def analytics_format(format: Optional[str], accept: Optional[str], stores: Optional[str] = None):
+    """"arrow"/"parquet" nếu client yêu cầu (?format= hoặc Accept), None nếu trả JSON như cũ"""
+    kind = arrow_export.negotiate(format, accept)
+    if format and kind is None:
+        raise HTTPException(status_code=400, detail="format must be arrow or parquet")
+    if kind and stores:
+        raise HTTPException(status_code=400, detail="Arrow/Parquet export covers one store; omit stores")
+    return kind
+
+# ===== ROUTES =====
+# Các báo cáo dạng bảng nhận thêm ?format=arrow|parquet (hoặc Accept tương ứng): luôn đọc dữ liệu mới,
+# stream thẳng từ database (arrow_export.py), bỏ qua kết quả tính trước và job nền
 @router.get("/reports/revenue")
-def get_revenue_report(start_date: Optional[str] = None, end_date: Optional[str] = None):
+def get_revenue_report(response: Response, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                       background: bool = False, fresh: bool = False, format: Optional[str] = None,
+                       accept: Optional[str] = Header(None), stores: Optional[str] = None):
     try:
-        conditions = []
-        params = []
-        if start_date:
-            conditions.append("o.orderDate >= %s")
-            params.append(start_date)
-        if end_date:
-            conditions.append("o.orderDate <= %s")
-            params.append(end_date)
-        
-        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
-        query = queries.SELECT_REVENUE_REPORT.format(where_clause=where_clause)
-        return fetchall_sql(query, tuple(params) if params else ())
+        params = {"start_date": start_date, "end_date": end_date}
+        kind = analytics_format(format, accept, stores)
+        tenants = parse_stores(stores)
+        if tenants is not None:
+            return cross_store("revenue", tenants, background, params)
+        if kind:
+            return arrow_export.export(kind, *revenue_query(start_date, end_date), filename="revenue")
+        if background:
+            return submit_job("reports.revenue", params)
+        cached = None if fresh else precomputed(response, "revenue", params)
+        return cached if cached is not None else compute_revenue(start_date, end_date)
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in get_revenue_report: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/reports/top-products")
-def get_top_products(limit: int = 10, start_date: Optional[str] = None, end_date: Optional[str] = None):
+def get_top_products(response: Response, limit: int = 10, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                     background: bool = False, fresh: bool = False, format: Optional[str] = None,
+                     accept: Optional[str] = Header(None), stores: Optional[str] = None):
     try:
-        conditions = []
-        params = []
-        if start_date:
-            conditions.append("o.orderDate >= %s")
-            params.append(start_date)
-        if end_date:
-            conditions.append("o.orderDate <= %s")
-            params.append(end_date)
-        
-        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
-        params_list = list(params)
-        params_list.append(limit)
-        
-        query = queries.SELECT_TOP_PRODUCTS_REPORT.format(where_clause=where_clause)
-        return fetchall_sql(query, tuple(params_list))
+        params = {"limit": limit, "start_date": start_date, "end_date": end_date}
+        kind = analytics_format(format, accept, stores)
+        tenants = parse_stores(stores)
+        if tenants is not None:
+            return cross_store("top-products", tenants, background, params)
+        if kind:
+            return arrow_export.export(kind, *top_products_query(limit, start_date, end_date), filename="top-products")
+        if background:
+            return submit_job("reports.top-products", params)
+        cached = None if fresh else precomputed(response, "top-products", params)
+        return cached if cached is not None else compute_top_products(limit, start_date, end_date)
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in get_top_products: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/reports/inventory")
-def get_inventory_report():
+def get_inventory_report(response: Response, background: bool = False, fresh: bool = False,
+                         format: Optional[str] = None, accept: Optional[str] = Header(None), stores: Optional[str] = None):
     try:
-        return fetchall_sql(queries.SELECT_INVENTORY_REPORT)
+        kind = analytics_format(format, accept, stores)
+        tenants = parse_stores(stores)
+        if tenants is not None:
+            return cross_store("inventory", tenants, background)
+        if kind:
+            return arrow_export.export(kind, queries.SELECT_INVENTORY_REPORT, (LOW_STOCK_RATIO,), filename="inventory")
+        if background:
+            return submit_job("reports.inventory")
+        cached = None if fresh else precomputed(response, "inventory")
+        return cached if cached is not None else compute_inventory_report()
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in get_inventory_report: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/reports/stock-at")
+def get_stock_at_report(date: str):
+    """Tồn kho của tất cả inventory tại cuối ngày `date` (YYYY-MM-DD)"""
+    try:
+        totals = {}
+        for row in stock_snapshots.stock_at(parse_snapshot_date(date)):
+            totals[row["inventoryID"]] = totals.get(row["inventoryID"], 0) + row["quantity"]
+        return {
+            "date": date,
+            "inventories": [{"inventoryID": k, "stockQuantity": v} for k, v in totals.items()],
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error in get_stock_at_report: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/reports/summary")
-def get_summary_report():
+def get_summary_report(response: Response, background: bool = False, fresh: bool = False, stores: Optional[str] = None):
     try:
-        # Tổng hợp các thống kê chính
-        summary = {}
-        
-        summary['totalCustomers'] = fetchall_sql(queries.SUMMARY_TOTAL_CUSTOMERS)[0]['count']
-        summary['totalProducts'] = fetchall_sql(queries.SUMMARY_TOTAL_PRODUCTS)[0]['count']
-        summary['totalOrders'] = fetchall_sql(queries.SUMMARY_TOTAL_ORDERS)[0]['count']
-        
-        revenue = fetchall_sql(queries.SUMMARY_TOTAL_REVENUE)
-        summary['totalRevenue'] = revenue[0]['total'] or 0
-        
-        debts = fetchall_sql(queries.SUMMARY_TOTAL_DEBTS)
-        summary['totalDebts'] = debts[0]['total'] or 0
-        
-        inventory = fetchall_sql(queries.SUMMARY_TOTAL_INVENTORY_VALUE)
-        summary['totalInventoryValue'] = inventory[0]['total'] or 0
-        
-        return summary
+        tenants = parse_stores(stores)
+        if tenants is not None:
+            return cross_store("summary", tenants, background)
+        if background:
+            return submit_job("reports.summary")
+        cached = None if fresh else precomputed(response, "summary")
+        return cached if cached is not None else compute_summary()
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in get_summary_report: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/reports/precompute")
+def get_precompute_stats():
+    return report_store.stats()
+
+@router.post("/reports/precompute")
+def refresh_precomputed_reports():
+    """Tính lại ngay các biến thể báo cáo chuẩn (chạy nền, không chờ kết quả)"""
+    report_store.request_refresh()
+    return {"message": "Report refresh requested"}
+
 @router.get("/categories")
 def get_categories():
     try:
@@ -1,16 +1,19 @@
 from fastapi import APIRouter, HTTPException, status
 import logging
 
-from ..db import fetchall_sql, execute_sql
+from ..db import fetchall_sql, execute_sql, execute_sql_grouped
 from ..models.request import Request
+from ..columnar import is_columnar, fetch_response
 from .. import queries
+from ..profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.get("/requests")
-def get_requests():
+def get_requests(format: str = "json"):
+    columnar = is_columnar(format)
     try:
-        return fetchall_sql(queries.SELECT_REQUESTS)
+        return fetch_response(queries.SELECT_REQUESTS, columnar=columnar)
     except Exception as e:
         logging.error(f"Error in get_request: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -26,7 +29,7 @@ def get_request(id: int):
 @router.post("/requests", status_code=status.HTTP_201_CREATED)
 def create_request(payload: Request):
     try:
-        request_id = execute_sql(queries.INSERT_REQUEST, (
+        request_id = execute_sql_grouped(queries.INSERT_REQUEST, (
             payload.orderID, payload.productID, payload.quantityOrdered, payload.discount, payload.note
         ))
         return {"message": "Request created", "requestID": request_id}
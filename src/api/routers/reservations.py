@@ -0,0 +1,67 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, status
+import logging
+
+from ..models.reservation import Reservation
+from ..reservations import current, ReservationNotFound, ReservationConflict
+from ..profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+def parse_product_ids(ids: str) -> list:
+    try:
+        return [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of product IDs")
+
+@router.get("/reservations/availability")
+def get_availability(ids: Optional[str] = None):
+    """Số lượng có thể bán (tồn kho - đang giữ) theo sản phẩm, đọc từ bộ nhớ; ids=1,2,3 hoặc tất cả"""
+    return current().availability(parse_product_ids(ids) if ids else None)
+
+@router.get("/reservations/stats")
+def get_reservation_stats():
+    return current().stats()
+
+@router.post("/reservations", status_code=status.HTTP_201_CREATED)
+def create_reservation(payload: Reservation):
+    """Giữ hàng cho giỏ hàng (tất cả các dòng hoặc không dòng nào); 409 nếu không đủ hàng"""
+    try:
+        return current().create([dict(item) for item in payload.items], payload.customerID)
+    except ReservationConflict as e:
+        raise HTTPException(status_code=409, detail=e.args[0])
+    except Exception as e:
+        logging.error(f"Error in create_reservation: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/reservations/{reservation_id}")
+def get_reservation(reservation_id: str):
+    reservation = current().get(reservation_id)
+    if reservation is None:
+        raise HTTPException(status_code=404, detail="Reservation not found or expired")
+    return reservation
+
+@router.put("/reservations/{reservation_id}")
+def update_reservation(reservation_id: str, payload: Reservation):
+    """Thay các dòng của giỏ hàng và gia hạn thời gian giữ"""
+    try:
+        return current().update(reservation_id, [dict(item) for item in payload.items])
+    except ReservationNotFound:
+        raise HTTPException(status_code=404, detail="Reservation not found or expired")
+    except ReservationConflict as e:
+        raise HTTPException(status_code=409, detail=e.args[0])
+    except Exception as e:
+        logging.error(f"Error in update_reservation: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/reservations/{reservation_id}")
+def delete_reservation(reservation_id: str):
+    try:
+        if not current().release(reservation_id):
+            raise HTTPException(status_code=404, detail="Reservation not found or expired")
+        return {"message": "Reservation released"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error in delete_reservation: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,16 +1,19 @@
 from fastapi import APIRouter, HTTPException, status
 import logging
 
-from ..db import fetchall_sql, execute_sql
+from ..db import execute_sql
 from ..models.staff import Staff
+from ..columnar import is_columnar, fetch_response
 from .. import queries
+from ..profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.get("/staffs")
-def get_staff():
+def get_staff(format: str = "json"):
+    columnar = is_columnar(format)
     try:
-        return fetchall_sql(queries.SELECT_STAFFS)
+        return fetch_response(queries.SELECT_STAFFS, columnar=columnar)
     except Exception as e:
         logging.error(f"Error in get_staff: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,39 +1,101 @@
 import datetime
+from typing import Optional
 from fastapi import APIRouter, HTTPException, status
 import logging
 
-from ..db import fetchall_sql, execute_sql, get_connection, safe_close_connection
+from ..db import get_connection, safe_close_connection
 from ..models.store import Store
-from .. import queries
+from ..columnar import is_columnar, fetch_response
+from .. import queries, alerts, store_archive, valuation, stock_movements
+from ..config import STORES_HOT_RETENTION_DAYS
+from ..event_bus import bus, TOPIC_STORES
+from ..profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+def store_history_query(conditions: list, params: list, include_archive: bool):
+    """Dựng truy vấn lịch sử kho; chỉ UNION thêm bảng archive khi thật sự cần"""
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+    tables = ["tbl_stores", "tbl_stores_archive"] if include_archive else ["tbl_stores"]
+    parts = [queries.SELECT_STORE_HISTORY.format(table=table, where_clause=where_clause) for table in tables]
+    query = " UNION ALL ".join(parts) + " ORDER BY storeDate DESC"
+    return query, tuple(params * len(tables))
 
 @router.get("/stores")
-def get_store():
+def get_store(
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+    role: Optional[str] = None,
+    include_archive: bool = False,
+    format: str = "json",
+):
+    """
+    Lịch sử biến động kho, mới nhất trước. Mặc định chỉ đọc bảng tbl_stores (các biến động gần đây);
+    bảng archive chỉ được đọc khi include_archive=true, date_from cũ hơn mốc lưu giữ hoặc chỉ có date_to.
+    """
+    columnar = is_columnar(format)
     try:
-        return fetchall_sql(queries.SELECT_STORES)
+        if not (date_from or date_to or role or include_archive):
+            return fetch_response(queries.SELECT_STORES, columnar=columnar)
+        conditions = []
+        params = []
+        if date_from:
+            conditions.append("s.storeDate >= %s")
+            params.append(date_from)
+        if date_to:
+            conditions.append("s.storeDate < %s")
+            params.append(date_to + datetime.timedelta(days=1))
+        if role:
+            conditions.append("s.roleStore = %s")
+            params.append(role)
+        query, query_params = store_history_query(
+            conditions, params, include_archive or store_archive.needs_archive(date_from, date_to)
+        )
+        return fetch_response(query, query_params, columnar)
     except Exception as e:
         logging.error(f"Error in get_store: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/stores/product/{product_id}")
-def get_stores_by_product(product_id: int):
+def get_stores_by_product(product_id: int, include_archive: bool = False, format: str = "json"):
     """Lấy tất cả stores của một product"""
+    columnar = is_columnar(format)
     try:
-        return fetchall_sql(queries.SELECT_STORES_BY_PRODUCT, (product_id,))
+        if include_archive:
+            return fetch_response(*store_history_query(["s.productID = %s"], [product_id], True), columnar)
+        return fetch_response(queries.SELECT_STORES_BY_PRODUCT, (product_id,), columnar)
     except Exception as e:
         logging.error(f"Error in get_stores_by_product: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/stores/{inventory_id}")
-def get_stores_by_inventory(inventory_id: int):
+def get_stores_by_inventory(inventory_id: int, include_archive: bool = False, format: str = "json"):
     """Lấy tất cả stores của một inventory"""
+    columnar = is_columnar(format)
     try:
-        return fetchall_sql(queries.SELECT_STORES_BY_INVENTORY, (inventory_id,))
+        if include_archive:
+            return fetch_response(*store_history_query(["s.inventoryID = %s"], [inventory_id], True), columnar)
+        return fetch_response(queries.SELECT_STORES_BY_INVENTORY, (inventory_id,), columnar)
     except Exception as e:
         logging.error(f"Error in get_stores_by_inventory: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/stores/archive")
+def archive_stores(retention_days: Optional[int] = None):
+    """Chạy ngay job lưu trữ: chuyển biến động cũ hơn retention_days ngày sang tbl_stores_archive"""
+    if retention_days is not None and retention_days < STORES_HOT_RETENTION_DAYS:
+        # Truy vấn mặc định chỉ đọc tbl_stores từ mốc STORES_HOT_RETENTION_DAYS, lưu trữ sớm hơn sẽ làm mất dòng
+        raise HTTPException(
+            status_code=400,
+            detail=f"retention_days must be at least STORES_HOT_RETENTION_DAYS ({STORES_HOT_RETENTION_DAYS})"
+        )
+    try:
+        archived = store_archive.archive_store_history(retention_days or STORES_HOT_RETENTION_DAYS)
+        return {"message": "Store history archived", "archived": archived}
+    except Exception as e:
+        logging.error(f"Error in archive_stores: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/stores", status_code=status.HTTP_201_CREATED)
 def create_store(payload: Store):
     conn = None
@@ -59,11 +121,19 @@ def create_store(payload: Store):
             ))
             
             # Cập nhật stock quantity trong inventory nếu roleStore là Import
+            alert = None
             if payload.roleStore == 'Import':
+                # Nhập không kèm giá: định giá theo unitCost hiện tại của inventory
+                cursor.execute(queries.SELECT_INVENTORY_FOR_VALUATION, (payload.inventoryID,))
+                unit_cost = cursor.fetchone()["unitCost"]
+                state = stock_movements.valuation_state(cursor, payload.inventoryID)
+                valuation.receive(cursor, payload.inventoryID, payload.quantityStore, unit_cost, state)
                 cursor.execute(queries.UPDATE_INVENTORY_FOR_STORE_IMPORT, (payload.quantityStore, payload.inventoryID))
+                alert = alerts.evaluate_inventory(cursor, payload.inventoryID)
             
             conn.commit()
-            
+        alerts.publish([alert])
+        bus.publish(TOPIC_STORES, "created", dict(payload))
         return {"message": "Store created"}
     except HTTPException:
         if conn:
@@ -104,6 +174,7 @@ def update_store(id: str, payload: Store):
                 id    # storeID
             ))
             conn.commit()
+        bus.publish(TOPIC_STORES, "updated", {**dict(payload), "id": id})
         return {"message": "Store updated successfully"}
 
     except HTTPException:
@@ -120,9 +191,20 @@ def update_store(id: str, payload: Store):
     
 @router.delete("/stores/{id}")
 def delete_store(id: int):
+    conn = None
     try:
-        execute_sql(queries.DELETE_STORE, (id,))
+        conn = get_connection()
+        with conn.cursor() as cursor:
+            # Xóa cả lịch sử đã lưu trữ, vì CHECK_..._IN_STORES đếm cả hai bảng
+            cursor.execute(queries.DELETE_STORE, (id,))
+            cursor.execute(queries.DELETE_STORE_ARCHIVE, (id,))
+        conn.commit()
+        bus.publish(TOPIC_STORES, "deleted", {"productID": id})
         return {"message": "Store deleted"}
     except Exception as e:
+        if conn:
+            conn.rollback()
         logging.error(f"Error in delete_store: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        safe_close_connection(conn)
@@ -2,34 +2,39 @@ import datetime
 from fastapi import APIRouter, HTTPException, status
 import logging
 
-from ..db import fetchall_sql, execute_sql, get_connection, safe_close_connection
+from ..db import execute_sql, get_connection, safe_close_connection
 from ..models.supply import Supply
+from ..columnar import is_columnar, fetch_response
 from .. import queries
+from ..profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.get("/supplies")
-def get_supply():
+def get_supply(format: str = "json"):
+    columnar = is_columnar(format)
     try:
-        return fetchall_sql(queries.SELECT_SUPPLIES)
+        return fetch_response(queries.SELECT_SUPPLIES, columnar=columnar)
     except Exception as e:
         logging.error(f"Error in get_supply: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/supplies/product/{product_id}")
-def get_supplies_by_product(product_id: int):
+def get_supplies_by_product(product_id: int, format: str = "json"):
     """Lấy tất cả supplies của một product"""
+    columnar = is_columnar(format)
     try:
-        return fetchall_sql(queries.SELECT_SUPPLIES_BY_PRODUCT, (product_id,))
+        return fetch_response(queries.SELECT_SUPPLIES_BY_PRODUCT, (product_id,), columnar)
     except Exception as e:
         logging.error(f"Error in get_supplies_by_product: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/supplies/{vendor_id}")
-def get_supplies_by_vendor(vendor_id: int):
+def get_supplies_by_vendor(vendor_id: int, format: str = "json"):
     """Lấy tất cả supplies của một vendor"""
+    columnar = is_columnar(format)
     try:
-        return fetchall_sql(queries.SELECT_SUPPLIES_BY_VENDOR, (vendor_id,))
+        return fetch_response(queries.SELECT_SUPPLIES_BY_VENDOR, (vendor_id,), columnar)
     except Exception as e:
         logging.error(f"Error in get_supplies_by_vendor: {e}")
         raise HTTPException(status_code=500, detail=str(e))
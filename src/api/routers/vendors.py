@@ -1,16 +1,19 @@
 from fastapi import APIRouter, HTTPException, status
 import logging
 
-from ..db import fetchall_sql, execute_sql, get_connection, safe_close_connection
+from ..db import execute_sql, get_connection, safe_close_connection
 from ..models.vendor import Vendor
+from ..columnar import is_columnar, fetch_response
 from .. import queries
+from ..profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.get("/vendors")
-def get_vendors():
+def get_vendors(format: str = "json"):
+    columnar = is_columnar(format)
     try:
-        return fetchall_sql(queries.SELECT_VENDORS)
+        return fetch_response(queries.SELECT_VENDORS, columnar=columnar)
     except Exception as e:
         logging.error(f"Error in get_vendors: {e}")
         raise HTTPException(status_code=500, detail=str(e))
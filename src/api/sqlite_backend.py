@@ -0,0 +1,360 @@
+"""
+Backend SQLite nhúng cho chi nhánh nhỏ (một máy, không cần MySQL server) và cho benchmark/test.
+
+Bật bằng DB_BACKEND = "sqlite" trong config.py (hoặc db.use_sqlite(path) trong script).
+Các câu lệnh trong queries.py viết cho MySQL được dịch sang SQLite khi thực thi (translate):
+%s -> ?, NOW()/CURDATE(), ON DUPLICATE KEY UPDATE -> ON CONFLICT DO UPDATE, INSERT IGNORE, IF(), <=>,
+(a, b) IN ((...), ...), phép chia luôn ra số thực, bỏ FOR UPDATE (chuỗi trong dấu nháy không bị dịch); DDL: AUTO_INCREMENT, KEY/INDEX
+trong CREATE TABLE tách thành CREATE INDEX, CREATE TABLE ... LIKE. Câu nào không dịch máy móc được
+thì có bản viết tay trong queries.SQLITE_OVERRIDES.
+
+Kết nối có cùng giao diện với pymysql mà code đang dùng (cursor theo cursorclass, with cursor,
+commit/rollback/close, lastrowid, rowcount, description, insert_id):
+- WAL + synchronous=NORMAL, cache/mmap lớn, temp_store trong bộ nhớ
+- Mỗi thread giữ sẵn vài kết nối rảnh: close() trả kết nối về cho thread thay vì đóng
+- Transaction ghi: câu đầu tiên không phải SELECT thường (hoặc có FOR UPDATE) mở BEGIN IMMEDIATE,
+  giữ khóa ghi của cả database tới commit/rollback (SQLite chỉ có một writer) - tương đương khóa dòng
+  của MySQL. Khóa ghi trong tiến trình được xếp hàng bằng threading.Lock thay vì busy-wait; một thread mở
+  transaction ghi thứ hai khi đang giữ khóa ở kết nối khác bị báo lỗi ngay thay vì tự chờ chính nó tới hết
+  busy_timeout.
+- ":memory:": database tạm dùng chung giữa các kết nối - file WAL trong /dev/shm (hoặc thư mục tạm),
+  cùng cách cô lập như database file (reader chỉ thấy dữ liệu đã commit), bị xóa khi Database được thu hồi
+"""
+import datetime
+import decimal
+import functools
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import weakref
+
+from pymysql.cursors import DictCursorMixin
+
+from . import tracing
+
+from .queries import SQLITE_OVERRIDES
+
+MAX_IDLE_PER_THREAD = 4
+_SHM_DIR = "/dev/shm"
+
+# ===== ADAPTERS / CONVERTERS =====
+# Ghi ngày giờ như MySQL DATETIME (không phần lẻ giây), DECIMAL dạng chuỗi để không mất chính xác;
+# đọc lại theo kiểu khai báo của cột như pymysql (datetime, date, Decimal); biểu thức (MIN, MAX...) mất kiểu
+# khai báo thì câu trong SQLITE_OVERRIDES đặt tên cột dạng "tên [KIỂU]"
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(" ", "seconds"))
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_adapter(decimal.Decimal, str)
+
+
+def _convert(parse):
+    def converter(raw: bytes):
+        text = raw.decode()
+        try:
+            return parse(text)
+        except (ValueError, decimal.InvalidOperation):
+            return text
+    return converter
+
+
+sqlite3.register_converter("DATETIME", _convert(datetime.datetime.fromisoformat))
+sqlite3.register_converter("TIMESTAMP", _convert(datetime.datetime.fromisoformat))
+sqlite3.register_converter("DATE", _convert(lambda text: datetime.date.fromisoformat(text[:10])))
+sqlite3.register_converter("DECIMAL", _convert(decimal.Decimal))
+
+
+# ===== DIALECT =====
+_NOW = "datetime('now', 'localtime')"
+_REWRITES = [
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"%%"), "%"),
+    (re.compile(r"\bNOW\(\)", re.I), _NOW),
+    (re.compile(r"\bCURDATE\(\)", re.I), "date('now', 'localtime')"),
+    (re.compile(r"\bINSERT\s+IGNORE\b", re.I), "INSERT OR IGNORE"),
+    (re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I), "ON CONFLICT DO UPDATE SET"),
+    (re.compile(r"\bVALUES\((\w+)\)", re.I), r"excluded.\1"),
+    (re.compile(r"\bIF\(", re.I), "IIF("),
+    (re.compile(r"<=>"), " IS "),
+    # SQLite chỉ nhận row value IN (subquery): (a, b) IN ((?, ?), ...) -> IN (VALUES (?, ?), ...)
+    (re.compile(r"\bIN\s*\(\s*\(", re.I), "IN (VALUES ("),
+    # MySQL chia luôn ra số thập phân, SQLite chia nguyên nếu hai vế là số nguyên
+    (re.compile(r"(?<![/*])/(?![/*])"), "* 1.0 /"),
+]
+# Chuỗi trong dấu nháy ('...', "...", `...`) được giữ nguyên khi dịch; chỉ %% được đổi như pymysql làm khi định dạng tham số
+_QUOTED = re.compile(r"""('(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*"|`[^`]*`)""")
+_ESCAPED_PERCENT = re.compile(r"%%")
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\b", re.I)
+_PLAIN_READ = re.compile(r"^\s*(SELECT|WITH|PRAGMA)\b", re.I)
+
+_DDL_REWRITES = [
+    (re.compile(r"\b\w*INT\s+(NOT\s+NULL\s+)?AUTO_INCREMENT\s+PRIMARY\s+KEY", re.I), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"\b\w*INT\s+(NOT\s+NULL\s+)?PRIMARY\s+KEY\s+AUTO_INCREMENT", re.I), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"\bDEFAULT\s+CURRENT_TIMESTAMP\b", re.I), f"DEFAULT ({_NOW})"),
+    (re.compile(r"\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\b", re.I), ""),
+    (re.compile(r"\s+UNSIGNED\b", re.I), ""),
+    (re.compile(r"\)\s*ENGINE\s*=.*$", re.I | re.S), ")"),
+]
+_CREATE_TABLE = re.compile(r"^\s*CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?(\w+)", re.I)
+_CREATE_TABLE_LIKE = re.compile(r"^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s+LIKE\s+(\w+)\s*$", re.I)
+_INLINE_INDEX = re.compile(r",\s*(UNIQUE\s+)?(?:KEY|INDEX)\s+(\w+)\s*\(([^)]*)\)", re.I)
+_CREATE_INDEX = re.compile(r"^\s*CREATE\s+(UNIQUE\s+)?INDEX\s+(?!IF\s)", re.I)
+
+
+@functools.lru_cache(maxsize=1024)
+def translate(query: str):
+    """(danh sách câu SQLite, cần khóa ghi hay không) cho một câu MySQL"""
+    if query in SQLITE_OVERRIDES:
+        sql = SQLITE_OVERRIDES[query]
+        return [sql], not _PLAIN_READ.match(sql)
+    if _CREATE_TABLE.match(query):
+        return _translate_create_table(query), True
+    if _CREATE_INDEX.match(query):
+        return [_CREATE_INDEX.sub(lambda m: f"CREATE {m.group(1) or ''}INDEX IF NOT EXISTS ", query)], True
+    locking = bool(_FOR_UPDATE.search(query)) or not _PLAIN_READ.match(query)
+    return [_rewrite(_FOR_UPDATE.sub("", query), _REWRITES)], locking
+
+
+def _rewrite(sql: str, rewrites: list) -> str:
+    """Áp các rewrite lên phần câu lệnh nằm ngoài chuỗi trong dấu nháy"""
+    parts = _QUOTED.split(sql)
+    for index, part in enumerate(parts):
+        if index % 2:
+            parts[index] = _ESCAPED_PERCENT.sub("%", part)
+            continue
+        for pattern, replacement in rewrites:
+            part = pattern.sub(replacement, part)
+        parts[index] = part
+    return "".join(parts)
+
+
+def _translate_create_table(query: str) -> list:
+    like = _CREATE_TABLE_LIKE.match(query)
+    if like:
+        # Được xử lý khi thực thi vì cần đọc định nghĩa bảng nguồn (Connection._create_table_like)
+        return [query]
+    table = _CREATE_TABLE.match(query).group(2)
+    indexes = [
+        f"CREATE {unique or ''}INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+        for unique, name, columns in _INLINE_INDEX.findall(query)
+    ]
+    sql = _INLINE_INDEX.sub("", query)
+    if not re.search(r"\bIF\s+NOT\s+EXISTS\b", sql, re.I):
+        sql = re.sub(r"\bTABLE\b", "TABLE IF NOT EXISTS", sql, count=1, flags=re.I)
+    for pattern, replacement in _DDL_REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return [_rewrite(sql, _REWRITES[2:4])] + indexes
+
+
+def is_already_exists(error: Exception) -> bool:
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ("already exists" in message or "duplicate column" in message)
+
+
+# ===== CONNECTIONS =====
+class Database:
+    """Một file (hoặc database tạm) SQLite: cấu hình, kết nối rảnh theo thread và khóa ghi"""
+
+    def __init__(self, path: str, cache_mb: int = 64, busy_timeout: float = 5.0):
+        self.path = path
+        self.memory = path == ":memory:"
+        self.cache_mb = cache_mb
+        self.busy_timeout = busy_timeout
+        # Xếp hàng các writer trong tiến trình (nhanh hơn busy handler của SQLite vốn ngủ rồi thử lại);
+        # _writers: thread đang giữ khóa ghi -> kết nối của nó, để phát hiện ghi lồng nhau trên cùng thread
+        self.write_lock = threading.Lock()
+        self._writers = {}
+        self._local = threading.local()
+        if self.memory:
+            # Shared cache không dùng được: reader hoặc thấy dữ liệu chưa commit (read_uncommitted) hoặc bị
+            # khóa ngay không chờ busy_timeout. Dùng file WAL tạm (/dev/shm nếu có), xóa khi Database bị thu hồi.
+            directory = tempfile.mkdtemp(prefix="store-sqlite-", dir=_SHM_DIR if os.path.isdir(_SHM_DIR) else None)
+            weakref.finalize(self, shutil.rmtree, directory, True)
+            self._uri = os.path.join(directory, "store.sqlite3")
+        else:
+            self._uri = path
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._open()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self._uri, timeout=self.busy_timeout, isolation_level=None,
+            check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+        )
+        # Database tạm không cần bền vững khi mất điện
+        conn.execute(f"PRAGMA synchronous={'OFF' if self.memory else 'NORMAL'}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA cache_size=-{self.cache_mb * 1024}")
+        conn.execute(f"PRAGMA mmap_size={self.cache_mb * 4 * 1024 * 1024}")
+        return conn
+
+    def _idle(self) -> list:
+        if not hasattr(self._local, "idle"):
+            self._local.idle = []
+        return self._local.idle
+
+    def connect(self, on_commit=None) -> "Connection":
+        idle = self._idle()
+        return Connection(self, idle.pop() if idle else self._open(), on_commit)
+
+    def release(self, raw: sqlite3.Connection):
+        idle = self._idle()
+        if len(idle) < MAX_IDLE_PER_THREAD:
+            idle.append(raw)
+        else:
+            raw.close()
+
+
+class Connection:
+    """Bọc sqlite3.Connection theo giao diện pymysql.connections.Connection mà code đang dùng"""
+
+    def __init__(self, database: Database, raw: sqlite3.Connection, on_commit=None):
+        self.database = database
+        self.raw = raw
+        self.on_commit = on_commit
+        self.open = True
+        self.locked = False
+        self.owner = None
+        self.last_insert_id = 0
+
+    def cursor(self, cursorclass=None) -> "Cursor":
+        as_dict = cursorclass is None or issubclass(cursorclass, DictCursorMixin)
+        return Cursor(self, as_dict)
+
+    def _begin(self):
+        if self.locked:
+            return
+        owner = threading.get_ident()
+        if self.database._writers.get(owner) is not None:
+            # Kết nối khác của chính thread này đang giữ khóa ghi: chờ busy_timeout cũng không bao giờ lấy được
+            raise sqlite3.OperationalError("database is locked by another connection of the same thread")
+        if not self.database.write_lock.acquire(timeout=self.database.busy_timeout):
+            raise sqlite3.OperationalError("database is locked")
+        try:
+            self.raw.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.database.write_lock.release()
+            raise
+        self.locked = True
+        self.owner = owner
+        self.database._writers[owner] = self
+
+    def _end(self, statement: str):
+        try:
+            if self.raw.in_transaction:
+                self.raw.execute(statement)
+        finally:
+            if self.locked:
+                self.locked = False
+                self.database._writers.pop(self.owner, None)
+                self.database.write_lock.release()
+
+    def commit(self):
+        self._end("COMMIT")
+        if self.on_commit:
+            self.on_commit()
+
+    def rollback(self):
+        self._end("ROLLBACK")
+
+    def insert_id(self) -> int:
+        return self.last_insert_id
+
+    def close(self):
+        if not self.open:
+            return
+        self.open = False
+        try:
+            self.rollback()
+        finally:
+            self.database.release(self.raw)
+
+    def _create_table_like(self, query: str):
+        target, source = _CREATE_TABLE_LIKE.match(query).groups()
+        row = self.raw.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (source,)).fetchone()
+        if row is None:
+            raise sqlite3.OperationalError(f"no such table: {source}")
+        sql = re.sub(rf"^CREATE TABLE (IF NOT EXISTS )?\"?{source}\"?", f"CREATE TABLE IF NOT EXISTS {target}", row[0])
+        self.raw.execute(sql)
+
+
+class Cursor:
+    """Bọc sqlite3.Cursor: dịch câu lệnh, trả dict (DictCursor) hoặc tuple (Cursor/SSCursor)"""
+
+    def __init__(self, connection: Connection, as_dict: bool):
+        self.connection = connection
+        self.as_dict = as_dict
+        self.raw = None
+        self.rowcount = -1
+        self.lastrowid = None
+        self._columns = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def description(self):
+        return self.raw.description if self.raw is not None else None
+
+    def _run(self, query: str, run):
+        began = time.perf_counter()
+        try:
+            return self._run_translated(query, run)
+        finally:
+            tracing.record_query(query, time.perf_counter() - began, "sqlite")
+
+    def _run_translated(self, query: str, run):
+        statements, locking = translate(query)
+        if locking:
+            self.connection._begin()
+        for sql in statements:
+            if _CREATE_TABLE_LIKE.match(sql):
+                self.connection._create_table_like(sql)
+                continue
+            self.raw = run(sql)
+        if self.raw is not None:
+            self.rowcount = self.raw.rowcount
+            self.lastrowid = self.raw.lastrowid
+            if self.lastrowid:
+                self.connection.last_insert_id = self.lastrowid
+            self._columns = [column[0] for column in self.raw.description] if self.raw.description else None
+        return self.rowcount
+
+    def execute(self, query: str, params=None):
+        return self._run(query, lambda sql: self.connection.raw.execute(sql, tuple(params or ())))
+
+    def executemany(self, query: str, seq_of_params):
+        return self._run(query, lambda sql: self.connection.raw.executemany(sql, [tuple(p) for p in seq_of_params]))
+
+    def _rows(self, rows: list) -> list:
+        if not self.as_dict:
+            return rows
+        columns = self._columns
+        return [dict(zip(columns, row)) for row in rows]
+
+    def fetchone(self):
+        row = self.raw.fetchone() if self.raw is not None else None
+        if row is None or not self.as_dict:
+            return row
+        return dict(zip(self._columns, row))
+
+    def fetchmany(self, size: int = 1):
+        return self._rows(self.raw.fetchmany(size)) if self.raw is not None else []
+
+    def fetchall(self):
+        return self._rows(self.raw.fetchall()) if self.raw is not None else []
+
+    def __iter__(self):
+        return iter(lambda: self.fetchone(), None)
+
+    def close(self):
+        if self.raw is not None:
+            self.raw.close()
+            self.raw = None
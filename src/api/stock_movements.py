@@ -0,0 +1,148 @@
+"""
+Các bước ghi của một biến động tồn kho (nhập, xuất, kiểm kê) trên cursor của transaction hiện tại.
+Dùng chung cho luồng đồng bộ trong routers/inventory_operations.py và luồng ghi trễ của journal.py.
+Hàm không commit; trả về sự kiện cảnh báo tồn kho (alerts) để publish sau khi commit.
+Định giá (valuation.py) được cập nhật trước khi đổi tbl_inventory để số dư đầu kỳ đúng.
+Inventory bật shard (hot_stock.py) được cộng/trừ vào shard thay vì dòng chính. Khi bật
+HOT_STOCK_SETTLE_SECONDS, xuất kho của inventory chia shard không khóa dòng định giá và dòng cảnh báo:
+số lượng xuất được cộng vào pendingIssue của shard, rồi thread nền (hoặc biến động kế tiếp cần định giá)
+ghi vào định giá và đánh giá lại cảnh báo theo lô (settle_pending).
+"""
+import datetime
+import logging
+import threading
+
+from .config import HOT_STOCK_SETTLE_SECONDS
+from .db import get_connection, safe_close_connection, all_tenants, use_tenant
+from . import queries, alerts, valuation, hot_stock
+
+_stop = threading.Event()
+_thread = None
+
+
+def get_stock(cursor, inventory_id: int):
+    """Số lượng tồn hiện tại trong database, None nếu inventory chưa tồn tại"""
+    cursor.execute(queries.SELECT_STOCK_QUANTITY_FOR_EXPORT, (inventory_id,))
+    row = cursor.fetchone()
+    return row["stockQuantity"] if row else None
+
+
+def valuation_state(cursor, inventory_id: int) -> dict:
+    """Khóa dòng định giá rồi ghi nốt phần xuất kho còn chờ của các shard (theo thứ tự khóa của hot_stock.py)"""
+    state = valuation.ensure_valuation(cursor, inventory_id)
+    pending = hot_stock.take_pending(cursor, inventory_id)
+    # Dòng định giá vừa được khởi tạo từ tồn kho hiện tại, tồn kho này đã trừ phần còn chờ
+    if pending and not state.get("seeded"):
+        valuation.issue(cursor, inventory_id, pending, state)
+    return state
+
+
+def apply_import(cursor, product_id: int, inventory_id: int, quantity: int, unit_cost: float, import_date=None):
+    # Thêm vào stores (lịch sử nhập kho)
+    cursor.execute(queries.INSERT_STORE_FOR_INVENTORY_IMPORT, (product_id, inventory_id, import_date or datetime.datetime.now(), quantity))
+    valuation.receive(cursor, inventory_id, quantity, unit_cost, valuation_state(cursor, inventory_id))
+
+    # Kiểm tra xem inventory record đã tồn tại chưa
+    cursor.execute(queries.SELECT_INVENTORY_BY_ID, (inventory_id,))
+    if cursor.fetchone():
+        # Cập nhật stock quantity nếu inventory đã tồn tại (inventory bật shard: dòng chính chỉ đổi giá)
+        if hot_stock.increment(cursor, inventory_id, quantity):
+            cursor.execute(queries.UPDATE_INVENTORY_FOR_IMPORT, (0, unit_cost, inventory_id))
+        else:
+            cursor.execute(queries.UPDATE_INVENTORY_FOR_IMPORT, (quantity, unit_cost, inventory_id))
+    else:
+        # Tạo inventory record mới nếu chưa có
+        cursor.execute(queries.INSERT_INVENTORY_FOR_IMPORT, (inventory_id, quantity, unit_cost))
+
+    return alerts.evaluate_inventory(cursor, inventory_id)
+
+
+def apply_export(cursor, product_id: int, inventory_id: int, quantity: int, export_date=None):
+    """Xuất kho; việc kiểm tra đủ hàng do nơi gọi thực hiện trước"""
+    # Thêm vào stores với roleStore = 'Export' (số lượng âm)
+    cursor.execute(queries.INSERT_STORE_FOR_EXPORT, (product_id, inventory_id, export_date or datetime.datetime.now(), -quantity))
+    if HOT_STOCK_SETTLE_SECONDS and hot_stock.decrement(cursor, inventory_id, quantity, defer_issue=True):
+        # Inventory chia shard: định giá và cảnh báo được ghi theo lô (settle_pending)
+        return None
+    valuation.issue(cursor, inventory_id, quantity)
+
+    # Cập nhật stock quantity
+    if HOT_STOCK_SETTLE_SECONDS or not hot_stock.decrement(cursor, inventory_id, quantity):
+        cursor.execute(queries.UPDATE_INVENTORY_FOR_EXPORT, (quantity, inventory_id))
+
+    return alerts.evaluate_inventory(cursor, inventory_id)
+
+
+def apply_stocktaking(cursor, product_id: int, inventory_id: int, actual_quantity: int, stocktaking_date=None):
+    """Kiểm kê; trả về (chênh lệch, cảnh báo) hoặc (None, None) nếu inventory không tồn tại"""
+    current = get_stock(cursor, inventory_id)
+    if current is None:
+        return None, None
+
+    difference = actual_quantity - current
+    valuation.adjust(cursor, inventory_id, difference, valuation_state(cursor, inventory_id))
+
+    # Cập nhật số lượng thực tế
+    cursor.execute(queries.UPDATE_INVENTORY_FOR_STOCKTAKING, (actual_quantity, inventory_id))
+    hot_stock.absorb(cursor, inventory_id)
+
+    # Ghi lại lịch sử kiểm kê vào stores
+    if difference != 0:
+        cursor.execute(queries.INSERT_STORE_FOR_STOCKTAKING, (product_id, inventory_id, stocktaking_date or datetime.datetime.now(), difference))
+
+    return difference, alerts.evaluate_inventory(cursor, inventory_id)
+
+
+# ===== SETTLE (xuất kho còn chờ định giá của inventory chia shard) =====
+def settle_pending(cursor, inventory_id: int):
+    """Ghi pendingIssue vào định giá và đánh giá lại cảnh báo; trả về sự kiện cảnh báo"""
+    valuation_state(cursor, inventory_id)
+    return alerts.evaluate_inventory(cursor, inventory_id)
+
+
+def settle_all() -> int:
+    """Ghi phần còn chờ của mọi inventory chia shard (mỗi inventory một transaction), trả về số inventory"""
+    conn = None
+    settled = 0
+    try:
+        conn = get_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(queries.SELECT_INVENTORIES_WITH_PENDING_ISSUE)
+            inventory_ids = [row["inventoryID"] for row in cursor.fetchall()]
+            for inventory_id in inventory_ids:
+                alert = settle_pending(cursor, inventory_id)
+                conn.commit()
+                alerts.publish([alert])
+                settled += 1
+    except Exception:
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        safe_close_connection(conn)
+    return settled
+
+
+def _settle_loop():
+    while not _stop.wait(HOT_STOCK_SETTLE_SECONDS):
+        # Mỗi cửa hàng có shard riêng (TENANT_SHARDS) được xử lý lần lượt
+        for tenant in all_tenants():
+            try:
+                with use_tenant(tenant):
+                    settle_all()
+            except Exception as e:
+                logging.error(f"Error settling hot stock valuation ({tenant or 'default'}): {e}")
+
+
+def start_settler():
+    global _thread
+    if HOT_STOCK_SETTLE_SECONDS and _thread is None:
+        _stop.clear()
+        _thread = threading.Thread(target=_settle_loop, name="hot-stock-settler", daemon=True)
+        _thread.start()
+
+
+def stop_settler():
+    global _thread
+    _stop.set()
+    _thread = None
@@ -0,0 +1,173 @@
+"""
+Ảnh chụp tồn kho theo ngày (tbl_stock_snapshot) dựng từ các biến động trong tbl_stores.
+
+Mỗi ngày có biến động, cặp (inventoryID, productID) được ghi một dòng số lượng cuối ngày.
+Tồn kho tại ngày D = ảnh chụp gần nhất <= D, cộng các biến động sau ngày đã chụp cuối cùng
+(tối đa một chu kỳ chụp) - không phải phát lại toàn bộ lịch sử tbl_stores.
+
+Quy ước roleStore: Import/Export/Stocktaking là chênh lệch (Export lưu số âm, Stocktaking lưu
+phần chênh lệch); Initial/Update là số lượng tuyệt đối; các role khác (Manual...) không đổi tồn kho.
+"""
+import datetime
+import logging
+import threading
+
+from .config import STOCK_SNAPSHOT_INTERVAL_HOURS
+from .db import get_connection, get_read_connection, safe_close_connection, all_tenants, use_tenant
+from . import queries
+
+DELTA_ROLES = {"Import", "Export", "Stocktaking"}
+ABSOLUTE_ROLES = {"Initial", "Update"}
+FETCH_SIZE = 5000
+# Mốc bắt đầu khi chưa có ảnh chụp nào (giá trị DATETIME nhỏ nhất của MySQL)
+EPOCH = datetime.datetime(1000, 1, 1)
+
+_stop = threading.Event()
+_thread = None
+
+
+def apply_movement(balance: int, role: str, quantity: int) -> int:
+    if role in ABSOLUTE_ROLES:
+        return quantity or 0
+    if role in DELTA_ROLES:
+        return balance + (quantity or 0)
+    return balance
+
+
+def _day_start(day: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(day, datetime.time.min)
+
+
+def _as_date(value) -> datetime.date:
+    return value.date() if isinstance(value, datetime.datetime) else value
+
+
+def _iter_movements(cursor, start: datetime.datetime, end: datetime.datetime, inventory_id: int = None):
+    """Biến động trong [start, end) từ cả bảng chính và bảng archive, theo thứ tự thời gian"""
+    if inventory_id is None:
+        cursor.execute(queries.SELECT_MOVEMENTS_BETWEEN, (start, end, start, end))
+    else:
+        cursor.execute(queries.SELECT_MOVEMENTS_BETWEEN_FOR_INVENTORY, (start, end, inventory_id, start, end, inventory_id))
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        yield from rows
+
+
+def _latest_snapshots(cursor, as_of: datetime.date, inventory_id: int = None) -> dict:
+    if inventory_id is None:
+        cursor.execute(queries.SELECT_LATEST_SNAPSHOTS, (as_of,))
+    else:
+        cursor.execute(queries.SELECT_LATEST_SNAPSHOTS_FOR_INVENTORY, (as_of, inventory_id))
+    return {(row["inventoryID"], row["productID"]): row["quantity"] for row in cursor.fetchall()}
+
+
+def last_snapshot_date(cursor):
+    cursor.execute(queries.SELECT_LAST_SNAPSHOT_RUN)
+    row = cursor.fetchone()
+    return row["lastDate"] if row else None
+
+
+def generate_snapshots(until: datetime.date = None, rebuild_from: datetime.date = None) -> int:
+    """
+    Chụp tồn kho cho các ngày chưa chụp tới hết ngày `until` (mặc định hôm qua).
+    Biến động ghi lùi ngày vào những ngày đã chụp cần chạy lại với `rebuild_from`.
+    """
+    until = until or datetime.date.today() - datetime.timedelta(days=1)
+    conn = None
+    written = 0
+    try:
+        conn = get_connection()
+        with conn.cursor() as cursor:
+            if rebuild_from is not None:
+                cursor.execute(queries.DELETE_SNAPSHOTS_FROM, (rebuild_from,))
+                cursor.execute(queries.DELETE_SNAPSHOT_RUNS_FROM, (rebuild_from,))
+            last = last_snapshot_date(cursor)
+            if last is not None and last >= until:
+                return 0
+            if last is None:
+                cursor.execute(queries.SELECT_FIRST_MOVEMENT_DATE)
+                row = cursor.fetchone()
+                if not row or row["firstDate"] is None:
+                    return 0
+                last = _as_date(row["firstDate"]) - datetime.timedelta(days=1)
+
+            balances = _latest_snapshots(cursor, last)
+            snapshot_rows = {}
+            for movement in _iter_movements(cursor, _day_start(last + datetime.timedelta(days=1)), _day_start(until + datetime.timedelta(days=1))):
+                key = (movement["inventoryID"], movement["productID"])
+                balances[key] = apply_movement(balances.get(key, 0), movement["roleStore"], movement["quantityStore"])
+                snapshot_rows[(key, _as_date(movement["storeDate"]))] = balances[key]
+
+            rows = [(inv, prod, day, qty) for ((inv, prod), day), qty in snapshot_rows.items()]
+            if rows:
+                cursor.executemany(queries.UPSERT_STOCK_SNAPSHOT, rows)
+            days = []
+            day = last + datetime.timedelta(days=1)
+            while day <= until:
+                days.append((day,))
+                day += datetime.timedelta(days=1)
+            cursor.executemany(queries.INSERT_SNAPSHOT_RUN, days)
+            written = len(rows)
+        conn.commit()
+    except Exception:
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        safe_close_connection(conn)
+    logging.info(f"Stock snapshots generated until {until}: {written} rows")
+    return written
+
+
+def stock_at(day: datetime.date, inventory_id: int = None) -> list:
+    """Tồn kho cuối ngày `day` cho từng cặp (inventoryID, productID)"""
+    conn = None
+    try:
+        conn = get_read_connection()
+        with conn.cursor() as cursor:
+            last = last_snapshot_date(cursor)
+            snapshot_day = min(day, last) if last else None
+            balances = _latest_snapshots(cursor, snapshot_day, inventory_id) if snapshot_day else {}
+
+            # Chỉ phát lại các biến động sau ngày đã chụp cuối cùng
+            replay_from = _day_start(snapshot_day + datetime.timedelta(days=1)) if snapshot_day else EPOCH
+            replay_to = _day_start(day + datetime.timedelta(days=1))
+            if replay_from < replay_to:
+                for movement in _iter_movements(cursor, replay_from, replay_to, inventory_id):
+                    key = (movement["inventoryID"], movement["productID"])
+                    balances[key] = apply_movement(balances.get(key, 0), movement["roleStore"], movement["quantityStore"])
+        return [
+            {"inventoryID": inv, "productID": prod or None, "quantity": qty}
+            for (inv, prod), qty in sorted(balances.items(), key=lambda item: (item[0][0] or 0, item[0][1] or 0))
+        ]
+    finally:
+        safe_close_connection(conn)
+
+
+def _snapshot_loop():
+    while True:
+        # Mỗi cửa hàng có shard riêng (TENANT_SHARDS) được xử lý lần lượt
+        for tenant in all_tenants():
+            try:
+                with use_tenant(tenant):
+                    generate_snapshots()
+            except Exception as e:
+                logging.error(f"Error generating stock snapshots ({tenant or 'default'}): {e}")
+        if _stop.wait(STOCK_SNAPSHOT_INTERVAL_HOURS * 3600):
+            break
+
+
+def start_snapshotter():
+    global _thread
+    if STOCK_SNAPSHOT_INTERVAL_HOURS and _thread is None:
+        _stop.clear()
+        _thread = threading.Thread(target=_snapshot_loop, name="stock-snapshotter", daemon=True)
+        _thread.start()
+
+
+def stop_snapshotter():
+    global _thread
+    _stop.set()
+    _thread = None
@@ -0,0 +1,88 @@
+"""
+Lưu trữ lịch sử biến động kho cũ (tbl_stores) sang tbl_stores_archive.
+
+tbl_stores vừa là liên kết sản phẩm - kho hiện tại vừa là nhật ký biến động tăng dần theo thời gian.
+Job lưu trữ chuyển các dòng cũ hơn STORES_HOT_RETENTION_DAYS sang bảng archive, nhưng luôn giữ lại
+dòng mới nhất của mỗi cặp (inventoryID, productID) để các truy vấn liên kết (SELECT_INVENTORIES...)
+vẫn đúng. Nhờ vậy mọi dòng mới hơn mốc lưu giữ chắc chắn nằm trong bảng "nóng".
+"""
+import datetime
+import logging
+import threading
+
+from .config import STORES_HOT_RETENTION_DAYS, STORES_ARCHIVE_INTERVAL_HOURS, STORES_ARCHIVE_WINDOW_DAYS
+from .db import get_connection, safe_close_connection, all_tenants, use_tenant
+from . import queries
+
+_stop = threading.Event()
+_thread = None
+
+
+def hot_cutoff(retention_days: int = STORES_HOT_RETENTION_DAYS) -> datetime.datetime:
+    """Mốc thời gian mà mọi dòng mới hơn đều nằm trong tbl_stores"""
+    return datetime.datetime.now() - datetime.timedelta(days=retention_days)
+
+
+def needs_archive(date_from, date_to=None) -> bool:
+    """Truy vấn trong khoảng [date_from, date_to] có cần đọc cả bảng archive không"""
+    if date_from is None:
+        # Chỉ có mốc cuối: khoảng không giới hạn phía trước nên gồm cả các dòng đã lưu trữ
+        return date_to is not None
+    if not isinstance(date_from, datetime.datetime):
+        date_from = datetime.datetime.combine(date_from, datetime.time.min)
+    return date_from < hot_cutoff()
+
+
+def archive_store_history(retention_days: int = STORES_HOT_RETENTION_DAYS) -> int:
+    """Chuyển các dòng cũ sang archive theo từng cửa sổ ngày (mỗi cửa sổ một transaction)"""
+    cutoff = hot_cutoff(retention_days)
+    archived = 0
+    conn = None
+    try:
+        conn = get_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(queries.SELECT_OLDEST_STORE_DATE, (cutoff,))
+            row = cursor.fetchone()
+            window_start = row["oldest"] if row else None
+            while window_start is not None and window_start < cutoff:
+                window_end = min(window_start + datetime.timedelta(days=STORES_ARCHIVE_WINDOW_DAYS), cutoff)
+                params = (window_start, window_end)
+                cursor.execute(queries.ARCHIVE_COPY_STORES, params)
+                cursor.execute(queries.ARCHIVE_DELETE_STORES, params)
+                archived += cursor.rowcount
+                conn.commit()
+                window_start = window_end
+    except Exception:
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        safe_close_connection(conn)
+    if archived:
+        logging.info(f"Archived {archived} tbl_stores rows older than {cutoff:%Y-%m-%d}")
+    return archived
+
+
+def _archive_loop():
+    while not _stop.wait(STORES_ARCHIVE_INTERVAL_HOURS * 3600):
+        # Mỗi cửa hàng có shard riêng (TENANT_SHARDS) được xử lý lần lượt
+        for tenant in all_tenants():
+            try:
+                with use_tenant(tenant):
+                    archive_store_history()
+            except Exception as e:
+                logging.error(f"Error archiving store history ({tenant or 'default'}): {e}")
+
+
+def start_archiver():
+    global _thread
+    if STORES_ARCHIVE_INTERVAL_HOURS and _thread is None:
+        _stop.clear()
+        _thread = threading.Thread(target=_archive_loop, name="stores-archiver", daemon=True)
+        _thread.start()
+
+
+def stop_archiver():
+    global _thread
+    _stop.set()
+    _thread = None
@@ -0,0 +1,323 @@
+"""
+Đo từng request: độ trễ theo route, thời gian DB / Python / serialize, số truy vấn và kích thước payload.
+
+Middleware trong main.py mở một RequestTrace (contextvar) cho mỗi request; kết nối MySQL/SQLite
+(db.TracedConnection, sqlite_backend.Cursor) cộng thời gian và số câu vào trace đang mở, ORJSONResponse
+của module này đo thời gian serialize. Khi request kết thúc, trace được ghi vào:
+
+- Histogram theo (method, route) xuất dạng Prometheus tại GET /metrics. Route là mẫu đường dẫn
+  (vd. /orders/{id}) để số series không tăng theo id; mỗi worker có số liệu riêng.
+- Span kiểu OpenTelemetry (nếu TRACING_SPANS_EXPORT khác ""): một span SERVER cho request và một span
+  CLIENT cho mỗi câu SQL (giá trị trong câu được thay bằng ?), ghi nền theo lô ra file JSON lines hoặc gửi
+  OTLP/HTTP JSON tới collector cục bộ. Header traceparent (W3C) của request được nối tiếp.
+
+Thời gian Python = tổng - DB - serialize. Với StreamingResponse chỉ đo tới lúc gửi header.
+"""
+import contextvars
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+
+import orjson
+from fastapi.responses import ORJSONResponse as BaseORJSONResponse
+
+from .config import (
+    METRICS_ENABLED, TRACING_SPANS_EXPORT, TRACING_SPANS_SAMPLE_RATIO, TRACING_SERVICE_NAME, TRACING_MAX_QUERY_SPANS,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+UNMATCHED_ROUTE = "unmatched"  # 404 và request không khớp route nào (tránh một series cho mỗi URL lạ)
+EXPORT_BATCH_SIZE = 200
+EXPORT_INTERVAL_SECONDS = 2
+
+_trace = contextvars.ContextVar("request_trace", default=None)
+
+
+# ===== REQUEST TRACE =====
+class RequestTrace:
+    def __init__(self, traceparent: str = None):
+        self.started = time.perf_counter()
+        self.started_ns = time.time_ns()
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.queries = 0
+        self.query_spans = []
+        self._lock = threading.Lock()  # Các câu của db.fetch_parallel cộng từ nhiều thread
+        self.trace_id, self.parent_id, self.sampled = _parse_traceparent(traceparent)
+        self.span_id = os.urandom(8).hex()
+
+    def add_query(self, statement: str, seconds: float, system: str):
+        with self._lock:
+            self.db_seconds += seconds
+            self.queries += 1
+            if self.sampled and len(self.query_spans) < TRACING_MAX_QUERY_SPANS:
+                self.query_spans.append((statement, seconds, time.time_ns(), system))
+
+
+def _parse_traceparent(traceparent: str):
+    """(trace id, span cha, có ghi span không) từ header traceparent "00-<trace>-<span>-<flags>" """
+    sampled = _spans is not None and random.random() < TRACING_SPANS_SAMPLE_RATIO
+    parts = (traceparent or "").split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        return parts[1], parts[2], _spans is not None and (sampled or parts[3] == "01")
+    return os.urandom(16).hex(), None, sampled
+
+
+def begin(traceparent: str = None) -> RequestTrace:
+    trace = RequestTrace(traceparent)
+    _trace.set(trace)
+    return trace
+
+
+def record_query(statement: str, seconds: float, system: str = "mysql"):
+    """Gọi từ tầng kết nối sau mỗi câu SQL; không có request đang đo (thread nền) thì bỏ qua"""
+    trace = _trace.get()
+    if trace is not None:
+        trace.add_query(statement, seconds, system)
+
+
+class ORJSONResponse(BaseORJSONResponse):
+    """default_response_class của app: như ORJSONResponse nhưng đo thời gian serialize"""
+
+    def render(self, content) -> bytes:
+        began = time.perf_counter()
+        try:
+            return super().render(content)
+        finally:
+            trace = _trace.get()
+            if trace is not None:
+                trace.serialize_seconds += time.perf_counter() - began
+
+
+# ===== METRICS =====
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {}  # (method, route) -> [đếm theo bucket..., +Inf, tổng]
+
+    def observe(self, labels: tuple, value: float):
+        counts = self.series.get(labels)
+        if counts is None:
+            counts = self.series[labels] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        counts[-2] += 1
+        counts[-1] += value
+
+    def render(self, label_names: tuple) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, counts in sorted(self.series.items()):
+            base = ",".join(f'{key}="{_escape(value)}"' for key, value in zip(label_names, labels))
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {counts[-2]}')
+            lines.append(f"{self.name}_sum{{{base}}} {counts[-1]}")
+            lines.append(f"{self.name}_count{{{base}}} {counts[-2]}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    LABELS = ("method", "route")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}  # (method, route, status) -> số request
+        self.histograms = [
+            Histogram("http_request_duration_seconds", "Total request latency", LATENCY_BUCKETS),
+            Histogram("http_request_db_seconds", "Time spent in database calls per request", LATENCY_BUCKETS),
+            Histogram("http_request_python_seconds", "Time spent in Python (total - db - serialization) per request", LATENCY_BUCKETS),
+            Histogram("http_request_serialization_seconds", "Time spent rendering the JSON response", LATENCY_BUCKETS),
+            Histogram("http_request_queries", "SQL statements executed per request", QUERY_BUCKETS),
+            Histogram("http_request_size_bytes", "Request body size (Content-Length)", SIZE_BUCKETS),
+            Histogram("http_response_size_bytes", "Response body size (Content-Length)", SIZE_BUCKETS),
+        ]
+
+    def observe(self, method: str, route: str, status: int, values: tuple):
+        """values theo thứ tự của self.histograms; None = không đo được (vd. response stream)"""
+        labels = (method, route)
+        with self._lock:
+            key = (method, route, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            for histogram, value in zip(self.histograms, values):
+                if value is not None:
+                    histogram.observe(labels, value)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = ["# HELP http_requests_total Requests by route and status", "# TYPE http_requests_total counter"]
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}')
+            for histogram in self.histograms:
+                lines.extend(histogram.render(self.LABELS))
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+# ===== SPANS =====
+_LITERALS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _span(trace: RequestTrace, name: str, kind: int, span_id: str, parent_id: str, start_ns: int, end_ns: int,
+          attributes: dict, error: bool = False) -> dict:
+    span = {
+        "traceId": trace.trace_id,
+        "spanId": span_id,
+        "name": name,
+        "kind": kind,
+        "startTimeUnixNano": str(start_ns),
+        "endTimeUnixNano": str(end_ns),
+        "attributes": [_attribute(key, value) for key, value in attributes.items() if value is not None],
+        "status": {"code": 2 if error else 1},
+    }
+    if parent_id:
+        span["parentSpanId"] = parent_id
+    return span
+
+
+def request_spans(trace: RequestTrace, method: str, route: str, path: str, status: int, seconds: float) -> list:
+    end_ns = trace.started_ns + int(seconds * 1e9)
+    spans = [_span(trace, f"{method} {route}", 2, trace.span_id, trace.parent_id, trace.started_ns, end_ns, {
+        "http.request.method": method,
+        "http.route": route,
+        "url.path": path,
+        "http.response.status_code": status,
+        "app.db_seconds": trace.db_seconds,
+        "app.serialization_seconds": trace.serialize_seconds,
+        "app.queries": trace.queries,
+    }, error=status >= 500)]
+    for statement, query_seconds, query_end_ns, system in trace.query_spans:
+        sql = " ".join(_LITERALS.sub("?", statement).split())
+        spans.append(_span(trace, sql.split(" ", 1)[0].upper() if sql else "SQL", 3, os.urandom(8).hex(), trace.span_id,
+                           query_end_ns - int(query_seconds * 1e9), query_end_ns, {"db.system": system, "db.statement": sql[:1000]}))
+    return spans
+
+
+class SpanExporter:
+    """Ghi span theo lô trên thread nền: file JSON lines (một dòng mỗi span) hoặc POST OTLP/HTTP JSON"""
+
+    def __init__(self, target: str):
+        self.target = target
+        self.exported = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=10000)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def submit(self, spans: list):
+        for span in spans:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                self.dropped += 1
+
+    def _drain(self) -> list:
+        batch = []
+        while len(batch) < EXPORT_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: list):
+        if self.target.startswith(("http://", "https://")):
+            body = orjson.dumps({"resourceSpans": [{
+                "resource": {"attributes": [_attribute("service.name", TRACING_SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": batch}],
+            }]})
+            request = urllib.request.Request(self.target, data=body, headers={"Content-Type": "application/json"})
+            urllib.request.urlopen(request, timeout=5).close()
+        else:
+            with open(self.target, "ab") as file:
+                file.write(b"".join(orjson.dumps({"service": TRACING_SERVICE_NAME, **span}) + b"\n" for span in batch))
+        self.exported += len(batch)
+
+    def _loop(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = self._drain()
+            if not batch:
+                self._stop.wait(EXPORT_INTERVAL_SECONDS)
+                continue
+            try:
+                self._write(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                logging.error(f"Error exporting spans to {self.target}: {e}")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        directory = os.path.dirname(self.target)
+        if directory and not self.target.startswith(("http://", "https://")):
+            os.makedirs(directory, exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+
+
+_spans = SpanExporter(TRACING_SPANS_EXPORT) if TRACING_SPANS_EXPORT else None
+
+
+def start():
+    if _spans is not None:
+        _spans.start()
+
+
+def stop():
+    if _spans is not None:
+        _spans.stop()
+
+
+# ===== FINISH =====
+def finish(trace: RequestTrace, method: str, route: str, path: str, status: int,
+           request_bytes: int = None, response_bytes: int = None):
+    seconds = time.perf_counter() - trace.started
+    if METRICS_ENABLED:
+        python_seconds = max(0.0, seconds - trace.db_seconds - trace.serialize_seconds)
+        metrics.observe(method, route, status, (
+            seconds, trace.db_seconds, python_seconds, trace.serialize_seconds, trace.queries, request_bytes, response_bytes,
+        ))
+    if trace.sampled:
+        _spans.submit(request_spans(trace, method, route, path, status, seconds))
+
+
+def stats() -> dict:
+    return {
+        "metricsEnabled": METRICS_ENABLED,
+        "spansExport": TRACING_SPANS_EXPORT or None,
+        "spansExported": _spans.exported if _spans else 0,
+        "spansDropped": _spans.dropped if _spans else 0,
+    }
@@ -0,0 +1,121 @@
+"""
+Định giá tồn kho theo lớp giá vốn (FIFO) hoặc bình quân gia quyền di động (AVERAGE).
+
+tbl_inventory.unitCost vẫn là giá nhập gần nhất. Giá trị tồn kho được duy trì tăng dần trong
+tbl_inventory_valuation (số lượng, tổng giá trị) mỗi khi có biến động, nên báo cáo chỉ cần đọc
+một dòng cho mỗi inventory. Ở chế độ FIFO, tbl_cost_layer chỉ giữ các lớp nhập còn hàng
+(lớp đã xuất hết bị xóa), nên chi phí xuất kho tỉ lệ với số lớp còn mở.
+
+Inventory chưa có dòng định giá được khởi tạo từ tồn kho hiện tại với unitCost hiện tại (số dư đầu kỳ).
+Các hàm chạy trên cursor của transaction hiện tại và không commit.
+"""
+from decimal import Decimal
+
+from .config import INVENTORY_VALUATION_METHOD
+from . import queries
+
+METHOD_FIFO = "FIFO"
+METHOD_AVERAGE = "AVERAGE"
+ZERO = Decimal("0")
+COST_PRECISION = Decimal("0.0001")  # Khớp DECIMAL(15,4) của tbl_cost_layer.unitCost
+
+
+def _decimal(value) -> Decimal:
+    return ZERO if value is None else Decimal(str(value))
+
+
+def _average_cost(state: dict) -> Decimal:
+    if state["quantity"] > 0:
+        return (state["totalValue"] / state["quantity"]).quantize(COST_PRECISION)
+    return ZERO
+
+
+def ensure_valuation(cursor, inventory_id: int) -> dict:
+    """Khóa và trả về dòng định giá, khởi tạo từ tbl_inventory nếu chưa có (state["seeded"] = True)"""
+    cursor.execute(queries.SELECT_INVENTORY_VALUATION_FOR_UPDATE, (inventory_id,))
+    row = cursor.fetchone()
+    if row:
+        return {"quantity": row["quantity"], "totalValue": _decimal(row["totalValue"])}
+
+    cursor.execute(queries.SELECT_INVENTORY_FOR_VALUATION, (inventory_id,))
+    inventory = cursor.fetchone()
+    quantity = max(inventory["stockQuantity"] or 0, 0) if inventory else 0
+    unit_cost = _decimal(inventory["unitCost"]) if inventory else ZERO
+    if quantity and INVENTORY_VALUATION_METHOD == METHOD_FIFO:
+        cursor.execute(queries.INSERT_COST_LAYER, (inventory_id, quantity, unit_cost))
+    state = {"quantity": quantity, "totalValue": quantity * unit_cost, "seeded": True}
+    cursor.execute(queries.UPSERT_INVENTORY_VALUATION, (inventory_id, state["quantity"], state["totalValue"]))
+    return state
+
+
+def _save(cursor, inventory_id: int, state: dict):
+    cursor.execute(queries.UPSERT_INVENTORY_VALUATION, (inventory_id, state["quantity"], state["totalValue"]))
+
+
+def receive(cursor, inventory_id: int, quantity: int, unit_cost, state: dict = None):
+    """Nhập `quantity` đơn vị với giá `unit_cost` (gọi trước khi cập nhật tbl_inventory)"""
+    state = state or ensure_valuation(cursor, inventory_id)
+    unit_cost = _decimal(unit_cost)
+    if INVENTORY_VALUATION_METHOD == METHOD_FIFO:
+        cursor.execute(queries.INSERT_COST_LAYER, (inventory_id, quantity, unit_cost))
+    state["quantity"] += quantity
+    state["totalValue"] += quantity * unit_cost
+    _save(cursor, inventory_id, state)
+
+
+def _consume_layers(cursor, inventory_id: int, quantity: int):
+    """Lấy hàng từ các lớp cũ nhất; trả về (giá vốn, số lượng không có lớp tương ứng)"""
+    cost = ZERO
+    remaining = quantity
+    cursor.execute(queries.SELECT_OPEN_COST_LAYERS, (inventory_id,))
+    for layer in cursor.fetchall():
+        if remaining <= 0:
+            break
+        taken = min(remaining, layer["quantityRemaining"])
+        cost += taken * _decimal(layer["unitCost"])
+        remaining -= taken
+        if taken == layer["quantityRemaining"]:
+            cursor.execute(queries.DELETE_COST_LAYER, (layer["layerID"],))
+        else:
+            cursor.execute(queries.UPDATE_COST_LAYER, (layer["quantityRemaining"] - taken, layer["layerID"]))
+    return cost, remaining
+
+
+def issue(cursor, inventory_id: int, quantity: int, state: dict = None) -> Decimal:
+    """Xuất `quantity` đơn vị, trả về giá vốn hàng xuất"""
+    state = state or ensure_valuation(cursor, inventory_id)
+    average = _average_cost(state)
+    if INVENTORY_VALUATION_METHOD == METHOD_FIFO:
+        cost, uncovered = _consume_layers(cursor, inventory_id, quantity)
+        # Phần không có lớp (dữ liệu cũ, đổi phương pháp định giá) tính theo giá bình quân
+        cost += uncovered * average
+    else:
+        cost = quantity * average
+    state["quantity"] -= quantity
+    state["totalValue"] = max(state["totalValue"] - cost, ZERO) if state["quantity"] > 0 else ZERO
+    _save(cursor, inventory_id, state)
+    return cost
+
+
+def adjust(cursor, inventory_id: int, difference: int, state: dict = None):
+    """Chênh lệch kiểm kê: thừa được nhập theo giá bình quân hiện tại, thiếu được xuất như bình thường"""
+    state = state or ensure_valuation(cursor, inventory_id)
+    if difference > 0:
+        unit_cost = _average_cost(state)
+        if not unit_cost:
+            cursor.execute(queries.SELECT_INVENTORY_FOR_VALUATION, (inventory_id,))
+            inventory = cursor.fetchone()
+            unit_cost = _decimal(inventory["unitCost"]) if inventory else ZERO
+        receive(cursor, inventory_id, difference, unit_cost, state)
+    elif difference < 0:
+        issue(cursor, inventory_id, -difference, state)
+
+
+def reset(cursor, inventory_id: int, quantity: int, unit_cost):
+    """Đặt lại định giá khi tồn kho được sửa trực tiếp (PUT /inventories/{id})"""
+    cursor.execute(queries.DELETE_COST_LAYERS, (inventory_id,))
+    quantity = max(quantity or 0, 0)
+    unit_cost = _decimal(unit_cost)
+    if quantity and INVENTORY_VALUATION_METHOD == METHOD_FIFO:
+        cursor.execute(queries.INSERT_COST_LAYER, (inventory_id, quantity, unit_cost))
+    _save(cursor, inventory_id, {"quantity": quantity, "totalValue": quantity * unit_cost})
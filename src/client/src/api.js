@@ -0,0 +1,16 @@
+// fetch dùng chung: sau khi ghi (vd. checkout), backend trả header X-DB-Primary-Until (mốc epoch giây);
+// gửi lại header này để các lần đọc ngay sau đó (lịch sử đơn hàng) dùng database primary thay vì replica còn trễ
+const PRIMARY_HEADER = "X-DB-Primary-Until";
+
+let primaryUntil = null;
+
+export async function apiFetch(url, options = {}) {
+  const headers = new Headers(options.headers || {});
+  if (primaryUntil && Number(primaryUntil) * 1000 > Date.now()) {
+    headers.set(PRIMARY_HEADER, primaryUntil);
+  }
+  const response = await fetch(url, { ...options, headers });
+  const until = response.headers.get(PRIMARY_HEADER);
+  if (until) primaryUntil = until;
+  return response;
+}
@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import { API_BASE_URL } from "../config";
+import { apiFetch } from "../api";
 
 export default function AccountView({ customer, onLogout, setCustomer }) {
   const navigate = useNavigate();
@@ -25,7 +26,7 @@ export default function AccountView({ customer, onLogout, setCustomer }) {
     setCustomer(stored);
 
     if (stored.customerID) {
-      fetch(`${API_BASE_URL}/customers/${stored.customerID}`)
+      apiFetch(`${API_BASE_URL}/customers/${stored.customerID}`)
         .then((res) => res.json())
         .then((data) => {
           if (data && data.customerID) {
@@ -53,7 +54,7 @@ export default function AccountView({ customer, onLogout, setCustomer }) {
     setSuccessMsg("");
 
     try {
-      const res = await fetch(
+      const res = await apiFetch(
         `${API_BASE_URL}/customers/${formData.customerID}`,
         {
           method: "PUT",
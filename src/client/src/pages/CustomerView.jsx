@@ -2,6 +2,7 @@ import React, { useState, useEffect, useRef } from "react";
 import { ShoppingCart, Search, User, Clock } from "lucide-react";
 import { useNavigate } from "react-router-dom";
 import { API_BASE_URL } from "../config";
+import { apiFetch } from "../api";
 
 export default function CustomerView({ cart, setCart }) {
   const [products, setProducts] = useState([]);
@@ -18,7 +19,7 @@ export default function CustomerView({ cart, setCart }) {
     if (hasFetched.current) return;
     hasFetched.current = true;
 
-    fetch(`${API_BASE_URL}/products`)
+    apiFetch(`${API_BASE_URL}/products`)
       .then((res) => res.json())
       .then((data) => {
         if (Array.isArray(data)) setProducts(data);
@@ -1,6 +1,7 @@
 import React, { useState } from "react";
 import { useNavigate } from "react-router-dom";
 import { API_BASE_URL } from "../config";
+import { apiFetch } from "../api";
 
 export default function LoginView({ onLoginSuccess }) {
   const [identifier, setIdentifier] = useState("");
@@ -16,7 +17,7 @@ export default function LoginView({ onLoginSuccess }) {
     setLoading(true);
 
     try {
-      const res = await fetch(`${API_BASE_URL}/login/customer`, {
+      const res = await apiFetch(`${API_BASE_URL}/login/customer`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ identifier, password }),
@@ -1,11 +1,29 @@
 import React, { useEffect, useState, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import { API_BASE_URL } from "../config";
+import { apiFetch } from "../api";
+
+const PAGE_SIZE = 20;
+
+// Một trang lịch sử đơn hàng (kèm sản phẩm), cursor trang sau nằm ở header X-Next-Cursor
+async function fetchOrderPage(customerID, cursor) {
+  const params = new URLSearchParams({ limit: PAGE_SIZE });
+  if (cursor) params.set("cursor", cursor);
+  const res = await apiFetch(`${API_BASE_URL}/customers/${customerID}/orders?${params}`);
+  const data = await res.json();
+  if (!Array.isArray(data)) {
+    console.error("Orders API trả về sai định dạng:", data);
+    return { orders: [], nextCursor: null };
+  }
+  return { orders: data, nextCursor: res.headers.get("X-Next-Cursor") };
+}
 
 export default function OrderHistory() {
   const navigate = useNavigate();
   const [orders, setOrders] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const hasFetched = useRef(false);
 
   const customer = JSON.parse(localStorage.getItem("customer"));
@@ -19,34 +37,11 @@ export default function OrderHistory() {
     if (hasFetched.current) return; // Ngăn fetch duplicate
     hasFetched.current = true;
 
-    const fetchOrders = async () => {
+    const loadFirstPage = async () => {
       try {
-        // Fetch orders của customer
-        const res = await fetch(`${API_BASE_URL}/orders/${customer.customerID}`);
-        const ordersData = await res.json();
-
-        if (!Array.isArray(ordersData)) {
-          console.error("Orders API trả về sai định dạng:", ordersData);
-          setLoading(false);
-          return;
-        }
-
-        // Fetch tất cả items một lần duy nhất
-        const reqRes = await fetch(`${API_BASE_URL}/requests`);
-        const allRequests = await reqRes.json();
-
-        // Map items cho mỗi order
-        const ordersWithItems = ordersData.map((order) => {
-          const items = Array.isArray(allRequests)
-            ? allRequests.filter((req) => req.orderID === order.orderID)
-            : [];
-          return {
-            ...order,
-            items: items,
-          };
-        });
-
-        setOrders(ordersWithItems);
+        const page = await fetchOrderPage(customer.customerID);
+        setOrders(page.orders);
+        setNextCursor(page.nextCursor);
       } catch (err) {
         console.error("Lỗi khi tải lịch sử đơn hàng:", err);
       } finally {
@@ -54,9 +49,23 @@ export default function OrderHistory() {
       }
     };
 
-    fetchOrders();
+    loadFirstPage();
   }, [customer, navigate]);
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchOrderPage(customer.customerID, nextCursor);
+      setOrders((prev) => [...prev, ...page.orders]);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error("Lỗi khi tải thêm đơn hàng:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   if (loading) {
     return (
       <div className="min-h-screen flex items-center justify-center text-gray-600 text-lg">
@@ -117,7 +126,7 @@ export default function OrderHistory() {
                   order.items.map((item) => (
                     <div key={item.productID} className="mb-2">
                       <p className="text-gray-800">
-                        • {item.productName} x {item.quantity}
+                        • {item.product?.productName} x {item.quantityOrdered}
                       </p>
                     </div>
                   ))
@@ -127,6 +136,17 @@ export default function OrderHistory() {
               </div>
             </div>
           ))}
+          {nextCursor && (
+            <div className="text-center">
+              <button
+                onClick={loadMore}
+                disabled={loadingMore}
+                className="px-4 py-2 bg-white border border-indigo-600 text-indigo-600 rounded-xl hover:bg-indigo-50 disabled:opacity-50"
+              >
+                {loadingMore ? "Đang tải..." : "Xem thêm đơn hàng"}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -1,6 +1,7 @@
 import React, { useState } from "react";
 import { useNavigate, useLocation } from "react-router-dom";
 import { API_BASE_URL } from "../config";
+import { apiFetch } from "../api";
 
 export default function OrderView({ customer, cart: cartFromProps, setCart }) {
   const navigate = useNavigate();
@@ -70,7 +71,7 @@ export default function OrderView({ customer, cart: cartFromProps, setCart }) {
         priceEach: Number(item.priceEach),
       }));
 
-      const res = await fetch(`${API_BASE_URL}/order/checkout`, {
+      const res = await apiFetch(`${API_BASE_URL}/order/checkout`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -1,6 +1,7 @@
 import React, { useState } from "react";
 import { useNavigate } from "react-router-dom";
 import { API_BASE_URL } from "../config";
+import { apiFetch } from "../api";
 
 export default function RegisterView({ onSwitchToLogin }) {
   const [formData, setFormData] = useState({
@@ -35,7 +36,7 @@ export default function RegisterView({ onSwitchToLogin }) {
     setLoading(true);
 
     try {
-      const res = await fetch(`${API_BASE_URL}/register/customer`, {
+      const res = await apiFetch(`${API_BASE_URL}/register/customer`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify(formData),
@@ -5,6 +5,7 @@ import LoginPage from './pages/LoginPage';
 import ReportsPage from './pages/ReportsPage';
 import { POSITION_PERMISSIONS } from './utils/permissions';
 import config from './constants/config';
+import { apiFetch } from './utils/api';
 
 const API_BASE_URL = config.API_BASE_URL;
 const TABS = {
@@ -339,7 +340,7 @@ const RelationsModal = ({ data, type, onClose, onEdit, onDelete, activeTab, sele
                 }
             });
 
-            const response = await fetch(endpoint, {
+            const response = await apiFetch(endpoint, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -374,7 +375,7 @@ const RelationsModal = ({ data, type, onClose, onEdit, onDelete, activeTab, sele
     const handleSaveEdit = async () => {
         try {
             const endpoint = `${API_BASE_URL}${TABS[activeTab].endpoint}/${editData[Object.keys(editData)[0]]}`;
-            const response = await fetch(endpoint, {
+            const response = await apiFetch(endpoint, {
                 method: 'PUT',
                 headers: {
                     'Content-Type': 'application/json',
@@ -865,7 +866,7 @@ export default function App() {
 
             const url = `${API_BASE_URL}${tabInfo.endpoint}${params.toString() ? '?' + params.toString() : ''}`;
 
-            const response = await fetch(url, {
+            const response = await apiFetch(url, {
                 headers: { 'Authorization': `Bearer ${user.token}` },
             });
 
@@ -977,7 +978,7 @@ export default function App() {
                 setCurrentResourceType(config.resourceName);
 
                 const endpoint = `${API_BASE_URL}${config.getEndpoint(item)}`;
-                const response = await fetch(endpoint);
+                const response = await apiFetch(endpoint);
 
                 if (!response.ok) throw new Error('Lỗi tải dữ liệu chi tiết');
 
@@ -1070,7 +1071,7 @@ export default function App() {
             console.log(`🚀 Sending ${isEdit ? 'PUT' : 'POST'} to: ${endpoint}`, payload);
 
             // 4. Gọi API
-            const response = await fetch(endpoint, {
+            const response = await apiFetch(endpoint, {
                 method: isEdit ? 'PUT' : 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -1121,7 +1122,7 @@ export default function App() {
 
         try {
             const endpoint = `${API_BASE_URL}${TABS[activeTab].endpoint}/${id}`;
-            await fetch(endpoint, {
+            await apiFetch(endpoint, {
                 method: 'DELETE',
                 headers: { 'Authorization': `Bearer ${user.token}` },
             });
@@ -1144,7 +1145,7 @@ export default function App() {
         try {
             for (const id of selectedRows) {
                 const endpoint = `${API_BASE_URL}${TABS[activeTab].endpoint}/${id}`;
-                await fetch(endpoint, {
+                await apiFetch(endpoint, {
                     method: 'DELETE',
                     headers: { 'Authorization': `Bearer ${user.token}` },
                 });
@@ -1,5 +1,6 @@
 import React, { useState } from 'react';
 import config from '../constants/config';
+import { apiFetch } from '../utils/api';
 
 const LoginPage = ({ onLogin }) => {
     const [activeTab, setActiveTab] = useState('login'); // 'login' or 'register'
@@ -42,7 +43,7 @@ const LoginPage = ({ onLogin }) => {
             }
 
             // Call backend login for staff: send identifier and password
-            const resp = await fetch(`${config.API_BASE_URL}${config.API_ENDPOINTS.LOGIN_STAFF}`, {
+            const resp = await apiFetch(`${config.API_BASE_URL}${config.API_ENDPOINTS.LOGIN_STAFF}`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ identifier: credentials.identifier, password: credentials.password })
@@ -78,7 +79,7 @@ const LoginPage = ({ onLogin }) => {
                 password: registerData.password || undefined
             };
 
-            const response = await fetch(`${config.API_BASE_URL}${config.API_ENDPOINTS.REGISTER_STAFF}`, {
+            const response = await apiFetch(`${config.API_BASE_URL}${config.API_ENDPOINTS.REGISTER_STAFF}`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
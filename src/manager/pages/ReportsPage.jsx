@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { BarChart3, TrendingUp, Package, DollarSign, Loader2, Users } from 'lucide-react';
 import config from '../constants/config';
+import { apiFetch } from '../utils/api';
 import dayjs from 'dayjs'; // Import dayjs
 
 const LoadingSpinner = () => (
@@ -70,7 +71,7 @@ const ReportsPage = () => {
 
     const loadSummary = async () => {
         try {
-            const response = await fetch(`${config.API_BASE_URL}${config.API_ENDPOINTS.REPORTS_SUMMARY}`);
+            const response = await apiFetch(`${config.API_BASE_URL}${config.API_ENDPOINTS.REPORTS_SUMMARY}`);
             if (response.ok) {
                 const data = await response.json();
                 setSummary(data);
@@ -88,7 +89,7 @@ const ReportsPage = () => {
             if (startDate) params.append('start_date', startDate);
             if (endDate) params.append('end_date', endDate);
 
-            const response = await fetch(`${config.API_BASE_URL}${config.API_ENDPOINTS.REPORTS_REVENUE}?${params}`);
+            const response = await apiFetch(`${config.API_BASE_URL}${config.API_ENDPOINTS.REPORTS_REVENUE}?${params}`);
             if (response.ok) {
                 const data = await response.json();
                 setRevenueData(data);
@@ -105,7 +106,7 @@ const ReportsPage = () => {
             if (startDate) params.append('start_date', startDate);
             if (endDate) params.append('end_date', endDate);
 
-            const response = await fetch(`${config.API_BASE_URL}${config.API_ENDPOINTS.REPORTS_TOP_PRODUCTS}?${params}`);
+            const response = await apiFetch(`${config.API_BASE_URL}${config.API_ENDPOINTS.REPORTS_TOP_PRODUCTS}?${params}`);
             if (response.ok) {
                 const data = await response.json();
                 setTopProducts(data);
@@ -117,7 +118,7 @@ const ReportsPage = () => {
 
     const loadInventoryReport = async () => {
         try {
-            const response = await fetch(`${config.API_BASE_URL}${config.API_ENDPOINTS.REPORTS_INVENTORY}`);
+            const response = await apiFetch(`${config.API_BASE_URL}${config.API_ENDPOINTS.REPORTS_INVENTORY}`);
             if (response.ok) {
                 const data = await response.json();
                 setInventoryReport(data);
@@ -0,0 +1,60 @@
+"""
+Fixture dùng chung: backend SQLite trong bộ nhớ và app chạy với các file dữ liệu (job, upload, profile)
+nằm trong thư mục tạm của pytest. Mọi thay đổi trạng thái toàn cục được trả lại khi fixture kết thúc.
+    python -m pytest tests
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api import db, catalog_io, profiling
+from src.api.jobs import runner as job_runner
+
+PRODUCT = dict(productName="Pen", priceEach=1.5, productLine="Office", productScale="1", productBrand="B",
+               productDiscription="d", warrantyPeriod=1, MSRP=2)
+
+
+def use_memory_sqlite(monkeypatch):
+    monkeypatch.setattr(db, "_sqlite", None)
+    return db.use_sqlite(":memory:")
+
+
+def use_tmp_data(monkeypatch, directory):
+    monkeypatch.setattr(job_runner, "path", str(directory / "jobs.sqlite3"))
+    monkeypatch.setattr(catalog_io, "UPLOAD_DIR", str(directory / "uploads"))
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(directory / "profiles"))
+
+
+@pytest.fixture
+def sqlite_db(monkeypatch):
+    """Database SQLite trong bộ nhớ riêng cho một test"""
+    return use_memory_sqlite(monkeypatch)
+
+
+@pytest.fixture(scope="module")
+def app_client(tmp_path_factory):
+    """TestClient (đã chạy lifespan) trên database SQLite trong bộ nhớ, dùng chung trong một file test"""
+    from src.api.main import app
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        use_memory_sqlite(monkeypatch)
+        use_tmp_data(monkeypatch, tmp_path_factory.mktemp("data"))
+        with TestClient(app) as client:
+            yield client
+
+
+def add_product(client, **fields) -> int:
+    response = client.post("/products", json={**PRODUCT, **fields})
+    response.raise_for_status()
+    return response.json()["productID"]
+
+
+def add_inventory(client, inventory_id: int, product_id: int = None, quantity: int = 0, max_level: int = 100,
+                  unit_cost: float = 1.0):
+    client.post("/inventories", json=dict(
+        inventoryID=inventory_id, warehouse="W", maxStockLevel=max_level, stockQuantity=quantity,
+        unitCost=unit_cost, productID=product_id,
+    )).raise_for_status()
+
+
+def add_customer(client, name: str = "A"):
+    client.post("/customers", json=dict(customerName=name, phone="1", address="x")).raise_for_status()
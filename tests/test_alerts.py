@@ -0,0 +1,48 @@
+"""
+Cảnh báo tồn kho: ngưỡng khi tồn kho thay đổi, rebuild và cột status của báo cáo tồn kho dùng chung một quy tắc
+    python -m pytest tests
+"""
+import pytest
+
+from src.api import alerts
+from src.api.db import execute_sql
+
+from conftest import add_inventory
+
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    add_inventory(app_client, 9001, quantity=0)
+    add_inventory(app_client, 9002, quantity=10)
+    add_inventory(app_client, 9003, quantity=50)
+    add_inventory(app_client, 9004, quantity=5)
+    return app_client
+
+
+def levels(client) -> dict:
+    return {a["inventoryID"]: a["alertLevel"] for a in client.get("/alerts/low-stock").json()}
+
+
+def test_classify():
+    assert alerts.classify(-1, 100) == alerts.OUT_OF_STOCK
+    assert alerts.classify(None, 100) == alerts.OUT_OF_STOCK
+    assert alerts.classify(19, 100) == alerts.LOW_STOCK
+    assert alerts.classify(20, 100) is None
+    assert alerts.classify(3, 0) is None
+
+
+def test_alerts_follow_inventory_writes(client):
+    assert levels(client) == {9001: alerts.OUT_OF_STOCK, 9002: alerts.LOW_STOCK, 9004: alerts.LOW_STOCK}
+    assert [a["inventoryID"] for a in client.get("/alerts/low-stock", params={"level": alerts.OUT_OF_STOCK}).json()] == [9001]
+
+
+def test_negative_stock_is_out_of_stock_in_alerts_and_report(client):
+    # Dữ liệu sửa ngoài API (vd. kiểm kê âm): rebuild và báo cáo cùng coi là hết hàng
+    execute_sql("UPDATE tbl_inventory SET stockQuantity = -3 WHERE inventoryID = %s", (9004,))
+    assert client.post("/alerts/low-stock/rebuild").status_code == 202
+    assert levels(client)[9004] == alerts.OUT_OF_STOCK
+    report = {row["inventoryID"]: row for row in client.get("/reports/inventory", params={"fresh": True}).json()}
+    for inventory_id, row in report.items():
+        level = alerts.classify(row["stockQuantity"], row["maxStockLevel"])
+        assert row["status"] == (level or "In Stock"), inventory_id
+    assert report[9004]["status"] == alerts.OUT_OF_STOCK
@@ -0,0 +1,74 @@
+"""
+Xuất báo cáo/bảng ra Arrow IPC và Parquet (arrow_export.py) trên backend SQLite
+    python -m pytest tests
+"""
+import datetime
+import io
+
+import pytest
+
+from src.api import arrow_export
+
+from conftest import add_customer, add_inventory, add_product
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    add_customer(app_client)
+    product_id = add_product(app_client, productName="Arrow")
+    for inventory_id, quantity in ((9901, 0), (9902, 4), (9903, 50)):
+        add_inventory(app_client, inventory_id, product_id=product_id, quantity=quantity, unit_cost=2)
+    app_client.post("/order/checkout", json=dict(
+        customerID=1, paymentMethod="Cash", pickupMethod="Store", orderStatus="New", paymentStatus="Paid",
+        shippedStatus="No", products=[dict(productID=product_id, quantity=2, priceEach=3)],
+    )).raise_for_status()
+    return app_client
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    # Nhiều record batch cho vài dòng dữ liệu: schema của lô đầu phải dùng được cho các lô sau
+    monkeypatch.setattr(arrow_export, "BATCH_ROWS", 2)
+
+
+def read_arrow(response) -> list:
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == arrow_export.MEDIA_ARROW
+    return pa.ipc.open_stream(response.content).read_all().to_pylist()
+
+
+def test_inventory_report_matches_json(client, small_batches):
+    rows = client.get("/reports/inventory", params={"fresh": True}).json()
+    exported = read_arrow(client.get("/reports/inventory", params={"format": "arrow"}))
+    assert [(row["inventoryID"], row["status"], float(row["totalValue"])) for row in exported] == \
+        [(row["inventoryID"], row["status"], float(row["totalValue"])) for row in rows]
+
+    by_accept = client.get("/reports/inventory", headers={"Accept": arrow_export.MEDIA_PARQUET})
+    assert by_accept.status_code == 200
+    assert by_accept.headers["content-disposition"] == 'attachment; filename="inventory.parquet"'
+    assert pq.read_table(io.BytesIO(by_accept.content)).to_pylist() == exported
+
+
+def test_revenue_and_table_exports(client, small_batches):
+    revenue = read_arrow(client.get("/reports/revenue", params={"format": "arrow"}))
+    assert sum(row["totalRevenue"] for row in revenue) == 6
+    orders = read_arrow(client.get("/orders/export", params={"format": "arrow"}))
+    assert isinstance(orders[0]["orderDate"], datetime.datetime)
+
+
+def test_bad_requests(client):
+    assert client.get("/reports/inventory", params={"format": "xml"}).status_code == 400
+    assert client.get("/reports/inventory", params={"format": "arrow", "stores": "all"}).status_code == 400
+    # Không yêu cầu Arrow/Parquet: JSON như cũ
+    assert client.get("/reports/inventory", params={"fresh": True}, headers={"Accept": "application/json"}).json()
+
+
+def test_infer_type():
+    assert arrow_export._infer_type(pa, [None, None]) == pa.string()
+    assert arrow_export._infer_type(pa, [1, None]) == pa.int64()
+    assert arrow_export._infer_type(pa, [1, 2.5]) == pa.float64()
+    assert arrow_export._infer_type(pa, [datetime.date(2024, 1, 1)]) == pa.date32()
+    assert arrow_export._infer_type(pa, [1, "x"]) == pa.string()
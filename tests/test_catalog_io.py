@@ -0,0 +1,86 @@
+"""
+Nhập/xuất danh mục: export streaming dùng chung (catalog_io.export_response), nhập CSV/XLSX theo lô
+    python -m pytest tests
+"""
+import csv
+import io
+
+import orjson
+import pytest
+
+from conftest import add_product, add_inventory
+
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    app_client.product_id = add_product(app_client, productName="Export")
+    add_inventory(app_client, 9201, app_client.product_id, quantity=3)
+    return app_client
+
+
+@pytest.mark.parametrize("path", ["/products/export", "/orders/export", "/inventories/export"])
+def test_export_formats(client, path):
+    response = client.get(path, params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    ndjson = [orjson.loads(line) for line in client.get(path, params={"format": "ndjson"}).text.splitlines()]
+    assert len(ndjson) == len(rows)
+    assert client.get(path, params={"format": "xml"}).status_code == 400
+
+
+def test_export_contains_rows(client):
+    rows = list(csv.DictReader(io.StringIO(client.get("/products/export").text)))
+    assert "Export" in {row["productName"] for row in rows}
+    inventories = [orjson.loads(line) for line in client.get("/inventories/export", params={"format": "ndjson"}).text.splitlines()]
+    assert 9201 in {row["inventoryID"] for row in inventories}
+
+
+def upload(client, content: bytes, filename: str = "catalog.csv", **params):
+    response = client.post("/products/import", params=params, files={"file": (filename, content)})
+    assert response.status_code == 200, response.text
+    return [orjson.loads(line) for line in response.text.splitlines()]
+
+
+def catalog_csv(*rows) -> bytes:
+    header = "productName,priceEach,productLine,productScale,productBrand,productDiscription,warrantyPeriod,MSRP\n"
+    return (header + "".join(row + "\n" for row in rows)).encode()
+
+
+def test_csv_import_batches_validates_and_matches(client):
+    before = len(client.get("/products").json())
+    events = upload(client, catalog_csv(
+        "Imp1,1,L,1,BR,d,1,2",
+        "Imp2,abc,L,1,BR,d,1,2",
+        "Imp3,3,L,1,BR,d,1,2",
+        "Export,9,Office,1,B,d,1,2",
+    ), batch_size=2)
+    assert [event["type"] for event in events] == ["error", "progress", "progress", "done"]
+    assert events[0]["row"] == 3
+    assert events[-1] == {"type": "done", "dryRun": False, "processed": 4, "inserted": 2, "updated": 1, "failed": 1}
+    products = client.get("/products").json()
+    assert len(products) == before + 2
+    # Dòng không có productID trùng (productName, productBrand) cập nhật sản phẩm đã có
+    assert float(next(p for p in products if p["productID"] == client.product_id)["priceEach"]) == 9
+
+
+def test_dry_run_and_unsupported_files(client):
+    before = len(client.get("/products").json())
+    events = upload(client, catalog_csv("Dry,1,L,1,BR,d,1,2"), dry_run=True)
+    assert events[-1]["dryRun"] and events[-1]["inserted"] == 1
+    assert len(client.get("/products").json()) == before
+    response = client.post("/products/import", files={"file": ("catalog.txt", b"x")})
+    assert response.status_code == 415
+
+
+def test_xlsx_import(client):
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["productName", "priceEach", "productLine", "productScale", "productBrand", "productDiscription",
+                  "warrantyPeriod", "MSRP"])
+    sheet.append(["Xlsx", 4.5, "L", 1, "BR", "d", 1, 2])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    events = upload(client, buffer.getvalue(), "catalog.xlsx")
+    assert events[-1]["inserted"] == 1
@@ -0,0 +1,52 @@
+"""
+Checkout có và không có giữ hàng, chạy trên backend SQLite trong bộ nhớ (không cần MySQL):
+    python -m pytest tests
+"""
+import pytest
+
+from conftest import add_customer, add_inventory, add_product
+
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    add_product(app_client)
+    add_inventory(app_client, 1, product_id=1)
+    app_client.post("/inventory/import", json=dict(productID=1, inventoryID=1, quantity=20, unitCost=1)).raise_for_status()
+    add_customer(app_client)
+    return app_client
+
+
+def checkout(client, quantity: int, reservation_id: str = None):
+    return client.post("/order/checkout", json=dict(
+        customerID=1, paymentMethod="Cash", products=[dict(productID=1, quantity=quantity, priceEach=1.5)],
+        pickupMethod="Store", orderStatus="Pending", paymentStatus="Unpaid", shippedStatus="In Process",
+        reservationID=reservation_id,
+    ))
+
+
+def stock(client) -> int:
+    return next(row["stockQuantity"] for row in client.get("/inventories").json() if row["inventoryID"] == 1)
+
+
+def test_checkout_without_reservation(client):
+    response = checkout(client, 2)
+    assert response.status_code == 200, response.text
+    assert client.get(f"/orders/{response.json()['orderID']}").status_code == 200
+
+
+def test_checkout_converts_hold_into_stock_decrement(client):
+    before = stock(client)
+    reservation = client.post("/reservations", json=dict(customerID=1, items=[dict(productID=1, quantity=3)]))
+    assert reservation.status_code == 201, reservation.text
+    reservation_id = reservation.json()["reservationID"]
+
+    response = checkout(client, 3, reservation_id)
+    assert response.status_code == 200, response.text
+    assert stock(client) == before - 3
+    assert client.get(f"/reservations/{reservation_id}").status_code == 404
+    # Giữ chỗ đã chuyển thành đơn: lần checkout lại cùng reservation bị từ chối
+    assert checkout(client, 3, reservation_id).status_code == 404
+
+
+def test_checkout_with_unknown_reservation(client):
+    assert checkout(client, 1, "missing").status_code == 404
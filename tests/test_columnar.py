@@ -0,0 +1,57 @@
+"""
+format=columnar trên các list endpoint (columnar.py): cùng dữ liệu với dạng JSON, một danh sách cột dùng chung
+    python -m pytest tests
+"""
+import datetime
+import decimal
+
+import orjson
+import pytest
+
+from src.api import columnar
+
+from conftest import add_customer, add_inventory, add_product
+
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    add_customer(app_client)
+    product_id = add_product(app_client, productName="Column")
+    add_inventory(app_client, 9801, product_id=product_id)
+    app_client.post("/inventory/import", json=dict(
+        productID=product_id, inventoryID=9801, quantity=3, unitCost=1.25, importDate="2024-01-01T09:00:00",
+    )).raise_for_status()
+    order_id = app_client.post("/orders", json=dict(customerID=1)).json()["orderID"]
+    app_client.post("/payments", json=dict(orderID=order_id, transactionAmount=3.75)).raise_for_status()
+    return app_client
+
+
+@pytest.mark.parametrize("path, params", [
+    ("/products", {}),
+    ("/products", {"sort": "-productID", "limit": 1}),
+    ("/payments", {}),
+    ("/inventories", {}),
+    ("/stores", {}),
+    ("/stores/9801", {}),
+    ("/customers", {}),
+])
+def test_columnar_matches_json_rows(client, path, params):
+    rows = client.get(path, params=params).json()
+    response = client.get(path, params={**params, "format": "columnar"})
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert rows, path
+    assert [dict(zip(result["columns"], row)) for row in result["rows"]] == rows
+
+
+def test_unknown_format_is_rejected(client):
+    assert client.get("/payments", params={"format": "xml"}).status_code == 400
+
+
+def test_to_columnar_and_encoding():
+    assert columnar.to_columnar([]) == {"columns": [], "rows": []}
+    assert columnar.to_columnar([{"a": 1, "b": 2}]) == {"columns": ["a", "b"], "rows": [(1, 2)]}
+    body = columnar.response({"columns": ["v", "d", "t"], "rows": [
+        (decimal.Decimal("1.50"), datetime.date(2024, 1, 2), datetime.timedelta(hours=1)),
+    ]}).body
+    assert orjson.loads(body)["rows"] == [[1.5, "2024-01-02", "1:00:00"]]
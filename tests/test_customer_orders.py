@@ -0,0 +1,40 @@
+"""
+GET /customers/{id}/orders: lịch sử đơn hàng đã nạp đầy đủ, phân trang theo ngày
+    python -m pytest tests
+"""
+import pytest
+
+from src.api.db import execute_sql
+
+from conftest import add_customer
+
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    add_customer(app_client, "A")
+    add_customer(app_client, "B")
+    for customer_id in (1, 1, 2, 1, 1, 1):
+        app_client.post("/orders", json=dict(customerID=customer_id)).raise_for_status()
+    # Hai đơn cùng thời điểm: cursor phải phân biệt bằng orderID
+    execute_sql("UPDATE tbl_order SET orderDate = datetime('2024-03-01 10:00:00', '+' || (orderID / 2) || ' hours')")
+    return app_client
+
+
+def test_history_pages_are_newest_first_and_complete(client):
+    seen = []
+    response = client.get("/customers/1/orders", params={"limit": 2})
+    while True:
+        assert response.status_code == 200, response.text
+        orders = response.json()
+        assert all(order["customerID"] == 1 and order["items"] == [] and order["payments"] == [] for order in orders)
+        seen += [order["orderID"] for order in orders]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        response = client.get("/customers/1/orders", params={"limit": 2, "cursor": cursor})
+    assert seen == [6, 5, 4, 2, 1]
+
+
+def test_unknown_customer_and_bad_cursor(client):
+    assert client.get("/customers/99/orders").json() == []
+    assert client.get("/customers/1/orders", params={"cursor": "bad"}).status_code == 400
@@ -0,0 +1,87 @@
+"""
+Bus sự kiện và luồng SSE: đăng ký khi response bắt đầu, lọc theo topic/cửa hàng, nhận bù và resync
+    python -m pytest tests
+"""
+import asyncio
+
+import orjson
+
+from src.api.db import use_tenant
+from src.api.event_bus import EventBus, bus, iter_sse, TOPIC_INVENTORY, TOPIC_ORDERS
+
+
+class FakeRequest:
+    """Request giả: client ngắt kết nối sau khi đã nhận `reads` chunk"""
+
+    def __init__(self, reads: int):
+        self.reads = reads
+
+    async def is_disconnected(self) -> bool:
+        self.reads -= 1
+        return self.reads < 0
+
+
+def parse(chunk: str) -> dict:
+    return orjson.loads(chunk.split("data: ", 1)[1])
+
+
+async def collect(stream) -> list:
+    return [chunk async for chunk in stream]
+
+
+def test_stream_subscribes_only_when_iterated():
+    subscribers = bus.stats()["subscribers"]
+    stream = iter_sse(FakeRequest(1), {TOPIC_INVENTORY})
+    assert bus.stats()["subscribers"] == subscribers
+
+    async def run():
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.01)
+        assert bus.stats()["subscribers"] == subscribers + 1
+        bus.publish(TOPIC_ORDERS, "created", {"orderID": 1})
+        bus.publish(TOPIC_INVENTORY, "updated", {"inventoryID": 7})
+        chunk = await first
+        assert [chunk async for chunk in stream] == []
+        return chunk
+
+    event = parse(asyncio.run(run()))
+    assert (event["topic"], event["data"]) == (TOPIC_INVENTORY, {"inventoryID": 7})
+    assert bus.stats()["subscribers"] == subscribers
+
+
+def test_snapshot_is_sent_after_subscribing():
+    async def snapshot():
+        # Sự kiện phát trong lúc tạo snapshot vẫn tới client
+        bus.publish(TOPIC_INVENTORY, "updated", {"inventoryID": 8})
+        return "event: snapshot\ndata: {}\n\n"
+
+    chunks = asyncio.run(collect(iter_sse(FakeRequest(1), {TOPIC_INVENTORY}, snapshot=snapshot)))
+    assert chunks[0].startswith("event: snapshot")
+    assert parse(chunks[1])["data"] == {"inventoryID": 8}
+
+
+def test_last_event_id_replays_missed_events_of_own_store():
+    first = bus.publish(TOPIC_INVENTORY, "updated", {"inventoryID": 1})
+    with use_tenant("hn01"):
+        bus.publish(TOPIC_INVENTORY, "updated", {"inventoryID": 2})
+    bus.publish(TOPIC_INVENTORY, "updated", {"inventoryID": 3})
+    chunks = asyncio.run(collect(iter_sse(FakeRequest(1), {TOPIC_INVENTORY}, first["id"])))
+    assert [parse(chunk)["data"] for chunk in chunks] == [{"inventoryID": 3}]
+
+
+def test_expired_history_and_overflow_send_resync():
+    small = EventBus(history_size=2)
+
+    async def run():
+        for n in range(4):
+            small.publish(TOPIC_INVENTORY, "updated", {"n": n})
+        expired = small.subscribe({TOPIC_INVENTORY}, last_event_id=0)
+        overflow = small.subscribe({TOPIC_INVENTORY}, maxsize=2)
+        for n in range(3):
+            small.publish(TOPIC_INVENTORY, "updated", {"n": n})
+        await asyncio.sleep(0.01)
+        return expired.queue.get_nowait(), [overflow.queue.get_nowait() for _ in range(overflow.queue.qsize())]
+
+    expired, overflow = asyncio.run(run())
+    assert (expired["type"], expired["data"]["reason"]) == ("resync", "history expired")
+    assert [event["type"] for event in overflow] == ["resync"]
@@ -0,0 +1,76 @@
+"""
+Chạy song song các câu đọc độc lập (db.fetch_parallel): kết quả theo tên, giới hạn đồng thời, timeout
+    python -m pytest tests
+"""
+import threading
+import time
+
+import pytest
+
+from src.api import db
+from src.api.routers import products
+
+from conftest import add_inventory, add_product
+
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    app_client.product_id = add_product(app_client, productName="Used")
+    add_inventory(app_client, 9951, product_id=app_client.product_id)
+    app_client.post("/inventory/import", json=dict(
+        productID=app_client.product_id, inventoryID=9951, quantity=1, unitCost=1,
+    )).raise_for_status()
+    return app_client
+
+
+@pytest.fixture
+def slow_fetch(monkeypatch):
+    """_fetch giả: ngủ theo số giây trong query, ghi lại số câu chạy cùng lúc nhiều nhất"""
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def fetch(query, params, primary):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        try:
+            time.sleep(float(query))
+            return [{"query": query, "params": params, "primary": primary, "tenant": db.current_tenant()}]
+        finally:
+            with lock:
+                state["running"] -= 1
+    monkeypatch.setattr(db, "_fetch", fetch)
+    return state
+
+
+def test_results_are_keyed_by_name(client):
+    rows = db.fetch_parallel({
+        "products": "SELECT COUNT(*) AS count FROM tbl_product",
+        "stock": ("SELECT stockQuantity FROM tbl_inventory WHERE inventoryID = %s", (9951,)),
+    })
+    assert list(rows) == ["products", "stock"]
+    assert (rows["products"][0]["count"], rows["stock"]) == (1, [{"stockQuantity": 1}])
+
+
+def test_concurrency_is_capped_per_request(slow_fetch):
+    rows = db.fetch_parallel({name: "0.05" for name in "abcd"}, max_concurrency=2)
+    assert list(rows) == list("abcd")
+    assert slow_fetch["peak"] == 2
+
+
+def test_timeout_and_request_context(slow_fetch, monkeypatch):
+    with pytest.raises(TimeoutError, match="slow"):
+        db.fetch_parallel({"fast": "0", "slow": "0.5"}, timeout=0.1)
+    monkeypatch.setitem(db.TENANT_SHARDS, "hn01", {})
+    with db.use_tenant("hn01"):
+        rows = db.fetch_parallel({"a": ("0", (1,)), "b": "0"}, primary=True)
+    assert rows["a"] == [{"query": "0", "params": (1,), "primary": True, "tenant": "hn01"}]
+
+
+def test_product_usage_blocks_delete(client):
+    usage = products.check_product_usage(client.product_id)
+    # Dòng liên kết khi tạo inventory và dòng nhập kho
+    assert (usage["stores_count"], usage["orders_count"], usage["can_delete"]) == (2, 0, False)
+    assert client.delete(f"/products/{client.product_id}").status_code == 400
+    unused = add_product(client, productName="Unused")
+    assert client.delete(f"/products/{unused}").status_code == 200
@@ -0,0 +1,98 @@
+"""
+GroupCommitWriter khi request chờ quá GROUP_COMMIT_TIMEOUT_SECONDS
+    python -m pytest tests
+"""
+import threading
+import time
+
+import pytest
+
+from src.api import db
+
+
+class FakeConnection:
+    """Kết nối giả: commit chờ tới khi test cho phép, ghi lại các câu đã commit"""
+    open = True
+
+    def __init__(self, committed: list, release: threading.Event):
+        self.committed = committed
+        self.release = release
+        self.pending = []
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            lastrowid = None
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, query, params):
+                connection.pending.append(params[0])
+                self.lastrowid = params[0]
+        return Cursor()
+
+    def commit(self):
+        self.release.wait(5)
+        self.committed.extend(self.pending)
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+    def close(self):
+        pass
+
+
+def test_timeout_cancels_queued_statement_but_waits_for_running_batch(monkeypatch):
+    committed = []
+    release = threading.Event()
+    monkeypatch.setattr(db, "get_connection", lambda: FakeConnection(committed, release))
+    writer = db.GroupCommitWriter(enabled=True, window_ms=0, max_batch=1, timeout=0.2)
+    writer.start()
+    try:
+        results = {}
+
+        def run(value):
+            try:
+                results[value] = writer.execute("INSERT", (value,))
+            except TimeoutError:
+                results[value] = "timeout"
+
+        first = threading.Thread(target=run, args=(1,))
+        first.start()
+        # Câu 2 nằm trong hàng đợi sau lô đang commit của câu 1
+        while writer.stats()["statements"] == 0:
+            pass
+        second = threading.Thread(target=run, args=(2,))
+        second.start()
+        second.join(5)
+        release.set()
+        first.join(5)
+    finally:
+        writer.stop()
+
+    assert results == {1: 1, 2: "timeout"}
+    assert committed == [1]
+    assert writer.stats()["cancelled"] == 1
+
+
+def test_wait_for_running_batch_is_bounded(monkeypatch):
+    committed = []
+    release = threading.Event()
+    monkeypatch.setattr(db, "get_connection", lambda: FakeConnection(committed, release))
+    writer = db.GroupCommitWriter(enabled=True, window_ms=0, max_batch=1, timeout=0.1)
+    writer.start()
+    try:
+        began = time.monotonic()
+        with pytest.raises(TimeoutError, match="may still be committed"):
+            writer.execute("INSERT", (1,))
+        assert time.monotonic() - began < 1
+    finally:
+        release.set()
+        writer.stop()
+    assert committed == [1]
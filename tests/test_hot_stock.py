@@ -0,0 +1,49 @@
+"""
+Inventory chia shard (hot SKU): tồn kho thực = dòng chính + các shard ở mọi endpoint và báo cáo
+    python -m pytest tests
+"""
+import pytest
+
+from src.api import stock_movements
+from src.api.db import execute_sql
+
+from conftest import add_product, add_inventory
+
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    app_client.product_id = add_product(app_client, productName="Hot")
+    add_inventory(app_client, 9101, app_client.product_id, quantity=40, unit_cost=2.5)
+    app_client.post("/inventories/9101/shards", params={"count": 4}).raise_for_status()
+    return app_client
+
+
+def report_row(client, inventory_id: int) -> dict:
+    rows = client.get("/reports/inventory", params={"fresh": True}).json()
+    return next(row for row in rows if row["inventoryID"] == inventory_id)
+
+
+def test_enable_spreads_stock_over_shards(client):
+    [hot] = [row for row in client.get("/inventories/hot").json() if row["inventoryID"] == 9101]
+    assert (hot["shards"], hot["mainQuantity"], hot["stockQuantity"]) == (4, 0, 40)
+    assert client.post("/inventories/9101/shards", params={"count": 1}).status_code == 400
+
+
+def test_exports_and_imports_keep_the_total(client):
+    for quantity in (7, 9, 11):
+        client.post("/inventory/export", json=dict(productID=client.product_id, inventoryID=9101, quantity=quantity)).raise_for_status()
+    client.post("/inventory/import", json=dict(productID=client.product_id, inventoryID=9101, quantity=5, unitCost=2.5)).raise_for_status()
+    assert client.post("/inventory/export", json=dict(productID=client.product_id, inventoryID=9101, quantity=99)).status_code == 400
+    stock_movements.settle_all()
+    row = report_row(client, 9101)
+    assert row["stockQuantity"] == 18
+    assert float(row["totalValue"]) == pytest.approx(18 * 2.5)
+
+
+def test_value_without_valuation_row_counts_shards(client):
+    # Inventory chưa có dòng định giá (vd. dữ liệu có từ trước): giá trị = tồn kho thực * unitCost
+    execute_sql("DELETE FROM tbl_inventory_valuation WHERE inventoryID = %s", (9101,))
+    row = report_row(client, 9101)
+    assert float(row["totalValue"]) == pytest.approx(row["stockQuantity"] * 2.5)
+    summary = client.get("/reports/summary", params={"fresh": True}).json()
+    assert float(summary["totalInventoryValue"]) >= row["stockQuantity"] * 2.5
@@ -0,0 +1,77 @@
+"""
+Nạp đơn hàng theo lô (hydration.py): một câu IN (...) cho mỗi bảng, giữ thứ tự mã đơn yêu cầu
+    python -m pytest tests
+"""
+import pytest
+
+from src.api import db
+from src.api.hydration import hydrate_orders
+
+from conftest import add_customer, add_inventory, add_product
+
+
+class CountingCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.queries = []
+
+    def execute(self, query, params=()):
+        self.queries.append(query)
+        return self.cursor.execute(query, params)
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    pen, ink = add_product(app_client, productName="Pen"), add_product(app_client, productName="Ink")
+    add_inventory(app_client, 9301, pen)
+    add_inventory(app_client, 9302, ink)
+    for product_id, inventory_id in ((pen, 9301), (ink, 9302)):
+        app_client.post("/inventory/import", json=dict(
+            productID=product_id, inventoryID=inventory_id, quantity=20, unitCost=1,
+        )).raise_for_status()
+    add_customer(app_client)
+    app_client.order_ids = []
+    for products in ([(pen, 1)], [(pen, 2), (ink, 3)], [(ink, 1)]):
+        response = app_client.post("/order/checkout", json=dict(
+            customerID=1, paymentMethod="Cash", pickupMethod="Store", orderStatus="Pending",
+            paymentStatus="Unpaid", shippedStatus="In Process",
+            products=[dict(productID=p, quantity=q, priceEach=2) for p, q in products],
+        ))
+        response.raise_for_status()
+        app_client.order_ids.append(response.json()["orderID"])
+    app_client.post("/payments", json=dict(orderID=app_client.order_ids[1], transactionAmount=4)).raise_for_status()
+    return app_client
+
+
+def test_one_query_per_table(client):
+    _, second, third = client.order_ids
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as raw:
+            cursor = CountingCursor(raw)
+            orders = hydrate_orders([third, 999999, second, third], cursor)
+    finally:
+        conn.close()
+    assert len(cursor.queries) == 4
+    assert [order["orderID"] for order in orders] == [third, second]
+    assert sorted(item["product"]["productName"] for item in orders[1]["items"]) == ["Ink", "Pen"]
+    assert [float(payment["transactionAmount"]) for payment in orders[1]["payments"]] == [4]
+    assert orders[0]["payments"] == []
+
+
+def test_batch_endpoint(client):
+    first, second, _ = client.order_ids
+    orders = client.get("/orders/batch", params={"ids": f"{second},{first}"}).json()
+    assert [(order["orderID"], len(order["items"])) for order in orders] == [(second, 2), (first, 1)]
+    assert client.get("/orders/batch", params={"ids": "1,x"}).status_code == 400
+    assert client.get("/orders/batch", params={"ids": ",".join(map(str, range(201)))}).status_code == 400
+
+
+def test_order_by_id_returns_that_order(client):
+    # Trước đây /orders/{id} tìm theo customerID
+    for order_id in client.order_ids:
+        assert client.get(f"/orders/{order_id}").json()["orderID"] == order_id
+    assert client.get("/orders/999999").status_code == 404
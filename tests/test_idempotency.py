@@ -0,0 +1,80 @@
+"""
+Idempotency-Key (idempotency.py): gửi lại nhận response đã lưu, không ghi lần hai
+    python -m pytest tests
+"""
+import pytest
+
+from src.api.db import execute_sql, fetchall_sql
+
+from conftest import add_customer, add_inventory, add_product
+
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    add_customer(app_client)
+    app_client.product_id = add_product(app_client, productName="Retried")
+    add_inventory(app_client, 9701, product_id=app_client.product_id, quantity=5)
+    return app_client
+
+
+def count(table: str) -> int:
+    return fetchall_sql(f"SELECT COUNT(*) AS n FROM {table}")[0]["n"]
+
+
+def checkout(client, key: str, quantity: int = 1):
+    return client.post("/order/checkout", headers={"Idempotency-Key": key}, json=dict(
+        customerID=1, paymentMethod="BankTransfer", pickupMethod="Store", orderStatus="New",
+        paymentStatus="Paid", shippedStatus="No", products=[dict(productID=client.product_id, quantity=quantity, priceEach=2)],
+    ))
+
+
+def test_checkout_replay_returns_original_response(client):
+    first = checkout(client, "checkout-1")
+    assert first.status_code == 200, first.text
+    assert "idempotent-replayed" not in first.headers
+    counts = count("tbl_order"), count("tbl_requests"), count("tbl_payment")
+
+    replay = checkout(client, "checkout-1")
+    assert (replay.status_code, replay.json()) == (200, first.json())
+    assert replay.headers["idempotent-replayed"] == "true"
+    assert (count("tbl_order"), count("tbl_requests"), count("tbl_payment")) == counts
+
+    # Khóa đã dùng cho giỏ hàng khác; khóa khác là đơn mới
+    assert checkout(client, "checkout-1", quantity=2).status_code == 422
+    assert checkout(client, "checkout-2").json()["orderID"] != first.json()["orderID"]
+
+
+def test_payment_replay_keeps_status_code(client):
+    payment = dict(orderID=1, transactionAmount=2, paymentMethod="Cash", transactionStatus="Paid")
+    before = count("tbl_payment")
+    for _ in range(2):
+        response = client.post("/payments", json=payment, headers={"Idempotency-Key": "payment-1"})
+        assert response.status_code == 201, response.text
+    assert count("tbl_payment") == before + 1
+
+
+def test_failed_operation_releases_key(client):
+    export = dict(productID=client.product_id, inventoryID=9701, quantity=8)
+    headers = {"Idempotency-Key": "export-1"}
+    assert client.post("/inventory/export", json=export, headers=headers).status_code == 400
+    client.post("/inventory/import", json=dict(
+        productID=client.product_id, inventoryID=9701, quantity=5, unitCost=1,
+    )).raise_for_status()
+    # Lần đầu lỗi nên không lưu response: gửi lại cùng khóa được chạy thật
+    response = client.post("/inventory/export", json=export, headers=headers)
+    assert response.status_code == 201 and "idempotent-replayed" not in response.headers
+    assert fetchall_sql("SELECT stockQuantity FROM tbl_inventory WHERE inventoryID = 9701")[0]["stockQuantity"] == 2
+
+
+def test_expired_key_can_be_reused(client):
+    payment = dict(orderID=1, transactionAmount=3, paymentMethod="Cash", transactionStatus="Paid")
+    headers = {"Idempotency-Key": "payment-expired"}
+    client.post("/payments", json=payment, headers=headers).raise_for_status()
+    execute_sql("UPDATE tbl_idempotency_key SET expiresAt = datetime('now', '-1 day')")
+    response = client.post("/payments", json={**payment, "transactionAmount": 4}, headers=headers)
+    assert response.status_code == 201 and "idempotent-replayed" not in response.headers
+
+
+def test_key_length_is_limited(client):
+    response = client.post("/payments", json=dict(orderID=1, transactionAmount=1), headers={"Idempotency-Key": "k" * 256})
+    assert response.status_code == 400
@@ -0,0 +1,113 @@
+"""
+Job nền (jobs.py): chạy, tiến độ, hủy, khởi động lại, cửa hàng sở hữu job và nhập danh mục nền
+    python -m pytest tests
+"""
+import os
+import threading
+import time
+
+import pytest
+
+from src.api import catalog_io, jobs
+from src.api.db import use_tenant
+
+
+@pytest.fixture
+def runner(tmp_path):
+    runner = jobs.JobRunner(path=str(tmp_path / "jobs.sqlite3"), workers=1, ttl_hours=1)
+    runner.start()
+    yield runner
+    runner.stop()
+
+
+def wait_for(runner, job_id: str, statuses=jobs.FINISHED_STATUSES, timeout: float = 5) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = runner.get(job_id, include_result=True)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def test_job_reports_progress_and_result(runner):
+    def double(params, context):
+        context.progress(step=1)
+        return {"value": params["value"] * 2}
+
+    runner.register("double", double)
+    job = wait_for(runner, runner.submit("double", {"value": 21}))
+    assert (job["status"], job["progress"], job["result"]) == (jobs.STATUS_SUCCEEDED, {"step": 1}, {"value": 42})
+    with pytest.raises(jobs.UnknownJobKind):
+        runner.submit("missing")
+
+
+def test_cancel_running_and_queued_jobs(runner):
+    started, release = threading.Event(), threading.Event()
+    discarded = []
+
+    def blocking(params, context):
+        started.set()
+        release.wait(5)
+        context.check_cancelled()
+        return "unreachable"
+
+    runner.register("blocking", blocking, discard=discarded.append)
+    running = runner.submit("blocking", {"n": 1})
+    started.wait(5)
+    # Một worker: job thứ hai còn chờ, hủy ngay và dọn tài nguyên của nó
+    queued = runner.submit("blocking", {"n": 2})
+    assert runner.cancel(queued)
+    assert runner.get(queued)["status"] == jobs.STATUS_CANCELLED
+    assert discarded == [{"n": 2}]
+
+    assert runner.cancel(running)
+    release.set()
+    assert wait_for(runner, running)["status"] == jobs.STATUS_CANCELLED
+    assert not runner.cancel(running)
+
+
+def test_restart_fails_interrupted_jobs(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    discarded = []
+    first = jobs.JobRunner(path=path, workers=1)
+    first.start()
+    first.stop()
+    first._execute(
+        "INSERT INTO jobs (jobID, kind, params, status, createdAt) VALUES (?, ?, ?, ?, ?)",
+        ("interrupted", "upload", '{"path": "x"}', jobs.STATUS_RUNNING, jobs._now()),
+    )
+    second = jobs.JobRunner(path=path, workers=1)
+    second.register("upload", lambda params, context: None, discard=discarded.append)
+    second.start()
+    try:
+        job = second.get("interrupted")
+        assert (job["status"], job["error"]) == (jobs.STATUS_FAILED, "Interrupted by server restart")
+        assert discarded == [{"path": "x"}]
+    finally:
+        second.stop()
+
+
+def test_jobs_belong_to_their_store(runner):
+    runner.register("noop", lambda params, context: None)
+    with use_tenant("hn01"):
+        job_id = runner.submit("noop")
+        wait_for(runner, job_id)
+        assert [job["jobID"] for job in runner.list()] == [job_id]
+    assert runner.get(job_id) is None
+    assert runner.list() == []
+    assert not runner.cancel(job_id)
+
+
+def test_background_catalog_import_removes_upload(app_client):
+    csv = b"productName,priceEach,productLine,productScale,productBrand,productDiscription,warrantyPeriod,MSRP\nJob,1,L,1,B,d,1,2\n"
+    response = app_client.post("/products/import", params={"background": True}, files={"file": ("c.csv", csv)})
+    assert response.status_code == 202, response.text
+    job_id = response.json()["jobID"]
+    deadline = time.monotonic() + 5
+    while app_client.get(f"/jobs/{job_id}").json()["status"] not in jobs.FINISHED_STATUSES:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    result = app_client.get(f"/jobs/{job_id}/result").json()
+    assert (result["inserted"], result["errors"]) == (1, [])
+    assert os.listdir(catalog_io.UPLOAD_DIR) == []
@@ -0,0 +1,110 @@
+"""
+Journal ghi trễ: thử lại khi mất kết nối, dead-letter khi lỗi dữ liệu, không đếm trùng khi đang ghi batch
+    python -m pytest tests
+"""
+import sqlite3
+import threading
+
+import pymysql
+import pytest
+
+from src.api import journal as journal_module
+
+
+@pytest.fixture
+def journal(sqlite_db, tmp_path, monkeypatch):
+    journal = journal_module.MovementJournal(str(tmp_path / "inventory.log"), fsync_ms=0, flush_ms=60_000, batch_size=10)
+    monkeypatch.setattr(journal, "_load_flushed_seq", lambda: 0)
+    monkeypatch.setattr(journal_module.alerts, "publish", lambda events: None)
+    monkeypatch.setattr(journal, "_read_db_stock", lambda inventory_id: 100)
+    journal.start()
+    yield journal
+    journal._stop.set()
+    journal._wake_syncer.set()
+    journal._wake_flusher.set()
+    for thread in journal._threads:
+        thread.join(5)
+
+
+def fake_apply(applied: list, fail=None):
+    def apply_entries(entries, last_seq=None):
+        for entry in entries:
+            if fail and entry["seq"] in fail:
+                raise fail[entry["seq"]]
+        applied.append(([entry["seq"] for entry in entries], last_seq))
+        return [None] * len(entries)
+    return apply_entries
+
+
+def test_connection_error_keeps_whole_batch(journal, monkeypatch):
+    journal.record_import(1, 1, 5, 1.0)
+    journal.record_import(1, 1, 5, 1.0)
+    monkeypatch.setattr(journal, "_apply_entries", fake_apply([], {1: pymysql.err.OperationalError(2013, "lost")}))
+    with pytest.raises(pymysql.err.OperationalError):
+        journal.flush()
+    assert journal.stats()["pending"] == 2
+
+    applied = []
+    monkeypatch.setattr(journal, "_apply_entries", fake_apply(applied))
+    assert journal.flush() == 2
+    assert applied == [([1, 2], None)]
+
+
+def test_data_error_dead_letters_only_failing_entry(journal, monkeypatch):
+    for _ in range(3):
+        journal.record_import(1, 1, 5, 1.0)
+    applied = []
+    monkeypatch.setattr(journal, "_apply_entries", fake_apply(applied, {2: sqlite3.IntegrityError("fk")}))
+    assert journal.flush() == 3
+    assert applied == [([1], None), ([], 2), ([3], None)]
+    with open(journal.path + ".failed", encoding="utf-8") as f:
+        assert [line for line in f if '"seq": 2' in line]
+        f.seek(0)
+        assert len(f.readlines()) == 1
+
+
+def test_unknown_error_stops_at_failing_entry(journal, monkeypatch):
+    for _ in range(3):
+        journal.record_import(1, 1, 5, 1.0)
+    applied = []
+    monkeypatch.setattr(journal, "_apply_entries", fake_apply(applied, {2: RuntimeError("boom")}))
+    assert journal.flush() == 1
+    assert journal.stats()["pending"] == 2
+    assert not journal_module.os.path.exists(journal.path + ".failed")
+
+
+def test_export_waits_for_batch_being_applied(journal, monkeypatch):
+    journal.record_import(1, 1, 5, 1.0)
+    committed = threading.Event()
+    release = threading.Event()
+    stock = {"db": 0}
+
+    def apply_entries(entries, last_seq=None):
+        stock["db"] += sum(entry["quantity"] for entry in entries)
+        committed.set()
+        release.wait(5)
+        return [None] * len(entries)
+
+    monkeypatch.setattr(journal, "_apply_entries", apply_entries)
+    monkeypatch.setattr(journal, "_read_db_stock", lambda inventory_id: stock["db"])
+    flusher = threading.Thread(target=journal.flush)
+    flusher.start()
+    committed.wait(5)
+
+    result = {}
+
+    def export():
+        try:
+            result["entry"] = journal.record_export(1, 1, 10)
+        except journal_module.InsufficientStock:
+            result["insufficient"] = True
+
+    exporter = threading.Thread(target=export)
+    exporter.start()
+    exporter.join(0.3)
+    # Batch đã commit nhưng chưa rời _pending: nếu đọc lúc này sẽ thấy 5 + 5 = 10
+    assert exporter.is_alive()
+    release.set()
+    flusher.join(5)
+    exporter.join(5)
+    assert result == {"insufficient": True}
@@ -0,0 +1,65 @@
+"""
+List endpoint: projection (fields=), sort nhiều cột, bộ lọc theo kiểu và limit/offset (listing.py)
+    python -m pytest tests
+"""
+import datetime
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import QueryParams
+
+from src.api.listing import build_list_query
+
+from conftest import add_product
+
+COLUMNS = {"id": "int", "name": "str", "price": "float", "at": "datetime"}
+
+
+def build(query_string: str, **kwargs):
+    return build_list_query("tbl", COLUMNS, QueryParams(query_string), **kwargs)
+
+
+def test_query_uses_only_whitelisted_columns():
+    assert build("fields=id,name&sort=-price,id&price__gte=2&name__in=a,b&other=1&limit=5&offset=10") == (
+        "SELECT id, name FROM tbl WHERE price >= %s AND name IN (%s, %s) ORDER BY price DESC, id ASC LIMIT %s OFFSET %s",
+        (2.0, "a", "b", 5, 10),
+    )
+    assert build("at__lte=2024-01-31") == ("SELECT * FROM tbl WHERE at < %s", (datetime.datetime(2024, 2, 1),))
+    assert build("fields=name", required_fields=["id"])[0] == "SELECT name, id FROM tbl"
+
+
+@pytest.mark.parametrize("query_string", [
+    "fields=id,password", "sort=name;DROP", "price__like=1", "id=abc", "limit=-1", "limit=5&offset=-5", "limit=x",
+])
+def test_invalid_parameters_are_rejected(query_string):
+    with pytest.raises(HTTPException) as error:
+        build(query_string)
+    assert error.value.status_code == 400
+
+
+def test_limit_is_capped():
+    assert build("limit=100000")[1] == (1000, 0)
+
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    for name, price, line in [("A", 5, "Pen"), ("B", 15, "Pen"), ("C", 25, "Ink"), ("D", 35, "Ink")]:
+        add_product(app_client, productName=name, priceEach=price, productLine=line)
+    return app_client
+
+
+def test_products_endpoint(client):
+    response = client.get("/products?fields=productName,priceEach&sort=-priceEach&priceEach__gte=10&productLine__in=Pen,Ink")
+    assert response.status_code == 200
+    assert response.json() == [
+        {"productName": "D", "priceEach": 35}, {"productName": "C", "priceEach": 25}, {"productName": "B", "priceEach": 15},
+    ]
+    page = client.get("/products?fields=productName&sort=productName&limit=2&offset=1").json()
+    assert page == [{"productName": "B"}, {"productName": "C"}]
+    assert client.get("/products?limit=-1").status_code == 400
+    assert client.get("/products?sort=unknown").status_code == 400
+
+
+def test_endpoint_params_combine_with_filters(client):
+    rows = client.get("/products?category=Ink&priceEach__lt=30&fields=productName").json()
+    assert rows == [{"productName": "C"}]
@@ -0,0 +1,71 @@
+"""
+Middleware của app: CORS cho cả response do middleware trả về, chọn cửa hàng, read-your-writes, tracing
+    python -m pytest tests
+"""
+import pytest
+
+ORIGIN = {"Origin": "http://manager.local"}
+
+
+def test_unknown_store_error_has_cors_headers(app_client):
+    response = app_client.get("/products", headers={**ORIGIN, "X-Store-ID": "nowhere"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Unknown store: nowhere"}
+    assert response.headers["access-control-allow-origin"]
+
+
+def test_profiling_refusal_has_cors_headers(app_client):
+    response = app_client.get("/products?profile=1", headers=ORIGIN)
+    assert response.status_code == 403
+    assert response.headers["access-control-allow-origin"]
+
+
+def test_write_pins_session_to_primary(app_client):
+    response = app_client.post("/customers", json=dict(customerName="Pin", phone="1", address="x"))
+    assert response.status_code < 300
+    until = float(response.headers["x-db-primary-until"])
+    assert response.cookies["db_primary_until"] == str(until)
+    assert "httponly" in response.headers["set-cookie"].lower()
+    assert "x-db-primary-until" not in app_client.get("/products").headers
+
+
+def test_metrics_label_requests_by_route_template(app_client):
+    app_client.get("/products/123456/inventory")
+    app_client.get("/no-such-path")
+    text = app_client.get("/metrics").text
+    assert 'route="/products/{id}/inventory"' in text
+    assert 'route="unmatched",status="404"' in text
+
+
+def test_admin_profile_returns_profile_id(app_client, monkeypatch):
+    from src.api import profiling
+
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "secret")
+    response = app_client.get("/products?profile=1", headers={profiling.ADMIN_HEADER: "secret"})
+    assert response.status_code == 200
+    assert response.headers[profiling.PROFILE_ID_HEADER] in {p["profileID"] for p in profiling.list_profiles()}
+
+
+def test_store_with_token_requires_matching_header(monkeypatch):
+    from src.api import db
+
+    monkeypatch.setattr(db, "TENANT_SHARDS", {"hn01": {}, "hcm01": {}})
+    monkeypatch.setattr(db, "TENANT_TOKENS", {"hn01": "s3cret"})
+    for token in (None, "wrong"):
+        with pytest.raises(db.TenantForbidden):
+            db.set_tenant("hn01", token)
+    with db.use_tenant(None):
+        db.set_tenant("hn01", "s3cret")
+        assert db.current_tenant() == "hn01"
+        db.set_tenant("hcm01")
+        assert db.current_tenant() == "hcm01"
+
+
+def test_forbidden_store_returns_403(app_client, monkeypatch):
+    from src.api import db
+
+    monkeypatch.setattr(db, "TENANT_SHARDS", {"hn01": {}})
+    monkeypatch.setattr(db, "TENANT_TOKENS", {"hn01": "s3cret"})
+    response = app_client.get("/products", headers={**ORIGIN, "X-Store-ID": "hn01", "X-Store-Token": "nope"})
+    assert response.status_code == 403
+    assert response.headers["access-control-allow-origin"]
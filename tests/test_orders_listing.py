@@ -0,0 +1,62 @@
+"""
+GET /orders: tìm theo tiền tố mã đơn, lọc trạng thái/ngày và phân trang keyset
+    python -m pytest tests
+"""
+import pytest
+
+from conftest import add_customer
+from src.api.db import execute_sql
+
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    add_customer(app_client)
+    for _ in range(12):
+        app_client.post("/orders", json=dict(customerID=1)).raise_for_status()
+    # Đơn 1..12 đặt vào các ngày 2024-01-01..2024-01-12; đơn chẵn đã giao
+    execute_sql("UPDATE tbl_order SET orderDate = datetime('2024-01-01 09:00:00', '+' || (orderID - 1) || ' days')")
+    execute_sql("UPDATE tbl_order SET orderStatus = 'Shipped' WHERE orderID % 2 = 0")
+    return app_client
+
+
+def ids(response) -> list:
+    assert response.status_code == 200, response.text
+    return [row["orderID"] for row in response.json()]
+
+
+def test_search_matches_id_prefix(client):
+    assert ids(client.get("/orders?search=1")) == [12, 11, 10, 1]
+    assert ids(client.get("/orders?search=%2312")) == [12]
+
+
+@pytest.mark.parametrize("search", ["a", "1a", "²"])
+def test_non_numeric_search_is_empty_not_error(client, search):
+    # Ô tìm kiếm của trang quản lý gửi search= theo từng phím gõ
+    assert ids(client.get("/orders", params={"search": search})) == []
+
+
+def test_blank_search_is_ignored(client):
+    assert len(ids(client.get("/orders", params={"search": " #"}))) == 12
+
+
+def test_status_and_date_filters(client):
+    assert ids(client.get("/orders?status=Shipped,Cancelled&date_from=2024-01-03&date_to=2024-01-06")) == [6, 4]
+    assert len(ids(client.get("/orders?status=,"))) == 12
+
+
+def test_keyset_pages_cover_every_order_once(client):
+    seen = []
+    response = client.get("/orders?limit=5")
+    while True:
+        seen += ids(response)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        response = client.get("/orders", params={"limit": 5, "cursor": cursor})
+    assert seen == list(range(12, 0, -1))
+
+
+def test_cursor_cannot_be_combined_with_sort(client):
+    cursor = client.get("/orders?limit=5").headers["X-Next-Cursor"]
+    assert client.get("/orders", params={"cursor": cursor, "sort": "orderID"}).status_code == 400
+    assert client.get("/orders?cursor=garbage").status_code == 400
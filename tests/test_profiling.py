@@ -0,0 +1,88 @@
+"""
+Profiling cho admin (profiling.py, routers/admin.py): lấy mẫu worker, ?profile=1 với cProfile, tracemalloc
+    python -m pytest tests
+"""
+import pstats
+
+import pytest
+
+from src.api import profiling
+
+from conftest import add_customer
+
+ADMIN = {profiling.ADMIN_HEADER: "secret"}
+
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    add_customer(app_client, "Profiled")
+    return app_client
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "secret")
+
+
+def test_admin_routes_require_token(client, monkeypatch):
+    assert client.get("/admin/profiles").status_code == 403
+    assert client.get("/admin/profiles", headers={profiling.ADMIN_HEADER: "wrong"}).status_code == 403
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "")
+    # Chưa cấu hình ADMIN_TOKEN: endpoint admin như không tồn tại, ?profile=1 bị từ chối
+    assert client.get("/admin/profiles", headers=ADMIN).status_code == 404
+    assert client.get("/customers", params={"profile": 1}, headers=ADMIN).status_code == 403
+
+
+def test_request_profile_is_saved_and_readable(client, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_KEEP", 2)
+    ids = []
+    for _ in range(3):
+        response = client.get("/customers/1", params={"profile": 1}, headers=ADMIN)
+        assert response.status_code == 200
+        ids.append(response.headers[profiling.PROFILE_ID_HEADER])
+    # Chỉ giữ PROFILE_KEEP file mới nhất
+    listed = [profile["profileID"] for profile in client.get("/admin/profiles", headers=ADMIN).json()]
+    assert listed == sorted(ids[1:], reverse=True)
+
+    text = client.get(f"/admin/profiles/{ids[-1]}", params={"format": "text", "limit": 5}, headers=ADMIN)
+    assert text.status_code == 200 and "function calls" in text.text
+    assert pstats.Stats(profiling.profile_path(ids[-1])).total_calls > 0
+    assert client.get(f"/admin/profiles/{ids[-1]}", params={"format": "text", "sort": "nope"}, headers=ADMIN).status_code == 400
+    assert client.get(f"/admin/profiles/{ids[0]}", headers=ADMIN).status_code == 404
+    assert profiling.profile_path("../etc/passwd") is None
+
+
+def test_only_selected_routes_are_wrapped(monkeypatch):
+    def endpoint():
+        return None
+
+    monkeypatch.setattr(profiling, "PROFILE_ROUTES", ["/selected"])
+    assert profiling.ProfiledRoute("/other", endpoint).endpoint is endpoint
+    assert profiling.ProfiledRoute("/selected", endpoint).endpoint is not endpoint
+
+
+def test_sampling_profile(client):
+    params = {"seconds": 0.05, "interval_ms": 5}
+    speedscope = client.post("/admin/profile/sample", params=params, headers=ADMIN).json()
+    assert speedscope["$schema"] == profiling.SPEEDSCOPE_SCHEMA
+    assert speedscope["profiles"] and speedscope["shared"]["frames"]
+    collapsed = client.post("/admin/profile/sample", params={**params, "format": "collapsed"}, headers=ADMIN)
+    assert collapsed.status_code == 200 and collapsed.text.strip()
+    assert client.post("/admin/profile/sample", params={"seconds": 0}, headers=ADMIN).status_code == 400
+
+    with profiling._sampling:
+        assert client.post("/admin/profile/sample", params=params, headers=ADMIN).status_code == 409
+
+
+def test_tracemalloc_snapshots(client):
+    assert client.get("/admin/tracemalloc/snapshot", headers=ADMIN).status_code == 409
+    assert client.post("/admin/tracemalloc/start", headers=ADMIN).json()["tracing"]
+    try:
+        first = client.get("/admin/tracemalloc/snapshot", headers=ADMIN).json()
+        assert first["compared"] is False and first["top"]
+        client.get("/customers")
+        second = client.get("/admin/tracemalloc/snapshot", params={"compare": True, "limit": 3}, headers=ADMIN).json()
+        assert second["compared"] is True and len(second["top"]) <= 3 and "sizeDiffKB" in second["top"][0]
+        assert client.get("/admin/tracemalloc/snapshot", params={"group_by": "x"}, headers=ADMIN).status_code == 400
+    finally:
+        assert client.post("/admin/tracemalloc/stop", headers=ADMIN).json()["tracing"] is False
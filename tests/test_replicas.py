@@ -0,0 +1,116 @@
+"""
+Định tuyến đọc sang replica (db.py): round-robin, kiểm tra độ trễ, fallback về primary và read-your-writes
+    python -m pytest tests
+"""
+import time
+
+import pymysql
+import pytest
+
+from src.api import db
+
+
+class FakeConnection:
+    def __init__(self, target: str, status=None, fail: bool = False):
+        if fail:
+            raise pymysql.err.OperationalError(2003, f"Can't connect to {target}")
+        self.target = target
+        self.status = status
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        pass
+
+    def fetchone(self):
+        return self.status
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def router(monkeypatch):
+    """Router hai replica; kết nối thật được thay bằng FakeConnection ghi lại đích"""
+    router = db.ReplicaRouter([{"host": "r1"}, {"host": "r2"}], max_lag=5)
+    down = set()
+    monkeypatch.setattr(db, "_sqlite", None)
+    monkeypatch.setattr(db, "replica_router", router)
+    monkeypatch.setattr(db, "get_connection", lambda: FakeConnection("primary"))
+    monkeypatch.setattr(db, "TracedConnection", lambda **config: FakeConnection(config["host"], fail=config["host"] in down))
+    router.down = down
+    token = db._routing.set(None)
+    yield router
+    db._routing.reset(token)
+
+
+def read_target() -> str:
+    return db.get_read_connection().target
+
+
+def test_reads_round_robin_over_healthy_replicas(router):
+    assert [read_target() for _ in range(4)] == ["r1", "r2", "r1", "r2"]
+    router.replicas[0].mark_down("lagging")
+    assert [read_target() for _ in range(2)] == ["r2", "r2"]
+    stats = router.stats()
+    assert stats["reads"]["replica"] == 6
+    assert [replica["reads"] for replica in stats["replicas"]] == [2, 4]
+
+
+def test_unreachable_replica_falls_back_to_primary(router):
+    router.down.update({"r1", "r2"})
+    # Mỗi lần đọc thử một replica, hỏng thì đánh dấu và đọc từ primary
+    assert [read_target() for _ in range(2)] == ["primary", "primary"]
+    assert [replica.healthy for replica in router.replicas] == [False, False]
+    # Không còn replica khỏe: đọc thẳng từ primary, không thử lại replica hỏng
+    assert read_target() == "primary"
+    assert router.stats()["reads"] == {"replica": 0, "primary": 3, "pinned": 0, "fallback": 2}
+
+
+def test_request_reads_its_own_writes(router):
+    state = db.begin_request()
+    assert read_target() == "r1"
+    db.mark_write()
+    assert state.wrote and read_target() == "primary"
+    # Request sau trong cùng session còn ghim primary theo mốc cookie/header
+    db.begin_request(time.time() + 60)
+    assert read_target() == "primary"
+    assert router.stats()["reads"]["pinned"] == 2
+
+
+def test_client_pin_is_capped(monkeypatch):
+    monkeypatch.setattr(db, "DB_READ_YOUR_WRITES_SECONDS", 5)
+    token = db._routing.set(None)
+    try:
+        state = db.begin_request(time.time() + 3600)
+        assert state.primary_until <= time.time() + 5
+        assert db.begin_request(time.time() - 1).use_primary() is False
+    finally:
+        db._routing.reset(token)
+
+
+@pytest.mark.parametrize("status, healthy, lag", [
+    ({"Seconds_Behind_Source": 1}, True, 1),
+    ({"Seconds_Behind_Master": 9}, False, 9),
+    ({"Seconds_Behind_Source": None}, False, None),
+    (None, True, 0),
+])
+def test_health_check_uses_replication_lag(monkeypatch, status, healthy, lag):
+    monkeypatch.setattr(pymysql, "connect", lambda **config: FakeConnection(config["host"], status))
+    replica = db.Replica({"host": "r1"})
+    replica.check(max_lag=5)
+    assert (replica.healthy, replica.lag) == (healthy, lag)
+    assert replica.checked_at is not None
+
+
+def test_db_stats_endpoint(app_client):
+    stats = app_client.get("/db/stats").json()
+    assert set(stats["reads"]) == {"replica", "primary", "pinned", "fallback"}
+    assert stats["replicas"] == [] and "groupCommit" in stats
@@ -0,0 +1,74 @@
+"""
+Báo cáo tính trước: cửa sổ thời gian, khớp tham số và tính lại sau thay đổi dữ liệu
+    python -m pytest tests
+"""
+import datetime
+import threading
+import time
+
+import pytest
+
+from src.api import report_precompute
+from src.api.db import use_tenant
+from src.api.event_bus import bus, TOPIC_PAYMENTS, TOPIC_ALERTS
+
+
+def test_window_range():
+    today = datetime.date(2024, 5, 20)
+    assert report_precompute.window_range("7d", today) == ("2024-05-13", "2024-05-20")
+    assert report_precompute.window_range("qtd", today) == ("2024-04-01", "2024-05-20")
+    assert report_precompute.window_range("all", today) == (None, None)
+    with pytest.raises(ValueError):
+        report_precompute.window_range("2w", today)
+
+
+def test_get_matches_exact_variant():
+    store = report_precompute.ReportStore(interval_minutes=0)
+    store.register("revenue", lambda start_date=None, end_date=None: [start_date, end_date], windowed=True)
+    store.register("summary", lambda: {"orders": 1})
+    # Các cửa sổ trùng khoảng ngày (vd. đầu quý cũng là đầu tháng) dùng chung một kết quả
+    windows = {report_precompute.window_range(window) for window in report_precompute.WINDOWS}
+    assert store.refresh_all() == len(windows) + 1
+    start, end = report_precompute.window_range("30d")
+    assert store.get("revenue", {"start_date": start, "end_date": end})[0] == [start, end]
+    assert store.get("revenue", {"start_date": "2000-01-01", "end_date": end}) is None
+    assert store.get("summary")[0] == {"orders": 1}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """Store chạy nền thay cho report_store, tính lại ngay khi có thay đổi (không gom)"""
+    computed = []
+    refreshed = threading.Event()
+
+    def summary():
+        computed.append(1)
+        refreshed.set()
+        return {"runs": len(computed)}
+
+    store = report_precompute.ReportStore(interval_minutes=60)
+    store.register("summary", summary)
+    monkeypatch.setattr(report_precompute, "REFRESH_DEBOUNCE_SECONDS", 0)
+    monkeypatch.setattr(report_precompute, "report_store", store)
+    store.start()
+    assert refreshed.wait(5)
+    refreshed.clear()
+    yield store, refreshed
+    store.stop()
+
+
+def test_default_store_change_triggers_refresh(store):
+    store, refreshed = store
+    bus.publish(TOPIC_PAYMENTS, "created", {"paymentID": 1})
+    deadline = time.monotonic() + 5
+    while store.get("summary")[0] != {"runs": 2}:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_unrelated_or_tenant_changes_do_not_refresh(store):
+    store, refreshed = store
+    bus.publish(TOPIC_ALERTS, "stock_alert", {})
+    with use_tenant("hn01"):
+        bus.publish(TOPIC_PAYMENTS, "created", {"paymentID": 1})
+    assert not refreshed.wait(0.3)
@@ -0,0 +1,107 @@
+"""
+Backend SQLite: dịch câu MySQL, transaction và kết nối
+    python -m pytest tests
+"""
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from src.api.sqlite_backend import translate
+
+
+def test_translate_leaves_quoted_literals_alone():
+    [sql], locking = translate(
+        "SELECT 'a/b' AS s, \"c/d\" AS t, x / y FROM tbl WHERE id = %s AND note LIKE 'it''s %%' AND at < NOW()"
+    )
+    assert sql == (
+        "SELECT 'a/b' AS s, \"c/d\" AS t, x * 1.0 / y FROM tbl WHERE id = ? AND note LIKE 'it''s %'"
+        " AND at < datetime('now', 'localtime')"
+    )
+    assert not locking
+
+
+def test_literal_survives_round_trip(sqlite_db):
+    conn = sqlite_db.connect()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 'a/b' AS s, 7 / 2 AS q, %s AS p", ("%s",))
+            assert cursor.fetchone() == {"s": "a/b", "q": 3.5, "p": "%s"}
+    finally:
+        conn.close()
+
+
+def test_memory_database_hides_uncommitted_writes(sqlite_db):
+    writer, reader = sqlite_db.connect(), sqlite_db.connect()
+    try:
+        with writer.cursor() as cursor:
+            cursor.execute("CREATE TABLE tbl_probe (id INT PRIMARY KEY)")
+        writer.commit()
+        with writer.cursor() as cursor:
+            cursor.execute("INSERT INTO tbl_probe (id) VALUES (%s)", (1,))
+        with reader.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) AS n FROM tbl_probe")
+            assert cursor.fetchone()["n"] == 0
+        writer.commit()
+        with reader.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) AS n FROM tbl_probe")
+            assert cursor.fetchone()["n"] == 1
+    finally:
+        writer.close()
+        reader.close()
+
+
+def test_writers_on_other_threads_wait_for_the_lock(sqlite_db):
+    setup = sqlite_db.connect()
+    with setup.cursor() as cursor:
+        cursor.execute("CREATE TABLE tbl_counter (id INT PRIMARY KEY, n INT)")
+        cursor.execute("INSERT INTO tbl_counter (id, n) VALUES (1, 0)")
+    setup.commit()
+    setup.close()
+    errors = []
+
+    def increment():
+        for _ in range(20):
+            conn = sqlite_db.connect()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT n FROM tbl_counter WHERE id = 1 FOR UPDATE")
+                    n = cursor.fetchone()["n"]
+                    cursor.execute("UPDATE tbl_counter SET n = %s WHERE id = 1", (n + 1,))
+                conn.commit()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                conn.close()
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    conn = sqlite_db.connect()
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT n FROM tbl_counter WHERE id = 1")
+        assert (errors, cursor.fetchone()["n"]) == ([], 80)
+    conn.close()
+
+
+def test_nested_write_on_same_thread_fails_fast(sqlite_db):
+    outer, inner = sqlite_db.connect(), sqlite_db.connect()
+    try:
+        with outer.cursor() as cursor:
+            cursor.execute("CREATE TABLE tbl_probe (id INT PRIMARY KEY)")
+        began = time.monotonic()
+        with pytest.raises(sqlite3.OperationalError):
+            with inner.cursor() as cursor:
+                cursor.execute("INSERT INTO tbl_probe (id) VALUES (1)")
+        assert time.monotonic() - began < sqlite_db.busy_timeout / 2
+        outer.commit()
+        # Khóa đã trả: kết nối thứ hai ghi được
+        with inner.cursor() as cursor:
+            cursor.execute("INSERT INTO tbl_probe (id) VALUES (1)")
+        inner.commit()
+    finally:
+        outer.close()
+        inner.close()
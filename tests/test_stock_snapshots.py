@@ -0,0 +1,66 @@
+"""
+Tồn kho tại một ngày: ảnh chụp theo ngày + phát lại biến động sau ảnh chụp cuối (stock_snapshots.py)
+    python -m pytest tests
+"""
+import pytest
+
+from src.api import stock_snapshots
+
+from conftest import add_inventory, add_product
+
+MOVEMENTS = [
+    ("import", "2024-01-01T09:00:00", 10),
+    ("export", "2024-01-03T09:00:00", 3),
+    ("import", "2024-01-03T15:00:00", 4),
+    ("export", "2024-01-06T09:00:00", 5),
+]
+EXPECTED = {"2023-12-31": 0, "2024-01-01": 10, "2024-01-02": 10, "2024-01-03": 11, "2024-01-05": 11, "2024-01-07": 6}
+
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    app_client.product_id = add_product(app_client, productName="Snap")
+    add_inventory(app_client, 9501)
+    for kind, date, quantity in MOVEMENTS:
+        payload = dict(productID=app_client.product_id, inventoryID=9501, quantity=quantity)
+        if kind == "import":
+            payload.update(unitCost=1, importDate=date)
+        else:
+            payload.update(exportDate=date)
+        app_client.post(f"/inventory/{kind}", json=payload).raise_for_status()
+    return app_client
+
+
+def stock_at(client, date: str) -> int:
+    response = client.get("/inventories/9501/stock-at", params={"date": date})
+    assert response.status_code == 200, response.text
+    return response.json()["stockQuantity"]
+
+
+def test_apply_movement():
+    assert stock_snapshots.apply_movement(5, "Import", 3) == 8
+    assert stock_snapshots.apply_movement(5, "Export", -3) == 2
+    assert stock_snapshots.apply_movement(5, "Update", 1) == 1
+    assert stock_snapshots.apply_movement(5, "Manual", 9) == 5
+
+
+def test_history_before_and_after_snapshots(client):
+    # Chưa có ảnh chụp: phát lại toàn bộ lịch sử
+    assert {date: stock_at(client, date) for date in EXPECTED} == EXPECTED
+    response = client.post("/inventories/snapshots", params={"until": "2024-01-04"})
+    assert response.status_code == 200, response.text
+    assert response.json()["rows"] == 2
+    assert client.post("/inventories/snapshots", params={"until": "2024-01-04"}).json()["rows"] == 0
+    assert {date: stock_at(client, date) for date in EXPECTED} == EXPECTED
+    totals = client.get("/reports/stock-at", params={"date": "2024-01-03"}).json()["inventories"]
+    assert {"inventoryID": 9501, "stockQuantity": 11} in totals
+
+
+def test_rebuild_after_backdated_movement(client):
+    client.post("/inventory/import", json=dict(
+        productID=client.product_id, inventoryID=9501, quantity=2, unitCost=1, importDate="2024-01-02T09:00:00",
+    )).raise_for_status()
+    client.post("/inventories/snapshots", params={"until": "2024-01-04", "rebuild_from": "2024-01-02"}).raise_for_status()
+    assert stock_at(client, "2024-01-02") == 12
+    assert stock_at(client, "2024-01-07") == 8
+    assert client.get("/inventories/9501/stock-at", params={"date": "01/02/2024"}).status_code == 400
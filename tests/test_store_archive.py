@@ -0,0 +1,53 @@
+"""
+Lưu trữ lịch sử biến động kho: job chuyển dòng cũ sang tbl_stores_archive, danh sách mặc định chỉ đọc bảng nóng
+    python -m pytest tests
+"""
+import datetime
+
+import pytest
+
+from src.api import store_archive
+
+from conftest import add_inventory, add_product
+
+OLD_DATES = ["2020-01-05T08:00:00", "2020-03-10T08:00:00", "2020-03-11T08:00:00"]
+
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    app_client.product_id = add_product(app_client, productName="Archived")
+    add_inventory(app_client, 9401)
+    for date in OLD_DATES:
+        app_client.post("/inventory/import", json=dict(
+            productID=app_client.product_id, inventoryID=9401, quantity=1, unitCost=1, importDate=date,
+        )).raise_for_status()
+    app_client.post("/inventory/import", json=dict(
+        productID=app_client.product_id, inventoryID=9401, quantity=1, unitCost=1,
+    )).raise_for_status()
+    return app_client
+
+
+def dates(response) -> list:
+    assert response.status_code == 200, response.text
+    return sorted(str(row["storeDate"])[:10] for row in response.json())
+
+
+def test_needs_archive():
+    assert not store_archive.needs_archive(None)
+    assert store_archive.needs_archive(None, datetime.date.today())
+    assert store_archive.needs_archive(datetime.date(2020, 1, 1))
+    assert not store_archive.needs_archive(datetime.date.today())
+
+
+def test_archive_keeps_latest_row_per_link(client):
+    path = f"/stores/product/{client.product_id}"
+    assert len(dates(client.get(path))) == 4
+    response = client.post("/stores/archive", params={"retention_days": 90})
+    assert response.status_code == 200, response.text
+    assert response.json()["archived"] == 3
+    assert client.post("/stores/archive", params={"retention_days": 90}).json()["archived"] == 0
+
+    assert len(dates(client.get(path))) == 1
+    assert dates(client.get(path, params={"include_archive": True}))[:3] == [date[:10] for date in OLD_DATES]
+    # Khoảng ngày cũ hơn mốc lưu giữ tự đọc thêm bảng archive
+    assert dates(client.get("/stores", params={"date_from": "2020-03-01", "date_to": "2020-03-31"})) == ["2020-03-10", "2020-03-11"]
@@ -0,0 +1,81 @@
+"""
+Cửa hàng có shard riêng (TENANT_SHARDS): định tuyến theo X-Store-ID và báo cáo gộp ?stores= (db.fan_out_tenants)
+    python -m pytest tests
+"""
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api import config, db
+
+from conftest import add_customer, add_inventory, add_product, use_memory_sqlite, use_tmp_data
+
+HN = {"X-Store-ID": "hn01"}
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    """App với database mặc định và shard hn01 (SQLite trong bộ nhớ), schema do lifespan tạo"""
+    from src.api.main import app
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        use_memory_sqlite(monkeypatch)
+        use_tmp_data(monkeypatch, tmp_path_factory.mktemp("data"))
+        monkeypatch.setitem(config.TENANT_SHARDS, "hn01", {"path": ":memory:"})
+        monkeypatch.setattr(db, "_tenant_sqlite", {})
+        with TestClient(app) as client:
+            product_id = add_product(client, productName="Default")
+            add_inventory(client, 1, product_id=product_id, quantity=2, unit_cost=5)
+            client.headers.update(HN)
+            add_customer(client)
+            product_id = add_product(client, productName="Hanoi")
+            add_inventory(client, 1, product_id=product_id, quantity=3, unit_cost=1)
+            del client.headers["X-Store-ID"]
+            yield client
+
+
+def names(response) -> list:
+    assert response.status_code == 200, response.text
+    return [row["productName"] for row in response.json()]
+
+
+def test_requests_are_routed_to_the_store_shard(client):
+    assert names(client.get("/products")) == ["Default"]
+    assert names(client.get("/products", headers=HN)) == ["Hanoi"]
+    assert client.get("/customers").json() == []
+    response = client.get("/products", headers={"X-Store-ID": "nope"})
+    assert (response.status_code, response.json()["detail"]) == (400, "Unknown store: nope")
+
+
+def test_cross_store_reports_merge_shards(client):
+    rows = client.get("/reports/inventory", params={"stores": "all"}).json()
+    assert sorted((row["storeID"], row["stockQuantity"]) for row in rows) == [("default", 2), ("hn01", 3)]
+    only_hn = client.get("/reports/inventory", params={"stores": "hn01"}).json()
+    assert [row["storeID"] for row in only_hn] == ["hn01"]
+
+    summary = client.get("/reports/summary", params={"stores": "default,hn01"}).json()
+    assert (summary["totalProducts"], summary["totalCustomers"], float(summary["totalInventoryValue"])) == (2, 1, 13)
+    assert client.get("/reports/summary", params={"stores": "default,nope"}).status_code == 400
+
+
+def test_fan_out_runs_every_shard_and_reraises(client):
+    seen = {}
+
+    def record():
+        seen[db.current_tenant()] = threading.current_thread().name
+        return db.current_tenant()
+
+    assert db.fan_out_tenants(record) == {None: None, "hn01": "hn01"}
+    assert all(name.startswith("tenant-fanout") for name in seen.values())
+
+    def fail_on_hn():
+        if db.current_tenant() == "hn01":
+            raise RuntimeError("shard down")
+        seen["default ran"] = True
+    seen.clear()
+    with pytest.raises(RuntimeError, match="shard down"):
+        db.fan_out_tenants(fail_on_hn)
+    assert seen == {"default ran": True}
+    # Request không bị đổi shard sau khi fan-out
+    assert db.current_tenant() is None
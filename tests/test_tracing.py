@@ -0,0 +1,84 @@
+"""
+Đo request (tracing.py): histogram Prometheus, số câu SQL mỗi request, span kiểu OpenTelemetry nối tiếp traceparent
+    python -m pytest tests
+"""
+import orjson
+import pytest
+
+from src.api import tracing
+
+from conftest import add_customer
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    add_customer(app_client, "Traced")
+    return app_client
+
+
+@pytest.fixture
+def span_file(tmp_path, monkeypatch):
+    exporter = tracing.SpanExporter(str(tmp_path / "spans" / "spans.jsonl"))
+    monkeypatch.setattr(tracing, "_spans", exporter)
+    exporter.start()
+    yield exporter
+    exporter.stop()
+
+
+def metric(text: str, line_prefix: str) -> float:
+    """Giá trị của series; 0 nếu chưa có (số liệu dùng chung với các file test khác)"""
+    line = next((line for line in text.splitlines() if line.startswith(line_prefix)), None)
+    return float(line.rsplit(" ", 1)[1]) if line else 0
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = tracing.Histogram("h", "help", (1, 5))
+    for value in (0.5, 3, 9):
+        histogram.observe(("GET", "/x"), value)
+    lines = histogram.render(("method", "route"))
+    assert lines[2:] == [
+        'h_bucket{method="GET",route="/x",le="1"} 1',
+        'h_bucket{method="GET",route="/x",le="5"} 2',
+        'h_bucket{method="GET",route="/x",le="+Inf"} 3',
+        'h_sum{method="GET",route="/x"} 12.5',
+        'h_count{method="GET",route="/x"} 3',
+    ]
+
+
+def test_request_metrics_count_queries(client):
+    labels = '{method="GET",route="/customers/{id}"}'
+    before = client.get("/metrics").text
+    assert client.get("/customers/1").status_code == 200
+    text = client.get("/metrics").text
+    assert text.startswith("# HELP http_requests_total")
+    count = f"http_request_duration_seconds_count{labels}"
+    assert metric(text, count) == metric(before, count) + 1
+    # Câu SQL trên backend SQLite cũng được đếm
+    assert metric(text, f"http_request_queries_sum{labels}") >= 1
+    assert metric(text, f"http_response_size_bytes_count{labels}") >= 1
+
+
+def test_spans_continue_incoming_trace(client, span_file):
+    response = client.get("/customers/1", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+    assert response.status_code == 200
+    span_file.stop()
+    with open(span_file.target, "rb") as file:
+        spans = [orjson.loads(line) for line in file]
+    server = next(span for span in spans if span["kind"] == 2)
+    assert (server["traceId"], server["parentSpanId"], server["name"]) == (TRACE_ID, PARENT_ID, "GET /customers/{id}")
+    queries = [span for span in spans if span["kind"] == 3]
+    assert queries and all(span["parentSpanId"] == server["spanId"] for span in queries)
+    statements = [attribute["value"]["stringValue"] for span in queries
+                  for attribute in span["attributes"] if attribute["key"] == "db.statement"]
+    assert all("'" not in statement for statement in statements)
+    assert client.get("/metrics/tracing").json()["spansExported"] == len(spans)
+
+
+def test_traceparent_parsing(monkeypatch):
+    monkeypatch.setattr(tracing, "_spans", None)
+    assert tracing._parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID, False)
+    trace_id, parent_id, sampled = tracing._parse_traceparent("garbage")
+    assert (len(trace_id), parent_id, sampled) == (32, None, False)
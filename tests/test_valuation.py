@@ -0,0 +1,73 @@
+"""
+Định giá tồn kho tăng dần (valuation.py): lớp giá vốn FIFO, bình quân gia quyền và giá trị trong báo cáo
+    python -m pytest tests
+"""
+import pytest
+
+from src.api import valuation
+
+from conftest import add_inventory, add_product
+
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    app_client.product_id = add_product(app_client, productName="Valued")
+    return app_client
+
+
+def move(client, inventory_id: int, kind: str, quantity: int, unit_cost: float = None):
+    payload = dict(productID=client.product_id, inventoryID=inventory_id, quantity=quantity)
+    if unit_cost is not None:
+        payload["unitCost"] = unit_cost
+    client.post(f"/inventory/{kind}", json=payload).raise_for_status()
+
+
+def valued(client, inventory_id: int) -> dict:
+    response = client.get(f"/inventories/{inventory_id}/valuation")
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def report_value(client, inventory_id: int) -> float:
+    rows = client.get("/reports/inventory", params={"fresh": True}).json()
+    return float(next(row["totalValue"] for row in rows if row["inventoryID"] == inventory_id))
+
+
+def test_fifo_consumes_oldest_layers(client, monkeypatch):
+    monkeypatch.setattr(valuation, "INVENTORY_VALUATION_METHOD", valuation.METHOD_FIFO)
+    add_inventory(client, 9601)
+    move(client, 9601, "import", 10, 2)
+    move(client, 9601, "import", 10, 4)
+    move(client, 9601, "export", 15)
+    state = valued(client, 9601)
+    assert (state["quantity"], float(state["totalValue"]), state["method"]) == (5, 20, "FIFO")
+    assert [(layer["quantityRemaining"], float(layer["unitCost"])) for layer in state["layers"]] == [(5, 4)]
+    assert report_value(client, 9601) == 20
+
+    # Kiểm kê thừa 2 nhập theo giá bình quân hiện tại (4)
+    client.post("/inventory/stocktaking", json=dict(
+        productID=client.product_id, inventoryID=9601, actualQuantity=7,
+    )).raise_for_status()
+    assert float(valued(client, 9601)["totalValue"]) == 28
+
+
+def test_average_cost(client, monkeypatch):
+    monkeypatch.setattr(valuation, "INVENTORY_VALUATION_METHOD", valuation.METHOD_AVERAGE)
+    add_inventory(client, 9602)
+    move(client, 9602, "import", 10, 2)
+    move(client, 9602, "import", 10, 4)
+    move(client, 9602, "export", 15)
+    state = valued(client, 9602)
+    assert (state["quantity"], float(state["totalValue"]), float(state["averageCost"])) == (5, 15, 3)
+    assert state["layers"] == []
+    assert report_value(client, 9602) == 15
+
+
+def test_opening_balance_is_seeded_from_inventory(client):
+    # Inventory có tồn kho trước khi có định giá: số dư đầu kỳ theo unitCost hiện tại
+    add_inventory(client, 9603, quantity=6, unit_cost=1.5)
+    assert client.get("/inventories/9603/valuation").status_code == 404
+    assert report_value(client, 9603) == 9
+    move(client, 9603, "export", 2)
+    state = valued(client, 9603)
+    assert (state["quantity"], float(state["totalValue"])) == (4, 6)